@@ -1,6 +1,6 @@
 {
     'name': 'Auxiliaire Médical CPS – Polynésie française',
-    'version': '17.0.2.2.0',
+    'version': '17.0.2.7.0',
     'author': 'OpalSea',
     'website': 'https://opalsea.site',
     'category': 'Healthcare',
@@ -20,6 +20,8 @@
 
         # ── Séquences ───────────────────────────────────────────────
         'data/ir_sequence_data.xml',
+        'data/ir_cron_data.xml',
+        'data/ir_config_parameter_data.xml',
 
         # ── Données de base ─────────────────────────────────────────
         'data/res_partner_category_data.xml',
@@ -42,11 +44,14 @@
         'views/bordereau_modele_views.xml',     # ← NOUVEAU
         'views/bordereau_views.xml',            # ← NOUVEAU sélection modèle document
         'views/api_usage_views.xml',            # ← NOUVEAU comptage tokens
+        'views/ocr_job_views.xml',
         'views/res_config_settings_views.xml',  # ← NOUVEAU sélection modèle Claude
 
         'wizards/wizard_bordereau_views.xml',
         'wizards/wizard_date_selection_views.xml',
+        'wizards/wizard_agenda_optimiseur_views.xml',
         'wizards/wizard_ocr_ordonnance_views.xml',
+        'wizards/wizard_ocr_import_views.xml',
 
         # ── Rapports ────────────────────────────────────────────────
         'report/report_bordereau.xml',
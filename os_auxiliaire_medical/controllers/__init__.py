@@ -1,2 +1,4 @@
 from . import main
 from . import bordereau_csv
+from . import agenda
+from . import fsa25
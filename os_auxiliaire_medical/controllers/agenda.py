@@ -0,0 +1,124 @@
+"""
+Flux agenda d'un praticien : séances (cps.feuille.soins.acte) d'une période,
+en JSON compact ou en iCalendar.
+
+Les lignes sont lues en une requête SQL sur l'index (praticien_id, datetime_acte),
+après le domaine et les règles d'accès de l'ORM. La réponse porte un ETag
+calculé sur une agrégation légère (nombre de séances, dernières modifications) :
+un client qui renvoie If-None-Match reçoit 304 sans que les lignes soient lues.
+"""
+import hashlib
+import json
+from datetime import timedelta
+
+from odoo import fields, http
+from odoo.http import request, Response
+
+# Période par défaut autour d'aujourd'hui (jours).
+JOURS_AVANT = 7
+JOURS_APRES = 60
+# Période maximale d'une requête (jours).
+JOURS_MAX = 731
+
+COLONNES = [
+    'id', 'debut', 'duree_heures', 'statut', 'libelle',
+    'patient', 'feuille', 'etat_feuille', 'montant', 'montant_cps',
+]
+
+STATUTS_ICS = {'annulee': 'CANCELLED', 'planifiee': 'TENTATIVE'}
+
+
+# ── Formatage (sans ORM) ──────────────────────────────────────────────────────
+
+def _ics_texte(valeur):
+    """Échappement RFC 5545 d'une valeur TEXT."""
+    return (str(valeur or '').replace('\\', '\\\\').replace(';', '\\;')
+            .replace(',', '\\,').replace('\n', '\\n'))
+
+
+def _ics_date(valeur):
+    return valeur.strftime('%Y%m%dT%H%M%SZ')
+
+
+def lignes_json(lignes):
+    return json.dumps({
+        'colonnes': COLONNES,
+        'lignes': [
+            [id_, debut and fields.Datetime.to_string(debut), duree, statut,
+             libelle, patient, feuille, etat, montant, montant_cps]
+            for (id_, debut, duree, statut, libelle, patient, feuille, etat,
+                 montant, montant_cps) in lignes
+        ],
+    }, ensure_ascii=False, separators=(',', ':'))
+
+
+def lignes_ics(lignes, horodatage):
+    """Calendrier iCalendar : un VEVENT par séance datée (heures UTC)."""
+    sortie = [
+        'BEGIN:VCALENDAR',
+        'VERSION:2.0',
+        'PRODID:-//os_auxiliaire_medical//Agenda CPS//FR',
+        'CALSCALE:GREGORIAN',
+    ]
+    stamp = _ics_date(horodatage)
+    for (id_, debut, duree, statut, libelle, patient, feuille, _etat,
+         _montant, _montant_cps) in lignes:
+        if not debut:
+            continue
+        fin = debut + timedelta(hours=duree or 0.5)
+        sortie += [
+            'BEGIN:VEVENT',
+            'UID:acte-%d@os_auxiliaire_medical' % id_,
+            'DTSTAMP:%s' % stamp,
+            'DTSTART:%s' % _ics_date(debut),
+            'DTEND:%s' % _ics_date(fin),
+            'SUMMARY:%s' % _ics_texte(libelle or patient),
+            'DESCRIPTION:%s' % _ics_texte(feuille),
+            'STATUS:%s' % STATUTS_ICS.get(statut, 'CONFIRMED'),
+            'END:VEVENT',
+        ]
+    sortie.append('END:VCALENDAR')
+    return ('\r\n'.join(sortie) + '\r\n').encode('utf-8')
+
+
+class AgendaController(http.Controller):
+
+    @http.route(['/cps/agenda/<int:praticien_id>.json',
+                 '/cps/agenda/<int:praticien_id>.ics'],
+                type='http', auth='user', methods=['GET'])
+    def agenda(self, praticien_id, debut=None, fin=None, **kwargs):
+        format_ics = request.httprequest.path.endswith('.ics')
+        try:
+            jour_debut = (fields.Date.to_date(debut) if debut
+                          else fields.Date.context_today(request.env.user)
+                          - timedelta(days=JOURS_AVANT))
+            jour_fin = (fields.Date.to_date(fin) if fin
+                        else fields.Date.context_today(request.env.user)
+                        + timedelta(days=JOURS_APRES))
+        except ValueError:
+            return Response('Dates invalides (AAAA-MM-JJ)', status=400)
+        if not jour_debut < jour_fin <= jour_debut + timedelta(days=JOURS_MAX):
+            return Response('Période invalide', status=400)
+
+        Acte = request.env['cps.feuille.soins.acte']
+        borne_debut = fields.Datetime.to_datetime(jour_debut)
+        borne_fin = fields.Datetime.to_datetime(jour_fin)
+
+        version = Acte._agenda_version(praticien_id, borne_debut, borne_fin)
+        etag = hashlib.sha1(repr((
+            request.env.uid, praticien_id, jour_debut, jour_fin, format_ics, version,
+        )).encode()).hexdigest()
+        entetes = [('ETag', '"%s"' % etag), ('Cache-Control', 'private, no-cache')]
+        if request.httprequest.if_none_match.contains(etag):
+            return Response(status=304, headers=entetes)
+
+        lignes = Acte._agenda_lignes(praticien_id, borne_debut, borne_fin)
+        if format_ics:
+            corps = lignes_ics(lignes, max(filter(None, version[1:]), default=borne_debut))
+            type_contenu = 'text/calendar; charset=utf-8'
+        else:
+            corps = lignes_json(lignes)
+            type_contenu = 'application/json; charset=utf-8'
+        return request.make_response(corps, headers=entetes + [
+            ('Content-Type', type_contenu),
+        ])
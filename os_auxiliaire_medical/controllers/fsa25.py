@@ -0,0 +1,56 @@
+"""
+Impression FSA25 en PDF :
+  - toutes les feuilles d'un bordereau (cps.bordereau._fsa25_pdf)
+  - feuilles choisies, sur le formulaire PDF (cps.feuille.soins._fsa25_remplir)
+Le PDF est écrit dans un fichier temporaire puis envoyé par blocs.
+?fond=1 : fond officiel du formulaire compris (impression sur page vierge).
+"""
+import tempfile
+
+from werkzeug.wsgi import wrap_file
+
+from odoo import http
+from odoo.http import request, Response, content_disposition
+
+
+class Fsa25Controller(http.Controller):
+
+    @http.route('/cps/bordereau/<int:bordereau_id>/fsa25.pdf',
+                type='http', auth='user', methods=['GET'])
+    def imprimer_fsa25(self, bordereau_id, fond='0', **kwargs):
+        bordereau = request.env['cps.bordereau'].browse(bordereau_id)
+        if not bordereau.exists():
+            return Response('Bordereau introuvable', status=404)
+
+        fichier = tempfile.TemporaryFile()
+        bordereau._fsa25_pdf(fichier, fond=fond == '1')
+        return self._envoyer(fichier, f"FSA25_{bordereau.name.replace('/', '_')}.pdf")
+
+    @http.route('/cps/feuille/fsa25.pdf', type='http', auth='user', methods=['GET'])
+    def imprimer_feuilles_fsa25(self, ids='', fond='0', **kwargs):
+        try:
+            feuille_ids = [int(i) for i in ids.split(',') if i]
+        except ValueError:
+            return Response('Paramètre ids invalide', status=400)
+        feuilles = request.env['cps.feuille.soins'].browse(feuille_ids).exists()
+        if not feuilles:
+            return Response('Feuille de soins introuvable', status=404)
+
+        fichier = tempfile.TemporaryFile()
+        feuilles._fsa25_remplir(fichier, fond=fond == '1')
+        nom = feuilles.name if len(feuilles) == 1 else 'feuilles'
+        return self._envoyer(fichier, f"FSA25_{nom.replace('/', '_')}.pdf")
+
+    @staticmethod
+    def _envoyer(fichier, filename):
+        taille = fichier.tell()
+        fichier.seek(0)
+        return Response(
+            wrap_file(request.httprequest.environ, fichier),
+            direct_passthrough=True,
+            content_type='application/pdf',
+            headers=[
+                ('Content-Disposition', content_disposition(filename)),
+                ('Content-Length', taille),
+            ],
+        )
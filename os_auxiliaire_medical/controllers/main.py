@@ -1,117 +1,219 @@
-from odoo import http
-from odoo.http import request, Response
-import io
+"""
+Export XLSX des bordereaux (openpyxl en mode write-only).
+
+Les lignes sont écrites au fil de l'eau avec des styles nommés partagés par
+tout le classeur (pas d'objets Font / PatternFill / Border par cellule).
+Le fichier est enregistré dans un fichier temporaire puis envoyé par blocs :
+la mémoire reste constante quel que soit le nombre de feuilles de soins.
+"""
+import re
+import tempfile
+
 from openpyxl import Workbook
-from openpyxl.styles import Font, PatternFill, Alignment, Border, Side
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles import Font, PatternFill, Alignment, Border, Side, NamedStyle
+from openpyxl.worksheet.cell_range import CellRange
+from werkzeug.wsgi import wrap_file
 
+from odoo import http
+from odoo.http import request, Response, content_disposition
+
+GREEN = "1F6B3A"
+LIGHT_GREEN = "E8F5E9"
+FORMAT_MONTANT = '#,##0 "F"'
+LARGEURS = [6, 28, 14, 13, 13, 16, 18]
+ENTETES = ["N°", "Nom Prénom", "DN", "Soins DU", "Soins AU", "Pmt CPS", "Pmt Patient"]
+XLSX_MIMETYPE = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+
+
+def _ajouter_styles(wb):
+    """Déclare une fois pour tout le classeur les styles nommés du bordereau."""
+    side = Side(style='thin', color='AAAAAA')
+    bordure = Border(left=side, right=side, top=side, bottom=side)
+    centre = Alignment(horizontal="center", vertical="center")
+    vert = PatternFill("solid", fgColor=GREEN)
+
+    def style(name, **attrs):
+        ns = NamedStyle(name=name)
+        for attr, value in attrs.items():
+            setattr(ns, attr, value)
+        wb.add_named_style(ns)
+
+    style('cps_titre', font=Font(bold=True, size=14, color="FFFFFF"), fill=vert,
+          alignment=centre)
+    style('cps_label', font=Font(bold=True, size=10))
+    style('cps_valeur', font=Font(size=10))
+    style('cps_praticien', font=Font(size=10, italic=True, color=GREEN),
+          fill=PatternFill("solid", fgColor=LIGHT_GREEN),
+          alignment=Alignment(horizontal="center"))
+    style('cps_mois', font=Font(bold=True, size=11, color=GREEN),
+          alignment=Alignment(horizontal="center"))
+    style('cps_entete', font=Font(bold=True, size=10, color="FFFFFF"), fill=vert,
+          alignment=centre, border=bordure)
+    for parite, couleur in (('paire', "F5F5F5"), ('impaire', "FFFFFF")):
+        fond = PatternFill("solid", fgColor=couleur)
+        style(f'cps_ligne_{parite}', font=Font(size=10), fill=fond, border=bordure,
+              alignment=centre)
+        style(f'cps_nom_{parite}', font=Font(size=10), fill=fond, border=bordure,
+              alignment=Alignment(horizontal="left", vertical="center"))
+        style(f'cps_montant_{parite}', font=Font(size=10), fill=fond, border=bordure,
+              alignment=centre, number_format=FORMAT_MONTANT)
+    style('cps_total', font=Font(bold=True, size=11, color="FFFFFF"), fill=vert,
+          alignment=Alignment(horizontal="center"), border=bordure,
+          number_format=FORMAT_MONTANT)
+
+
+def _titre_onglet(nom, pris):
+    """Nom d'onglet Excel valide (31 caractères, sans []:*?/\\) et unique."""
+    base = re.sub(r'[\[\]:*?/\\]', '-', nom or 'Bordereau').strip("' ")[:31] or 'Bordereau'
+    titre, n = base, 2
+    while titre.lower() in pris:
+        suffixe = f' ({n})'
+        titre = base[:31 - len(suffixe)] + suffixe
+        n += 1
+    pris.add(titre.lower())
+    return titre
+
+
+def _nouvel_onglet(wb, titre, fige=True):
+    ws = wb.create_sheet(title=titre)
+    for i, largeur in enumerate(LARGEURS):
+        ws.column_dimensions[chr(ord('A') + i)].width = largeur
+    if fige:
+        # En write-only, doit être posé avant la première ligne.
+        ws.freeze_panes = "A7"
+    return ws
 
-class CpsBordereauController(http.Controller):
 
-    @http.route('/cps/bordereau/<int:bordereau_id>/xlsx', type='http', auth='user')
-    def export_bordereau_xlsx(self, bordereau_id, **kwargs):
-        bordereau = request.env['cps.bordereau'].browse(bordereau_id)
-        if not bordereau.exists():
-            return Response('Bordereau introuvable', status=404)
+class _Ecrivain:
+    """Ajoute des lignes stylées à un onglet write-only en suivant le n° de ligne."""
+
+    def __init__(self, ws):
+        self.ws = ws
+        self.row = 0
+
+    def cellule(self, value, style):
+        cell = WriteOnlyCell(self.ws, value=value)
+        cell.style = style
+        return cell
+
+    def ligne(self, cells, hauteur=None, fusion=None):
+        self.row += 1
+        if hauteur:
+            self.ws.row_dimensions[self.row].height = hauteur
+        if fusion:
+            self.ws.merged_cells.add(CellRange(fusion.format(r=self.row)))
+        self.ws.append(cells)
 
-        wb = Workbook()
-        ws = wb.active
-        ws.title = "Bordereau"
-
-        GREEN = "1F6B3A"
-        LIGHT_GREEN = "E8F5E9"
-
-        def thin():
-            s = Side(style='thin', color='AAAAAA')
-            return Border(left=s, right=s, top=s, bottom=s)
-
-        for col, w in zip("ABCDEFG", [6, 28, 14, 13, 13, 16, 18]):
-            ws.column_dimensions[col].width = w
-
-        row = 1
-        ws.merge_cells(f"A{row}:G{row}")
-        ws[f"A{row}"] = "BORDEREAU DE FACTURATION"
-        ws[f"A{row}"].font = Font(bold=True, size=14, color="FFFFFF")
-        ws[f"A{row}"].fill = PatternFill("solid", fgColor=GREEN)
-        ws[f"A{row}"].alignment = Alignment(horizontal="center", vertical="center")
-        ws.row_dimensions[row].height = 28
-        row += 1
-
-        for i, (lbl, val) in enumerate([
-            ("N° bordereau :", bordereau.name),
-            ("Date :", bordereau.date_bordereau.strftime('%d.%m.%Y') if bordereau.date_bordereau else ''),
-            ("Nb factures :", str(bordereau.nb_feuilles)),
-        ]):
-            c1, c2 = ["A", "D", "F"][i], ["B", "E", "G"][i]
-            ws[f"{c1}{row}"] = lbl
-            ws[f"{c1}{row}"].font = Font(bold=True, size=10)
-            ws[f"{c2}{row}"] = val
-            ws[f"{c2}{row}"].font = Font(size=10)
-        row += 1
+    def bordereau(self, bordereau, lignes):
+        c = self.cellule
+        self.ligne([c("BORDEREAU DE FACTURATION", 'cps_titre')], hauteur=28, fusion="A{r}:G{r}")
+
+        date_b = bordereau.date_bordereau.strftime('%d.%m.%Y') if bordereau.date_bordereau else ''
+        self.ligne([
+            c("N° bordereau :", 'cps_label'), c(bordereau.name, 'cps_valeur'), None,
+            c("Date :", 'cps_label'), c(date_b, 'cps_valeur'),
+            c("Nb factures :", 'cps_label'), c(str(bordereau.nb_feuilles), 'cps_valeur'),
+        ])
 
         prat = bordereau.praticien_id
-        ws.merge_cells(f"A{row}:G{row}")
-        ws[f"A{row}"] = f"{prat.vat or ''}  ·  {prat.name}  ·  Tél : {prat.phone or ''}  ·  {prat.street or ''}"
-        ws[f"A{row}"].font = Font(size=10, italic=True, color=GREEN)
-        ws[f"A{row}"].fill = PatternFill("solid", fgColor=LIGHT_GREEN)
-        ws[f"A{row}"].alignment = Alignment(horizontal="center")
-        row += 1
-
-        ws.merge_cells(f"A{row}:G{row}")
-        ws[f"A{row}"] = bordereau.mois.upper()
-        ws[f"A{row}"].font = Font(bold=True, size=11, color=GREEN)
-        ws[f"A{row}"].alignment = Alignment(horizontal="center")
-        row += 2
-
-        headers = ["N°", "Nom Prénom", "DN", "Soins DU", "Soins AU", "Pmt CPS", "Pmt Patient"]
-        for i, h in enumerate(headers):
-            c = ws.cell(row=row, column=i + 1, value=h)
-            c.font = Font(bold=True, size=10, color="FFFFFF")
-            c.fill = PatternFill("solid", fgColor=GREEN)
-            c.alignment = Alignment(horizontal="center", vertical="center")
-            c.border = thin()
-        ws.row_dimensions[row].height = 22
-        row += 1
-
-        first_data = row
-        lignes = bordereau.get_lignes_for_report()
+        self.ligne([c(
+            f"{prat.vat or ''}  ·  {prat.name}  ·  Tél : {prat.phone or ''}  ·  {prat.street or ''}",
+            'cps_praticien',
+        )], fusion="A{r}:G{r}")
+        self.ligne([c((bordereau.mois or '').upper(), 'cps_mois')], fusion="A{r}:G{r}")
+        self.ligne([])
+
+        self.ligne([c(h, 'cps_entete') for h in ENTETES], hauteur=22)
+
+        premiere = self.row + 1
         for idx, l in enumerate(lignes):
-            bg = "F5F5F5" if idx % 2 == 0 else "FFFFFF"
-            data = [l['n'], l['nom_prenom'], l['dn'], l['date_debut'], l['date_fin'],
-                    l['montant_cps'], l['montant_patient']]
-            for ci, val in enumerate(data):
-                c = ws.cell(row=row, column=ci + 1, value=val)
-                c.border = thin()
-                c.fill = PatternFill("solid", fgColor=bg)
-                c.alignment = Alignment(horizontal="center" if ci != 1 else "left", vertical="center")
-                c.font = Font(size=10)
-                if ci in (5, 6):
-                    c.number_format = '#,##0 "F"'
-            row += 1
-
-        ws.merge_cells(f"A{row}:E{row}")
-        ws[f"A{row}"] = "TOTAL"
-        ws[f"A{row}"].font = Font(bold=True, size=11, color="FFFFFF")
-        ws[f"A{row}"].fill = PatternFill("solid", fgColor=GREEN)
-        ws[f"A{row}"].alignment = Alignment(horizontal="center")
-        ws[f"A{row}"].border = thin()
-        for col_letter in ["F", "G"]:
-            c = ws[f"{col_letter}{row}"]
-            c.value = f"=SUM({col_letter}{first_data}:{col_letter}{row - 1})"
-            c.font = Font(bold=True, size=11, color="FFFFFF")
-            c.fill = PatternFill("solid", fgColor=GREEN)
-            c.alignment = Alignment(horizontal="center")
-            c.border = thin()
-            c.number_format = '#,##0 "F"'
+            parite = 'paire' if idx % 2 == 0 else 'impaire'
+            ligne_style = f'cps_ligne_{parite}'
+            montant_style = f'cps_montant_{parite}'
+            self.ligne([
+                c(l['n'], ligne_style), c(l['nom_prenom'], f'cps_nom_{parite}'),
+                c(l['dn'], ligne_style), c(l['date_debut'], ligne_style),
+                c(l['date_fin'], ligne_style),
+                c(l['montant_cps_raw'], montant_style), c(l['montant_patient_raw'], montant_style),
+            ])
+        derniere = self.row
+
+        total = self.row + 1
+        self.ligne(
+            [c("TOTAL", 'cps_total')] + [c(None, 'cps_total') for _i in range(4)] + [
+                c(f"=SUM({col}{premiere}:{col}{derniere})" if derniere >= premiere else 0,
+                  'cps_total')
+                for col in "FG"
+            ],
+            fusion=f"A{total}:E{total}",
+        )
 
-        ws.freeze_panes = "A7"
 
-        output = io.BytesIO()
-        wb.save(output)
-        output.seek(0)
+class CpsBordereauController(http.Controller):
 
-        filename = f"Bordereau_{bordereau.name}_{bordereau.mois.replace(' ', '_')}.xlsx"
+    @http.route('/cps/bordereau/<int:bordereau_id>/xlsx', type='http', auth='user')
+    def export_bordereau_xlsx(self, bordereau_id, **kwargs):
+        bordereau = request.env['cps.bordereau'].browse(bordereau_id)
+        if not bordereau.exists():
+            return Response('Bordereau introuvable', status=404)
+
+        wb = Workbook(write_only=True)
+        _ajouter_styles(wb)
+        lignes = bordereau._get_export_rows()[bordereau.id]
+        _Ecrivain(_nouvel_onglet(wb, "Bordereau")).bordereau(bordereau, lignes)
+
+        filename = f"Bordereau_{bordereau.name}_{(bordereau.mois or '').replace(' ', '_')}.xlsx"
+        return self._reponse_xlsx(wb, filename)
+
+    @http.route('/cps/bordereaux/xlsx', type='http', auth='user')
+    def export_bordereaux_xlsx(self, ids='', onglet='bordereau', **kwargs):
+        """
+        Export de plusieurs bordereaux dans un classeur :
+          onglet=bordereau → un onglet par bordereau
+          onglet=praticien → un onglet par praticien, bordereaux à la suite
+        """
+        bordereau_ids = [int(i) for i in ids.split(',') if i.strip().isdigit()]
+        bordereaux = request.env['cps.bordereau'].browse(bordereau_ids).exists()
+        if not bordereaux:
+            return Response('Bordereau introuvable', status=404)
+        bordereaux = bordereaux.sorted(lambda b: (b.praticien_id.name or '', b.date_bordereau))
+
+        lignes = bordereaux._get_export_rows()
+
+        wb = Workbook(write_only=True)
+        _ajouter_styles(wb)
+        pris = set()
+        if onglet == 'praticien':
+            for praticien in bordereaux.praticien_id:
+                ecrivain = _Ecrivain(_nouvel_onglet(
+                    wb, _titre_onglet(praticien.name, pris), fige=False,
+                ))
+                for bordereau in bordereaux.filtered(lambda b: b.praticien_id == praticien):
+                    if ecrivain.row:
+                        ecrivain.ligne([])
+                        ecrivain.ligne([])
+                    ecrivain.bordereau(bordereau, lignes[bordereau.id])
+        else:
+            for bordereau in bordereaux:
+                _Ecrivain(_nouvel_onglet(wb, _titre_onglet(bordereau.name, pris))).bordereau(
+                    bordereau, lignes[bordereau.id])
+
+        return self._reponse_xlsx(wb, f"Bordereaux_{len(bordereaux)}.xlsx")
+
+    @staticmethod
+    def _reponse_xlsx(wb, filename):
+        """Enregistre le classeur sur disque et l'envoie par blocs."""
+        fichier = tempfile.TemporaryFile()
+        wb.save(fichier)
+        taille = fichier.tell()
+        fichier.seek(0)
         return Response(
-            output.read(),
-            content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
-            headers=[('Content-Disposition', f'attachment; filename="{filename}"')]
+            wrap_file(request.httprequest.environ, fichier),
+            direct_passthrough=True,
+            content_type=XLSX_MIMETYPE,
+            headers=[
+                ('Content-Disposition', content_disposition(filename)),
+                ('Content-Length', taille),
+            ],
         )
@@ -0,0 +1,70 @@
+"""
+Migration vers la version où les champs texte FSA25 de cps.feuille.soins
+ne sont plus stockés (voir CpsFeuillesSoins.get_fsa25_field_map) :
+  - suppression des ~200 colonnes *_texte / *_oui / *_non de cps_feuille_soins
+"""
+import logging
+_logger = logging.getLogger(__name__)
+
+_CHAMPS_ENTETE = [
+    'state_texte', 'num_rsr_texte', 'num_panier_texte', 'motif_derogation_texte',
+    'auxiliaire_remplacant_oui', 'auxiliaire_remplacant_non', 'parcours_soins_oui',
+    'at_mp_oui', 'autre_oui', 'maladie_oui', 'longue_maladie_oui', 'maternite_oui',
+    'urgence_oui', 'date_prescription_texte', 'date_debut_soins_texte',
+    'date_fin_soins_texte', 'montant_total_texte', 'montant_tiers_payant_texte',
+    'montant_patient_texte', 'taux_remboursement_texte', 'patient_nom_texte',
+    'patient_prenom_texte', 'patient_dn_texte', 'patient_date_naissance_texte',
+    'praticien_name_texte', 'praticien_code_texte', 'praticien_profession_texte',
+    'praticien_bp_texte', 'praticien_tel_texte', 'bordereau_name_texte',
+]
+_CHAMPS_ACTE = [
+    'date_texte', 'lettre_cle_texte', 'coefficient_texte', 'ifd_texte', 'ik_texte',
+    'taux_majoration_texte', 'montant_texte', 'dimanche_ferie_oui',
+    'dimanche_ferie_non', 'nuit_oui', 'nuit_non',
+]
+
+
+def migrate(cr, version):
+    if not version:
+        return
+
+    colonnes = list(_CHAMPS_ENTETE) + [
+        f'acte_{i:02d}_{suffixe}' for i in range(1, 17) for suffixe in _CHAMPS_ACTE
+    ]
+
+    # ── 1. Métadonnées ORM (évite un DROP COLUMN par champ en fin de mise à jour)
+    cr.execute("""
+        DELETE FROM ir_model_data
+         WHERE module = 'os_auxiliaire_medical'
+           AND model = 'ir.model.fields'
+           AND name = ANY(%s)
+    """, [['field_cps_feuille_soins__%s' % col for col in colonnes]])
+    cr.execute("""
+        DELETE FROM ir_model_fields
+         WHERE model = 'cps.feuille.soins'
+           AND name = ANY(%s)
+    """, [colonnes])
+
+    # ── 2. Colonnes : un seul ALTER TABLE ─────────────────────────────────────
+    cr.execute("""
+        SELECT column_name
+        FROM information_schema.columns
+        WHERE table_name = 'cps_feuille_soins'
+          AND column_name = ANY(%s)
+    """, [colonnes])
+    existantes = [row[0] for row in cr.fetchall()]
+    if existantes:
+        _logger.info(
+            "Migration: suppression de %d colonnes texte FSA25 sur cps_feuille_soins",
+            len(existantes),
+        )
+        cr.execute(
+            'ALTER TABLE cps_feuille_soins '
+            + ', '.join('DROP COLUMN "%s"' % col for col in existantes)
+        )
+        _logger.info(
+            "Migration: l'espace disque n'est récupéré qu'après "
+            "VACUUM FULL cps_feuille_soins (à lancer hors transaction)."
+        )
+
+    _logger.info("Migration CPS terminée avec succès.")
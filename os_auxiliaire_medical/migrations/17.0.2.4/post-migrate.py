@@ -0,0 +1,30 @@
+"""
+Migration vers la version des budgets mensuels de tokens Claude :
+  - initialisation des compteurs cps_api_usage_mensuel depuis le journal
+    cps_api_usage (ensuite tenus à jour par log_usage)
+"""
+import logging
+_logger = logging.getLogger(__name__)
+
+
+def migrate(cr, version):
+    if not version:
+        return
+
+    # Une ligne par (société, utilisateur, mois) + une ligne société (user_id NULL).
+    cr.execute("""
+        INSERT INTO cps_api_usage_mensuel AS c
+               (company_id, user_id, mois, tokens, nb_appels,
+                create_uid, create_date, write_uid, write_date)
+        SELECT company_id, user_id, date_trunc('month', date)::date,
+               SUM(total_tokens), COUNT(*),
+               1, now() at time zone 'UTC', 1, now() at time zone 'UTC'
+          FROM cps_api_usage
+         WHERE total_tokens > 0
+         GROUP BY GROUPING SETS ((company_id, user_id, date_trunc('month', date)),
+                                 (company_id, date_trunc('month', date)))
+        ON CONFLICT (company_id, (COALESCE(user_id, 0)), mois) DO UPDATE
+           SET tokens = EXCLUDED.tokens,
+               nb_appels = EXCLUDED.nb_appels
+    """)
+    _logger.info("Migration: %d compteurs mensuels de tokens Claude initialisés", cr.rowcount)
@@ -0,0 +1,39 @@
+"""
+Migration vers la version des agrégats quotidiens de consommation Claude :
+  - initialisation de cps_api_usage_jour depuis le journal cps_api_usage
+    (ensuite tenu à jour par log_usage ; le journal est purgé par le cron
+    au-delà de cps.api.usage.retention_jours)
+"""
+import logging
+_logger = logging.getLogger(__name__)
+
+
+def migrate(cr, version):
+    if not version:
+        return
+
+    cr.execute("""
+        INSERT INTO cps_api_usage_jour AS j
+               (company_id, user_id, jour, model, operation,
+                nb_appels, nb_erreurs, nb_cache,
+                input_tokens, output_tokens, total_tokens,
+                create_uid, create_date, write_uid, write_date)
+        SELECT company_id, user_id, date::date, model, operation,
+               COUNT(*),
+               COUNT(*) FILTER (WHERE NOT COALESCE(success, FALSE)),
+               COUNT(*) FILTER (WHERE cache_hit),
+               COALESCE(SUM(input_tokens), 0), COALESCE(SUM(output_tokens), 0),
+               COALESCE(SUM(total_tokens), 0),
+               1, now() at time zone 'UTC', 1, now() at time zone 'UTC'
+          FROM cps_api_usage
+         GROUP BY company_id, user_id, date::date, model, operation
+        ON CONFLICT (company_id, user_id, model, operation, jour) DO UPDATE
+           SET nb_appels = EXCLUDED.nb_appels,
+               nb_erreurs = EXCLUDED.nb_erreurs,
+               nb_cache = EXCLUDED.nb_cache,
+               input_tokens = EXCLUDED.input_tokens,
+               output_tokens = EXCLUDED.output_tokens,
+               total_tokens = EXCLUDED.total_tokens
+    """)
+    _logger.info("Migration: %d agrégats quotidiens de consommation Claude initialisés",
+                 cr.rowcount)
@@ -0,0 +1,33 @@
+"""
+Migration vers la version où praticien_id / company_id sont stockés sur
+cps.feuille.soins.acte :
+  - colonnes créées et remplies en une requête depuis cps_feuille_soins
+    (l'ORM ne recalcule pas ensuite les champs related acte par acte)
+  - index (feuille_id, datetime_acte) du flux agenda remplacé par
+    (praticien_id, datetime_acte), créé par CpsActe.init()
+"""
+import logging
+_logger = logging.getLogger(__name__)
+
+
+def migrate(cr, version):
+    if not version:
+        return
+
+    cr.execute("""
+        ALTER TABLE cps_feuille_soins_acte
+            ADD COLUMN IF NOT EXISTS praticien_id INTEGER,
+            ADD COLUMN IF NOT EXISTS company_id INTEGER
+    """)
+    cr.execute("""
+        UPDATE cps_feuille_soins_acte a
+           SET praticien_id = f.praticien_id,
+               company_id = f.company_id
+          FROM cps_feuille_soins f
+         WHERE f.id = a.feuille_id
+           AND (a.praticien_id IS DISTINCT FROM f.praticien_id
+                OR a.company_id IS DISTINCT FROM f.company_id)
+    """)
+    _logger.info("Migration: praticien / société recopiés sur %d actes", cr.rowcount)
+
+    cr.execute("DROP INDEX IF EXISTS cps_feuille_soins_acte_feuille_datetime_idx")
@@ -0,0 +1,75 @@
+"""
+Migration vers la version des scans en pièces jointes :
+  - cps_feuille_soins.photo_feuille : contenu de la colonne déplacé dans le
+    filestore (ir.attachment, fichiers adressés par empreinte SHA-1 : un même
+    scan n'est stocké qu'une fois), puis colonne supprimée
+  - miniatures WebP (photo_miniature, ordonnance_miniature) calculées
+
+Lecture par lots sur l'id (LIMIT) : quelques scans en mémoire à la fois,
+quel que soit le volume de la table.
+"""
+import logging
+
+from odoo import api, SUPERUSER_ID
+from odoo.tools import split_every
+
+_logger = logging.getLogger(__name__)
+
+TAILLE_LOT = 50
+
+
+def _miniatures(env, modele, champ, ids):
+    Modele = env[modele]
+    for lot in split_every(TAILLE_LOT, ids):
+        env.add_to_compute(Modele._fields[champ], Modele.browse(lot))
+        env.flush_all()
+        env.invalidate_all()
+
+
+def migrate(cr, version):
+    if not version:
+        return
+    env = api.Environment(cr, SUPERUSER_ID, {})
+
+    # ── 1. Photos des feuilles : colonne → pièces jointes ─────────────────────
+    cr.execute("""
+        SELECT 1 FROM information_schema.columns
+         WHERE table_name = 'cps_feuille_soins' AND column_name = 'photo_feuille'
+    """)
+    if cr.fetchone():
+        feuille_ids, dernier = [], 0
+        while True:
+            cr.execute("""
+                SELECT id, photo_feuille FROM cps_feuille_soins
+                 WHERE photo_feuille IS NOT NULL AND id > %s
+                 ORDER BY id LIMIT %s
+            """, [dernier, TAILLE_LOT])
+            lot = cr.fetchall()
+            if not lot:
+                break
+            env['ir.attachment'].create([{
+                'name': 'photo_feuille',
+                'res_model': 'cps.feuille.soins',
+                'res_field': 'photo_feuille',
+                'res_id': feuille_id,
+                'type': 'binary',
+                'datas': bytes(valeur),
+            } for feuille_id, valeur in lot])
+            env.invalidate_all()
+            dernier = lot[-1][0]
+            feuille_ids += [feuille_id for feuille_id, _valeur in lot]
+        cr.execute("ALTER TABLE cps_feuille_soins DROP COLUMN photo_feuille")
+        _logger.info("Migration: %d photos de feuilles déplacées en pièces jointes",
+                     len(feuille_ids))
+        _miniatures(env, 'cps.feuille.soins', 'photo_miniature', feuille_ids)
+
+    # ── 2. Miniatures des ordonnances (déjà en pièces jointes) ───────────────
+    cr.execute("""
+        SELECT res_id FROM ir_attachment
+         WHERE res_model = 'cps.ordonnance' AND res_field = 'ordonnance_image'
+           AND res_id IS NOT NULL
+         ORDER BY res_id
+    """)
+    ordonnance_ids = [res_id for (res_id,) in cr.fetchall()]
+    _miniatures(env, 'cps.ordonnance', 'ordonnance_miniature', ordonnance_ids)
+    _logger.info("Migration: miniatures calculées pour %d ordonnances", len(ordonnance_ids))
@@ -1,6 +1,7 @@
 from . import res_partner
 from . import config_settings
 from . import tarif_historique
+from . import tarif_resolver
 from . import ordonnance
 from . import acte_type
 from . import feuille_modele
@@ -8,4 +9,8 @@ from . import feuille_soins
 from . import bordereau
 from . import bordereau_modele
 from . import api_usage
+from . import api_budget
+from . import anthropic_client
+from . import ocr_job
+from . import ocr_cache
 from . import patient_config
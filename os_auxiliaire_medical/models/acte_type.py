@@ -82,17 +82,12 @@ class CpsActeType(models.Model):
 
     @api.depends('coefficient_defaut', 'tarif_unitaire', 'type_supplement')
     def _compute_montant_indicatif(self):
+        Resolver = self.env['cps.tarif.resolver']
         for rec in self:
             if rec.type_supplement == 'ifn':
-                montant = float(
-                    self.env['ir.config_parameter'].sudo()
-                    .get_param('cps.supplement.ifn', 250)
-                )
+                montant = Resolver.supplement_ifn()
             elif rec.type_supplement == 'ifd':
-                montant = float(
-                    self.env['ir.config_parameter'].sudo()
-                    .get_param('cps.supplement.ifd', 250)
-                )
+                montant = Resolver.supplement_ifd()
             else:
                 montant = round(rec.coefficient_defaut * rec.tarif_unitaire, 0)
             rec.montant_indicatif = montant
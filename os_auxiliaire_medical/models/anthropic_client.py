@@ -0,0 +1,291 @@
+"""
+Client unique de l'API Anthropic (OCR des ordonnances).
+
+  - une session HTTP par processus : connexions keep-alive réutilisées
+    (pool urllib3), y compris depuis les threads de l'import en lot
+  - nouvelles tentatives avec backoff exponentiel sur 429 / 5xx / 529
+    (en-tête Retry-After respecté)
+  - limite de débit par société : N requêtes par minute glissante, par
+    processus Odoo
+  - configuration unique (ir.config_parameter), anciennes clés lues en repli
+  - trace automatique de chaque appel dans cps.api.usage
+  - budgets mensuels (cps.api.budget) contrôlés avant l'appel sur une
+    estimation du coût : limite souple = avertissement, limite dure =
+    BudgetEpuise (l'appelant bascule sur l'OCR local)
+
+`envoyer` n'accède pas à l'ORM : utilisable depuis un pool de threads avec
+une configuration lue au préalable par `_config`.
+"""
+import base64
+import collections
+import io
+import logging
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from odoo import models, fields, api, _
+
+_logger = logging.getLogger(__name__)
+
+ANTHROPIC_API_URL = 'https://api.anthropic.com'
+ANTHROPIC_VERSION = '2023-06-01'
+MODELE_DEFAUT = 'claude-haiku-4-5-20251001'
+STATUTS_A_REESSAYER = (429, 500, 502, 503, 504, 529)
+BACKOFF = 0.5
+TAILLE_POOL = 16
+# Estimation avant appel : ~3,5 caractères par token (texte français),
+# image au plafond de l'API si ses dimensions sont illisibles.
+CARACTERES_PAR_TOKEN = 3.5
+COTE_MAX_IMAGE = 1568
+
+# Clé unifiée → ancienne clé encore lue si la nouvelle est absente.
+CLES_HISTORIQUES = {
+    'cps.anthropic.api.key': 'claude_api_key',
+    'cps.claude.model': 'claude_model',
+}
+
+
+class ErreurClaude(Exception):
+    """Appel en échec après les nouvelles tentatives ; `statut` : code HTTP ou None."""
+
+    def __init__(self, message, statut=None):
+        super().__init__(message)
+        self.statut = statut
+
+
+class BudgetEpuise(ErreurClaude):
+    """Limite dure du budget mensuel atteinte : aucun appel n'a été fait."""
+
+
+def _tokens_image(source):
+    from ..wizards.ocr_image import tokens_estimes
+    try:
+        from PIL import Image
+        with Image.open(io.BytesIO(base64.b64decode(source['data']))) as img:
+            return tokens_estimes(*img.size)
+    except Exception:
+        return tokens_estimes(COTE_MAX_IMAGE, COTE_MAX_IMAGE)
+
+
+def estimer_tokens(payload):
+    """
+    Coût maximal d'un appel /v1/messages : texte (longueur), images
+    (dimensions, voir ocr_image.tokens_estimes) et max_tokens en sortie.
+    """
+    caracteres = len(payload.get('system') or '')
+    images = 0
+    for message in payload.get('messages', []):
+        contenu = message.get('content') or ''
+        if isinstance(contenu, str):
+            caracteres += len(contenu)
+            continue
+        for bloc in contenu:
+            if bloc.get('type') == 'text':
+                caracteres += len(bloc.get('text', ''))
+            elif bloc.get('type') == 'image':
+                images += _tokens_image(bloc['source'])
+    return int(caracteres / CARACTERES_PAR_TOKEN) + images + payload.get('max_tokens', 0)
+
+
+# ── Session HTTP et limite de débit (partagées par processus) ────────────────
+
+_verrou = threading.Lock()
+_sessions = {}
+_limites = {}
+
+
+def session_http(tentatives=3):
+    """Session requests mise en commun (une par nombre de tentatives configuré)."""
+    with _verrou:
+        session = _sessions.get(tentatives)
+        if session is None:
+            retry = Retry(
+                total=tentatives, connect=tentatives, status=tentatives,
+                # Lecture interrompue : la requête a pu être facturée, pas de nouvel essai.
+                read=0,
+                backoff_factor=BACKOFF,
+                status_forcelist=STATUTS_A_REESSAYER,
+                allowed_methods=None,
+                respect_retry_after_header=True,
+                raise_on_status=False,
+            )
+            adaptateur = HTTPAdapter(
+                pool_connections=4, pool_maxsize=TAILLE_POOL, max_retries=retry)
+            session = requests.Session()
+            session.mount('https://', adaptateur)
+            session.mount('http://', adaptateur)
+            session.headers.update({
+                'anthropic-version': ANTHROPIC_VERSION,
+                'content-type': 'application/json',
+            })
+            _sessions[tentatives] = session
+        return session
+
+
+class LimiteDebit:
+    """Au plus `par_minute` requêtes sur toute fenêtre de 60 s ; `attendre` bloque sinon."""
+
+    def __init__(self):
+        self._appels = collections.deque()
+        self._verrou = threading.Lock()
+
+    def attendre(self, par_minute):
+        """Réserve un créneau ; retourne le temps passé à attendre (s)."""
+        attente = 0.0
+        if par_minute <= 0:
+            return attente
+        while True:
+            with self._verrou:
+                maintenant = time.monotonic()
+                while self._appels and self._appels[0] <= maintenant - 60:
+                    self._appels.popleft()
+                if len(self._appels) < par_minute:
+                    self._appels.append(maintenant)
+                    return attente
+                delai = self._appels[0] + 60 - maintenant
+            time.sleep(delai)
+            attente += delai
+
+
+def limite_debit(company_id):
+    with _verrou:
+        return _limites.setdefault(company_id, LimiteDebit())
+
+
+def envoyer(config, payload):
+    """POST {api_url}/v1/messages → corps JSON ; ErreurClaude en cas d'échec."""
+    attente = limite_debit(config['company_id']).attendre(config['requetes_minute'])
+    if attente:
+        _logger.info('API Anthropic : limite de débit atteinte, %.1f s d\'attente', attente)
+    try:
+        reponse = session_http(config['tentatives']).post(
+            '%s/v1/messages' % config['api_url'],
+            json=payload,
+            headers={'x-api-key': config['api_key']},
+            timeout=config['timeout'],
+        )
+    except requests.RequestException as e:
+        raise ErreurClaude(str(e)) from e
+    if reponse.status_code != 200:
+        _logger.error('Claude API HTTP %s: %s', reponse.status_code, reponse.text[:500])
+        raise ErreurClaude('HTTP %s' % reponse.status_code, reponse.status_code)
+    try:
+        return reponse.json()
+    except ValueError as e:
+        raise ErreurClaude(_('Réponse non JSON : %s') % e) from e
+
+
+class CpsAnthropicClient(models.AbstractModel):
+    _name = 'cps.anthropic.client'
+    _description = 'Client API Anthropic (OCR)'
+
+    @api.model
+    def _param(self, cle, defaut=''):
+        IrParam = self.env['ir.config_parameter'].sudo()
+        valeur = IrParam.get_param(cle)
+        if not valeur and cle in CLES_HISTORIQUES:
+            valeur = IrParam.get_param(CLES_HISTORIQUES[cle])
+        return valeur or defaut
+
+    @api.model
+    def _config(self, api_key=None):
+        """Paramètres d'appel (dict sans ORM, transmissible aux threads)."""
+        return {
+            'api_key': api_key or self._param('cps.anthropic.api.key'),
+            'api_url': self._param('cps.anthropic.api.url', ANTHROPIC_API_URL).rstrip('/'),
+            'model': self._param('cps.claude.model', MODELE_DEFAUT),
+            'timeout': int(self._param('cps.anthropic.timeout', 60)),
+            'tentatives': int(self._param('cps.anthropic.tentatives', 3)),
+            'requetes_minute': int(self._param('cps.anthropic.requetes_minute', 50)),
+            'company_id': self.env.company.id,
+        }
+
+    # ── Budgets ───────────────────────────────────────────────────────────────
+
+    @api.model
+    def _budget_restant(self):
+        """
+        (souple, dure) : tokens restant ce mois-ci avant chaque limite, pour
+        l'utilisateur courant (budget société et budget personnel, le plus
+        strict l'emporte) ; None si aucune limite. Lit les compteurs de
+        cps.api.usage.mensuel : au plus deux lignes, quel que soit le volume
+        du journal.
+        """
+        self.env['cps.api.budget'].flush_model()
+        self.env.cr.execute("""
+            SELECT b.limite_souple, b.limite_dure, COALESCE(c.tokens, 0)
+              FROM cps_api_budget b
+              LEFT JOIN cps_api_usage_mensuel c
+                ON c.company_id = b.company_id
+               AND COALESCE(c.user_id, 0) = COALESCE(b.user_id, 0)
+               AND c.mois = %s
+             WHERE b.company_id = %s
+               AND (b.user_id IS NULL OR b.user_id = %s)
+        """, [fields.Datetime.now().date().replace(day=1), self.env.company.id, self.env.uid])
+        restant = [None, None]
+        for ligne in self.env.cr.fetchall():
+            tokens = ligne[2]
+            for i, limite in enumerate(ligne[:2]):
+                if limite:
+                    reste = max(limite - tokens, 0)
+                    restant[i] = reste if restant[i] is None else min(restant[i], reste)
+        return tuple(restant)
+
+    @api.model
+    def _avertir_budget(self):
+        """Notification (bus) : limite souple du budget mensuel dépassée."""
+        self.env['bus.bus']._sendone(self.env.user.partner_id, 'simple_notification', {
+            'title': _('Budget Claude'),
+            'message': _('Limite souple du budget mensuel de tokens Claude dépassée.'),
+            'type': 'warning',
+            'sticky': False,
+        })
+
+    @api.model
+    def _controler_budget(self, estimation):
+        """Avertit au-delà de la limite souple ; BudgetEpuise au-delà de la limite dure."""
+        souple, dure = self._budget_restant()
+        if dure is not None and estimation > dure:
+            _logger.info('API Anthropic : budget épuisé (%d tokens estimés, %d restants)',
+                         estimation, dure)
+            raise BudgetEpuise(_(
+                'Budget mensuel de tokens Claude épuisé '
+                '(%d restants, %d estimés pour cet appel).'
+            ) % (dure, estimation))
+        if souple is not None and estimation > souple:
+            self._avertir_budget()
+
+    # ── Appels ────────────────────────────────────────────────────────────────
+
+    @api.model
+    def messages(self, payload, operation, ordonnance_id=None, api_key=None):
+        """
+        Appel /v1/messages tracé dans cps.api.usage (succès : tokens ;
+        échec : message d'erreur). Lève ErreurClaude en cas d'échec,
+        BudgetEpuise (sans appel) si l'estimation dépasse la limite dure.
+        """
+        config = self._config(api_key)
+        if not config['api_key']:
+            raise ErreurClaude(_('Clé API Anthropic non configurée.'))
+        self._controler_budget(estimer_tokens(payload))
+        Usage = self.env['cps.api.usage']
+        try:
+            body = envoyer(config, payload)
+        except ErreurClaude as e:
+            Usage.log_usage(
+                model=payload['model'], operation=operation, success=False,
+                error_message=str(e), ordonnance_id=ordonnance_id,
+            )
+            raise
+        usage = body.get('usage') or {}
+        Usage.log_usage(
+            model=payload['model'], operation=operation,
+            input_tokens=usage.get('input_tokens', 0),
+            output_tokens=usage.get('output_tokens', 0),
+            ordonnance_id=ordonnance_id,
+        )
+        return body
@@ -0,0 +1,49 @@
+"""
+Budgets mensuels de tokens Claude, par société et par utilisateur.
+
+Contrôlés avant chaque appel par cps.anthropic.client (estimation du coût
+de la requête) contre le compteur cps.api.usage.mensuel :
+  - limite souple : l'appel part, l'utilisateur est averti
+  - limite dure : l'appel est refusé (BudgetEpuise), l'analyse bascule sur
+    l'OCR local (tesseract)
+"""
+from odoo import models, fields
+from odoo.tools.sql import create_unique_index
+
+
+class CpsApiBudget(models.Model):
+    _name = 'cps.api.budget'
+    _description = 'Budget mensuel de tokens Claude'
+    _order = 'company_id, user_id'
+    _rec_name = 'company_id'
+
+    company_id = fields.Many2one(
+        'res.company', string='Société', required=True, index=True,
+        default=lambda self: self.env.company, ondelete='cascade',
+    )
+    user_id = fields.Many2one(
+        'res.users', string='Utilisateur', ondelete='cascade',
+        help='Vide : budget de toute la société.',
+    )
+    limite_souple = fields.Integer(
+        string='Limite souple (tokens / mois)',
+        help='Au-delà, les appels partent mais un avertissement est affiché. 0 : aucune.',
+    )
+    limite_dure = fields.Integer(
+        string='Limite dure (tokens / mois)',
+        help='Au-delà, les appels Claude sont refusés et l\'analyse se fait '
+             'par OCR local (tesseract). 0 : aucune.',
+    )
+
+    _sql_constraints = [
+        ('limites_positives', 'CHECK(limite_souple >= 0 AND limite_dure >= 0)',
+         'Les limites ne peuvent pas être négatives.'),
+    ]
+
+    def init(self):
+        # Un seul budget société (user_id vide) : NULL n'est jamais égal à NULL
+        # pour une contrainte UNIQUE(company_id, user_id).
+        create_unique_index(
+            self.env.cr, 'cps_api_budget_cle_unique', self._table,
+            ['company_id', 'COALESCE(user_id, 0)'],
+        )
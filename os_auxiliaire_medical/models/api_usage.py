@@ -1,10 +1,25 @@
+import logging
+
 from odoo import models, fields, api
+from odoo.tools.sql import create_unique_index
+
+_logger = logging.getLogger(__name__)
+
+RETENTION_JOURS = 400
+
+OPERATIONS = [
+    ('ocr_texte',  'OCR – Texte'),
+    ('ocr_vision', 'OCR – Vision'),
+]
 
 
 class CpsApiUsage(models.Model):
     """
     Enregistre chaque appel à l'API Anthropic Claude avec le nombre de
     tokens consommés, par utilisateur et par société.
+
+    Journal détaillé, purgé au-delà de cps.api.usage.retention_jours : les
+    tableaux de bord lisent les agrégats de cps.api.usage.jour.
     """
     _name = 'cps.api.usage'
     _description = 'Consommation API Claude (tokens)'
@@ -23,10 +38,7 @@ class CpsApiUsage(models.Model):
         string='Date / Heure', required=True, default=fields.Datetime.now, index=True,
     )
     model = fields.Char(string='Modèle Claude', required=True)
-    operation = fields.Selection([
-        ('ocr_texte',  'OCR – Texte'),
-        ('ocr_vision', 'OCR – Vision'),
-    ], string='Opération', required=True)
+    operation = fields.Selection(OPERATIONS, string='Opération', required=True)
 
     # Référence optionnelle à l'ordonnance traitée
     ordonnance_id = fields.Many2one(
@@ -42,6 +54,10 @@ class CpsApiUsage(models.Model):
     # Statut de l'appel
     success = fields.Boolean(string='Succès', default=True)
     error_message = fields.Char(string="Message d'erreur")
+    cache_hit = fields.Boolean(
+        string='Cache', index=True,
+        help='Résultat repris du cache OCR : aucun appel facturé.',
+    )
 
     @api.depends('input_tokens', 'output_tokens')
     def _compute_total(self):
@@ -50,7 +66,7 @@ class CpsApiUsage(models.Model):
 
     @api.model
     def log_usage(self, model, operation, input_tokens=0, output_tokens=0,
-                  ordonnance_id=None, success=True, error_message=None):
+                  ordonnance_id=None, success=True, error_message=None, cache_hit=False):
         """
         Méthode utilitaire appelée depuis les wizards OCR pour enregistrer
         la consommation.
@@ -63,6 +79,9 @@ class CpsApiUsage(models.Model):
                 output_tokens=body.get('usage', {}).get('output_tokens', 0),
                 ordonnance_id=self.ordonnance_id.id,
             )
+        Un résultat lu dans cps.ocr.cache est tracé avec cache_hit=True et 0 token.
+        Chaque appel est ajouté aux agrégats de cps.api.usage.jour, les tokens
+        facturés aux compteurs de cps.api.usage.mensuel.
         """
         vals = {
             'model': model,
@@ -70,9 +89,163 @@ class CpsApiUsage(models.Model):
             'input_tokens': input_tokens,
             'output_tokens': output_tokens,
             'success': success,
+            'cache_hit': cache_hit,
         }
         if ordonnance_id:
             vals['ordonnance_id'] = ordonnance_id
         if error_message:
             vals['error_message'] = error_message
-        return self.sudo().create([vals])
+        usage = self.sudo().create([vals])
+        self.env['cps.api.usage.jour']._incrementer(usage)
+        tokens = (input_tokens or 0) + (output_tokens or 0)
+        if tokens:
+            self.env['cps.api.usage.mensuel']._incrementer(
+                usage.company_id.id, usage.user_id.id, usage.date.date(), tokens)
+        return usage
+
+    # ── Rétention ─────────────────────────────────────────────────────────────
+
+    @api.model
+    def _cron_purger_journal(self):
+        """Supprime les appels plus anciens que la rétention (agrégats conservés)."""
+        jours = int(self.env['ir.config_parameter'].sudo().get_param(
+            'cps.api.usage.retention_jours', RETENTION_JOURS) or 0)
+        if jours <= 0:
+            return
+        self.flush_model()
+        self.env.cr.execute("""
+            DELETE FROM cps_api_usage
+             WHERE date < (now() at time zone 'UTC') - make_interval(days => %s)
+        """, [jours])
+        nb = self.env.cr.rowcount
+        self.invalidate_model()
+        if nb:
+            _logger.info('Journal API Claude : %d appels de plus de %d jours supprimés', nb, jours)
+
+
+class CpsApiUsageJour(models.Model):
+    """
+    Agrégats quotidiens du journal cps.api.usage : une ligne par société,
+    utilisateur, modèle, opération et jour. Tenus à jour par log_usage
+    (INSERT … ON CONFLICT DO UPDATE) et conservés après la purge du
+    journal : les vues pivot / graphe restent rapides après des années d'OCR.
+    """
+    _name = 'cps.api.usage.jour'
+    _description = 'Consommation API Claude par jour'
+    _order = 'jour desc, company_id, user_id'
+    _rec_name = 'jour'
+
+    company_id = fields.Many2one(
+        'res.company', string='Société', required=True, readonly=True, ondelete='cascade',
+    )
+    user_id = fields.Many2one(
+        'res.users', string='Utilisateur', required=True, readonly=True, ondelete='cascade',
+    )
+    jour = fields.Date(string='Jour', required=True, readonly=True)
+    model = fields.Char(string='Modèle Claude', required=True, readonly=True)
+    operation = fields.Selection(OPERATIONS, string='Opération', required=True, readonly=True)
+    nb_appels = fields.Integer(string='Appels', readonly=True)
+    nb_erreurs = fields.Integer(string='Erreurs', readonly=True)
+    nb_cache = fields.Integer(string='Depuis le cache', readonly=True)
+    input_tokens = fields.Integer(string='Tokens entrée', readonly=True)
+    output_tokens = fields.Integer(string='Tokens sortie', readonly=True)
+    total_tokens = fields.Integer(string='Total tokens', readonly=True)
+
+    _sql_constraints = [
+        ('cle_unique', 'UNIQUE(company_id, user_id, model, operation, jour)',
+         'Une seule ligne par société, utilisateur, modèle, opération et jour.'),
+    ]
+
+    @api.model
+    def _incrementer(self, usage):
+        """Ajoute l'appel `usage` (cps.api.usage) à l'agrégat de son jour."""
+        entree, sortie = usage.input_tokens or 0, usage.output_tokens or 0
+        self.env.cr.execute("""
+            INSERT INTO cps_api_usage_jour AS j
+                   (company_id, user_id, jour, model, operation,
+                    nb_appels, nb_erreurs, nb_cache,
+                    input_tokens, output_tokens, total_tokens,
+                    create_uid, create_date, write_uid, write_date)
+            VALUES (%(company)s, %(user)s, %(jour)s, %(model)s, %(operation)s,
+                    1, %(erreur)s, %(cache)s,
+                    %(entree)s, %(sortie)s, %(total)s,
+                    %(uid)s, now() at time zone 'UTC', %(uid)s, now() at time zone 'UTC')
+            ON CONFLICT (company_id, user_id, model, operation, jour) DO UPDATE
+               SET nb_appels = j.nb_appels + 1,
+                   nb_erreurs = j.nb_erreurs + EXCLUDED.nb_erreurs,
+                   nb_cache = j.nb_cache + EXCLUDED.nb_cache,
+                   input_tokens = j.input_tokens + EXCLUDED.input_tokens,
+                   output_tokens = j.output_tokens + EXCLUDED.output_tokens,
+                   total_tokens = j.total_tokens + EXCLUDED.total_tokens,
+                   write_date = EXCLUDED.write_date
+        """, {
+            'company': usage.company_id.id, 'user': usage.user_id.id,
+            'jour': usage.date.date(), 'model': usage.model, 'operation': usage.operation,
+            'erreur': 0 if usage.success else 1, 'cache': 1 if usage.cache_hit else 0,
+            'entree': entree, 'sortie': sortie, 'total': entree + sortie,
+            'uid': self.env.uid,
+        })
+        self.invalidate_model()
+
+
+class CpsApiUsageMensuel(models.Model):
+    """
+    Compteur matérialisé des tokens consommés par mois : une ligne par
+    (société, utilisateur, mois) et une ligne société (user_id vide).
+    Tenu à jour par log_usage (INSERT … ON CONFLICT DO UPDATE, atomique
+    entre transactions concurrentes) : le contrôle des budgets lit une
+    ligne au lieu d'agréger tout le journal cps.api.usage.
+    """
+    _name = 'cps.api.usage.mensuel'
+    _description = 'Consommation API Claude par mois'
+    _order = 'mois desc, company_id, user_id'
+    _rec_name = 'mois'
+
+    company_id = fields.Many2one(
+        'res.company', string='Société', required=True, readonly=True, ondelete='cascade',
+    )
+    user_id = fields.Many2one(
+        'res.users', string='Utilisateur', readonly=True, ondelete='cascade',
+        help='Vide : total de la société.',
+    )
+    mois = fields.Date(string='Mois', required=True, readonly=True)
+    tokens = fields.Integer(string='Tokens', readonly=True)
+    nb_appels = fields.Integer(string='Appels facturés', readonly=True)
+
+    def init(self):
+        create_unique_index(
+            self.env.cr, 'cps_api_usage_mensuel_cle_unique', self._table,
+            ['company_id', 'COALESCE(user_id, 0)', 'mois'],
+        )
+
+    @api.model
+    def _incrementer(self, company_id, user_id, date, tokens):
+        """Ajoute `tokens` aux compteurs du mois de `date` (utilisateur et société)."""
+        self.env.cr.execute("""
+            INSERT INTO cps_api_usage_mensuel AS c
+                   (company_id, user_id, mois, tokens, nb_appels,
+                    create_uid, create_date, write_uid, write_date)
+            VALUES (%(company)s, %(user)s, %(mois)s, %(tokens)s, 1,
+                    %(uid)s, now() at time zone 'UTC', %(uid)s, now() at time zone 'UTC'),
+                   (%(company)s, NULL, %(mois)s, %(tokens)s, 1,
+                    %(uid)s, now() at time zone 'UTC', %(uid)s, now() at time zone 'UTC')
+            ON CONFLICT (company_id, (COALESCE(user_id, 0)), mois) DO UPDATE
+               SET tokens = c.tokens + EXCLUDED.tokens,
+                   nb_appels = c.nb_appels + 1,
+                   write_date = EXCLUDED.write_date
+        """, {
+            'company': company_id, 'user': user_id, 'mois': date.replace(day=1),
+            'tokens': tokens, 'uid': self.env.uid,
+        })
+        self.invalidate_model(['tokens', 'nb_appels'])
+
+    @api.model
+    def _tokens_du_mois(self, company_id, user_id=None, date=None):
+        """Tokens consommés ce mois-ci (user_id None : total de la société)."""
+        mois = (date or fields.Datetime.now().date()).replace(day=1)
+        self.env.cr.execute("""
+            SELECT tokens FROM cps_api_usage_mensuel
+             WHERE company_id = %s AND COALESCE(user_id, 0) = %s AND mois = %s
+        """, [company_id, user_id or 0, mois])
+        ligne = self.env.cr.fetchone()
+        return ligne[0] if ligne else 0
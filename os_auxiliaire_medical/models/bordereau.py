@@ -1,8 +1,12 @@
 from odoo import models, fields, api, _
 from odoo.exceptions import UserError
+from odoo.tools import SQL
 import datetime
+import logging
 import pytz
 
+_logger = logging.getLogger(__name__)
+
 
 def _tahiti_today_short():
     tz = pytz.timezone('Pacific/Tahiti')
@@ -98,7 +102,22 @@ class CpsBordereau(models.Model):
     @api.depends('feuille_ids.montant_total', 'feuille_ids.montant_tiers_payant',
                  'feuille_ids.montant_patient')
     def _compute_totaux(self):
-        for rec in self:
+        # Bordereaux enregistrés : une agrégation SQL pour tout le lot.
+        enregistres = self.filtered('id')
+        totaux = {}
+        if enregistres:
+            groupes = self.env['cps.feuille.soins']._read_group(
+                [('bordereau_id', 'in', enregistres.ids)],
+                ['bordereau_id'],
+                ['__count', 'montant_tiers_payant:sum', 'montant_patient:sum'],
+            )
+            totaux = {bordereau.id: (nb, cps or 0.0, patient or 0.0)
+                      for bordereau, nb, cps, patient in groupes}
+        for rec in enregistres:
+            rec.nb_feuilles, rec.total_cps, rec.total_patient = totaux.get(rec.id, (0, 0.0, 0.0))
+            rec.total_general = rec.total_cps + rec.total_patient
+        # Formulaire en cours d'édition (onchange) : feuilles en mémoire.
+        for rec in self - enregistres:
             rec.nb_feuilles   = len(rec.feuille_ids)
             rec.total_cps     = sum(rec.feuille_ids.mapped('montant_tiers_payant'))
             rec.total_patient = sum(rec.feuille_ids.mapped('montant_patient'))
@@ -122,6 +141,104 @@ class CpsBordereau(models.Model):
     def action_reset_draft(self):
         self.state = 'draft'
 
+    # ── Clôture mensuelle (tous praticiens) ───────────────────────────────────
+
+    @api.model
+    def generer_bordereaux_mensuels(self, date_cloture=None):
+        """
+        Crée un bordereau par (praticien, société) regroupant toutes les
+        feuilles confirmées non rattachées dont les soins débutent au plus
+        tard le date_cloture (aujourd'hui par défaut).
+
+        Sélection en une requête groupée, création des bordereaux en un
+        seul create, rattachement des feuilles en un seul UPDATE (hors ORM :
+        recalculs déclenchés par modified(), une note au chatter de chaque
+        bordereau à la place du suivi champ par champ des feuilles).
+        Retourne les bordereaux créés.
+        """
+        date_cloture = date_cloture or fields.Date.context_today(self)
+        Feuille = self.env['cps.feuille.soins']
+        groupes = Feuille._read_group([
+            ('state', '=', 'confirmed'),
+            ('bordereau_id', '=', False),
+            '|', ('date_debut_soins', '=', False),
+                 ('date_debut_soins', '<=', date_cloture),
+        ], ['praticien_id', 'company_id'], ['id:array_agg'])
+        groupes = [g for g in groupes if g[0]]
+        if not groupes:
+            return self
+
+        mois_labels = dict(self.env['cps.wizard.bordereau']._fields['mois'].selection)
+        mois_str = f"{mois_labels['%02d' % date_cloture.month]} {date_cloture.year}"
+        bordereaux = self.create([{
+            'praticien_id': praticien.id,
+            'company_id': company.id,
+            'mois': mois_str,
+            'date_bordereau': date_cloture,
+        } for praticien, company, _ids in groupes])
+
+        feuille_ids, bordereau_ids = [], []
+        for bordereau, (_praticien, _company, ids) in zip(bordereaux, groupes):
+            feuille_ids += ids
+            bordereau_ids += [bordereau.id] * len(ids)
+        Feuille.flush_model(['bordereau_id'])
+        self.env.cr.execute("""
+            UPDATE cps_feuille_soins f
+               SET bordereau_id = v.bordereau_id,
+                   write_uid = %s,
+                   write_date = (now() at time zone 'UTC')
+              FROM unnest(%s::int[], %s::int[]) AS v(id, bordereau_id)
+             WHERE f.id = v.id AND f.bordereau_id IS NULL
+        """, [self.env.uid, feuille_ids, bordereau_ids])
+
+        # Le cache ORM ne voit pas l'UPDATE : invalidation puis recalcul
+        # des totaux stockés (une agrégation pour tous les bordereaux).
+        feuilles = Feuille.browse(feuille_ids)
+        feuilles.invalidate_recordset(['bordereau_id', 'write_uid', 'write_date'])
+        bordereaux.invalidate_recordset(['feuille_ids'])
+        feuilles.modified(['bordereau_id'])
+        bordereaux.flush_recordset()
+
+        for bordereau in bordereaux:
+            bordereau.message_post(body=_(
+                'Clôture mensuelle : %d feuille(s) de soins rattachée(s) (%s).'
+            ) % (bordereau.nb_feuilles, ', '.join(bordereau.feuille_ids.mapped('name'))))
+        return bordereaux
+
+    @api.model
+    def action_cloture_mensuelle(self):
+        """Action serveur : clôture du mois pour tous les praticiens."""
+        bordereaux = self.generer_bordereaux_mensuels()
+        if not bordereaux:
+            return {
+                'type': 'ir.actions.client',
+                'tag': 'display_notification',
+                'params': {
+                    'title': _('Clôture mensuelle'),
+                    'message': _('Aucune feuille confirmée à mettre en bordereau.'),
+                    'type': 'info',
+                    'sticky': False,
+                },
+            }
+        return {
+            'type': 'ir.actions.act_window',
+            'name': _('%d bordereaux générés') % len(bordereaux),
+            'res_model': 'cps.bordereau',
+            'view_mode': 'list,form',
+            'domain': [('id', 'in', bordereaux.ids)],
+        }
+
+    @api.model
+    def _cron_cloture_mensuelle(self):
+        """
+        Cron du 1er du mois : clôture le mois précédent, jusqu'à son dernier
+        jour à Tahiti quels que soient le fuseau du cron et l'heure d'exécution.
+        """
+        today = fields.Date.context_today(self.with_context(tz='Pacific/Tahiti'))
+        fin_mois = today.replace(day=1) - datetime.timedelta(days=1)
+        bordereaux = self.generer_bordereaux_mensuels(date_cloture=fin_mois)
+        _logger.info('Clôture mensuelle CPS : %d bordereau(x) générés', len(bordereaux))
+
     def action_view_feuilles(self):
         self.ensure_one()
         return {
@@ -138,33 +255,143 @@ class CpsBordereau(models.Model):
             'os_auxiliaire_medical.action_report_bordereau'
         ).report_action(self)
 
+    def action_print_fsa25(self):
+        """Toutes les feuilles FSA25 du bordereau dans un seul PDF (texte seul,
+        pour les formulaires pré-imprimés)."""
+        return self._action_imprimer_fsa25(fond=False)
+
+    def action_print_fsa25_page_vierge(self):
+        """Toutes les feuilles FSA25 du bordereau, fond officiel compris."""
+        return self._action_imprimer_fsa25(fond=True)
+
+    def _action_imprimer_fsa25(self, fond):
+        self.ensure_one()
+        if not self.feuille_ids:
+            raise UserError(_('Aucune feuille de soins dans ce bordereau.'))
+        return {
+            'type': 'ir.actions.act_url',
+            'url': f'/cps/bordereau/{self.id}/fsa25.pdf' + ('?fond=1' if fond else ''),
+            'target': 'new',
+        }
+
+    def _fsa25_pdf(self, sortie, max_workers=None, fond=False):
+        """
+        Écrit dans le fichier sortie les FSA25 du bordereau, dans l'ordre de
+        l'export (date de début de soins) ; retourne le nombre de pages.
+
+        Moteur selon cps.fsa25.moteur : remplissage du formulaire PDF (par
+        défaut, avec ou sans fond), ou rapport HTML rendu par wkhtmltopdf.
+        """
+        from ..wizards.fsa25_impression import fusionner
+        self.ensure_one()
+        feuilles = self.env['cps.feuille.soins'].search(
+            [('bordereau_id', '=', self.id)], order='date_debut_soins, id')
+        moteur = self.env['ir.config_parameter'].sudo().get_param(
+            'cps.fsa25.moteur', 'formulaire')
+        if moteur != 'html':
+            return feuilles._fsa25_remplir(sortie, fond)
+        pages = feuilles._fsa25_pdf_pages(max_workers)
+        return fusionner([pages[fid] for fid in feuilles.ids], sortie)
+
     def action_export_excel(self):
+        if len(self) > 1:
+            return self._action_export_excel_lot('bordereau')
         return {
             'type': 'ir.actions.act_url',
             'url': f'/cps/bordereau/{self.id}/xlsx',
             'target': 'new',
         }
 
-    def get_lignes_for_report(self):
-        lignes = []
-        for i, feuille in enumerate(
-            self.feuille_ids.sorted('date_debut_soins'), start=1
-        ):
-            p = feuille.patient_id
+    def action_export_excel_praticien(self):
+        return self._action_export_excel_lot('praticien')
+
+    def _action_export_excel_lot(self, onglet):
+        """Classeur unique : un onglet par bordereau ou par praticien."""
+        return {
+            'type': 'ir.actions.act_url',
+            'url': '/cps/bordereaux/xlsx?ids=%s&onglet=%s' % (
+                ','.join(map(str, self.ids)), onglet),
+            'target': 'new',
+        }
+
+    # ── Projection d'export (CSV / XLSX / QWeb) ───────────────────────────────
+
+    @staticmethod
+    def _tahiti_today_short():
+        return _tahiti_today_short()
+
+    @staticmethod
+    def _format_amount_comma(amount):
+        return _format_amount_comma(amount)
+
+    def _get_export_rows(self):
+        """
+        Lignes d'export de tous les bordereaux de self en une seule requête :
+        feuilles, patient (nom, prénom, DN) et nombre d'actes. Seules les
+        feuilles visibles par l'utilisateur (règles d'accès) sont exportées.
+        Retourne {bordereau_id: [ligne, ...]} trié par date de début de soins.
+        """
+        self.check_access_rights('read')
+        self.check_access_rule('read')
+        self.env['cps.feuille.soins'].flush_model([
+            'bordereau_id', 'patient_id', 'date_debut_soins', 'date_fin_soins',
+            'montant_total', 'montant_tiers_payant', 'montant_patient',
+        ])
+        self.env['cps.feuille.soins.acte'].flush_model(['feuille_id'])
+        self.env['res.partner'].flush_model(['name', 'lastname', 'firstname', 'vat'])
+        feuilles = self.env['cps.feuille.soins']._search([('bordereau_id', 'in', self.ids)])
+        self.env.cr.execute(SQL("""
+            SELECT f.bordereau_id, f.date_debut_soins, f.date_fin_soins,
+                   f.montant_total, f.montant_tiers_payant, f.montant_patient,
+                   p.name, p.lastname, p.firstname, p.vat,
+                   (SELECT count(*) FROM cps_feuille_soins_acte a
+                     WHERE a.feuille_id = f.id) AS nb_actes
+              FROM cps_feuille_soins f
+              LEFT JOIN res_partner p ON p.id = f.patient_id
+             WHERE f.id IN %s
+          ORDER BY f.bordereau_id, f.date_debut_soins NULLS LAST, f.id
+        """, feuilles.subselect()))
+
+        rows = {rec.id: [] for rec in self}
+        for (bordereau_id, debut, fin, total, cps, patient,
+             name, lastname, firstname, vat, nb_actes) in self.env.cr.fetchall():
+            lignes = rows[bordereau_id]
+            nom = f"{lastname or ''} {firstname or ''}".strip() or name or ''
             lignes.append({
-                'n': i,
-                'nom_prenom': f"{p.lastname or ''} {p.firstname or ''}".strip(),
-                'dn': p.vat or '',
-                'date_debut': (
-                    feuille.date_debut_soins.strftime('%d/%m/%y')
-                    if feuille.date_debut_soins else ''
-                ),
-                'date_fin': (
-                    feuille.date_fin_soins.strftime('%d/%m/%y')
-                    if feuille.date_fin_soins else ''
-                ),
-                'montant_cps':     feuille.montant_tiers_payant,
-                'montant_patient': feuille.montant_patient,
-                'montant_total':   feuille.montant_total,
+                'n': len(lignes) + 1,
+                'nom_prenom': nom.upper(),
+                'dn': vat or '',
+                'date': debut.strftime('%d/%m/%y') if debut else '',
+                'date_debut': debut.strftime('%d/%m/%y') if debut else '',
+                'date_fin': fin.strftime('%d/%m/%y') if fin else '',
+                'nb_actes': nb_actes,
+                'part_cps': _format_amount_comma(cps or 0.0),
+                'part_patient': _format_amount_comma(patient or 0.0),
+                'montant_cps_raw': cps or 0.0,
+                'montant_patient_raw': patient or 0.0,
+                'montant_total_raw': total or 0.0,
             })
-        return lignes
+        return rows
+
+    def get_export_data(self, rows=None):
+        """
+        Projection commune aux exports CSV, XLSX et PDF d'un bordereau.
+        rows : lignes déjà chargées par _get_export_rows (export groupé).
+        """
+        self.ensure_one()
+        if rows is None:
+            rows = self._get_export_rows()[self.id]
+        total_cps = sum(r['montant_cps_raw'] for r in rows)
+        total_patient = sum(r['montant_patient_raw'] for r in rows)
+        return {
+            'praticien_nom': _upper_name(self.praticien_id),
+            'date_impression': _tahiti_today_short(),
+            'label_nom_prenom': 'NOM PRENOM',
+            'label_part_cps': 'Part CPS',
+            'label_part_patient': 'Part patient',
+            'rows': rows,
+            'total_cps': _format_amount_comma(total_cps),
+            'total_patient': _format_amount_comma(total_patient),
+            'total_cps_raw': total_cps,
+            'total_patient_raw': total_patient,
+        }
@@ -1,5 +1,7 @@
 from odoo import models, fields, api, _
 
+from .tarif_resolver import LETTRE_CLE_PARAMS
+
 # Modèles Claude disponibles (à maintenir à jour selon la documentation Anthropic)
 CLAUDE_MODELS = [
     ('claude-haiku-4-5-20251001',  'Claude Haiku 4.5  (rapide, économique)'),
@@ -28,6 +30,50 @@ class ResConfigSettings(models.TransientModel):
              'Haiku est recommandé pour un bon rapport qualité/coût.',
     )
 
+    # ── Appels API Anthropic ──────────────────────────────────────────────────
+    cps_anthropic_requetes_minute = fields.Integer(
+        string='Requêtes Claude par minute (par société)',
+        config_parameter='cps.anthropic.requetes_minute', default=50,
+        help='Au-delà, les appels attendent un créneau libre. 0 : pas de limite.',
+    )
+    cps_api_usage_retention_jours = fields.Integer(
+        string='Conservation du journal des appels (jours)',
+        config_parameter='cps.api.usage.retention_jours', default=400,
+        help='Les appels plus anciens sont supprimés chaque nuit ; les agrégats '
+             'quotidiens du tableau de bord sont conservés. 0 : pas de purge.',
+    )
+    cps_anthropic_tentatives = fields.Integer(
+        string='Nouvelles tentatives',
+        config_parameter='cps.anthropic.tentatives', default=3,
+        help='Nouvelles tentatives (backoff exponentiel) sur surcharge ou erreur '
+             'serveur de l\'API (429, 5xx).',
+    )
+
+    # ── Pré-traitement des images (Claude vision) ────────────────────────────
+    cps_vision_pretraitement = fields.Boolean(
+        string='Pré-traiter les images envoyées à Claude vision',
+        config_parameter='cps.vision.pretraitement',
+        help='Rotation EXIF, réduction, niveaux de gris, redressement et rognage '
+             'avant envoi : moins de tokens facturés et des appels plus rapides.',
+    )
+    cps_vision_cote_max = fields.Integer(
+        string='Plus grand côté (px)', config_parameter='cps.vision.cote_max',
+        default=1568,
+        help="Au-delà de 1568 px, l'API réduit l'image elle-même : inutile d'envoyer plus.",
+    )
+    cps_vision_qualite = fields.Integer(
+        string='Qualité JPEG', config_parameter='cps.vision.qualite', default=80,
+    )
+    cps_vision_niveaux_gris = fields.Boolean(
+        string='Niveaux de gris', config_parameter='cps.vision.niveaux_gris',
+    )
+    cps_vision_redresser = fields.Boolean(
+        string='Redresser', config_parameter='cps.vision.redresser',
+    )
+    cps_vision_rogner = fields.Boolean(
+        string='Rogner les marges', config_parameter='cps.vision.rogner',
+    )
+
     # ── Durée de validité ordonnance ──────────────────────────────────────────
     cps_ordonnance_validite_jours = fields.Integer(
         string="Durée de validité d'une ordonnance (jours)",
@@ -37,6 +83,24 @@ class ResConfigSettings(models.TransientModel):
              'automatiquement la date de fin de validité. Défaut : 90 jours.',
     )
 
+    # ── Impression FSA25 ──────────────────────────────────────────────────────
+    cps_fsa25_moteur = fields.Selection(
+        selection=[
+            ('formulaire', 'Formulaire PDF officiel'),
+            ('html', 'Rapport HTML (wkhtmltopdf)'),
+        ],
+        string='Impression des FSA25 d\'un bordereau',
+        config_parameter='cps.fsa25.moteur', default='formulaire',
+        help='Formulaire PDF : texte posé sur le gabarit FSA25 (templates/), '
+             'sans navigateur. Rapport HTML : mise en page du rapport QWeb.',
+    )
+    cps_fsa25_impression_workers = fields.Integer(
+        string='Rendus PDF simultanés',
+        config_parameter='cps.fsa25.impression_workers',
+        help='Nombre de wkhtmltopdf lancés en parallèle pour imprimer les FSA25 '
+             "d'un bordereau (rapport HTML). 0 : un par cœur du serveur.",
+    )
+
     # ── Tarifs par lettre clé ─────────────────────────────────────────────────
     cps_tarif_amo = fields.Float(
         string='Tarif AMO / AMK (F XPF)', config_parameter='cps.tarif.amo',
@@ -70,18 +134,9 @@ class ResConfigSettings(models.TransientModel):
     )
 
     def action_update_all_actes_tarifs(self):
-        IrParam = self.env['ir.config_parameter'].sudo()
+        Resolver = self.env['cps.tarif.resolver']
         ActeType = self.env['cps.acte.type']
-        mapping = {
-            'AMO': float(IrParam.get_param('cps.tarif.amo', 490)),
-            'AMK': float(IrParam.get_param('cps.tarif.amo', 490)),
-            'AMY': float(IrParam.get_param('cps.tarif.amy', 490)),
-            'AMI': float(IrParam.get_param('cps.tarif.ami', 366)),
-            'AIS': float(IrParam.get_param('cps.tarif.ami', 366)),
-            'DI':  float(IrParam.get_param('cps.tarif.ami', 366)),
-            'AMS': float(IrParam.get_param('cps.tarif.ams', 283)),
-            'AMP': float(IrParam.get_param('cps.tarif.ams', 283)),
-        }
+        mapping = {lk: Resolver.tarif_lettre_cle(lk) for lk in LETTRE_CLE_PARAMS}
         count = 0
         for lk, tarif in mapping.items():
             actes = ActeType.search([('lettre_cle', '=', lk)])
@@ -99,10 +154,6 @@ class ResConfigSettings(models.TransientModel):
         }
 
     def action_view_api_usage(self):
-        """Ouvre la vue de consommation des tokens API."""
-        return {
-            'type': 'ir.actions.act_window',
-            'name': _('Consommation API Claude'),
-            'res_model': 'cps.api.usage',
-            'view_mode': 'list,pivot,graph,form',
-        }
+        """Ouvre le tableau de bord de consommation des tokens API (agrégats quotidiens)."""
+        return self.env['ir.actions.act_window']._for_xml_id(
+            'os_auxiliaire_medical.action_api_usage_jour')
@@ -1,7 +1,17 @@
-from odoo import models, fields, api, _
+from odoo import models, fields, api, tools, _
 from odoo.exceptions import UserError
+from odoo.tools import SQL
+from odoo.http import request
+import base64
+import hashlib
+import os
 import pytz
+import tempfile
+from collections import defaultdict
 from datetime import datetime as dt
+import logging
+
+_logger = logging.getLogger(__name__)
 
 PROFESSION_LABELS = {
     'kinesitherapeute': 'Masseur-kinésithérapeute',
@@ -13,6 +23,14 @@ PROFESSION_LABELS = {
 }
 PRATICIEN_CPS_CAT = 'Praticien CPS'
 _TZ_TAHITI = 'Pacific/Tahiti'
+FSA25_NB_ACTES = 16
+FSA25_CHAMPS_ACTE = (
+    'date_texte', 'lettre_cle_texte', 'coefficient_texte', 'ifd_texte', 'ik_texte',
+    'taux_majoration_texte', 'montant_texte', 'dimanche_ferie_oui',
+    'dimanche_ferie_non', 'nuit_oui', 'nuit_non',
+)
+# Pièces jointes (res_field) des pages FSA25 déjà rendues, par feuille.
+FSA25_PAGE_CACHE = 'fsa25_page_cache'
 
 
 def _default_praticien(env):
@@ -27,6 +45,40 @@ def _profession_from_partner(partner):
     return partner.get_cps_profession_key()
 
 
+def _fsa25_date(d):
+    return d.strftime('%d%m%y') if d else ''
+
+
+def _fsa25_date_longue(d):
+    return d.strftime('%d%m%Y') if d else ''
+
+
+def _fsa25_montant(v):
+    return '{:,.0f}'.format(v).replace(',', ' ') if v else '0'
+
+
+def _fsa25_acte_vals(num, acte):
+    """Champs FSA25 de la ligne d'acte n° ``num`` (acte : dict lu, None → ligne vide)."""
+    prefix = f'acte_{num:02d}_'
+    if not acte:
+        return dict.fromkeys([prefix + suffix for suffix in FSA25_CHAMPS_ACTE], '')
+    coefficient = acte['coefficient']
+    taux_majoration = acte['taux_majoration']
+    return {
+        prefix + 'date_texte': _fsa25_date(acte['date_acte']),
+        prefix + 'lettre_cle_texte': acte['lettre_cle'] or '',
+        prefix + 'coefficient_texte': '{:g}'.format(coefficient) if coefficient else '',
+        prefix + 'ifd_texte': _fsa25_montant(acte['ifd']) if acte['ifd'] else '',
+        prefix + 'ik_texte': _fsa25_montant(acte['ik']) if acte['ik'] else '',
+        prefix + 'taux_majoration_texte': '{:g}'.format(taux_majoration) if taux_majoration else '',
+        prefix + 'montant_texte': _fsa25_montant(acte['montant']),
+        prefix + 'dimanche_ferie_oui': 'x' if acte['dimanche_ferie'] else '',
+        prefix + 'dimanche_ferie_non': '' if acte['dimanche_ferie'] else 'x',
+        prefix + 'nuit_oui': 'x' if acte['nuit'] else '',
+        prefix + 'nuit_non': '' if acte['nuit'] else 'x',
+    }
+
+
 class CpsFeuillesSoins(models.Model):
     _name = 'cps.feuille.soins'
     _description = 'Feuille de soins auxiliaire médical (FSA25)'
@@ -71,7 +123,7 @@ class CpsFeuillesSoins(models.Model):
     praticien_id = fields.Many2one(
         'res.partner', string='Auxiliaire médical',
         domain="[('category_id.name', '=', 'Praticien CPS')]",
-        tracking=True, ondelete='restrict',
+        tracking=True, ondelete='restrict', index=True,
         compute='_compute_praticien_id', store=True, readonly=False,
     )
     praticien_profession = fields.Char(
@@ -183,234 +235,21 @@ class CpsFeuillesSoins(models.Model):
                 for a in rec.acte_ids
             )
 
-    photo_feuille = fields.Binary(string='Photo / scan')
+    photo_feuille = fields.Binary(string='Photo / scan', attachment=True)
     photo_filename = fields.Char()
+    photo_miniature = fields.Binary(
+        string='Miniature', attachment=True,
+        compute='_compute_photo_miniature', store=True,
+    )
     company_id = fields.Many2one('res.company', required=True,
                                  default=lambda self: self.env.company, index=True)
 
-    # ── Champs texte PDF ──────────────────────────────────────────────────────
-    state_texte = fields.Char(compute='_compute_champs_texte', store=True)
-    num_rsr_texte = fields.Char(compute='_compute_champs_texte', store=True)
-    num_panier_texte = fields.Char(compute='_compute_champs_texte', store=True)
-    motif_derogation_texte = fields.Char(compute='_compute_champs_texte', store=True)
-    auxiliaire_remplacant_oui = fields.Char(compute='_compute_champs_texte', store=True)
-    auxiliaire_remplacant_non = fields.Char(compute='_compute_champs_texte', store=True)
-    parcours_soins_oui = fields.Char(compute='_compute_champs_texte', store=True)
-    at_mp_oui = fields.Char(compute='_compute_champs_texte', store=True)
-    autre_oui = fields.Char(compute='_compute_champs_texte', store=True)
-    maladie_oui = fields.Char(compute='_compute_champs_texte', store=True)
-    longue_maladie_oui = fields.Char(compute='_compute_champs_texte', store=True)
-    maternite_oui = fields.Char(compute='_compute_champs_texte', store=True)
-    urgence_oui = fields.Char(compute='_compute_champs_texte', store=True)
-    date_prescription_texte = fields.Char(compute='_compute_champs_texte', store=True)
-    date_debut_soins_texte = fields.Char(compute='_compute_champs_texte', store=True)
-    date_fin_soins_texte = fields.Char(compute='_compute_champs_texte', store=True)
-    montant_total_texte = fields.Char(compute='_compute_champs_texte', store=True)
-    montant_tiers_payant_texte = fields.Char(compute='_compute_champs_texte', store=True)
-    montant_patient_texte = fields.Char(compute='_compute_champs_texte', store=True)
-    taux_remboursement_texte = fields.Char(compute='_compute_champs_texte', store=True)
-    patient_nom_texte = fields.Char(compute='_compute_champs_texte', store=True)
-    patient_prenom_texte = fields.Char(compute='_compute_champs_texte', store=True)
-    patient_dn_texte = fields.Char(compute='_compute_champs_texte', store=True)
-    patient_date_naissance_texte = fields.Char(compute='_compute_champs_texte', store=True)
-    praticien_name_texte = fields.Char(compute='_compute_champs_texte', store=True)
-    praticien_code_texte = fields.Char(compute='_compute_champs_texte', store=True)
-    praticien_profession_texte = fields.Char(compute='_compute_champs_texte', store=True)
-    praticien_bp_texte = fields.Char(compute='_compute_champs_texte', store=True)
-    praticien_tel_texte = fields.Char(compute='_compute_champs_texte', store=True)
-    bordereau_name_texte = fields.Char(compute='_compute_champs_texte', store=True)
-
-    acte_01_date_texte = fields.Char(compute='_compute_champs_texte', store=True)
-    acte_01_lettre_cle_texte = fields.Char(compute='_compute_champs_texte', store=True)
-    acte_01_coefficient_texte = fields.Char(compute='_compute_champs_texte', store=True)
-    acte_01_ifd_texte = fields.Char(compute='_compute_champs_texte', store=True)
-    acte_01_ik_texte = fields.Char(compute='_compute_champs_texte', store=True)
-    acte_01_taux_majoration_texte = fields.Char(compute='_compute_champs_texte', store=True)
-    acte_01_montant_texte = fields.Char(compute='_compute_champs_texte', store=True)
-    acte_01_dimanche_ferie_oui = fields.Char(compute='_compute_champs_texte', store=True)
-    acte_01_dimanche_ferie_non = fields.Char(compute='_compute_champs_texte', store=True)
-    acte_01_nuit_oui = fields.Char(compute='_compute_champs_texte', store=True)
-    acte_01_nuit_non = fields.Char(compute='_compute_champs_texte', store=True)
-
-    acte_02_date_texte = fields.Char(compute='_compute_champs_texte', store=True)
-    acte_02_lettre_cle_texte = fields.Char(compute='_compute_champs_texte', store=True)
-    acte_02_coefficient_texte = fields.Char(compute='_compute_champs_texte', store=True)
-    acte_02_ifd_texte = fields.Char(compute='_compute_champs_texte', store=True)
-    acte_02_ik_texte = fields.Char(compute='_compute_champs_texte', store=True)
-    acte_02_taux_majoration_texte = fields.Char(compute='_compute_champs_texte', store=True)
-    acte_02_montant_texte = fields.Char(compute='_compute_champs_texte', store=True)
-    acte_02_dimanche_ferie_oui = fields.Char(compute='_compute_champs_texte', store=True)
-    acte_02_dimanche_ferie_non = fields.Char(compute='_compute_champs_texte', store=True)
-    acte_02_nuit_oui = fields.Char(compute='_compute_champs_texte', store=True)
-    acte_02_nuit_non = fields.Char(compute='_compute_champs_texte', store=True)
-
-    acte_03_date_texte = fields.Char(compute='_compute_champs_texte', store=True)
-    acte_03_lettre_cle_texte = fields.Char(compute='_compute_champs_texte', store=True)
-    acte_03_coefficient_texte = fields.Char(compute='_compute_champs_texte', store=True)
-    acte_03_ifd_texte = fields.Char(compute='_compute_champs_texte', store=True)
-    acte_03_ik_texte = fields.Char(compute='_compute_champs_texte', store=True)
-    acte_03_taux_majoration_texte = fields.Char(compute='_compute_champs_texte', store=True)
-    acte_03_montant_texte = fields.Char(compute='_compute_champs_texte', store=True)
-    acte_03_dimanche_ferie_oui = fields.Char(compute='_compute_champs_texte', store=True)
-    acte_03_dimanche_ferie_non = fields.Char(compute='_compute_champs_texte', store=True)
-    acte_03_nuit_oui = fields.Char(compute='_compute_champs_texte', store=True)
-    acte_03_nuit_non = fields.Char(compute='_compute_champs_texte', store=True)
-
-    acte_04_date_texte = fields.Char(compute='_compute_champs_texte', store=True)
-    acte_04_lettre_cle_texte = fields.Char(compute='_compute_champs_texte', store=True)
-    acte_04_coefficient_texte = fields.Char(compute='_compute_champs_texte', store=True)
-    acte_04_ifd_texte = fields.Char(compute='_compute_champs_texte', store=True)
-    acte_04_ik_texte = fields.Char(compute='_compute_champs_texte', store=True)
-    acte_04_taux_majoration_texte = fields.Char(compute='_compute_champs_texte', store=True)
-    acte_04_montant_texte = fields.Char(compute='_compute_champs_texte', store=True)
-    acte_04_dimanche_ferie_oui = fields.Char(compute='_compute_champs_texte', store=True)
-    acte_04_dimanche_ferie_non = fields.Char(compute='_compute_champs_texte', store=True)
-    acte_04_nuit_oui = fields.Char(compute='_compute_champs_texte', store=True)
-    acte_04_nuit_non = fields.Char(compute='_compute_champs_texte', store=True)
-
-    acte_05_date_texte = fields.Char(compute='_compute_champs_texte', store=True)
-    acte_05_lettre_cle_texte = fields.Char(compute='_compute_champs_texte', store=True)
-    acte_05_coefficient_texte = fields.Char(compute='_compute_champs_texte', store=True)
-    acte_05_ifd_texte = fields.Char(compute='_compute_champs_texte', store=True)
-    acte_05_ik_texte = fields.Char(compute='_compute_champs_texte', store=True)
-    acte_05_taux_majoration_texte = fields.Char(compute='_compute_champs_texte', store=True)
-    acte_05_montant_texte = fields.Char(compute='_compute_champs_texte', store=True)
-    acte_05_dimanche_ferie_oui = fields.Char(compute='_compute_champs_texte', store=True)
-    acte_05_dimanche_ferie_non = fields.Char(compute='_compute_champs_texte', store=True)
-    acte_05_nuit_oui = fields.Char(compute='_compute_champs_texte', store=True)
-    acte_05_nuit_non = fields.Char(compute='_compute_champs_texte', store=True)
-
-    acte_06_date_texte = fields.Char(compute='_compute_champs_texte', store=True)
-    acte_06_lettre_cle_texte = fields.Char(compute='_compute_champs_texte', store=True)
-    acte_06_coefficient_texte = fields.Char(compute='_compute_champs_texte', store=True)
-    acte_06_ifd_texte = fields.Char(compute='_compute_champs_texte', store=True)
-    acte_06_ik_texte = fields.Char(compute='_compute_champs_texte', store=True)
-    acte_06_taux_majoration_texte = fields.Char(compute='_compute_champs_texte', store=True)
-    acte_06_montant_texte = fields.Char(compute='_compute_champs_texte', store=True)
-    acte_06_dimanche_ferie_oui = fields.Char(compute='_compute_champs_texte', store=True)
-    acte_06_dimanche_ferie_non = fields.Char(compute='_compute_champs_texte', store=True)
-    acte_06_nuit_oui = fields.Char(compute='_compute_champs_texte', store=True)
-    acte_06_nuit_non = fields.Char(compute='_compute_champs_texte', store=True)
-
-    acte_07_date_texte = fields.Char(compute='_compute_champs_texte', store=True)
-    acte_07_lettre_cle_texte = fields.Char(compute='_compute_champs_texte', store=True)
-    acte_07_coefficient_texte = fields.Char(compute='_compute_champs_texte', store=True)
-    acte_07_ifd_texte = fields.Char(compute='_compute_champs_texte', store=True)
-    acte_07_ik_texte = fields.Char(compute='_compute_champs_texte', store=True)
-    acte_07_taux_majoration_texte = fields.Char(compute='_compute_champs_texte', store=True)
-    acte_07_montant_texte = fields.Char(compute='_compute_champs_texte', store=True)
-    acte_07_dimanche_ferie_oui = fields.Char(compute='_compute_champs_texte', store=True)
-    acte_07_dimanche_ferie_non = fields.Char(compute='_compute_champs_texte', store=True)
-    acte_07_nuit_oui = fields.Char(compute='_compute_champs_texte', store=True)
-    acte_07_nuit_non = fields.Char(compute='_compute_champs_texte', store=True)
-
-    acte_08_date_texte = fields.Char(compute='_compute_champs_texte', store=True)
-    acte_08_lettre_cle_texte = fields.Char(compute='_compute_champs_texte', store=True)
-    acte_08_coefficient_texte = fields.Char(compute='_compute_champs_texte', store=True)
-    acte_08_ifd_texte = fields.Char(compute='_compute_champs_texte', store=True)
-    acte_08_ik_texte = fields.Char(compute='_compute_champs_texte', store=True)
-    acte_08_taux_majoration_texte = fields.Char(compute='_compute_champs_texte', store=True)
-    acte_08_montant_texte = fields.Char(compute='_compute_champs_texte', store=True)
-    acte_08_dimanche_ferie_oui = fields.Char(compute='_compute_champs_texte', store=True)
-    acte_08_dimanche_ferie_non = fields.Char(compute='_compute_champs_texte', store=True)
-    acte_08_nuit_oui = fields.Char(compute='_compute_champs_texte', store=True)
-    acte_08_nuit_non = fields.Char(compute='_compute_champs_texte', store=True)
-
-    acte_09_date_texte = fields.Char(compute='_compute_champs_texte', store=True)
-    acte_09_lettre_cle_texte = fields.Char(compute='_compute_champs_texte', store=True)
-    acte_09_coefficient_texte = fields.Char(compute='_compute_champs_texte', store=True)
-    acte_09_ifd_texte = fields.Char(compute='_compute_champs_texte', store=True)
-    acte_09_ik_texte = fields.Char(compute='_compute_champs_texte', store=True)
-    acte_09_taux_majoration_texte = fields.Char(compute='_compute_champs_texte', store=True)
-    acte_09_montant_texte = fields.Char(compute='_compute_champs_texte', store=True)
-    acte_09_dimanche_ferie_oui = fields.Char(compute='_compute_champs_texte', store=True)
-    acte_09_dimanche_ferie_non = fields.Char(compute='_compute_champs_texte', store=True)
-    acte_09_nuit_oui = fields.Char(compute='_compute_champs_texte', store=True)
-    acte_09_nuit_non = fields.Char(compute='_compute_champs_texte', store=True)
-
-    acte_10_date_texte = fields.Char(compute='_compute_champs_texte', store=True)
-    acte_10_lettre_cle_texte = fields.Char(compute='_compute_champs_texte', store=True)
-    acte_10_coefficient_texte = fields.Char(compute='_compute_champs_texte', store=True)
-    acte_10_ifd_texte = fields.Char(compute='_compute_champs_texte', store=True)
-    acte_10_ik_texte = fields.Char(compute='_compute_champs_texte', store=True)
-    acte_10_taux_majoration_texte = fields.Char(compute='_compute_champs_texte', store=True)
-    acte_10_montant_texte = fields.Char(compute='_compute_champs_texte', store=True)
-    acte_10_dimanche_ferie_oui = fields.Char(compute='_compute_champs_texte', store=True)
-    acte_10_dimanche_ferie_non = fields.Char(compute='_compute_champs_texte', store=True)
-    acte_10_nuit_oui = fields.Char(compute='_compute_champs_texte', store=True)
-    acte_10_nuit_non = fields.Char(compute='_compute_champs_texte', store=True)
-
-    acte_11_date_texte = fields.Char(compute='_compute_champs_texte', store=True)
-    acte_11_lettre_cle_texte = fields.Char(compute='_compute_champs_texte', store=True)
-    acte_11_coefficient_texte = fields.Char(compute='_compute_champs_texte', store=True)
-    acte_11_ifd_texte = fields.Char(compute='_compute_champs_texte', store=True)
-    acte_11_ik_texte = fields.Char(compute='_compute_champs_texte', store=True)
-    acte_11_taux_majoration_texte = fields.Char(compute='_compute_champs_texte', store=True)
-    acte_11_montant_texte = fields.Char(compute='_compute_champs_texte', store=True)
-    acte_11_dimanche_ferie_oui = fields.Char(compute='_compute_champs_texte', store=True)
-    acte_11_dimanche_ferie_non = fields.Char(compute='_compute_champs_texte', store=True)
-    acte_11_nuit_oui = fields.Char(compute='_compute_champs_texte', store=True)
-    acte_11_nuit_non = fields.Char(compute='_compute_champs_texte', store=True)
-
-    acte_12_date_texte = fields.Char(compute='_compute_champs_texte', store=True)
-    acte_12_lettre_cle_texte = fields.Char(compute='_compute_champs_texte', store=True)
-    acte_12_coefficient_texte = fields.Char(compute='_compute_champs_texte', store=True)
-    acte_12_ifd_texte = fields.Char(compute='_compute_champs_texte', store=True)
-    acte_12_ik_texte = fields.Char(compute='_compute_champs_texte', store=True)
-    acte_12_taux_majoration_texte = fields.Char(compute='_compute_champs_texte', store=True)
-    acte_12_montant_texte = fields.Char(compute='_compute_champs_texte', store=True)
-    acte_12_dimanche_ferie_oui = fields.Char(compute='_compute_champs_texte', store=True)
-    acte_12_dimanche_ferie_non = fields.Char(compute='_compute_champs_texte', store=True)
-    acte_12_nuit_oui = fields.Char(compute='_compute_champs_texte', store=True)
-    acte_12_nuit_non = fields.Char(compute='_compute_champs_texte', store=True)
-
-    acte_13_date_texte = fields.Char(compute='_compute_champs_texte', store=True)
-    acte_13_lettre_cle_texte = fields.Char(compute='_compute_champs_texte', store=True)
-    acte_13_coefficient_texte = fields.Char(compute='_compute_champs_texte', store=True)
-    acte_13_ifd_texte = fields.Char(compute='_compute_champs_texte', store=True)
-    acte_13_ik_texte = fields.Char(compute='_compute_champs_texte', store=True)
-    acte_13_taux_majoration_texte = fields.Char(compute='_compute_champs_texte', store=True)
-    acte_13_montant_texte = fields.Char(compute='_compute_champs_texte', store=True)
-    acte_13_dimanche_ferie_oui = fields.Char(compute='_compute_champs_texte', store=True)
-    acte_13_dimanche_ferie_non = fields.Char(compute='_compute_champs_texte', store=True)
-    acte_13_nuit_oui = fields.Char(compute='_compute_champs_texte', store=True)
-    acte_13_nuit_non = fields.Char(compute='_compute_champs_texte', store=True)
-
-    acte_14_date_texte = fields.Char(compute='_compute_champs_texte', store=True)
-    acte_14_lettre_cle_texte = fields.Char(compute='_compute_champs_texte', store=True)
-    acte_14_coefficient_texte = fields.Char(compute='_compute_champs_texte', store=True)
-    acte_14_ifd_texte = fields.Char(compute='_compute_champs_texte', store=True)
-    acte_14_ik_texte = fields.Char(compute='_compute_champs_texte', store=True)
-    acte_14_taux_majoration_texte = fields.Char(compute='_compute_champs_texte', store=True)
-    acte_14_montant_texte = fields.Char(compute='_compute_champs_texte', store=True)
-    acte_14_dimanche_ferie_oui = fields.Char(compute='_compute_champs_texte', store=True)
-    acte_14_dimanche_ferie_non = fields.Char(compute='_compute_champs_texte', store=True)
-    acte_14_nuit_oui = fields.Char(compute='_compute_champs_texte', store=True)
-    acte_14_nuit_non = fields.Char(compute='_compute_champs_texte', store=True)
-
-    acte_15_date_texte = fields.Char(compute='_compute_champs_texte', store=True)
-    acte_15_lettre_cle_texte = fields.Char(compute='_compute_champs_texte', store=True)
-    acte_15_coefficient_texte = fields.Char(compute='_compute_champs_texte', store=True)
-    acte_15_ifd_texte = fields.Char(compute='_compute_champs_texte', store=True)
-    acte_15_ik_texte = fields.Char(compute='_compute_champs_texte', store=True)
-    acte_15_taux_majoration_texte = fields.Char(compute='_compute_champs_texte', store=True)
-    acte_15_montant_texte = fields.Char(compute='_compute_champs_texte', store=True)
-    acte_15_dimanche_ferie_oui = fields.Char(compute='_compute_champs_texte', store=True)
-    acte_15_dimanche_ferie_non = fields.Char(compute='_compute_champs_texte', store=True)
-    acte_15_nuit_oui = fields.Char(compute='_compute_champs_texte', store=True)
-    acte_15_nuit_non = fields.Char(compute='_compute_champs_texte', store=True)
-
-    acte_16_date_texte = fields.Char(compute='_compute_champs_texte', store=True)
-    acte_16_lettre_cle_texte = fields.Char(compute='_compute_champs_texte', store=True)
-    acte_16_coefficient_texte = fields.Char(compute='_compute_champs_texte', store=True)
-    acte_16_ifd_texte = fields.Char(compute='_compute_champs_texte', store=True)
-    acte_16_ik_texte = fields.Char(compute='_compute_champs_texte', store=True)
-    acte_16_taux_majoration_texte = fields.Char(compute='_compute_champs_texte', store=True)
-    acte_16_montant_texte = fields.Char(compute='_compute_champs_texte', store=True)
-    acte_16_dimanche_ferie_oui = fields.Char(compute='_compute_champs_texte', store=True)
-    acte_16_dimanche_ferie_non = fields.Char(compute='_compute_champs_texte', store=True)
-    acte_16_nuit_oui = fields.Char(compute='_compute_champs_texte', store=True)
-    acte_16_nuit_non = fields.Char(compute='_compute_champs_texte', store=True)
+    @api.depends('photo_feuille')
+    def _compute_photo_miniature(self):
+        from ..wizards.ocr_image import miniature_webp
+        for rec in self.with_context(bin_size=False):
+            miniature = rec.photo_feuille and miniature_webp(base64.b64decode(rec.photo_feuille))
+            rec.photo_miniature = miniature and base64.b64encode(miniature)
 
     # ── Onchanges ─────────────────────────────────────────────────────────────
 
@@ -434,16 +273,13 @@ class CpsFeuillesSoins(models.Model):
         self.condition = m.condition
         self.taux_remboursement = m.taux_remboursement
         today = fields.Date.today()
-        IrParam = self.env['ir.config_parameter'].sudo()
-        ifd_sup = float(IrParam.get_param('cps.supplement.ifd', 250))
+        at_list = [ligne.acte_type_id for ligne in m.ligne_ids]
+        coefs = [ligne.coefficient or ligne.acte_type_id.coefficient_defaut for ligne in m.ligne_ids]
+        montants = self.env['cps.tarif.resolver'].price_many(
+            at_list, coefs, [ligne.ifd for ligne in m.ligne_ids], today, self.company_id,
+        )
         lignes = []
-        for ligne in m.ligne_ids:
-            at = ligne.acte_type_id
-            coef = ligne.coefficient or at.coefficient_defaut
-            tarif = self._get_tarif_unitaire(at, IrParam)
-            montant = round(tarif * coef, 0) if tarif else 0.0
-            if ligne.ifd:
-                montant += round(ligne.ifd * ifd_sup, 0)
+        for ligne, at, coef, montant in zip(m.ligne_ids, at_list, coefs, montants):
             lignes.append((0, 0, {
                 'acte_type_id': at.id, 'date_acte': today,
                 'lettre_cle': at.lettre_cle, 'coefficient': coef,
@@ -455,93 +291,6 @@ class CpsFeuillesSoins(models.Model):
 
     # ── Compute ───────────────────────────────────────────────────────────────
 
-    @api.depends(
-        'state', 'condition', 'motif_derogation', 'num_rsr', 'num_panier',
-        'auxiliaire_remplacant', 'parcours_soins',
-        'date_prescription', 'date_debut_soins', 'date_fin_soins',
-        'montant_total', 'montant_tiers_payant', 'montant_patient', 'taux_remboursement',
-        'patient_id.lastname', 'patient_id.firstname', 'patient_id.vat',
-        'patient_id.birthdate_date',
-        'praticien_id.name', 'praticien_id.vat',
-        'praticien_id.category_id', 'praticien_id.category_id.parent_id',
-        'praticien_id.street', 'praticien_id.phone',
-        'bordereau_id.name',
-        'acte_ids.date_acte', 'acte_ids.lettre_cle', 'acte_ids.coefficient',
-        'acte_ids.ifd', 'acte_ids.ik', 'acte_ids.taux_majoration', 'acte_ids.montant',
-        'acte_ids.dimanche_ferie', 'acte_ids.nuit',
-    )
-    def _compute_champs_texte(self):
-        def fd(d):
-            return d.strftime('%d%m%y') if d else ''
-
-        def fd8(d):
-            return d.strftime('%d%m%Y') if d else ''
-
-        def ff(v):
-            return '{:,.0f}'.format(v).replace(',', ' ') if v else '0'
-
-        sl = dict(self._fields['state'].selection)
-        for rec in self:
-            rec.state_texte = sl.get(rec.state, rec.state or '')
-            rec.auxiliaire_remplacant_oui = 'x' if rec.auxiliaire_remplacant else ''
-            rec.auxiliaire_remplacant_non = '' if rec.auxiliaire_remplacant else 'x'
-            rec.parcours_soins_oui = 'x' if rec.parcours_soins else ''
-            rec.maternite_oui = 'x' if rec.condition == 'maternite' else ''
-            rec.urgence_oui = 'x' if rec.condition == 'urgence' else ''
-            rec.longue_maladie_oui = 'x' if rec.condition == 'longue_maladie' else ''
-            rec.maladie_oui = 'x' if rec.condition == 'maladie' else ''
-            rec.at_mp_oui = 'x' if rec.condition == 'at_mp' else ''
-            rec.autre_oui = 'x' if rec.condition == 'autre' else ''
-            rec.num_panier_texte = rec.num_panier or ''
-            rec.num_rsr_texte = rec.num_rsr or ''
-            rec.motif_derogation_texte = rec.motif_derogation or ''
-            rec.date_prescription_texte = fd(rec.date_prescription)
-            rec.date_debut_soins_texte = fd(rec.date_debut_soins)
-            rec.date_fin_soins_texte = fd(rec.date_fin_soins)
-            rec.montant_total_texte = ff(rec.montant_total)
-            rec.montant_tiers_payant_texte = ff(rec.montant_tiers_payant)
-            rec.montant_patient_texte = ff(rec.montant_patient)
-            rec.taux_remboursement_texte = '{:g}'.format(rec.taux_remboursement)
-            p = rec.patient_id
-            rec.patient_nom_texte = (p.lastname.upper() if p and p.lastname else '')
-            rec.patient_prenom_texte = (p.firstname.upper() if p and p.firstname else '')
-            rec.patient_dn_texte = (p.vat.upper() if p and p.vat else '')
-            rec.patient_date_naissance_texte = fd8(p.birthdate_date) if p else ''
-            pr = rec.praticien_id
-            rec.praticien_name_texte = (pr.name or '').upper() if pr else ''
-            rec.praticien_code_texte = (pr.vat or '').upper() if pr else ''
-            rec.praticien_profession_texte = pr.get_cps_profession_label() if pr else ''
-            rec.praticien_bp_texte = (pr.street or '') if pr else ''
-            rec.praticien_tel_texte = (pr.phone or '') if pr else ''
-            rec.bordereau_name_texte = (rec.bordereau_id.name or '') if rec.bordereau_id else ''
-
-            for i in range(1, 17):
-                idx = i - 1
-                acte = rec.acte_ids[idx] if len(rec.acte_ids) > idx else None
-                suffix = f'{i:02d}'
-                setattr(rec, f'acte_{suffix}_date_texte',
-                        fd(acte.date_acte) if acte else '')
-                setattr(rec, f'acte_{suffix}_lettre_cle_texte',
-                        (acte.lettre_cle or '') if acte else '')
-                setattr(rec, f'acte_{suffix}_coefficient_texte',
-                        '{:g}'.format(acte.coefficient) if acte and acte.coefficient else '')
-                setattr(rec, f'acte_{suffix}_ifd_texte',
-                        ff(acte.ifd) if acte and acte.ifd else '')
-                setattr(rec, f'acte_{suffix}_ik_texte',
-                        ff(acte.ik) if acte and acte.ik else '')
-                setattr(rec, f'acte_{suffix}_taux_majoration_texte',
-                        '{:g}'.format(acte.taux_majoration) if acte and acte.taux_majoration else '')
-                setattr(rec, f'acte_{suffix}_montant_texte',
-                        ff(acte.montant) if acte else '')
-                setattr(rec, f'acte_{suffix}_dimanche_ferie_oui',
-                        'x' if acte and acte.dimanche_ferie else '')
-                setattr(rec, f'acte_{suffix}_dimanche_ferie_non',
-                        '' if acte and acte.dimanche_ferie else 'x' if acte else '')
-                setattr(rec, f'acte_{suffix}_nuit_oui',
-                        'x' if acte and acte.nuit else '')
-                setattr(rec, f'acte_{suffix}_nuit_non',
-                        '' if acte and acte.nuit else 'x' if acte else '')
-
     @api.model_create_multi
     def create(self, vals_list):
         for vals in vals_list:
@@ -568,17 +317,153 @@ class CpsFeuillesSoins(models.Model):
             rec.date_debut_soins = min(dates) if dates else False
             rec.date_fin_soins = max(dates) if dates else False
 
-    @staticmethod
-    def _get_tarif_unitaire(acte_type, ir_param):
-        cfg = {
-            'AMO': 'cps.tarif.amo', 'AMK': 'cps.tarif.amo', 'AMY': 'cps.tarif.amy',
-            'AMI': 'cps.tarif.ami', 'AIS': 'cps.tarif.ami', 'DI': 'cps.tarif.ami',
-            'AMS': 'cps.tarif.ams', 'AMP': 'cps.tarif.ams',
+    # ── Champs texte PDF (FSA25) ──────────────────────────────────────────────
+    # Les valeurs destinées au formulaire FSA25 (PDF/ODG) ne sont pas stockées :
+    # elles sont construites à la demande lors du rendu, puis mises en cache
+    # tant que ni la feuille, ni ses actes, ni les partenaires liés ne changent.
+
+    def get_fsa25_field_map(self):
+        """Retourne le dict {nom du champ FSA25: texte} de la feuille."""
+        self.ensure_one()
+        return self.get_fsa25_field_maps()[self.id]
+
+    def get_fsa25_field_maps(self):
+        """Retourne {feuille_id: field map} pour tout le recordset.
+
+        Les feuilles absentes du cache sont construites ensemble, au premier
+        défaut de cache, par _build_fsa25_field_maps (lectures groupées).
+        """
+        if any(not isinstance(rec.id, int) for rec in self):
+            raise UserError(_('Enregistrez la feuille de soins avant de la rendre.'))
+        batch = {}
+
+        def loader(feuille_id):
+            if feuille_id not in batch:
+                batch.update(self._build_fsa25_field_maps())
+            return batch[feuille_id]
+
+        result = {}
+        for rec in self:
+            cache_key = rec._fsa25_cache_key()
+            if cache_key is None:
+                result[rec.id] = dict(loader(rec.id))
+            else:
+                result[rec.id] = dict(
+                    self._get_fsa25_field_map_cached(rec.id, cache_key, loader)
+                )
+        return result
+
+    def _fsa25_cache_key(self):
+        """Clé de cache = write_date de la feuille, des actes et des partenaires.
+
+        Retourne None (pas de cache) pour une feuille modifiée dans la
+        transaction courante : write_date vaut alors cr.now() et ne distingue
+        pas deux écritures successives.
+        """
+        self.ensure_one()
+        dates = (
+            self.write_date,
+            self.patient_id.write_date,
+            self.praticien_id.write_date,
+            self.bordereau_id.write_date,
+        )
+        actes = tuple((a.id, a.write_date) for a in self.acte_ids)
+        now = self.env.cr.now()
+        if now in dates or any(d == now for _id, d in actes):
+            return None
+        return dates + actes
+
+    @tools.ormcache('feuille_id', 'cache_key')
+    def _get_fsa25_field_map_cached(self, feuille_id, cache_key, loader):
+        return loader(feuille_id)
+
+    def _build_fsa25_field_maps(self):
+        """Construit les field maps du recordset en dicts Python.
+
+        Trois lectures pour tout le lot (feuilles, actes, partenaires) : pas
+        d'indexation acte_ids[idx] ni d'affectation ORM champ par champ.
+        """
+        feuilles = self.read([
+            'name', 'state', 'condition', 'motif_derogation', 'num_rsr', 'num_panier',
+            'auxiliaire_remplacant', 'accord_prealable', 'parcours_soins', 'code_prescripteur',
+            'date_prescription', 'date_debut_soins', 'date_fin_soins',
+            'montant_total', 'montant_tiers_payant', 'montant_patient',
+            'taux_remboursement', 'patient_id', 'praticien_id', 'bordereau_id',
+        ], load=None)
+        actes_par_feuille = defaultdict(list)
+        for acte in self.env['cps.feuille.soins.acte'].search_read(
+            [('feuille_id', 'in', self.ids)],
+            ['feuille_id', 'date_acte', 'lettre_cle', 'coefficient', 'ifd', 'ik',
+             'taux_majoration', 'montant', 'dimanche_ferie', 'nuit'],
+            load=None,
+        ):
+            actes_par_feuille[acte['feuille_id']].append(acte)
+
+        partners = self.env['res.partner'].browse({
+            pid for f in feuilles for pid in (f['patient_id'], f['praticien_id']) if pid
+        })
+        partner_vals = {p['id']: p for p in partners.read(
+            ['name', 'lastname', 'firstname', 'vat', 'birthdate_date', 'street', 'phone'],
+            load=None,
+        )}
+        professions = {
+            pr.id: pr.get_cps_profession_label()
+            for pr in partners.browse({f['praticien_id'] for f in feuilles if f['praticien_id']})
+        }
+        bordereau_names = {
+            b.id: b.name for b in self.env['cps.bordereau'].browse(
+                {f['bordereau_id'] for f in feuilles if f['bordereau_id']})
         }
-        lk = (acte_type.lettre_cle or '').upper()
-        key = cfg.get(lk)
-        return float(ir_param.get_param(key, acte_type.tarif_unitaire or 490)) if key else (
-                    acte_type.tarif_unitaire or 490)
+
+        sl = dict(self._fields['state'].selection)
+        vide = {}
+        result = {}
+        for f in feuilles:
+            p = partner_vals.get(f['patient_id'], vide)
+            pr = partner_vals.get(f['praticien_id'], vide)
+            condition = f['condition']
+            vals = {
+                'name_texte': f['name'] or '',
+                'state_texte': sl.get(f['state'], f['state'] or ''),
+                'auxiliaire_remplacant_oui': 'x' if f['auxiliaire_remplacant'] else '',
+                'auxiliaire_remplacant_non': '' if f['auxiliaire_remplacant'] else 'x',
+                'accord_prealable_texte': f['accord_prealable'] or '',
+                'parcours_soins_oui': 'x' if f['parcours_soins'] else '',
+                'parcours_soins_non': '' if f['parcours_soins'] else 'x',
+                'code_prescripteur_texte': f['code_prescripteur'] or '',
+                'maternite_oui': 'x' if condition == 'maternite' else '',
+                'urgence_oui': 'x' if condition == 'urgence' else '',
+                'longue_maladie_oui': 'x' if condition == 'longue_maladie' else '',
+                'maladie_oui': 'x' if condition == 'maladie' else '',
+                'at_mp_oui': 'x' if condition == 'at_mp' else '',
+                'autre_oui': 'x' if condition == 'autre' else '',
+                'num_panier_texte': f['num_panier'] or '',
+                'num_rsr_texte': f['num_rsr'] or '',
+                'motif_derogation_texte': f['motif_derogation'] or '',
+                'date_prescription_texte': _fsa25_date(f['date_prescription']),
+                'date_debut_soins_texte': _fsa25_date(f['date_debut_soins']),
+                'date_fin_soins_texte': _fsa25_date(f['date_fin_soins']),
+                'montant_total_texte': _fsa25_montant(f['montant_total']),
+                'montant_tiers_payant_texte': _fsa25_montant(f['montant_tiers_payant']),
+                'montant_patient_texte': _fsa25_montant(f['montant_patient']),
+                'taux_remboursement_texte': '{:g}'.format(f['taux_remboursement']),
+                'patient_nom_texte': (p.get('lastname') or '').upper(),
+                'patient_prenom_texte': (p.get('firstname') or '').upper(),
+                'patient_dn_texte': (p.get('vat') or '').upper(),
+                'patient_date_naissance_texte': _fsa25_date_longue(p.get('birthdate_date')),
+                'patient_adresse_texte': p.get('street') or '',
+                'praticien_name_texte': (pr.get('name') or '').upper(),
+                'praticien_code_texte': (pr.get('vat') or '').upper(),
+                'praticien_profession_texte': professions.get(f['praticien_id'], ''),
+                'praticien_bp_texte': pr.get('street') or '',
+                'praticien_tel_texte': pr.get('phone') or '',
+                'bordereau_name_texte': bordereau_names.get(f['bordereau_id'], '') or '',
+            }
+            actes = actes_par_feuille[f['id']]
+            for i in range(FSA25_NB_ACTES):
+                vals.update(_fsa25_acte_vals(i + 1, actes[i] if i < len(actes) else None))
+            result[f['id']] = vals
+        return result
 
     # ── Actions workflow ──────────────────────────────────────────────────────
 
@@ -642,6 +527,127 @@ class CpsFeuillesSoins(models.Model):
             raise UserError(_("Aucune action d'impression PDF n'est disponible."))
         return report.report_action(self)
 
+    # ── Impression FSA25 sur le formulaire PDF ───────────────────────────────
+
+    def action_print_fsa25_formulaire(self):
+        """Texte seul, à imprimer sur un formulaire FSA25 pré-imprimé."""
+        return self._action_imprimer_fsa25(fond=False)
+
+    def action_print_fsa25_page_vierge(self):
+        """Formulaire FSA25 complet (fond officiel), à imprimer sur page vierge."""
+        return self._action_imprimer_fsa25(fond=True)
+
+    def _action_imprimer_fsa25(self, fond):
+        if not self:
+            raise UserError(_('Aucune feuille de soins à imprimer.'))
+        return {
+            'type': 'ir.actions.act_url',
+            'url': '/cps/feuille/fsa25.pdf?ids=%s&fond=%d' % (
+                ','.join(str(i) for i in self.ids), int(fond)),
+            'target': 'new',
+        }
+
+    def _fsa25_remplir(self, sortie, fond=True):
+        """
+        Écrit dans le fichier sortie une page FSA25 par feuille, dans l'ordre
+        du recordset, sur le gabarit PDF (wizards/fsa25_pdf) ; retourne le
+        nombre de pages.
+        """
+        from ..wizards.fsa25_pdf import remplir
+        field_maps = self.get_fsa25_field_maps()
+        return remplir([field_maps[fid] for fid in self.ids], sortie, fond)
+
+    # ── Impression FSA25 en lot (bordereau) ──────────────────────────────────
+
+    def _fsa25_pdf_pages(self, max_workers=None):
+        """
+        {feuille_id: PDF} du recordset. Une page déjà rendue est reprise de
+        son cache (pièce jointe nommée d'après _fsa25_cache_key) ; les autres
+        sont rendues ensemble par _fsa25_rendre_pdf puis mises en cache.
+        """
+        self.env.flush_all()
+        noms = {}
+        for rec in self:
+            cle = rec._fsa25_cache_key()
+            if cle is not None:
+                noms[rec.id] = 'FSA25-%s.pdf' % hashlib.sha1(repr(cle).encode()).hexdigest()
+        Attachment = self.env['ir.attachment'].sudo()
+        caches = {a.res_id: a for a in Attachment.search([
+            ('res_model', '=', self._name), ('res_field', '=', FSA25_PAGE_CACHE),
+            ('res_id', 'in', self.ids),
+        ])}
+        pages = {fid: a.raw for fid, a in caches.items() if noms.get(fid) == a.name}
+
+        a_rendre = self.filtered(lambda f: f.id not in pages)
+        if not a_rendre:
+            return pages
+        rendues = a_rendre._fsa25_rendre_pdf(max_workers)
+        pages.update(rendues)
+        creations = []
+        for fid, pdf in rendues.items():
+            if fid not in noms:
+                continue
+            vals = {'name': noms[fid], 'raw': pdf, 'mimetype': 'application/pdf'}
+            if fid in caches:
+                caches[fid].write(vals)
+            else:
+                creations.append(dict(vals, res_model=self._name, res_field=FSA25_PAGE_CACHE,
+                                      res_id=fid, type='binary'))
+        Attachment.create(creations)
+        return pages
+
+    def _fsa25_rendre_pdf(self, max_workers=None):
+        """
+        Rendu du rapport FSA25 des feuilles : HTML QWeb en une fois, puis
+        wkhtmltopdf par lots en parallèle (wizards/fsa25_impression).
+        Retourne {feuille_id: PDF}.
+        """
+        from odoo.addons.base.models.ir_actions_report import _get_wkhtmltopdf_bin
+        from ..wizards.fsa25_impression import (
+            FEUILLES_PAR_LOT, decouper_par_signets, wkhtmltopdf_lots,
+        )
+        Report = self.env['ir.actions.report']
+        if Report.get_wkhtmltopdf_state() == 'install':
+            raise UserError(_("wkhtmltopdf est introuvable : impression PDF impossible."))
+        report = self.env.ref('os_auxiliaire_medical.action_report_feuille_soins')
+        html = Report._render_qweb_html(report, self.ids)[0]
+        corps, _ids, entete, pied, args_format = Report._prepare_html(html, report_model=self._name)
+        if len(corps) != len(self):
+            raise UserError(_('Rendu FSA25 inattendu : %d pages pour %d feuilles.')
+                            % (len(corps), len(self)))
+        if max_workers is None:
+            max_workers = int(self.env['ir.config_parameter'].sudo().get_param(
+                'cps.fsa25.impression_workers', 0)) or os.cpu_count()
+
+        commande = [_get_wkhtmltopdf_bin()] + Report._build_wkhtmltopdf_args(
+            report.get_paperformat(), self.env.context.get('landscape'),
+            specific_paperformat_args=args_format,
+        )
+        if request and request.db:
+            commande += ['--cookie', 'session_id', request.session.sid]
+        with tempfile.TemporaryDirectory(prefix='cps.fsa25.') as dossier:
+            for option, contenu in (('--header-html', entete), ('--footer-html', pied)):
+                if contenu:
+                    chemin = os.path.join(dossier, option[2:] + '.html')
+                    with open(chemin, 'wb') as f:
+                        f.write(contenu if isinstance(contenu, bytes) else contenu.encode())
+                    commande += [option, chemin]
+
+            ids = self.ids
+            lots = [list(range(i, min(i + FEUILLES_PAR_LOT, len(ids))))
+                    for i in range(0, len(ids), FEUILLES_PAR_LOT)]
+            pdfs = wkhtmltopdf_lots(commande, [[corps[i] for i in lot] for lot in lots], max_workers)
+            pages = {}
+            for lot, pdf in zip(lots, pdfs):
+                documents = decouper_par_signets(pdf, len(lot))
+                if documents is None:
+                    # Signets absents ou ambigus : une feuille par appel.
+                    _logger.warning('Impression FSA25 : lot de %d feuilles non découpable, '
+                                    'rendu feuille par feuille', len(lot))
+                    documents = wkhtmltopdf_lots(commande, [[corps[i]] for i in lot], max_workers)
+                pages.update({ids[i]: document for i, document in zip(lot, documents)})
+        return pages
+
     def action_open_date_wizard(self):
         self.ensure_one()
         return {
@@ -662,9 +668,42 @@ class CpsActe(models.Model):
     _description = 'Acte de soin (ligne de feuille FSA25)'
     _order = 'date_acte, heure_acte, id'
 
-    feuille_id = fields.Many2one('cps.feuille.soins', required=True, ondelete='cascade')
+    def init(self):
+        # Comptage des séances planifiées par ligne d'ordonnance
+        # (CpsOrdonnanceLigne._compute_seances_stats).
+        tools.create_index(
+            self.env.cr, 'cps_feuille_soins_acte_ligne_planifiee_idx', self._table,
+            ['ordonnance_ligne_id'], where="state_seance = 'planifiee'",
+        )
+        # Séances planifiées arrivées à échéance (_cron_seances_effectuees).
+        tools.create_index(
+            self.env.cr, 'cps_feuille_soins_acte_planifiee_date_idx', self._table,
+            ['date_acte'], where="state_seance = 'planifiee'",
+        )
+        # Créneaux d'un praticien (wizard de dates, optimiseur d'agenda).
+        tools.create_index(
+            self.env.cr, 'cps_feuille_soins_acte_praticien_date_idx', self._table,
+            ['praticien_id', 'date_acte', 'state_seance'],
+        )
+        # Flux agenda d'un praticien sur une période (controllers/agenda.py).
+        tools.create_index(
+            self.env.cr, 'cps_feuille_soins_acte_praticien_datetime_idx', self._table,
+            ['praticien_id', 'datetime_acte'],
+        )
+
+    feuille_id = fields.Many2one('cps.feuille.soins', required=True, ondelete='cascade', index=True)
+    # Copiés de la feuille (tenus à jour par l'ORM) : les recherches par
+    # praticien ou par société se font sans jointure sur cps_feuille_soins.
+    praticien_id = fields.Many2one(
+        related='feuille_id.praticien_id', store=True, readonly=True, string='Praticien',
+    )
+    company_id = fields.Many2one(
+        related='feuille_id.company_id', store=True, readonly=True, index=True,
+    )
     acte_type_id = fields.Many2one('cps.acte.type', string="Type d'acte", ondelete='set null')
-    ordonnance_ligne_id = fields.Many2one('cps.ordonnance.ligne', ondelete='set null')
+    ordonnance_ligne_id = fields.Many2one(
+        'cps.ordonnance.ligne', ondelete='set null', index='btree_not_null',
+    )
     seances_restantes = fields.Integer(
         related='ordonnance_ligne_id.nb_seances_restantes', readonly=True,
     )
@@ -735,7 +774,6 @@ class CpsActe(models.Model):
     patient_nom = fields.Char(related='feuille_id.patient_nom', readonly=True, store=False)
     patient_prenom = fields.Char(related='feuille_id.patient_prenom', readonly=True, store=False)
     patient_dn = fields.Char(related='feuille_id.patient_dn', readonly=True, store=False)
-    praticien_id = fields.Many2one(related='feuille_id.praticien_id', readonly=True, store=False)
     feuille_state = fields.Selection(related='feuille_id.state', readonly=True, store=False)
     feuille_name = fields.Char(related='feuille_id.name', readonly=True, store=False)
     montant_cps = fields.Float(related='feuille_id.montant_tiers_payant', readonly=True, store=False)
@@ -783,6 +821,98 @@ class CpsActe(models.Model):
                 vals['state_seance'] = 'planifiee' if date_acte > today else 'effectuee'
         return super().create(vals_list)
 
+    # ── Cron : séances passées ────────────────────────────────────────────────
+
+    @api.model
+    def _cron_seances_effectuees(self, taille_lot=5000):
+        """
+        Passe en « Effectuée » les séances planifiées dont la date est atteinte,
+        toutes sociétés confondues : un UPDATE … RETURNING, puis recalcul groupé
+        des champs qui en dépendent (compteurs des lignes d'ordonnance,
+        séances disponibles, séances futures des feuilles), par lots.
+        La date atteinte est celle de Tahiti, quel que soit le fuseau du cron.
+        """
+        today = fields.Date.context_today(self.with_context(tz=_TZ_TAHITI))
+        self.flush_model(['state_seance', 'date_acte'])
+        self.env.cr.execute("""
+            UPDATE cps_feuille_soins_acte
+               SET state_seance = 'effectuee',
+                   write_uid = %s, write_date = now() at time zone 'UTC'
+             WHERE state_seance = 'planifiee' AND date_acte <= %s
+         RETURNING id
+        """, [self.env.uid, today])
+        ids = [row[0] for row in self.env.cr.fetchall()]
+        self.invalidate_model(['state_seance', 'write_uid', 'write_date'])
+        for lot in tools.split_every(taille_lot, ids):
+            self.browse(lot).modified(['state_seance'])
+            self.env.flush_all()
+
+        # Séances futures devenues passées sans changer de statut (annulées…).
+        Feuille = self.env['cps.feuille.soins']
+        Feuille.flush_model(['has_future_seances'])
+        self.env.cr.execute("""
+            UPDATE cps_feuille_soins f
+               SET has_future_seances = FALSE
+             WHERE f.has_future_seances
+               AND NOT EXISTS (
+                    SELECT 1 FROM cps_feuille_soins_acte a
+                     WHERE a.feuille_id = f.id AND a.date_acte > %s)
+        """, [today])
+        nb_feuilles = self.env.cr.rowcount
+        Feuille.invalidate_model(['has_future_seances'])
+        if ids or nb_feuilles:
+            _logger.info('Séances : %d passées en « Effectuée », %d feuilles sans séance future',
+                         len(ids), nb_feuilles)
+        return len(ids)
+
+    # ── Flux agenda (controllers/agenda.py) ───────────────────────────────────
+
+    @api.model
+    def _agenda_requete(self, praticien_id, debut, fin):
+        """Séances du praticien sur [debut, fin[ (règles d'accès appliquées)."""
+        return self._search([
+            ('praticien_id', '=', praticien_id),
+            ('datetime_acte', '>=', debut),
+            ('datetime_acte', '<', fin),
+        ])
+
+    @api.model
+    def _agenda_version(self, praticien_id, debut, fin):
+        """
+        Empreinte de la période (nombre de séances, dernières modifications des
+        séances, feuilles et patients) : une agrégation sur l'index, sans
+        construire les lignes. Sert d'ETag au flux.
+        """
+        self.env['cps.feuille.soins'].flush_model()
+        self.flush_model()
+        self.env.cr.execute(SQL("""
+            SELECT count(*), max(a.write_date), max(f.write_date), max(p.write_date)
+              FROM cps_feuille_soins_acte a
+              JOIN cps_feuille_soins f ON f.id = a.feuille_id
+              LEFT JOIN res_partner p ON p.id = f.patient_id
+             WHERE a.id IN %s
+        """, self._agenda_requete(praticien_id, debut, fin).subselect()))
+        return self.env.cr.fetchone()
+
+    @api.model
+    def _agenda_lignes(self, praticien_id, debut, fin):
+        """
+        Lignes compactes du flux, dans l'ordre de COLONNES : une requête
+        pour toute la période, sans champs related ni lecture ORM.
+        """
+        self.env['cps.feuille.soins'].flush_model()
+        self.flush_model()
+        self.env.cr.execute(SQL("""
+            SELECT a.id, a.datetime_acte, a.date_delay, a.state_seance, a.name,
+                   p.name, f.name, f.state, a.montant, f.montant_tiers_payant
+              FROM cps_feuille_soins_acte a
+              JOIN cps_feuille_soins f ON f.id = a.feuille_id
+              LEFT JOIN res_partner p ON p.id = f.patient_id
+             WHERE a.id IN %s
+             ORDER BY a.datetime_acte, a.id
+        """, self._agenda_requete(praticien_id, debut, fin).subselect()))
+        return self.env.cr.fetchall()
+
     # ── Onchange : met à jour le statut quand la date change ──────────────────
 
     @api.onchange('date_acte')
@@ -799,19 +929,12 @@ class CpsActe(models.Model):
         if not self.acte_type_id:
             return
         at = self.acte_type_id
-        IrParam = self.env['ir.config_parameter'].sudo()
         self.lettre_cle = at.lettre_cle
         if at.coefficient_defaut:
             self.coefficient = at.coefficient_defaut
-        tarif = CpsFeuillesSoins._get_tarif_unitaire(at, IrParam)
-        if at.type_supplement == 'ifn':
-            montant = float(IrParam.get_param('cps.supplement.ifn', 250))
-        elif at.type_supplement == 'ifd':
-            montant = self.ifd * float(IrParam.get_param('cps.supplement.ifd', 250))
-        else:
-            montant = round(tarif * (at.coefficient_defaut or 0), 0)
-            if self.ifd:
-                montant += round(self.ifd * float(IrParam.get_param('cps.supplement.ifd', 250)), 0)
+        montant = self.env['cps.tarif.resolver'].price_many(
+            at, [at.coefficient_defaut], self.ifd, self.date_acte, self.feuille_id.company_id,
+        )[0]
         self.montant = montant
         feuille = self.feuille_id
         if feuille and feuille.ordonnance_id and not self.ordonnance_ligne_id:
@@ -821,29 +944,43 @@ class CpsActe(models.Model):
 
     @api.onchange('ifd', 'coefficient', 'lettre_cle')
     def _onchange_recalculate(self):
-        IrParam = self.env['ir.config_parameter'].sudo()
+        Resolver = self.env['cps.tarif.resolver']
+        company = self.feuille_id.company_id
         if self.acte_type_id:
-            at = self.acte_type_id
-            if at.type_supplement == 'ifn':
-                self.montant = float(IrParam.get_param('cps.supplement.ifn', 250))
-                return
-            elif at.type_supplement == 'ifd':
-                self.montant = round(self.ifd * float(IrParam.get_param('cps.supplement.ifd', 250)), 0)
-                return
-            tarif = CpsFeuillesSoins._get_tarif_unitaire(at, IrParam)
-        else:
-            cfg = {'AMO': 'cps.tarif.amo', 'AMK': 'cps.tarif.amo', 'AMY': 'cps.tarif.amy',
-                   'AMI': 'cps.tarif.ami', 'AIS': 'cps.tarif.ami', 'DI': 'cps.tarif.ami',
-                   'AMS': 'cps.tarif.ams', 'AMP': 'cps.tarif.ams'}
-            lk = (self.lettre_cle or '').upper()
-            key = cfg.get(lk)
-            fb = {'AMO': 490, 'AMK': 490, 'AMY': 490, 'AMI': 366, 'AIS': 366, 'DI': 366, 'AMS': 283, 'AMP': 283}
-            tarif = float(IrParam.get_param(key, fb.get(lk, 490))) if key else 490
+            self.montant = Resolver.price_many(
+                self.acte_type_id, [self.coefficient], self.ifd, self.date_acte, company,
+            )[0]
+            return
+        tarif = Resolver.tarif_lettre_cle(self.lettre_cle, self.date_acte, company)
         montant = round(tarif * (self.coefficient or 0), 0)
         if self.ifd:
-            montant += round(self.ifd * float(IrParam.get_param('cps.supplement.ifd', 250)), 0)
+            montant += round(self.ifd * Resolver.supplement_ifd(self.date_acte, company), 0)
         self.montant = montant
 
+    def _revaloriser_montants(self):
+        """Recalcule le montant des actes au tarif en vigueur à leur date_acte.
+
+        Un seul passage sur le recordset : valorisation groupée par
+        cps.tarif.resolver (index des révisions en mémoire), puis une écriture
+        par montant distinct pour les seuls actes modifiés.
+        Retourne le nombre d'actes dont le montant a changé.
+        """
+        actes = self.filtered('acte_type_id')
+        montants = self.env['cps.tarif.resolver'].price_many(
+            [a.acte_type_id for a in actes],
+            actes.mapped('coefficient'),
+            actes.mapped('ifd'),
+            actes.mapped('date_acte'),
+            [a.company_id.id for a in actes],
+        )
+        par_montant = defaultdict(list)
+        for acte, montant in zip(actes, montants):
+            if acte.montant != montant:
+                par_montant[montant].append(acte.id)
+        for montant, ids in par_montant.items():
+            self.browse(ids).write({'montant': montant})
+        return sum(len(ids) for ids in par_montant.values())
+
     # Ouvre la feuille de soins parente depuis le smart button.
     def action_open_feuille(self):
         self.ensure_one()
@@ -0,0 +1,133 @@
+"""
+Cache des analyses Claude des ordonnances.
+
+Clé : empreinte SHA-256 du contenu envoyé (octets de l'image ou texte
+anonymisé) + modèle Claude + version du prompt. Un même scan re-soumis
+(wizard, job, import en lot, bouton OCR de l'ordonnance) réutilise le JSON
+déjà obtenu sans nouvel appel facturé ; l'accès est tracé dans
+cps.api.usage avec 0 token (colonne « Cache »).
+
+Éviction (cron quotidien) : entrées non lues depuis N jours, puis les moins
+récemment lues tant que la taille totale dépasse le plafond.
+"""
+import hashlib
+import json
+import logging
+
+import psycopg2
+
+from odoo import models, fields, api
+
+_logger = logging.getLogger(__name__)
+
+CACHE_MAX_JOURS = 90
+CACHE_MAX_MO = 50
+
+
+def empreinte(contenu):
+    """SHA-256 hexadécimal d'octets ou d'un texte (UTF-8)."""
+    if isinstance(contenu, str):
+        contenu = contenu.encode('utf-8')
+    return hashlib.sha256(contenu or b'').hexdigest()
+
+
+def version_prompt(*prompts):
+    """Version courte d'un prompt : toute modification invalide le cache."""
+    return empreinte('\x00'.join(prompts))[:12]
+
+
+class CpsOcrCache(models.Model):
+    _name = 'cps.ocr.cache'
+    _description = 'Cache des analyses OCR Claude'
+    _order = 'date_dernier_acces desc, id desc'
+    _rec_name = 'empreinte'
+
+    empreinte = fields.Char(string='Empreinte SHA-256', required=True, readonly=True)
+    model = fields.Char(string='Modèle Claude', required=True, readonly=True)
+    prompt_version = fields.Char(string='Version du prompt', required=True, readonly=True)
+    operation = fields.Selection([
+        ('ocr_texte',  'OCR – Texte'),
+        ('ocr_vision', 'OCR – Vision'),
+    ], string='Opération', required=True, readonly=True)
+    company_id = fields.Many2one(
+        'res.company', string='Société', required=True, readonly=True,
+        default=lambda self: self.env.company, ondelete='cascade',
+    )
+    resultat_json = fields.Text(string='Résultat (JSON)', required=True, readonly=True)
+    taille = fields.Integer(string='Taille (octets)', readonly=True)
+    nb_hits = fields.Integer(string='Réutilisations', readonly=True)
+    date_dernier_acces = fields.Datetime(
+        string='Dernier accès', default=fields.Datetime.now, index=True, readonly=True,
+    )
+
+    _sql_constraints = [
+        ('cle_unique', 'UNIQUE(empreinte, model, prompt_version, company_id)',
+         'Une seule entrée de cache par contenu, modèle et version de prompt.'),
+    ]
+
+    @api.model
+    def lire(self, contenu, model, prompt_version):
+        """JSON mis en cache pour ce contenu (dict), ou None."""
+        entree = self.sudo().search([
+            ('empreinte', '=', empreinte(contenu)),
+            ('model', '=', model),
+            ('prompt_version', '=', prompt_version),
+            ('company_id', '=', self.env.company.id),
+        ], limit=1)
+        if not entree:
+            return None
+        entree.write({
+            'nb_hits': entree.nb_hits + 1,
+            'date_dernier_acces': fields.Datetime.now(),
+        })
+        return json.loads(entree.resultat_json)
+
+    @api.model
+    def ecrire(self, contenu, model, prompt_version, operation, data):
+        """Mémorise le JSON parsé ; sans effet si l'entrée existe déjà (job concurrent)."""
+        resultat = json.dumps(data, default=str)
+        try:
+            with self.env.cr.savepoint():
+                self.sudo().create([{
+                    'empreinte': empreinte(contenu),
+                    'model': model,
+                    'prompt_version': prompt_version,
+                    'operation': operation,
+                    'company_id': self.env.company.id,
+                    'resultat_json': resultat,
+                    'taille': len(resultat.encode('utf-8')),
+                }])
+        except psycopg2.IntegrityError:
+            _logger.debug('Cache OCR : entrée déjà présente pour %s', model)
+
+    # ── Éviction ──────────────────────────────────────────────────────────────
+
+    @api.model
+    def _cron_purger_cache(self):
+        """Supprime les entrées trop anciennes puis les moins récentes au-delà du plafond."""
+        IrParam = self.env['ir.config_parameter'].sudo()
+        max_jours = int(IrParam.get_param('cps.ocr.cache.max_jours', CACHE_MAX_JOURS))
+        max_octets = int(IrParam.get_param('cps.ocr.cache.max_mo', CACHE_MAX_MO)) * 1024 * 1024
+
+        self.flush_model()
+        self.env.cr.execute("""
+            DELETE FROM cps_ocr_cache
+             WHERE date_dernier_acces < (now() at time zone 'UTC') - make_interval(days => %s)
+        """, [max_jours])
+        nb_ages = self.env.cr.rowcount
+        self.env.cr.execute("""
+            DELETE FROM cps_ocr_cache
+             WHERE id IN (
+                SELECT id FROM (
+                    SELECT id, SUM(taille) OVER (
+                        ORDER BY date_dernier_acces DESC, id DESC) AS cumul
+                      FROM cps_ocr_cache
+                ) t
+                 WHERE t.cumul > %s
+             )
+        """, [max_octets])
+        nb_taille = self.env.cr.rowcount
+        self.invalidate_model()
+        if nb_ages or nb_taille:
+            _logger.info('Cache OCR : %d entrées expirées, %d au-delà du plafond',
+                         nb_ages, nb_taille)
@@ -0,0 +1,205 @@
+"""
+File d'attente des analyses OCR d'ordonnances.
+
+Le wizard cps.wizard.ocr.ordonnance ne fait plus l'OCR local ni les appels
+Claude dans la requête HTTP de l'utilisateur : il crée un job et rend la main.
+Le cron « CPS : traitement des analyses OCR » (déclenché immédiatement à la
+création) prend les jobs un par un (FOR UPDATE SKIP LOCKED, plusieurs workers
+possibles), exécute l'analyse puis notifie l'utilisateur par le bus.
+"""
+import base64
+import json
+import logging
+import threading
+from datetime import timedelta
+
+from odoo import models, fields, api, _
+
+_logger = logging.getLogger(__name__)
+
+# Au-delà, un job « En cours » est considéré comme abandonné (worker tué).
+JOB_TIMEOUT_MIN = 15
+JOB_MAX_TENTATIVES = 3
+# Conservation des jobs terminés (le fichier est supprimé avec le job).
+JOB_RETENTION_JOURS = 7
+
+
+class CpsOcrJob(models.Model):
+    _name = 'cps.ocr.job'
+    _description = "Analyse OCR d'ordonnance (file d'attente)"
+    _order = 'create_date desc, id desc'
+
+    name = fields.Char(string='Fichier', compute='_compute_name')
+    state = fields.Selection([
+        ('queued',  'En attente'),
+        ('running', 'En cours'),
+        ('done',    'Terminé'),
+        ('failed',  'Échec'),
+    ], default='queued', required=True, index=True, readonly=True)
+
+    user_id = fields.Many2one(
+        'res.users', string='Demandé par', required=True,
+        default=lambda self: self.env.user, ondelete='cascade',
+    )
+    company_id = fields.Many2one(
+        'res.company', string='Société', required=True, index=True,
+        default=lambda self: self.env.company,
+    )
+    ordonnance_id = fields.Many2one('cps.ordonnance', string='Ordonnance', ondelete='cascade')
+
+    # ── Entrée ────────────────────────────────────────────────────────────────
+    fichier = fields.Binary(string='Fichier', attachment=True)
+    fichier_nom = fields.Char(string='Nom du fichier')
+    texte_source = fields.Text(
+        string='Texte à analyser',
+        help='Ré-analyse Claude (mode texte) d\'un texte déjà extrait : '
+             'pas d\'OCR local.',
+    )
+    patient_prenom = fields.Char(string='Prénom à anonymiser')
+    use_claude_ai = fields.Boolean(string='Claude texte')
+    use_claude_vision = fields.Boolean(string='Claude vision')
+    # Clé saisie dans le wizard uniquement (sinon celle de la configuration,
+    # lue à l'exécution) ; effacée dès la fin du job.
+    claude_api_key = fields.Char(groups='base.group_system')
+
+    # ── Sortie ────────────────────────────────────────────────────────────────
+    resultat_json = fields.Text(string='Résultat (JSON)', readonly=True)
+    error_message = fields.Text(string="Message d'erreur", readonly=True)
+    tentatives = fields.Integer(readonly=True)
+    date_debut = fields.Datetime(string='Début', readonly=True)
+    date_fin = fields.Datetime(string='Fin', readonly=True)
+
+    @api.depends('fichier_nom', 'texte_source')
+    def _compute_name(self):
+        for rec in self:
+            rec.name = rec.fichier_nom or (_('Ré-analyse texte') if rec.texte_source else '/')
+
+    @api.model_create_multi
+    def create(self, vals_list):
+        jobs = super().create(vals_list)
+        self._declencher()
+        return jobs
+
+    @api.model
+    def _declencher(self):
+        """Réveille le cron de traitement sans attendre son prochain passage."""
+        cron = self.env.ref('os_auxiliaire_medical.ir_cron_ocr_jobs', raise_if_not_found=False)
+        if cron:
+            cron.sudo()._trigger()
+
+    def get_resultat(self):
+        """Vals du wizard produites par l'analyse (dict vide si pas terminé)."""
+        self.ensure_one()
+        return json.loads(self.resultat_json or '{}')
+
+    # ── Traitement ────────────────────────────────────────────────────────────
+
+    @api.model
+    def _cron_traiter_jobs(self, limite=20):
+        """Traite au plus `limite` jobs en attente, un commit par job."""
+        auto_commit = not getattr(threading.current_thread(), 'testing', False)
+        self._relancer_jobs_bloques()
+        self._purger_jobs_termines()
+        for _i in range(limite):
+            job = self._prendre_job()
+            if not job:
+                break
+            if auto_commit:
+                self.env.cr.commit()
+            job._executer()
+            if auto_commit:
+                self.env.cr.commit()
+
+    @api.model
+    def _prendre_job(self):
+        """Verrouille le plus ancien job en attente et le passe En cours."""
+        self.flush_model(['state'])
+        self.env.cr.execute("""
+            SELECT id FROM cps_ocr_job
+             WHERE state = 'queued'
+          ORDER BY create_date, id
+             LIMIT 1
+               FOR UPDATE SKIP LOCKED
+        """)
+        row = self.env.cr.fetchone()
+        if not row:
+            return self.browse()
+        job = self.browse(row[0])
+        job.write({
+            'state': 'running',
+            'date_debut': fields.Datetime.now(),
+            'tentatives': job.tentatives + 1,
+        })
+        return job
+
+    def _executer(self):
+        self.ensure_one()
+        try:
+            with self.env.cr.savepoint():
+                resultat = self.with_user(self.user_id).with_company(self.company_id)._analyser()
+        except Exception as e:
+            _logger.warning('Job OCR %s en échec : %s', self.id, e)
+            self.sudo().write({
+                'state': 'failed',
+                'error_message': str(e.args[0] if e.args else e),
+                'date_fin': fields.Datetime.now(),
+                'claude_api_key': False,
+            })
+        else:
+            self.sudo().write({
+                'state': 'done',
+                'resultat_json': json.dumps(resultat, default=str),
+                'error_message': False,
+                'date_fin': fields.Datetime.now(),
+                'claude_api_key': False,
+            })
+        self._notifier()
+
+    def _analyser(self):
+        """
+        Exécute l'analyse du wizard OCR sur un enregistrement en mémoire, avec
+        les droits, la société, le budget et le journal d'usage du demandeur.
+        """
+        wizard = self.env['cps.wizard.ocr.ordonnance'].new({
+            'ordonnance_id': self.ordonnance_id.id,
+            'use_claude_ai': self.use_claude_ai,
+            'use_claude_vision': self.use_claude_vision,
+            'claude_api_key': self.sudo().claude_api_key,
+        })
+        if self.texte_source:
+            return wizard._analyser_texte(self.texte_source, self.patient_prenom or '')
+        return wizard._analyser_fichier(
+            base64.b64decode(self.fichier or b''), (self.fichier_nom or '').lower(),
+        )
+
+    def _notifier(self):
+        """Notification dans le navigateur du demandeur (bus)."""
+        for job in self:
+            if job.state == 'done':
+                message, type_ = _('Analyse OCR terminée : %s') % job.name, 'success'
+            else:
+                message, type_ = _('Analyse OCR en échec : %s') % job.name, 'warning'
+            self.env['bus.bus']._sendone(job.user_id.partner_id, 'simple_notification', {
+                'title': _('OCR ordonnance'),
+                'message': message,
+                'type': type_,
+                'sticky': False,
+            })
+
+    @api.model
+    def _relancer_jobs_bloques(self):
+        limite = fields.Datetime.now() - timedelta(minutes=JOB_TIMEOUT_MIN)
+        bloques = self.search([('state', '=', 'running'), ('date_debut', '<', limite)])
+        bloques.filtered(lambda j: j.tentatives < JOB_MAX_TENTATIVES).write({'state': 'queued'})
+        bloques.filtered(lambda j: j.tentatives >= JOB_MAX_TENTATIVES).sudo().write({
+            'state': 'failed',
+            'error_message': _('Analyse interrompue (%d tentatives).') % JOB_MAX_TENTATIVES,
+            'claude_api_key': False,
+        })
+
+    @api.model
+    def _purger_jobs_termines(self):
+        limite = fields.Datetime.now() - timedelta(days=JOB_RETENTION_JOURS)
+        self.search([
+            ('state', 'in', ['done', 'failed']), ('date_fin', '<', limite),
+        ]).unlink()
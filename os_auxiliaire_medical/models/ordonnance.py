@@ -1,9 +1,25 @@
 from odoo import models, fields, api, _
 from odoo.exceptions import UserError
+from odoo.tools.sql import create_index
 from datetime import timedelta
 
 import base64
-import requests
+import json
+import re
+
+from .anthropic_client import BudgetEpuise, ErreurClaude
+from .ocr_cache import version_prompt
+
+OCR_PROMPT = (
+    "Tu es un assistant médical spécialisé en Polynésie française. "
+    "Extrait de cette ordonnance médicale : "
+    "1. Le nom et prénom du patient. "
+    "2. La date de prescription (format YYYY-MM-DD). "
+    "3. Les actes prescrits avec lettre clé, coefficient et quantité. "
+    "4. Le nom du médecin prescripteur. "
+    "Réponds en JSON structuré uniquement."
+)
+OCR_PROMPT_VERSION = version_prompt(OCR_PROMPT)
 
 
 class CpsOrdonnance(models.Model):
@@ -12,6 +28,14 @@ class CpsOrdonnance(models.Model):
     _order = 'date_prescription desc'
     _inherit = ['mail.thread', 'mail.activity.mixin']
 
+    def init(self):
+        # Domaine des feuilles de soins / de l'optimiseur d'agenda :
+        # has_seances_disponibles = True, le plus souvent pour un patient.
+        create_index(
+            self.env.cr, 'cps_ordonnance_seances_disponibles_idx', self._table,
+            ['patient_id', 'state'], where='has_seances_disponibles',
+        )
+
     name = fields.Char(
         string='Référence', copy=False, readonly=True, default='/',
     )
@@ -43,6 +67,10 @@ class CpsOrdonnance(models.Model):
     date_fin_validite = fields.Date(string='Fin de validité', required=False)
     ordonnance_image = fields.Binary(string="Photo de l'ordonnance", attachment=True)
     ordonnance_filename = fields.Char()
+    ordonnance_miniature = fields.Binary(
+        string='Miniature', attachment=True,
+        compute='_compute_ordonnance_miniature', store=True,
+    )
 
     ligne_ids = fields.One2many(
         'cps.ordonnance.ligne', 'ordonnance_id', string='Lignes', required=True,
@@ -64,14 +92,26 @@ class CpsOrdonnance(models.Model):
         'ligne_ids',
     )
     def _compute_has_seances_disponibles(self):
-        for rec in self:
-            if not rec.ligne_ids:
-                # Ordonnance sans lignes : accessible (nouvellement créée)
-                rec.has_seances_disponibles = True
-            else:
-                rec.has_seances_disponibles = any(
-                    l.nb_seances_theorique_restantes > 0 for l in rec.ligne_ids
-                )
+        # Ordonnances enregistrées : un comptage SQL pour tout le lot.
+        enregistrees = self.filtered('id')
+        stats = {}
+        if enregistrees:
+            groupes = self.env['cps.ordonnance.ligne']._read_group(
+                [('ordonnance_id', 'in', enregistrees.ids)],
+                ['ordonnance_id'],
+                ['__count', 'nb_seances_theorique_restantes:max'],
+            )
+            stats = {ordonnance.id: (nb, restantes or 0)
+                     for ordonnance, nb, restantes in groupes}
+        for rec in enregistrees:
+            nb, restantes = stats.get(rec.id, (0, 0))
+            # Ordonnance sans lignes : accessible (nouvellement créée)
+            rec.has_seances_disponibles = not nb or restantes > 0
+        # Formulaire en cours d'édition (onchange) : lignes en mémoire.
+        for rec in self - enregistrees:
+            rec.has_seances_disponibles = not rec.ligne_ids or any(
+                l.nb_seances_theorique_restantes > 0 for l in rec.ligne_ids
+            )
 
     # ── Profession du praticien : champ plat pour les contextes de vue XML ────
     praticien_profession = fields.Char(
@@ -98,6 +138,13 @@ class CpsOrdonnance(models.Model):
             else:
                 rec.praticien_profession = ''
 
+    @api.depends('ordonnance_image')
+    def _compute_ordonnance_miniature(self):
+        from ..wizards.ocr_image import miniature_webp
+        for rec in self.with_context(bin_size=False):
+            miniature = rec.ordonnance_image and miniature_webp(base64.b64decode(rec.ordonnance_image))
+            rec.ordonnance_miniature = miniature and base64.b64encode(miniature)
+
     def _default_praticien(self):
         return self.env.user.partner_id.filtered(
             lambda p: 'Praticien CPS' in p.category_id.mapped('name')
@@ -156,25 +203,33 @@ class CpsOrdonnance(models.Model):
         if not self.ordonnance_image:
             raise UserError(_("Veuillez d'abord charger une photo de l'ordonnance."))
 
-        IrParam = self.env['ir.config_parameter'].sudo()
-        api_key = IrParam.get_param('cps.anthropic.api.key', '')
-        if not api_key:
+        config = self.env['cps.anthropic.client']._config()
+        if not config['api_key']:
             raise UserError(_(
                 "Clé API Anthropic non configurée. "
                 "Allez dans Paramètres CPS → Configuration."
             ))
-        model = IrParam.get_param(
-            'cps.claude.model', 'claude-haiku-4-5-20251001'
-        )
+        model = config['model']
+
+        img_bytes = base64.b64decode(self.ordonnance_image)
+        media_type = None
+        options = self.env['cps.wizard.ocr.ordonnance']._get_options_vision()
+        if options is not None:
+            from ..wizards.ocr_image import preparer_image
+            img_bytes, media_type, _infos = preparer_image(img_bytes, options)
+
+        # Même image déjà analysée : pas de nouvel appel facturé.
+        Cache = self.env['cps.ocr.cache']
+        data = Cache.lire(img_bytes, model, OCR_PROMPT_VERSION)
+        if data is not None:
+            self.env['cps.api.usage'].log_usage(
+                model=model, operation='ocr_vision', ordonnance_id=self.id, cache_hit=True,
+            )
+            return self._appliquer_ocr(data)
 
-        img_data = self.ordonnance_image
-        img_bytes = base64.b64decode(img_data)
-        if img_bytes[:3] == b'\xff\xd8\xff':
-            media_type = 'image/jpeg'
-        elif img_bytes[:8] == b'\x89PNG\r\n\x1a\n':
-            media_type = 'image/png'
-        else:
-            media_type = 'image/jpeg'
+        if not media_type:
+            media_type = ('image/png' if img_bytes[:8] == b'\x89PNG\r\n\x1a\n'
+                          else 'image/jpeg')
 
         payload = {
             "model": model,
@@ -187,68 +242,64 @@ class CpsOrdonnance(models.Model):
                         "source": {
                             "type": "base64",
                             "media_type": media_type,
-                            "data": img_data if isinstance(img_data, str)
-                            else img_data.decode(),
+                            "data": base64.b64encode(img_bytes).decode(),
                         },
                     },
-                    {
-                        "type": "text",
-                        "text": (
-                            "Tu es un assistant médical spécialisé en Polynésie française. "
-                            "Extrait de cette ordonnance médicale : "
-                            "1. Le nom et prénom du patient. "
-                            "2. La date de prescription (format YYYY-MM-DD). "
-                            "3. Les actes prescrits avec lettre clé, coefficient et quantité. "
-                            "4. Le nom du médecin prescripteur. "
-                            "Réponds en JSON structuré uniquement."
-                        ),
-                    },
+                    {"type": "text", "text": OCR_PROMPT},
                 ],
             }],
         }
 
         try:
-            resp = requests.post(
-                'https://api.anthropic.com/v1/messages',
-                headers={
-                    'x-api-key': api_key,
-                    'anthropic-version': '2023-06-01',
-                    'content-type': 'application/json',
-                },
-                json=payload,
-                timeout=30,
-            )
-            resp.raise_for_status()
-            body = resp.json()
+            body = self.env['cps.anthropic.client'].messages(
+                payload, 'ocr_vision', ordonnance_id=self.id)
+        except BudgetEpuise:
+            return self._ocr_local(img_bytes)
+        except ErreurClaude as e:
+            raise UserError(_("Erreur API Anthropic : %s") % str(e))
 
-            usage = body.get('usage', {})
-            self.env['cps.api.usage'].log_usage(
-                model=model,
-                operation='ocr_vision',
-                input_tokens=usage.get('input_tokens', 0),
-                output_tokens=usage.get('output_tokens', 0),
-                ordonnance_id=self.id,
-            )
+        texte = ''.join(
+            b.get('text', '') for b in body.get('content', [])
+            if b.get('type') == 'text'
+        )
+        data = self._extraire_json_ocr(texte)
+        Cache.ecrire(img_bytes, model, OCR_PROMPT_VERSION, 'ocr_vision', data)
+        return self._appliquer_ocr(data)
 
-            texte = ''.join(
-                b.get('text', '') for b in body.get('content', [])
-                if b.get('type') == 'text'
-            )
-            return self._parse_ocr_response(texte)
+    def _ocr_local(self, img_bytes):
+        """Repli sans Claude (budget épuisé) : tesseract + parser local."""
+        from ..wizards.ocr_parser import parse_ordonnance_text
+        from ..wizards.wizard_ocr_ordonnance import _extract_text_image
 
-        except requests.RequestException as e:
-            self.env['cps.api.usage'].log_usage(
-                model=model,
-                operation='ocr_vision',
-                success=False,
-                error_message=str(e),
-                ordonnance_id=self.id,
-            )
-            raise UserError(_("Erreur API Anthropic : %s") % str(e))
+        texte = _extract_text_image(img_bytes)
+        if not texte.strip():
+            raise UserError(_(
+                "Budget mensuel Claude épuisé et OCR local indisponible.\n"
+                "Installez pytesseract, Pillow et tesseract-ocr-fra."
+            ))
+        parsed = parse_ordonnance_text(texte)
+        date = parsed['date_prescription']
+        action = self._appliquer_ocr({
+            'patient': {'nom': parsed['patient_nom'], 'prenom': parsed['patient_prenom']},
+            'date_prescription': date.isoformat() if date else None,
+            'actes': parsed['actes'],
+        })
+        action['params'].update({
+            'title': _('OCR local'),
+            'message': _(
+                'Budget mensuel Claude épuisé : ordonnance analysée par OCR local '
+                '(tesseract). Vérifiez les informations extraites.'
+            ),
+            'type': 'warning',
+        })
+        return action
 
     def _parse_ocr_response(self, texte):
         """Parse la réponse JSON de l'OCR et pré-remplit les champs."""
-        import json, re
+        return self._appliquer_ocr(self._extraire_json_ocr(texte))
+
+    def _extraire_json_ocr(self, texte):
+        """Objet JSON contenu dans la réponse de l'IA (UserError sinon)."""
         match = re.search(r'\{.*\}', texte, re.DOTALL)
         if not match:
             raise UserError(_(
@@ -258,7 +309,10 @@ class CpsOrdonnance(models.Model):
             data = json.loads(match.group())
         except json.JSONDecodeError as e:
             raise UserError(_("JSON invalide : %s") % str(e))
+        return data
 
+    def _appliquer_ocr(self, data):
+        """Pré-remplit l'ordonnance depuis le JSON de l'OCR."""
         vals = {}
         if data.get('patient'):
             p = data['patient']
@@ -283,8 +337,7 @@ class CpsOrdonnance(models.Model):
             self.write(vals)
 
         if data.get('actes'):
-            for acte_data in data['actes']:
-                self._create_ligne_from_ocr(acte_data)
+            self._create_lignes_from_ocr([data['actes']])
 
         return {
             'type': 'ir.actions.client',
@@ -300,25 +353,40 @@ class CpsOrdonnance(models.Model):
 
     def _create_ligne_from_ocr(self, acte_data):
         """Crée une ligne d'ordonnance depuis les données OCR."""
-        lettre_cle = acte_data.get('lettre_cle', '')
-        coefficient = acte_data.get('coefficient', 0)
-        quantite = acte_data.get('quantite', 1)
-
-        acte_type = self.env['cps.acte.type'].search([
-            ('lettre_cle', '=', lettre_cle),
-            ('coefficient_defaut', '=', float(coefficient)),
-        ], limit=1)
-
-        if acte_type:
-            quantite = acte_type.nb_seances_defaut or quantite or 1
-
-        self.env['cps.ordonnance.ligne'].create({
-            'ordonnance_id': self.id,
-            'acte_type_id': acte_type.id if acte_type else False,
-            'lettre_cle': lettre_cle,
-            'coefficient': float(coefficient or 0),
-            'nb_seances': quantite,
-        })
+        return self._create_lignes_from_ocr([[acte_data]])
+
+    def _create_lignes_from_ocr(self, actes_par_ordonnance):
+        """
+        Version groupée de _create_ligne_from_ocr : actes_par_ordonnance est
+        aligné sur self (une liste d'actes OCR par ordonnance). Une recherche
+        des types d'actes et un create pour tout le lot.
+        """
+        paires = [
+            (ordonnance, acte_data)
+            for ordonnance, actes in zip(self, actes_par_ordonnance)
+            for acte_data in actes
+        ]
+        lettres = {acte_data.get('lettre_cle', '') for _o, acte_data in paires}
+        acte_types = {}
+        for at in self.env['cps.acte.type'].search([('lettre_cle', 'in', list(lettres))]):
+            acte_types.setdefault((at.lettre_cle, at.coefficient_defaut), at)
+
+        vals_list = []
+        for ordonnance, acte_data in paires:
+            lettre_cle = acte_data.get('lettre_cle', '')
+            coefficient = float(acte_data.get('coefficient') or 0)
+            quantite = acte_data.get('quantite') or acte_data.get('nb_seances') or 1
+            acte_type = acte_types.get((lettre_cle, coefficient))
+            if acte_type:
+                quantite = acte_type.nb_seances_defaut or quantite or 1
+            vals_list.append({
+                'ordonnance_id': ordonnance.id,
+                'acte_type_id': acte_type.id if acte_type else False,
+                'lettre_cle': lettre_cle,
+                'coefficient': coefficient,
+                'nb_seances': quantite,
+            })
+        return self.env['cps.ordonnance.ligne'].create(vals_list)
 
 
 class CpsOrdonnanceLigne(models.Model):
@@ -445,17 +513,33 @@ class CpsOrdonnanceLigne(models.Model):
         'acte_feuille_ids.state_seance',
     )
     def _compute_seances_stats(self):
-        for rec in self:
-            planifiees = len(
-                rec.acte_feuille_ids.filtered(lambda a: a.state_seance == 'planifiee')
-            )
-            rec.nb_seances_planifiees = planifiees
-            rec.nb_seances_theorique_restantes = max(
-                0,
-                (rec.nb_seances or 0)
-                - (rec.nb_seances_realises or 0)
-                - planifiees,
+        # Lignes enregistrées : un comptage SQL des séances planifiées pour tout
+        # le lot, sans charger les actes (index partiel, voir CpsActe.init).
+        enregistrees = self.filtered('id')
+        planifiees = {}
+        if enregistrees:
+            groupes = self.env['cps.feuille.soins.acte']._read_group(
+                [('ordonnance_ligne_id', 'in', enregistrees.ids),
+                 ('state_seance', '=', 'planifiee')],
+                ['ordonnance_ligne_id'],
+                ['__count'],
             )
+            planifiees = {ligne.id: nb for ligne, nb in groupes}
+        for rec in enregistrees:
+            rec._set_seances_stats(planifiees.get(rec.id, 0))
+        # Formulaire en cours d'édition (onchange) : actes en mémoire.
+        for rec in self - enregistrees:
+            rec._set_seances_stats(len(
+                rec.acte_feuille_ids.filtered(lambda a: a.state_seance == 'planifiee')))
+
+    def _set_seances_stats(self, planifiees):
+        self.nb_seances_planifiees = planifiees
+        self.nb_seances_theorique_restantes = max(
+            0,
+            (self.nb_seances or 0)
+            - (self.nb_seances_realises or 0)
+            - planifiees,
+        )
 
     @api.constrains('nb_seances', 'nb_seances_max')
     def _check_nb_seances(self):
@@ -1,5 +1,7 @@
 from odoo import models, fields, api, _
 
+from .tarif_resolver import LETTRE_CLE_PARAMS, _famille
+
 
 class CpsTarifHistorique(models.Model):
     _name = 'cps.tarif.historique'
@@ -59,6 +61,24 @@ class CpsTarifHistorique(models.Model):
             elif not rec.name:
                 rec.name = ''
 
+    # ── CRUD : invalidation du cache de cps.tarif.resolver ──────────────────
+
+    @api.model_create_multi
+    def create(self, vals_list):
+        records = super().create(vals_list)
+        self.env.registry.clear_cache()
+        return records
+
+    def write(self, vals):
+        res = super().write(vals)
+        self.env.registry.clear_cache()
+        return res
+
+    def unlink(self):
+        res = super().unlink()
+        self.env.registry.clear_cache()
+        return res
+
     # ── Actions ──────────────────────────────────────────────────────────────
 
     def action_appliquer_tarif(self):
@@ -78,14 +98,8 @@ class CpsTarifHistorique(models.Model):
         actes.write({'tarif_unitaire': self.tarif_unitaire})
 
         # --- Paramètre de configuration ---
-        config_map = {
-            'AMO': 'cps.tarif.amo', 'AMK': 'cps.tarif.amo',
-            'AMY': 'cps.tarif.amy',
-            'AMI': 'cps.tarif.ami', 'AIS': 'cps.tarif.ami', 'DI': 'cps.tarif.ami',
-            'AMS': 'cps.tarif.ams', 'AMP': 'cps.tarif.ams',
-        }
-        if lk in config_map:
-            IrParam.set_param(config_map[lk], str(self.tarif_unitaire))
+        if lk in LETTRE_CLE_PARAMS:
+            IrParam.set_param(LETTRE_CLE_PARAMS[lk], str(self.tarif_unitaire))
 
         # --- Suppléments optionnels ---
         if self.supplement_ifd:
@@ -106,3 +120,33 @@ class CpsTarifHistorique(models.Model):
                 'sticky': False,
             },
         }
+
+    def action_revaloriser_actes(self):
+        """
+        Revalorise, au tarif en vigueur à leur date, les actes des feuilles
+        non encore soumises concernés par cette révision (même société, même
+        famille de lettre clé, date_acte ≥ date d'application).
+        """
+        self.ensure_one()
+        famille = _famille(self.lettre_cle)
+        lettres = [lk for lk, param in LETTRE_CLE_PARAMS.items() if param == famille]
+        domain = [
+            ('company_id', '=', self.company_id.id),
+            ('feuille_id.state', 'in', ('draft', 'confirmed')),
+            ('date_acte', '>=', self.date_application),
+        ]
+        if not (self.supplement_ifd or self.supplement_ifn):
+            domain.append(('acte_type_id.lettre_cle', 'in', lettres or [self.lettre_cle.upper()]))
+        actes = self.env['cps.feuille.soins.acte'].search(domain)
+        count = actes._revaloriser_montants()
+        return {
+            'type': 'ir.actions.client',
+            'tag': 'display_notification',
+            'params': {
+                'title': _('Actes revalorisés'),
+                'message': _('%d acte(s) sur %d revalorisé(s) depuis le %s.') % (
+                    count, len(actes), self.date_application.strftime('%d/%m/%Y')),
+                'type': 'success',
+                'sticky': False,
+            },
+        }
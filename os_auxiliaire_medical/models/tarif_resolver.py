@@ -0,0 +1,204 @@
+from bisect import bisect_right
+
+from odoo import models, api, tools
+
+# Lettre clé → paramètre de configuration portant sa valeur en F XPF.
+LETTRE_CLE_PARAMS = {
+    'AMO': 'cps.tarif.amo', 'AMK': 'cps.tarif.amo',
+    'AMY': 'cps.tarif.amy',
+    'AMI': 'cps.tarif.ami', 'AIS': 'cps.tarif.ami', 'DI': 'cps.tarif.ami',
+    'AMS': 'cps.tarif.ams', 'AMP': 'cps.tarif.ams',
+}
+# Valeurs par défaut quand le paramètre n'a jamais été enregistré.
+TARIF_DEFAUTS = {
+    'cps.tarif.amo': 490,
+    'cps.tarif.amy': 490,
+    'cps.tarif.ami': 366,
+    'cps.tarif.ams': 283,
+}
+TARIF_DEFAUT = 490
+SUPPLEMENT_DEFAUT = 250
+PARAM_IFD = 'cps.supplement.ifd'
+PARAM_IFN = 'cps.supplement.ifn'
+
+
+def _famille(lettre_cle):
+    """Clé d'index d'une lettre clé : son paramètre (AMO et AMK partagent cps.tarif.amo)."""
+    lk = (lettre_cle or '').upper()
+    return LETTRE_CLE_PARAMS.get(lk, lk)
+
+
+def _aligner(valeur, n):
+    """Valeur commune ou liste alignée → liste de n éléments."""
+    if isinstance(valeur, (list, tuple)):
+        return list(valeur)
+    return [valeur] * n
+
+
+class CpsTarifResolver(models.AbstractModel):
+    """Point d'entrée unique pour la valorisation des actes CPS.
+
+    Les tarifs des lettres clés et les suppléments IFD/IFN sont lus une fois
+    puis conservés dans l'ormcache du registre. Le cache est vidé par
+    ir.config_parameter (set_param) et par toute modification de
+    cps.tarif.historique.
+
+    Pour un acte daté, la valeur retenue est celle de la dernière révision
+    de cps.tarif.historique applicable à cette date (par société) ; à
+    défaut, la valeur de la configuration.
+    """
+    _name = 'cps.tarif.resolver'
+    _description = 'Résolution des tarifs CPS'
+
+    @api.model
+    @tools.ormcache()
+    def _get_parametres(self):
+        """Paramètres tarifaires en vigueur (dict partagé : ne pas modifier).
+
+        tarifs : {paramètre: valeur ou None si jamais enregistré}
+        """
+        IrParam = self.env['ir.config_parameter'].sudo()
+        tarifs = {}
+        for param in set(LETTRE_CLE_PARAMS.values()):
+            valeur = IrParam.get_param(param)
+            tarifs[param] = float(valeur) if valeur else None
+        return {
+            'tarifs': tarifs,
+            'ifd': float(IrParam.get_param(PARAM_IFD, SUPPLEMENT_DEFAUT)),
+            'ifn': float(IrParam.get_param(PARAM_IFN, SUPPLEMENT_DEFAUT)),
+        }
+
+    @api.model
+    @tools.ormcache()
+    def _get_index_historique(self):
+        """Index des révisions tarifaires (dict partagé : ne pas modifier).
+
+        {(company_id, famille): (dates, valeurs)} — listes parallèles triées
+        par date_application, interrogées par bisect. Les suppléments sont
+        indexés sous les familles PARAM_IFD / PARAM_IFN (0 = inchangé).
+        """
+        rows = self.env['cps.tarif.historique'].sudo().search_read(
+            [],
+            ['company_id', 'lettre_cle', 'date_application',
+             'tarif_unitaire', 'supplement_ifd', 'supplement_ifn'],
+            order='date_application, id', load=None,
+        )
+        index = {}
+        for row in rows:
+            for famille, valeur in (
+                (_famille(row['lettre_cle']), row['tarif_unitaire']),
+                (PARAM_IFD, row['supplement_ifd']),
+                (PARAM_IFN, row['supplement_ifn']),
+            ):
+                if not valeur:
+                    continue
+                dates, valeurs = index.setdefault((row['company_id'], famille), ([], []))
+                if dates and dates[-1] == row['date_application']:
+                    # Même date d'application : la dernière saisie l'emporte.
+                    valeurs[-1] = valeur
+                else:
+                    dates.append(row['date_application'])
+                    valeurs.append(valeur)
+        return index
+
+    @api.model
+    def _valeur_historique(self, company_id, famille, date):
+        """Valeur en vigueur à ``date`` selon l'historique, ou None."""
+        if not date:
+            return None
+        entree = self._get_index_historique().get((company_id, famille))
+        if not entree:
+            return None
+        dates, valeurs = entree
+        pos = bisect_right(dates, date)
+        return valeurs[pos - 1] if pos else None
+
+    @api.model
+    def _company_id(self, company):
+        if not company:
+            return self.env.company.id
+        return company if isinstance(company, int) else company.id
+
+    # ── Accès unitaires ───────────────────────────────────────────────────────
+
+    @api.model
+    def tarif_lettre_cle(self, lettre_cle, date=None, company=None):
+        """Valeur (F XPF) d'une lettre clé, sans type d'acte de référence."""
+        historique = self._valeur_historique(
+            self._company_id(company), _famille(lettre_cle), date)
+        if historique is not None:
+            return historique
+        param = LETTRE_CLE_PARAMS.get((lettre_cle or '').upper())
+        if not param:
+            return TARIF_DEFAUT
+        tarif = self._get_parametres()['tarifs'][param]
+        return tarif if tarif is not None else TARIF_DEFAUTS[param]
+
+    @api.model
+    def tarif_acte_type(self, acte_type, date=None, company=None):
+        """Valeur (F XPF) de la lettre clé d'un type d'acte.
+
+        Repli sur le tarif du catalogue si la lettre clé n'a ni révision
+        datée ni paramètre.
+        """
+        historique = self._valeur_historique(
+            self._company_id(company), _famille(acte_type.lettre_cle), date)
+        if historique is not None:
+            return historique
+        fallback = acte_type.tarif_unitaire or TARIF_DEFAUT
+        param = LETTRE_CLE_PARAMS.get((acte_type.lettre_cle or '').upper())
+        if not param:
+            return fallback
+        tarif = self._get_parametres()['tarifs'][param]
+        return tarif if tarif is not None else fallback
+
+    @api.model
+    def supplement_ifd(self, date=None, company=None):
+        historique = self._valeur_historique(self._company_id(company), PARAM_IFD, date)
+        return historique if historique is not None else self._get_parametres()['ifd']
+
+    @api.model
+    def supplement_ifn(self, date=None, company=None):
+        historique = self._valeur_historique(self._company_id(company), PARAM_IFN, date)
+        return historique if historique is not None else self._get_parametres()['ifn']
+
+    # ── Valorisation groupée ──────────────────────────────────────────────────
+
+    @api.model
+    def price_many(self, acte_types, coefficients=None, ifd=None, date=None, company=None):
+        """Montants (F XPF) d'une série d'actes, sans requête par acte.
+
+        acte_types   : itérable de cps.acte.type, un par acte (répétitions permises)
+        coefficients : coefficients alignés sur acte_types (None → coefficient par défaut)
+        ifd          : unités IFD par acte, liste alignée ou valeur commune
+        date         : date des actes, liste alignée ou valeur commune
+                       (None → valeurs de la configuration)
+        company      : société(s) des actes, liste alignée ou valeur commune
+                       (enregistrement ou id ; None → société courante)
+        """
+        acte_types = list(acte_types)
+        n = len(acte_types)
+        if coefficients is None:
+            coefficients = [at.coefficient_defaut for at in acte_types]
+        ifd = _aligner(ifd, n)
+        dates = _aligner(date, n)
+        company_ids = [self._company_id(c) for c in _aligner(company, n)]
+        return [
+            self._montant(at, coefficient, nb_ifd, d, company_id)
+            for at, coefficient, nb_ifd, d, company_id
+            in zip(acte_types, coefficients, ifd, dates, company_ids)
+        ]
+
+    @api.model
+    def _montant(self, acte_type, coefficient, nb_ifd, date, company_id):
+        if not acte_type:
+            return 0.0
+        if acte_type.type_supplement == 'ifn':
+            return self.supplement_ifn(date, company_id)
+        if acte_type.type_supplement == 'ifd':
+            return round((nb_ifd or 0) * self.supplement_ifd(date, company_id), 0)
+        tarif = self.tarif_acte_type(acte_type, date, company_id)
+        montant = round(tarif * (coefficient or 0), 0)
+        if nb_ifd:
+            montant += round(nb_ifd * self.supplement_ifd(date, company_id), 0)
+        return montant
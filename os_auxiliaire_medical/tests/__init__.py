@@ -1,4 +1,18 @@
 from . import test_acte_type
 from . import test_ordonnance
 from . import test_feuille_soins
+from . import test_agenda_flux
 from . import test_bordereau
+from . import test_fsa25_pdf
+from . import test_tarif_resolver
+from . import test_agenda_optimiseur
+from . import test_anthropic_client
+from . import test_api_budget
+from . import test_api_usage
+from . import test_ocr_job
+from . import test_ocr_cache
+from . import test_ocr_image
+from . import test_ocr_local
+from . import test_ocr_parser
+from . import test_migrations
+from . import test_performance
@@ -0,0 +1,80 @@
+"""
+Serveur HTTP local imitant l'endpoint Anthropic POST /v1/messages.
+
+Utilisé par les tests OCR (paramètre cps.anthropic.api.url) : aucune
+requête ne sort de la machine et aucun token n'est facturé.
+"""
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class AnthropicStub:
+    """
+    with AnthropicStub(reponse={...}) as stub:
+        ... stub.url, stub.requetes
+    reponse : objet JSON renvoyé comme texte par Claude
+    status  : code HTTP renvoyé (erreur simulée si ≠ 200) ; une liste donne
+              le code de chaque requête successive, le dernier est répété
+    delai   : latence simulée par appel (secondes)
+    """
+
+    def __init__(self, reponse=None, status=200, delai=0.0, usage=(120, 40)):
+        self.reponse = reponse or {}
+        self.status = status if isinstance(status, list) else [status]
+        self.delai = delai
+        self.usage = usage
+        self.requetes = []
+        self._verrou = threading.Lock()
+
+    def __enter__(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            # Keep-alive : une connexion réutilisée par le client garde le même port.
+            protocol_version = 'HTTP/1.1'
+
+            def do_POST(self):
+                longueur = int(self.headers.get('Content-Length') or 0)
+                corps = json.loads(self.rfile.read(longueur) or b'{}')
+                with stub._verrou:
+                    stub.requetes.append({
+                        'path': self.path,
+                        'headers': {k.lower(): v for k, v in self.headers.items()},
+                        'body': corps,
+                        'port_client': self.client_address[1],
+                    })
+                    status = stub.status[min(len(stub.requetes), len(stub.status)) - 1]
+                if stub.delai:
+                    time.sleep(stub.delai)
+                if status != 200:
+                    data = {'type': 'error', 'error': {'type': 'api_error', 'message': 'stub'}}
+                else:
+                    data = {
+                        'type': 'message',
+                        'role': 'assistant',
+                        'content': [{'type': 'text', 'text': json.dumps(stub.reponse)}],
+                        'usage': {'input_tokens': stub.usage[0],
+                                  'output_tokens': stub.usage[1]},
+                    }
+                payload = json.dumps(data).encode()
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def log_message(self, *args):
+                pass
+
+        self._serveur = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self._thread = threading.Thread(target=self._serveur.serve_forever, daemon=True)
+        self._thread.start()
+        self.url = 'http://127.0.0.1:%d' % self._serveur.server_address[1]
+        return self
+
+    def __exit__(self, *exc):
+        self._serveur.shutdown()
+        self._serveur.server_close()
+        self._thread.join()
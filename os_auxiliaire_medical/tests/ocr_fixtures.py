@@ -0,0 +1,276 @@
+"""
+Jeu d'ordonnances synthétiques pour les tests et bancs OCR.
+
+Les photos sont générées (Pillow) plutôt que versionnées : format de
+téléphone (12 Mpx), fond légèrement teinté, marges, inclinaison et
+orientation EXIF au choix. TEXTES : corpus de textes OCR pour le parser
+local.
+"""
+import io
+
+ORDONNANCES = [
+    {
+        'lignes': [
+            'Docteur MARTIN',
+            'Code prescripteur : AB1234',
+            'Papeete, le 02/03/2026',
+            'Patient : DUPONT Alice',
+            'AMO 10 x 12 séances',
+        ],
+        'angle': 0,
+        'attendu': {'date_prescription': '2026-03-02',
+                    'actes': [('AMO', 10.0, 12)]},
+    },
+    {
+        'lignes': [
+            'Dr TEHEI',
+            'Le 15/01/2026',
+            'Mme TAPUTU Hina',
+            'AMK 7.5 x 20 séances',
+            'AMI 3 x 10',
+        ],
+        'angle': -3,
+        'attendu': {'date_prescription': '2026-01-15',
+                    'actes': [('AMK', 7.5, 20), ('AMI', 3.0, 10)]},
+    },
+    {
+        'lignes': [
+            'Docteur LEROY',
+            '28 février 2026',
+            'Patient : TEIVA Marc',
+            'AMS 9.5 x 15 séances',
+        ],
+        'angle': 2.5,
+        'attendu': {'date_prescription': '2026-02-28',
+                    'actes': [('AMS', 9.5, 15)]},
+    },
+]
+
+
+def _police(taille):
+    from PIL import ImageFont
+    for nom in ('DejaVuSans.ttf', 'LiberationSans-Regular.ttf', 'Arial.ttf'):
+        try:
+            return ImageFont.truetype(nom, taille)
+        except OSError:
+            continue
+    try:
+        return ImageFont.load_default(size=taille)
+    except TypeError:
+        return ImageFont.load_default()
+
+
+def photo_ordonnance(lignes, angle=0, taille=(3024, 4032), orientation_exif=None,
+                     qualite=92):
+    """Octets JPEG d'une « photo » d'ordonnance portant les lignes données."""
+    from PIL import Image, ImageDraw
+
+    fond = (238, 236, 228)
+    photo = Image.new('RGB', taille, fond)
+    page = Image.new('RGB', (int(taille[0] * 0.7), int(taille[1] * 0.7)), (252, 252, 250))
+    dessin = ImageDraw.Draw(page)
+    police = _police(int(page.width / 22))
+    y = int(page.height * 0.08)
+    for ligne in lignes:
+        dessin.text((int(page.width * 0.08), y), ligne, fill=(25, 25, 35), font=police)
+        y += int(police.size * 1.8) if hasattr(police, 'size') else 40
+    page = page.rotate(angle, expand=True, fillcolor=fond)
+    photo.paste(page, ((taille[0] - page.width) // 2, (taille[1] - page.height) // 2))
+
+    exif = None
+    if orientation_exif:
+        # Pixels enregistrés « couchés », l'EXIF indique comment les redresser.
+        photo = photo.rotate(90, expand=True)
+        exif = Image.Exif()
+        exif[0x0112] = orientation_exif
+    sortie = io.BytesIO()
+    photo.save(sortie, format='JPEG', quality=qualite, **({'exif': exif} if exif else {}))
+    return sortie.getvalue()
+
+
+# ── Textes OCR ────────────────────────────────────────────────────────────────
+# Corpus anonymisé (noms, codes et adresses fictifs) reprenant les défauts
+# rencontrés en sortie de tesseract / pdfminer : en-têtes de cabinet, lignes
+# vides, date de naissance, code postal, majuscules, coefficient à virgule.
+# `attendu` : valeurs exactes attendues du parser local (dates ISO, actes en
+# tuples (lettre-clé, coefficient, séances)).
+
+TEXTES = [
+    {
+        'texte': (
+            'Docteur MARTIN\n'
+            'Code prescripteur : AB1234\n'
+            'Papeete, le 02/03/2026\n'
+            'Patient : DUPONT Alice\n'
+            'AMO 10 x 12 séances\n'
+        ),
+        'attendu': {
+            'prescripteur_nom': 'MARTIN', 'prescripteur_code': 'AB1234',
+            'date_prescription': '2026-03-02', 'patient_nom': 'DUPONT',
+            'patient_prenom': 'Alice', 'actes': [('AMO', 10.0, 12)],
+        },
+    },
+    {
+        'texte': (
+            'Dr TEHEI\n'
+            'Le 15/01/2026\n'
+            'Mme TAPUTU Hina\n'
+            'AMK 7.5 x 20 séances\n'
+            'AMI 3 x 10\n'
+        ),
+        'attendu': {
+            'prescripteur_nom': 'TEHEI', 'prescripteur_code': '',
+            'date_prescription': '2026-01-15', 'patient_nom': 'TAPUTU',
+            'patient_prenom': 'Hina', 'actes': [('AMK', 7.5, 20), ('AMI', 3.0, 10)],
+        },
+    },
+    {
+        'texte': (
+            'Docteur LEROY\n'
+            '28 février 2026\n'
+            'Patient : TEIVA Marc\n'
+            'AMS 9.5 x 15 séances\n'
+        ),
+        'attendu': {
+            'prescripteur_nom': 'LEROY', 'prescripteur_code': '',
+            'date_prescription': '2026-02-28', 'patient_nom': 'TEIVA',
+            'patient_prenom': 'Marc', 'actes': [('AMS', 9.5, 15)],
+        },
+    },
+    {
+        'texte': (
+            'CABINET MEDICAL DE PUNAAUIA\n'
+            'Dr. Paul ROCHE - Médecine générale\n'
+            'BP 1234 - Code postal 98718 Punaauia\n'
+            'N° RPPS : 10100123456\n'
+            '\n'
+            'Punaauia, le 1er avril 2026\n'
+            '\n'
+            'Mme TEMAURI Vaea\n'
+            'née le 12/05/1961\n'
+            '\n'
+            'Kinésithérapie : AMK 8,5 x 15 séances\n'
+            'A domicile\n'
+        ),
+        'attendu': {
+            'prescripteur_nom': 'Paul ROCHE', 'prescripteur_code': '10100123456',
+            'date_prescription': '2026-04-01', 'patient_nom': 'TEMAURI',
+            'patient_prenom': 'Vaea', 'actes': [('AMK', 8.5, 15)],
+        },
+    },
+    {
+        'texte': (
+            '   DOCTEUR FAURE\n'
+            'ORDONNANCE\n'
+            'PAPEETE LE 03-11-25\n'
+            'POUR MME LE BRIS ANNE\n'
+            'SOINS INFIRMIERS AMI 4 X 30\n'
+            'AIS 3 X 30\n'
+        ),
+        'attendu': {
+            'prescripteur_nom': 'FAURE', 'prescripteur_code': '',
+            'date_prescription': '2025-11-03', 'patient_nom': 'LE',
+            'patient_prenom': 'Bris Anne', 'actes': [('AMI', 4.0, 30), ('AIS', 3.0, 30)],
+        },
+    },
+    {
+        'texte': (
+            'Dr Hiro TAMATA\n'
+            'n° AM 7742PF\n'
+            'Faaa, le 20.02.2026\n'
+            'Patiente : LE BRIS Anne-Marie\n'
+            'Rééducation du genou droit\n'
+            'AMK 7.5 - 12 séances\n'
+        ),
+        'attendu': {
+            'prescripteur_nom': 'Hiro TAMATA', 'prescripteur_code': '7742PF',
+            'date_prescription': '2026-02-20', 'patient_nom': 'LE BRIS',
+            'patient_prenom': 'Anne-Marie', 'actes': [('AMK', 7.5, 12)],
+        },
+    },
+    {
+        'texte': (
+            'Docteur VIDAL\n'
+            'Cabinet du Centre\n'
+            'Papeete\n'
+            'TERIITEHAU MOANA\n'
+            'Le 05/06/2026\n'
+            'Orthophonie\n'
+            'AMO 12\n'
+            'Bilan puis rééducation\n'
+        ),
+        'attendu': {
+            'prescripteur_nom': 'VIDAL', 'prescripteur_code': '',
+            'date_prescription': '2026-06-05', 'patient_nom': 'TERIITEHAU',
+            'patient_prenom': 'Moana', 'actes': [('AMO', 12.0, 1)],
+        },
+    },
+    {
+        'texte': (
+            'Dr CHEN\n'
+            'Code : 55871\n'
+            'Ordonnance du 10 mars 2026 renouvelant celle du 10/12/2025\n'
+            'pour M. ATGER Louis\n'
+            'AMK 7.5 x 10 séances, AMK 8 x 5 séances\n'
+        ),
+        'attendu': {
+            'prescripteur_nom': 'CHEN', 'prescripteur_code': '55871',
+            'date_prescription': '2026-03-10', 'patient_nom': 'ATGER',
+            'patient_prenom': 'Louis', 'actes': [('AMK', 7.5, 10), ('AMK', 8.0, 5)],
+        },
+    },
+    {
+        'texte': (
+            '\n\n'
+            'Docteur BONNET\n'
+            'Rendez-vous le 14/09/2026 à 10h\n'
+            'Patient : POMARE Tiare\n'
+            'DI 1.5\n'
+            'AMI 2 x 7 séances\n'
+        ),
+        'attendu': {
+            'prescripteur_nom': 'BONNET', 'prescripteur_code': '',
+            'date_prescription': '2026-09-14', 'patient_nom': 'POMARE',
+            'patient_prenom': 'Tiare', 'actes': [('DI', 1.5, 1), ('AMI', 2.0, 7)],
+        },
+    },
+    {
+        'texte': (
+            'Dr Sophie LAMBERT\n'
+            'Le 30/02/2026\n'
+            'Le 27/02/2026\n'
+            'M. GARNIER Yves\n'
+            'AMY 6 x 8 séances\n'
+        ),
+        'attendu': {
+            'prescripteur_nom': 'Sophie LAMBERT', 'prescripteur_code': '',
+            'date_prescription': '2026-02-27', 'patient_nom': 'GARNIER',
+            'patient_prenom': 'Yves', 'actes': [('AMY', 6.0, 8)],
+        },
+    },
+    {
+        'texte': (
+            'Mme le Docteur ARII\n'
+            'Papeete le 8 aout 2026\n'
+            'Patient: Mr TEHAU Rahiti\n'
+            'AMP 5 x 6 séances\n'
+        ),
+        'attendu': {
+            'prescripteur_nom': 'ARII', 'prescripteur_code': '',
+            'date_prescription': '2026-08-08', 'patient_nom': 'TEHAU',
+            'patient_prenom': 'Rahiti', 'actes': [('AMP', 5.0, 6)],
+        },
+    },
+    {
+        'texte': (
+            'Centre hospitalier\n'
+            'Service de rééducation\n'
+            'Pas de prescription lisible\n'
+        ),
+        'attendu': {
+            'prescripteur_nom': '', 'prescripteur_code': '',
+            'date_prescription': None, 'patient_nom': '',
+            'patient_prenom': '', 'actes': [],
+        },
+    },
+]
@@ -0,0 +1,105 @@
+"""
+Tests unitaires – flux agenda d'un praticien (/cps/agenda/<id>.json|.ics)
+Couvre :
+  - Lignes compactes de la période, dans l'ordre chronologique
+  - ETag : 304 sur If-None-Match, nouvel ETag après modification d'une séance
+  - Calendrier iCalendar : un VEVENT par séance, statut annulé
+  - Dates invalides : 400
+"""
+from datetime import timedelta
+
+from odoo import fields
+from odoo.tests import HttpCase, tagged
+
+from ..controllers.agenda import COLONNES
+
+
+@tagged('post_install', '-at_install')
+class TestAgendaFlux(HttpCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.praticien = cls.env['res.partner'].create({
+            'name': 'Praticien Agenda',
+            'category_id': [(4, cls.env.ref('os_auxiliaire_medical.partner_category_praticien').id)],
+        })
+        cls.patient = cls.env['res.partner'].create({
+            'name': 'Patient Agenda',
+            'category_id': [(4, cls.env.ref('os_auxiliaire_medical.partner_category_patient').id)],
+        })
+        cls.acte_type = cls.env['cps.acte.type'].create({
+            'name': 'Acte agenda',
+            'lettre_cle': 'AMK',
+            'coefficient_defaut': 7.5,
+            'tarif_unitaire': 490,
+            'profession': 'kinesitherapeute',
+        })
+        cls.today = fields.Date.today()
+        cls.feuille = cls.env['cps.feuille.soins'].create({
+            'praticien_id': cls.praticien.id,
+            'patient_id': cls.patient.id,
+            'date_prescription': cls.today - timedelta(days=10),
+            'acte_ids': [(0, 0, {
+                'acte_type_id': cls.acte_type.id,
+                'lettre_cle': 'AMK',
+                'date_acte': cls.today + timedelta(days=jours),
+                'montant': 3675,
+            }) for jours in (3, 1, 200)],
+        })
+        cls.url = '/cps/agenda/%d' % cls.praticien.id
+
+    def setUp(self):
+        super().setUp()
+        self.authenticate('admin', 'admin')
+
+    # ── Tests ─────────────────────────────────────────────────────────────
+
+    def test_flux_json(self):
+        reponse = self.url_open(self.url + '.json')
+        self.assertEqual(reponse.status_code, 200)
+        data = reponse.json()
+        self.assertEqual(data['colonnes'], COLONNES)
+        # La séance à J+200 est hors de la période par défaut.
+        dans_periode = self.feuille.acte_ids.filtered(
+            lambda a: a.date_acte <= self.today + timedelta(days=60)
+        ).sorted('datetime_acte')
+        self.assertEqual([ligne[0] for ligne in data['lignes']], dans_periode.ids)
+        self.assertEqual(data['lignes'][0][COLONNES.index('patient')], 'Patient Agenda')
+
+        periode = '?debut=%s&fin=%s' % (self.today, self.today + timedelta(days=365))
+        data = self.url_open(self.url + '.json' + periode).json()
+        self.assertEqual(len(data['lignes']), 3)
+
+    def test_etag(self):
+        reponse = self.url_open(self.url + '.json')
+        etag = reponse.headers['ETag']
+        self.assertTrue(etag)
+
+        reponse = self.url_open(self.url + '.json', headers={'If-None-Match': etag})
+        self.assertEqual(reponse.status_code, 304)
+        self.assertFalse(reponse.content)
+
+        self.feuille.acte_ids[0].state_seance = 'annulee'
+        self.env.flush_all()
+        reponse = self.url_open(self.url + '.json', headers={'If-None-Match': etag})
+        self.assertEqual(reponse.status_code, 200)
+        self.assertNotEqual(reponse.headers['ETag'], etag)
+
+    def test_flux_ics(self):
+        acte = self.feuille.acte_ids.sorted('datetime_acte')[0]
+        acte.state_seance = 'annulee'
+        self.env.flush_all()
+        reponse = self.url_open(self.url + '.ics')
+        self.assertEqual(reponse.status_code, 200)
+        self.assertTrue(reponse.headers['Content-Type'].startswith('text/calendar'))
+        texte = reponse.content.decode()
+        self.assertTrue(texte.startswith('BEGIN:VCALENDAR\r\n'))
+        self.assertEqual(texte.count('BEGIN:VEVENT'), 2)
+        self.assertIn('UID:acte-%d@' % acte.id, texte)
+        self.assertIn('STATUS:CANCELLED', texte)
+
+    def test_dates_invalides(self):
+        self.assertEqual(self.url_open(self.url + '.json?debut=31/12').status_code, 400)
+        periode = '?debut=%s&fin=%s' % (self.today, self.today)
+        self.assertEqual(self.url_open(self.url + '.json' + periode).status_code, 400)
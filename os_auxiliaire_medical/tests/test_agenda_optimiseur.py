@@ -0,0 +1,124 @@
+"""
+Tests unitaires – optimiseur d'agenda multi-praticiens
+Couvre :
+  - Respect des contraintes : horaires, agenda existant, délai minimum, salles
+  - Séances regroupées sans temps mort sur une journée
+  - Séances non placées quand la période est trop courte
+  - Salles occupées par les autres praticiens du cabinet (solveur et wizard)
+"""
+import datetime
+
+from odoo.tests.common import TransactionCase
+
+from ..wizards.agenda_optimiseur import Demande, OptimiseurAgenda
+
+LUNDI = datetime.date(2026, 3, 2)
+HORAIRES = {j: (8 * 60, 12 * 60) for j in range(5)}
+
+
+class TestAgendaOptimiseur(TransactionCase):
+
+    def _optimiser(self, demandes, occupations=None, nb_salles=0, jours=14):
+        praticiens = {d.praticien for d in demandes}
+        optimiseur = OptimiseurAgenda(
+            {p: HORAIRES for p in praticiens}, occupations, nb_salles=nb_salles,
+        )
+        return optimiseur.optimiser(
+            demandes, LUNDI + datetime.timedelta(days=jours), limite_s=0.5,
+        )
+
+    # ── Tests ─────────────────────────────────────────────────────────────
+
+    def test_contraintes_respectees(self):
+        """Délai, horaires, agenda existant et salles ne sont jamais violés."""
+        occupations = {(1, LUNDI): [(8 * 60, 9 * 60)]}
+        demandes = [
+            Demande('a', 1, 4, 30, 2, LUNDI),
+            Demande('b', 2, 4, 45, 1, LUNDI),
+            Demande('c', 3, 3, 60, 3, LUNDI),
+        ]
+        res = self._optimiser(demandes, occupations, nb_salles=2)
+        self.assertFalse(res.non_places)
+
+        par_ref = {}
+        for p in res.placements:
+            par_ref.setdefault(p.ref, []).append(p.date)
+            self.assertLess(p.date.weekday(), 5)
+            self.assertGreaterEqual(p.debut, 8 * 60)
+            self.assertLessEqual(p.fin, 12 * 60)
+            if (p.praticien, p.date) == (1, LUNDI):
+                self.assertGreaterEqual(p.debut, 9 * 60)
+        for dem in demandes:
+            dates = sorted(par_ref[dem.ref])
+            for avant, apres in zip(dates, dates[1:]):
+                self.assertGreaterEqual((apres - avant).days, dem.delai_min_jours)
+
+        occupation = {}
+        for p in res.placements:
+            for minute in range(p.debut, p.fin):
+                cle = (p.date, minute)
+                occupation[cle] = occupation.get(cle, 0) + 1
+        for (date, minute), n in occupation.items():
+            existantes = sum(
+                1 for (_pr, d), ints in occupations.items() if d == date
+                for debut, fin in ints if debut <= minute < fin
+            )
+            self.assertLessEqual(n + existantes, 2)
+
+    def test_journee_sans_temps_mort(self):
+        """Deux patients du même praticien le même jour : séances accolées."""
+        occupations = {(1, LUNDI): [(10 * 60, 10 * 60 + 30)]}
+        res = self._optimiser([Demande('a', 1, 1, 30, 1, LUNDI)], occupations)
+        self.assertEqual(res.temps_morts, 0)
+        self.assertEqual(res.placements[0].date, LUNDI)
+
+    def test_salles_autres_praticiens(self):
+        """Une salle, occupée de 8 h à 9 h par un praticien hors du lot."""
+        optimiseur = OptimiseurAgenda(
+            {1: HORAIRES}, nb_salles=1, salles_occupees={LUNDI: [(8 * 60, 9 * 60)]},
+        )
+        res = optimiseur.optimiser([Demande('a', 1, 1, 30, 1, LUNDI)], LUNDI, limite_s=0.1)
+        self.assertEqual([(p.date, p.debut) for p in res.placements], [(LUNDI, 9 * 60)])
+
+    def test_wizard_salles_du_cabinet(self):
+        acte_type = self.env['cps.acte.type'].create({
+            'name': 'Séance optimiseur', 'lettre_cle': 'AMK', 'coefficient_defaut': 7.5,
+            'tarif_unitaire': 490, 'duree_seance': 30,
+        })
+        praticien, autre, patient = self.env['res.partner'].create([
+            {'name': 'Praticien du lot'}, {'name': 'Praticien hors lot'}, {'name': 'Patient lot'},
+        ])
+        ordonnance = self.env['cps.ordonnance'].create({
+            'praticien_id': praticien.id,
+            'patient_id': patient.id,
+            'date_prescription': LUNDI,
+            'ligne_ids': [(0, 0, {'acte_type_id': acte_type.id, 'nb_seances': 1})],
+        })
+        # Le praticien hors lot remplit l'unique salle de 8 h à 9 h.
+        self.env['cps.feuille.soins'].create({
+            'praticien_id': autre.id,
+            'patient_id': patient.id,
+            'date_prescription': LUNDI,
+            'acte_ids': [(0, 0, {
+                'acte_type_id': acte_type.id, 'lettre_cle': 'AMK', 'date_acte': LUNDI,
+                'heure_acte': heure, 'montant': 3675,
+            }) for heure in (8.0, 8.5)],
+        })
+        wizard = self.env['cps.wizard.agenda.optimiseur'].create({
+            'ordonnance_ids': [(6, 0, ordonnance.ids)],
+            'date_debut': LUNDI,
+            'date_fin': LUNDI,
+            'heure_ouverture': 8.0,
+            'heure_fermeture': 10.0,
+            'nb_salles': 1,
+            'limite_secondes': 0.1,
+        })
+        wizard.action_optimiser()
+        self.assertEqual(wizard.ligne_ids.mapped('heure_acte'), [9.0])
+        self.assertEqual(wizard.ligne_ids.praticien_id, praticien)
+
+    def test_non_placees(self):
+        """Les séances hors période sont signalées, jamais surréservées."""
+        res = self._optimiser([Demande('a', 1, 10, 30, 2, LUNDI)], jours=6)
+        self.assertEqual(len(res.placements), 3)
+        self.assertEqual(res.non_places, {'a': 7})
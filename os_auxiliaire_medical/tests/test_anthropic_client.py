@@ -0,0 +1,95 @@
+"""
+Tests unitaires – cps.anthropic.client (client unique de l'API Anthropic)
+Couvre :
+  - Configuration unifiée, anciennes clés (claude_model, claude_api_key) en repli
+  - Connexion keep-alive réutilisée d'un appel à l'autre
+  - Nouvelles tentatives sur 529 / 503, puis succès
+  - Échec après épuisement des tentatives : ErreurClaude, trace en erreur
+  - Trace automatique dans cps.api.usage
+  - Limite de débit : attente quand la fenêtre d'une minute est pleine
+"""
+import time
+
+from odoo.tests.common import TransactionCase
+
+from ..models.anthropic_client import ErreurClaude, LimiteDebit
+from .anthropic_stub import AnthropicStub
+
+PAYLOAD = {
+    'model': 'claude-haiku-4-5-20251001',
+    'max_tokens': 16,
+    'messages': [{'role': 'user', 'content': 'ping'}],
+}
+
+
+class TestAnthropicClient(TransactionCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.Client = cls.env['cps.anthropic.client']
+        cls.Usage = cls.env['cps.api.usage']
+        cls.params = cls.env['ir.config_parameter'].sudo()
+        cls.params.set_param('cps.anthropic.api.key', 'sk-test')
+        cls.params.set_param('cps.anthropic.requetes_minute', '0')
+
+    def _appels(self):
+        return self.Usage.search([('model', '=', PAYLOAD['model'])], order='id')
+
+    # ── Tests ─────────────────────────────────────────────────────────────
+
+    def test_config_cles_historiques(self):
+        self.params.set_param('cps.claude.model', False)
+        self.params.set_param('claude_model', 'claude-ancien')
+        self.params.set_param('cps.anthropic.api.key', False)
+        self.params.set_param('claude_api_key', 'sk-ancienne')
+        config = self.Client._config()
+        self.assertEqual(config['model'], 'claude-ancien')
+        self.assertEqual(config['api_key'], 'sk-ancienne')
+        self.assertEqual(self.env['cps.wizard.ocr.ordonnance']._get_model(), 'claude-ancien')
+
+        self.params.set_param('cps.claude.model', 'claude-sonnet-4-6-20251101')
+        self.assertEqual(self.Client._config()['model'], 'claude-sonnet-4-6-20251101')
+        self.assertEqual(self.Client._config(api_key='sk-wizard')['api_key'], 'sk-wizard')
+
+    def test_keep_alive_et_trace(self):
+        with AnthropicStub({'ok': True}) as stub:
+            self.params.set_param('cps.anthropic.api.url', stub.url)
+            for _i in range(3):
+                self.Client.messages(PAYLOAD, 'ocr_texte')
+        self.assertEqual(len(stub.requetes), 3)
+        self.assertEqual(len({r['port_client'] for r in stub.requetes}), 1)
+        self.assertEqual(stub.requetes[0]['headers'].get('anthropic-version'), '2023-06-01')
+        appels = self._appels()
+        self.assertEqual(len(appels), 3)
+        self.assertEqual(appels.mapped('total_tokens'), [160, 160, 160])
+
+    def test_nouvelles_tentatives(self):
+        self.params.set_param('cps.anthropic.tentatives', '3')
+        with AnthropicStub({'ok': True}, status=[529, 503, 200]) as stub:
+            self.params.set_param('cps.anthropic.api.url', stub.url)
+            body = self.Client.messages(PAYLOAD, 'ocr_vision')
+        self.assertEqual(len(stub.requetes), 3)
+        self.assertEqual(body['usage']['input_tokens'], 120)
+        self.assertTrue(self._appels().success)
+
+    def test_echec_apres_tentatives(self):
+        self.params.set_param('cps.anthropic.tentatives', '1')
+        with AnthropicStub(status=500) as stub:
+            self.params.set_param('cps.anthropic.api.url', stub.url)
+            with self.assertRaises(ErreurClaude) as erreur:
+                self.Client.messages(PAYLOAD, 'ocr_texte')
+        self.assertEqual(erreur.exception.statut, 500)
+        self.assertEqual(len(stub.requetes), 2)
+        appel = self._appels()
+        self.assertFalse(appel.success)
+        self.assertEqual(appel.error_message, 'HTTP 500')
+
+    def test_limite_debit(self):
+        limite = LimiteDebit()
+        self.assertEqual(limite.attendre(2), 0)
+        self.assertEqual(limite.attendre(2), 0)
+        # Fenêtre pleine : le plus ancien appel sort de la minute dans ~50 ms.
+        limite._appels[0] = time.monotonic() - 59.95
+        self.assertGreater(limite.attendre(2), 0)
+        self.assertEqual(limite.attendre(0), 0)
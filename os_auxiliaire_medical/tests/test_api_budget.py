@@ -0,0 +1,149 @@
+"""
+Tests unitaires – budgets mensuels de tokens Claude (cps.api.budget)
+Couvre :
+  - Estimation avant appel : longueur du texte, dimensions de l'image, max_tokens
+  - Compteur mensuel tenu par log_usage (utilisateur + société), égal au journal
+  - Limite dure : aucun appel, BudgetEpuise, statut « analyse locale » du wizard
+  - Limite souple : l'appel part
+  - Budget personnel plus strict que le budget société
+  - Un seul budget société (utilisateur vide) par société
+  - Import en lot : fichiers au-delà du budget en OCR local
+"""
+import base64
+import io
+
+from psycopg2 import IntegrityError
+
+from odoo.tests.common import TransactionCase
+from odoo.tools import mute_logger
+
+from ..models.anthropic_client import BudgetEpuise, estimer_tokens
+from .anthropic_stub import AnthropicStub
+
+PAYLOAD = {
+    'model': 'claude-haiku-4-5-20251001',
+    'max_tokens': 16,
+    'messages': [{'role': 'user', 'content': 'x' * 350}],
+}
+
+
+class TestApiBudget(TransactionCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.Client = cls.env['cps.anthropic.client']
+        cls.Usage = cls.env['cps.api.usage']
+        cls.Mensuel = cls.env['cps.api.usage.mensuel']
+        cls.Budget = cls.env['cps.api.budget']
+        cls.company = cls.env.company
+        cls.params = cls.env['ir.config_parameter'].sudo()
+        cls.params.set_param('cps.anthropic.api.key', 'sk-test')
+        cls.params.set_param('cps.anthropic.requetes_minute', '0')
+        cls.Budget.search([('company_id', '=', cls.company.id)]).unlink()
+
+    def _consommer(self, tokens):
+        self.Usage.log_usage(model=PAYLOAD['model'], operation='ocr_texte',
+                             input_tokens=tokens)
+
+    def _consomme(self, user_id=None):
+        return self.Mensuel._tokens_du_mois(self.company.id, user_id)
+
+    # ── Tests ─────────────────────────────────────────────────────────────
+
+    def test_estimation(self):
+        self.assertEqual(estimer_tokens(PAYLOAD), 100 + 16)
+        try:
+            from PIL import Image
+        except ImportError:
+            self.skipTest('Pillow non installé')
+        tampon = io.BytesIO()
+        Image.new('RGB', (750, 1000), 'white').save(tampon, 'PNG')
+        payload = {'max_tokens': 1024, 'messages': [{'role': 'user', 'content': [
+            {'type': 'image', 'source': {'type': 'base64', 'media_type': 'image/png',
+                                         'data': base64.b64encode(tampon.getvalue()).decode()}},
+            {'type': 'text', 'text': 'y' * 35},
+        ]}]}
+        self.assertEqual(estimer_tokens(payload), 1000 + 10 + 1024)
+
+    def test_compteur_mensuel(self):
+        avant_user, avant_societe = self._consomme(self.env.uid), self._consomme()
+        self._consommer(300)
+        self._consommer(200)
+        self.Usage.log_usage(model=PAYLOAD['model'], operation='ocr_texte', cache_hit=True)
+        self.assertEqual(self._consomme(self.env.uid), avant_user + 500)
+        self.assertEqual(self._consomme(), avant_societe + 500)
+
+        # Le compteur correspond au journal du mois.
+        compteur = self.Mensuel.search([
+            ('company_id', '=', self.company.id), ('user_id', '=', self.env.uid),
+        ], order='mois desc', limit=1)
+        journal = self.Usage.search([
+            ('company_id', '=', self.company.id), ('user_id', '=', self.env.uid),
+            ('date', '>=', compteur.mois),
+        ])
+        self.assertEqual(compteur.tokens, sum(journal.mapped('total_tokens')))
+        self.assertEqual(compteur.nb_appels, len(journal.filtered('total_tokens')))
+
+    def test_limite_dure(self):
+        self.Budget.create({'company_id': self.company.id,
+                            'limite_dure': self._consomme() + 50})
+        with AnthropicStub({'ok': True}) as stub:
+            self.params.set_param('cps.anthropic.api.url', stub.url)
+            with self.assertRaises(BudgetEpuise):
+                self.Client.messages(PAYLOAD, 'ocr_texte')
+            body, statut = self.env['cps.wizard.ocr.ordonnance'].new({})._appeler_claude(
+                PAYLOAD, 'ocr_texte')
+        self.assertFalse(stub.requetes)
+        self.assertIsNone(body)
+        self.assertIn('tesseract', statut)
+
+    def test_limite_souple(self):
+        self.Budget.create({'company_id': self.company.id, 'limite_souple': 1})
+        avant = self._consomme()
+        with AnthropicStub({'ok': True}) as stub:
+            self.params.set_param('cps.anthropic.api.url', stub.url)
+            self.Client.messages(PAYLOAD, 'ocr_texte')
+        self.assertEqual(len(stub.requetes), 1)
+        self.assertEqual(self._consomme(), avant + 160)
+        self.assertEqual(self.Client._budget_restant(), (0, None))
+
+    def test_budget_utilisateur(self):
+        self.Budget.create([
+            {'company_id': self.company.id, 'limite_dure': self._consomme() + 10 ** 6},
+            {'company_id': self.company.id, 'user_id': self.env.uid,
+             'limite_dure': self._consomme(self.env.uid) + 1000},
+        ])
+        self.assertEqual(self.Client._budget_restant(), (None, 1000))
+        self._consommer(400)
+        self.assertEqual(self.Client._budget_restant(), (None, 600))
+
+    def test_budget_societe_unique(self):
+        self.Budget.create({'company_id': self.company.id, 'limite_dure': 1000})
+        self.Budget.create({'company_id': self.company.id, 'user_id': self.env.uid,
+                            'limite_dure': 500})
+        with mute_logger('odoo.sql_db'), self.assertRaises(IntegrityError), self.cr.savepoint():
+            self.Budget.create({'company_id': self.company.id, 'limite_dure': 2000})
+
+    def test_import_lot_hors_budget(self):
+        try:
+            from PIL import Image
+        except ImportError:
+            self.skipTest('Pillow non installé')
+        tampon = io.BytesIO()
+        Image.new('RGB', (200, 100), 'white').save(tampon, 'PNG')
+        self.Budget.create({'company_id': self.company.id,
+                            'limite_dure': self._consomme() + 10})
+        praticien = self.env['res.partner'].create({'name': 'Praticien budget'})
+        wizard = self.env['cps.wizard.ocr.import'].create({
+            'praticien_id': praticien.id, 'use_claude_vision': True,
+        })
+        with AnthropicStub({'ok': True}) as stub:
+            self.params.set_param('cps.anthropic.api.url', stub.url)
+            ((data, erreur, usage, operation),) = wizard._analyser_lot(
+                [('scan.png', tampon.getvalue())])
+        # Image hors budget : pas d'appel, OCR local (page blanche : aucun texte).
+        self.assertFalse(stub.requetes)
+        self.assertIsNone(usage)
+        self.assertIsNone(data)
+        self.assertNotIn('Claude', erreur)
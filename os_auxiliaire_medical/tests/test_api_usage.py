@@ -0,0 +1,74 @@
+"""
+Tests unitaires – cps.api.usage.jour (agrégats quotidiens de consommation)
+Couvre :
+  - Agrégat tenu par log_usage : appels, erreurs, cache, tokens
+  - Une ligne par modèle / opération / jour
+  - Purge du journal au-delà de la rétention, agrégats conservés
+  - Tableau de bord des Paramètres ouvert sur les agrégats
+"""
+from datetime import timedelta
+
+from odoo import fields
+from odoo.tests.common import TransactionCase
+
+MODELE = 'claude-test-agregats'
+
+
+class TestApiUsage(TransactionCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.Usage = cls.env['cps.api.usage']
+        cls.Jour = cls.env['cps.api.usage.jour']
+        cls.params = cls.env['ir.config_parameter'].sudo()
+
+    def _agregats(self):
+        return self.Jour.search([('model', '=', MODELE)])
+
+    # ── Tests ─────────────────────────────────────────────────────────────
+
+    def test_agregat_quotidien(self):
+        self.Usage.log_usage(MODELE, 'ocr_texte', input_tokens=100, output_tokens=20)
+        self.Usage.log_usage(MODELE, 'ocr_texte', input_tokens=50, output_tokens=10)
+        self.Usage.log_usage(MODELE, 'ocr_texte', success=False, error_message='HTTP 500')
+        self.Usage.log_usage(MODELE, 'ocr_texte', cache_hit=True)
+        self.Usage.log_usage(MODELE, 'ocr_vision', input_tokens=1500, output_tokens=200)
+
+        texte = self._agregats().filtered(lambda j: j.operation == 'ocr_texte')
+        self.assertEqual(len(texte), 1)
+        self.assertEqual(texte.jour, fields.Datetime.now().date())
+        self.assertEqual(texte.user_id, self.env.user)
+        self.assertEqual(
+            (texte.nb_appels, texte.nb_erreurs, texte.nb_cache),
+            (4, 1, 1),
+        )
+        self.assertEqual(
+            (texte.input_tokens, texte.output_tokens, texte.total_tokens),
+            (150, 30, 180),
+        )
+        self.assertEqual(sum(self._agregats().mapped('total_tokens')), 1880)
+
+        # Le pivot lit les agrégats : mêmes totaux que le journal.
+        journal = self.Usage.search([('model', '=', MODELE)])
+        self.assertEqual(sum(journal.mapped('total_tokens')), 1880)
+
+    def test_purge_journal(self):
+        ancien = self.Usage.log_usage(MODELE, 'ocr_texte', input_tokens=70)
+        recent = self.Usage.log_usage(MODELE, 'ocr_texte', input_tokens=30)
+        ancien.date = fields.Datetime.now() - timedelta(days=500)
+        self.params.set_param('cps.api.usage.retention_jours', '400')
+        self.Usage._cron_purger_journal()
+        self.assertFalse(ancien.exists())
+        self.assertTrue(recent.exists())
+        self.assertEqual(self._agregats().total_tokens, 100)
+
+        self.params.set_param('cps.api.usage.retention_jours', '0')
+        recent.date = fields.Datetime.now() - timedelta(days=5000)
+        self.Usage._cron_purger_journal()
+        self.assertTrue(recent.exists())
+
+    def test_tableau_de_bord(self):
+        action = self.env['res.config.settings'].create({}).action_view_api_usage()
+        self.assertEqual(action['res_model'], 'cps.api.usage.jour')
+        self.assertTrue(action['view_mode'].startswith('pivot'))
@@ -6,12 +6,22 @@ Couvre :
   - get_export_data : montants avec virgule décimale
   - get_export_data : libellés "NOM PRENOM", "Part CPS", "Part patient"
   - get_export_data : pas de colonne "Total"
+  - get_export_data : une seule requête quel que soit le nombre de feuilles
+  - get_export_data : règles d'accès des feuilles respectées
   - Pas de couleur de fond (contrôlé par le template QWeb, pas testé en unitaire ici)
+  - Clôture mensuelle : un bordereau par praticien, totaux agrégés, note au chatter
+  - Cron de clôture : mois précédent complet, dernier jour à Tahiti compris
+  - Impression des FSA25 du bordereau en rapport HTML : PDF fusionné, pages
+    en cache par write_date, rendu wkhtmltopdf par lots découpé par feuille
 """
 import datetime
+import io
 import pytz
 
+from freezegun import freeze_time
+
 from odoo.tests.common import TransactionCase
+from odoo.tools.pdf import PdfFileReader, PdfFileWriter
 from unittest.mock import patch
 
 
@@ -41,8 +51,14 @@ class TestBordereau(TransactionCase):
         cls.feuille = cls.env['cps.feuille.soins'].create({
             'praticien_id': cls.praticien.id,
             'patient_id':   cls.patient_a.id,
-            'date_soins':   '2026-04-10',
+            'date_prescription': '2026-04-10',
             'bordereau_id': cls.bordereau.id,
+            'acte_ids': [(0, 0, {
+                'date_acte':   '2026-04-10',
+                'lettre_cle':  'AMO',
+                'coefficient': 8,
+                'montant':     3675.5,
+            })],
         })
 
     # ── Majuscules ────────────────────────────────────────────────────────
@@ -110,3 +126,198 @@ class TestBordereau(TransactionCase):
                              "La colonne 'total' ne doit pas être présente dans les lignes PDF.")
             # Les valeurs brutes sont disponibles mais sous noms distincts
             self.assertIn('montant_total_raw', row)
+
+    # ── Projection en une requête ─────────────────────────────────────────
+
+    def test_export_lignes_et_totaux(self):
+        data = self.bordereau.get_export_data()
+        row = data['rows'][0]
+        self.assertEqual(row['nb_actes'], 1)
+        self.assertEqual(row['date'], '10/04/26')
+        self.assertEqual(row['montant_total_raw'], 3675.5)
+        self.assertEqual(data['total_cps_raw'], self.feuille.montant_tiers_payant)
+
+    def test_export_une_requete(self):
+        self.env['cps.feuille.soins'].create([{
+            'praticien_id': self.praticien.id,
+            'patient_id':   self.patient_a.id,
+            'date_prescription': '2026-04-01',
+            'bordereau_id': self.bordereau.id,
+        } for _i in range(20)])
+        self.env.flush_all()
+        self.env.invalidate_all()
+        with self.assertQueryCount(1):
+            self.bordereau._get_export_rows()
+
+    def test_export_regles_acces_feuilles(self):
+        patient_b = self.env['res.partner'].create({'name': 'bruno masque'})
+        self.env['cps.feuille.soins'].create({
+            'praticien_id': self.praticien.id,
+            'patient_id':   patient_b.id,
+            'date_prescription': '2026-04-01',
+            'bordereau_id': self.bordereau.id,
+        })
+        self.env['ir.rule'].create({
+            'name': 'Feuilles sans patient masqué (test)',
+            'model_id': self.env.ref('os_auxiliaire_medical.model_cps_feuille_soins').id,
+            'domain_force': "[('patient_id', '!=', %d)]" % patient_b.id,
+        })
+        user = self.env['res.users'].create({
+            'name': 'Lecteur bordereau',
+            'login': 'lecteur_bordereau@cps.pf',
+            'groups_id': [(4, self.env.ref('os_auxiliaire_medical.group_cps_user').id)],
+        })
+        rows = self.bordereau.with_user(user)._get_export_rows()[self.bordereau.id]
+        self.assertEqual(len(rows), 1)
+        self.assertIn('ALICE', rows[0]['nom_prenom'])
+        self.assertEqual(len(self.bordereau._get_export_rows()[self.bordereau.id]), 2)
+
+
+class TestImpressionFsa25(TransactionCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.praticien = cls.env['res.partner'].create({'name': 'Praticien FSA25'})
+        cls.patient = cls.env['res.partner'].create({'name': 'Patient FSA25'})
+        cls.bordereau = cls.env['cps.bordereau'].create({
+            'praticien_id': cls.praticien.id,
+            'date_bordereau': datetime.date(2026, 4, 1),
+        })
+        cls.feuilles = cls.env['cps.feuille.soins'].create([{
+            'praticien_id': cls.praticien.id,
+            'patient_id': cls.patient.id,
+            'date_prescription': '2026-03-01',
+            'bordereau_id': cls.bordereau.id,
+            'acte_ids': [(0, 0, {
+                'date_acte': datetime.date(2026, 3, jour),
+                'lettre_cle': 'AMO',
+                'coefficient': 8,
+                'montant': 3920,
+            })],
+        } for jour in (12, 3, 20)])
+
+    def _vieillir(self):
+        """Écritures antérieures à la transaction : les pages peuvent être mises en cache."""
+        self.env.flush_all()
+        for table in ('cps_feuille_soins', 'cps_feuille_soins_acte', 'res_partner', 'cps_bordereau'):
+            self.env.cr.execute(
+                f"UPDATE {table} SET write_date = write_date - interval '1 day' "
+                f"WHERE write_date >= now() at time zone 'UTC' - interval '1 hour'")
+        self.env.invalidate_all()
+
+    @staticmethod
+    def _pdf_blanc(largeur):
+        writer = PdfFileWriter()
+        writer.addBlankPage(largeur, 100)
+        flux = io.BytesIO()
+        writer.write(flux)
+        return flux.getvalue()
+
+    def test_cache_des_pages(self):
+        rendues = []
+
+        def rendre(feuilles, max_workers=None):
+            rendues.append(feuilles.ids)
+            return {f.id: self._pdf_blanc(100 + f.id % 100) for f in feuilles}
+
+        Feuille = type(self.env['cps.feuille.soins'])
+        self.env['ir.config_parameter'].sudo().set_param('cps.fsa25.moteur', 'html')
+        self._vieillir()
+        with patch.object(Feuille, '_fsa25_rendre_pdf', rendre):
+            sortie = io.BytesIO()
+            self.assertEqual(self.bordereau._fsa25_pdf(sortie), 3)
+            self.assertEqual(sorted(rendues.pop()), sorted(self.feuilles.ids))
+            # Ordre de l'export : date de début de soins.
+            reader = PdfFileReader(io.BytesIO(sortie.getvalue()))
+            largeurs = [int(reader.getPage(i).mediaBox.getWidth()) for i in range(3)]
+            ordre = self.feuilles.sorted('date_debut_soins')
+            self.assertEqual(largeurs, [100 + f.id % 100 for f in ordre])
+
+            self.bordereau._fsa25_pdf(io.BytesIO())
+            self.assertFalse(rendues)
+
+            self.feuilles[0].acte_ids.coefficient = 9
+            self._vieillir()
+            self.bordereau._fsa25_pdf(io.BytesIO())
+            self.assertEqual(rendues.pop(), self.feuilles[0].ids)
+
+    def test_rendu_wkhtmltopdf(self):
+        if self.env['ir.actions.report'].get_wkhtmltopdf_state() != 'ok':
+            self.skipTest('wkhtmltopdf non installé')
+        pages = self.feuilles._fsa25_rendre_pdf(max_workers=2)
+        self.assertEqual(set(pages), set(self.feuilles.ids))
+        for pdf in pages.values():
+            self.assertTrue(pdf.startswith(b'%PDF'))
+            self.assertEqual(PdfFileReader(io.BytesIO(pdf)).getNumPages(), 1)
+
+        action = self.bordereau.action_print_fsa25()
+        self.assertEqual(action['url'], '/cps/bordereau/%d/fsa25.pdf' % self.bordereau.id)
+
+
+class TestClotureMensuelle(TransactionCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cat_praticien = cls.env.ref('os_auxiliaire_medical.partner_category_praticien')
+        cls.praticiens = cls.env['res.partner'].create([{
+            'name': name, 'category_id': [(4, cat_praticien.id)],
+        } for name in ('Praticien clôture A', 'Praticien clôture B')])
+        cls.patient = cls.env['res.partner'].create({'name': 'Patient clôture'})
+        cls.acte_type = cls.env['cps.acte.type'].create({
+            'name': 'Acte clôture', 'lettre_cle': 'AMK',
+            'coefficient_defaut': 10, 'tarif_unitaire': 490,
+        })
+
+    def _feuille(self, praticien, jour, montant, state='confirmed'):
+        feuille = self.env['cps.feuille.soins'].create({
+            'praticien_id': praticien.id,
+            'patient_id': self.patient.id,
+            'date_prescription': datetime.date(2026, 3, 1),
+            'acte_ids': [(0, 0, {
+                'acte_type_id': self.acte_type.id, 'lettre_cle': 'AMK',
+                'date_acte': datetime.date(2026, 3, jour), 'coefficient': 10,
+                'montant': montant,
+            })],
+        })
+        feuille.state = state
+        return feuille
+
+    def test_un_bordereau_par_praticien(self):
+        a, b = self.praticiens
+        feuilles_a = self._feuille(a, 2, 4900) | self._feuille(a, 9, 5000)
+        feuille_b = self._feuille(b, 3, 4900)
+        brouillon = self._feuille(b, 4, 4900, state='draft')
+        hors_periode = self._feuille(b, 31, 4900)
+
+        bordereaux = self.env['cps.bordereau'].generer_bordereaux_mensuels(
+            date_cloture=datetime.date(2026, 3, 30))
+
+        self.assertEqual(len(bordereaux), 2)
+        bordereau_a = bordereaux.filtered(lambda r: r.praticien_id == a)
+        self.assertEqual(bordereau_a.feuille_ids, feuilles_a)
+        self.assertEqual(bordereau_a.nb_feuilles, 2)
+        self.assertEqual(bordereau_a.total_cps, sum(feuilles_a.mapped('montant_tiers_payant')))
+        self.assertEqual(bordereau_a.total_general, sum(feuilles_a.mapped('montant_total')))
+        self.assertEqual(bordereau_a.mois, 'Mars 2026')
+        self.assertIn(feuilles_a[0].name, bordereau_a.message_ids[0].body)
+        self.assertEqual(feuille_b.bordereau_id.praticien_id, b)
+        self.assertFalse(brouillon.bordereau_id)
+        self.assertFalse(hors_periode.bordereau_id)
+
+        # Rien de nouveau : pas de bordereau vide.
+        self.assertFalse(self.env['cps.bordereau'].generer_bordereaux_mensuels(
+            date_cloture=datetime.date(2026, 3, 30)))
+
+    def test_cron_dernier_jour_tahiti(self):
+        a, _b = self.praticiens
+        dernier_jour = self._feuille(a, 31, 4900)
+        # 12:00 UTC le 1er avril = 02:00 à Tahiti ; cron en UTC ou à Tahiti.
+        for tz in ('UTC', 'Pacific/Tahiti'):
+            with self.subTest(tz=tz), freeze_time('2026-04-01 12:00:00'):
+                self.env.user.tz = tz
+                dernier_jour.bordereau_id = False
+                self.env['cps.bordereau']._cron_cloture_mensuelle()
+                self.assertEqual(dernier_jour.bordereau_id.date_bordereau,
+                                 datetime.date(2026, 3, 31))
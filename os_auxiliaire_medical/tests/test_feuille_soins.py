@@ -3,7 +3,24 @@ Tests unitaires – cps.feuille.soins
 Couvre :
   - Filtre "Mes feuilles" (praticien_id.user_ids ∋ uid)
   - Formatage virgule décimale
+  - Champs du formulaire FSA25 (get_fsa25_field_map) ; cache par write_date :
+    second appel servi par le cache, invalidé par une écriture sur la feuille
+    ou un acte, pas de cache pour une feuille modifiée dans la transaction
+  - Cron des séances passées : planifiée → effectuée, compteurs et confirmation,
+    date du jour à Tahiti (UTC-10)
+  - Conflits de créneaux du wizard de dates : chevauchement, séances accolées,
+    séance annulée ignorée, premier créneau libre du jour
+  - Praticien / société stockés sur les actes : suivent la feuille, recherche sans jointure
+  - Photo en pièce jointe : fichier partagé entre scans identiques, miniature WebP
 """
+import base64
+import io
+from datetime import date, datetime, timedelta
+from unittest.mock import patch
+
+from freezegun import freeze_time
+
+from odoo import fields
 from odoo.tests.common import TransactionCase
 
 
@@ -54,12 +71,12 @@ class TestFeuilleSoins(TransactionCase):
         cls.feuille_kine = cls.env['cps.feuille.soins'].create({
             'praticien_id': cls.praticien_kine.id,
             'patient_id':   cls.patient.id,
-            'date_soins':   '2026-04-10',
+            'date_prescription': '2026-04-10',
         })
         cls.feuille_autre = cls.env['cps.feuille.soins'].create({
             'praticien_id': cls.praticien_autre.id,
             'patient_id':   cls.patient.id,
-            'date_soins':   '2026-04-11',
+            'date_prescription': '2026-04-11',
         })
 
     # ── Filtre "Mes feuilles" ─────────────────────────────────────────────
@@ -98,3 +115,282 @@ class TestFeuilleSoins(TransactionCase):
         result = self.feuille_kine._format_amount(3675.50)
         self.assertIn(',', result)
         self.assertNotIn('.', result)
+
+    # ── Champs FSA25 ──────────────────────────────────────────────────────
+
+    def test_fsa25_field_map_actes(self):
+        """Les lignes d'actes sont numérotées 01..16, les lignes vides restent vides."""
+        self.feuille_kine.write({'acte_ids': [(0, 0, {
+            'acte_type_id': self.acte_type.id,
+            'date_acte':    '2026-04-10',
+            'lettre_cle':   'AMK',
+            'coefficient':  7.5,
+            'montant':      3675,
+            'nuit':         True,
+        })]})
+        fields_map = self.feuille_kine.get_fsa25_field_map()
+        self.assertEqual(fields_map['acte_01_date_texte'], '100426')
+        self.assertEqual(fields_map['acte_01_coefficient_texte'], '7.5')
+        self.assertEqual(fields_map['acte_01_montant_texte'], '3 675')
+        self.assertEqual(fields_map['acte_01_nuit_oui'], 'x')
+        self.assertEqual(fields_map['acte_01_nuit_non'], '')
+        self.assertEqual(fields_map['acte_02_date_texte'], '')
+        self.assertEqual(fields_map['acte_16_nuit_non'], '')
+        self.assertEqual(fields_map['praticien_name_texte'], 'PRATICIEN KINÉ')
+
+    def test_fsa25_field_map_suit_les_modifications(self):
+        """Le cache est invalidé dès que la feuille ou un acte change."""
+        self.feuille_kine.write({'acte_ids': [(0, 0, {
+            'date_acte': '2026-04-10', 'lettre_cle': 'AMK',
+            'coefficient': 7.5, 'montant': 3675,
+        })]})
+        self.assertEqual(self.feuille_kine.get_fsa25_field_map()['num_rsr_texte'], '')
+        self.feuille_kine.write({'num_rsr': 'RSR-42'})
+        self.assertEqual(self.feuille_kine.get_fsa25_field_map()['num_rsr_texte'], 'RSR-42')
+        self.feuille_kine.acte_ids.write({'coefficient': 10})
+        self.assertEqual(
+            self.feuille_kine.get_fsa25_field_map()['acte_01_coefficient_texte'], '10')
+
+    def _dater(self, feuille, moment, actes=True):
+        """Date d'écriture antérieure à la transaction (feuille, actes, partenaires)."""
+        self.env.flush_all()
+        self.env.cr.execute("UPDATE cps_feuille_soins SET write_date = %s WHERE id = %s",
+                            [moment, feuille.id])
+        self.env.cr.execute("UPDATE res_partner SET write_date = %s WHERE id IN %s",
+                            [moment, (feuille.patient_id.id, feuille.praticien_id.id)])
+        if actes:
+            self.env.cr.execute(
+                "UPDATE cps_feuille_soins_acte SET write_date = %s WHERE feuille_id = %s",
+                [moment, feuille.id])
+        self.env.invalidate_all()
+
+    def test_fsa25_field_map_cache(self):
+        feuille = self.feuille_kine
+        feuille.write({'acte_ids': [(0, 0, {
+            'date_acte': '2026-04-10', 'lettre_cle': 'AMK',
+            'coefficient': 7.5, 'montant': 3675,
+        })]})
+        self._dater(feuille, datetime(2026, 1, 1, 10, 0))
+        Feuille = type(feuille)
+        with patch.object(Feuille, '_build_fsa25_field_maps', autospec=True,
+                          side_effect=Feuille._build_fsa25_field_maps) as build:
+            # Second appel : même clé, servi par l'ormcache.
+            self.assertIsNotNone(feuille._fsa25_cache_key())
+            feuille.get_fsa25_field_map()
+            feuille.get_fsa25_field_map()
+            self.assertEqual(build.call_count, 1)
+
+            # Feuille modifiée dans la transaction : write_date = cr.now(), pas de cache.
+            feuille.write({'num_rsr': 'RSR-42'})
+            self.assertIsNone(feuille._fsa25_cache_key())
+            self.assertEqual(feuille.get_fsa25_field_map()['num_rsr_texte'], 'RSR-42')
+            feuille.get_fsa25_field_map()
+            self.assertEqual(build.call_count, 3)
+
+            # Nouvelle write_date de la feuille : nouvelle entrée, puis cache.
+            self._dater(feuille, datetime(2026, 1, 2, 10, 0))
+            self.assertEqual(feuille.get_fsa25_field_map()['num_rsr_texte'], 'RSR-42')
+            feuille.get_fsa25_field_map()
+            self.assertEqual(build.call_count, 4)
+
+            # Acte modifié (feuille inchangée) : l'entrée de la feuille est invalidée.
+            feuille.acte_ids.write({'coefficient': 10})
+            self.env.flush_all()
+            self.env.cr.execute(
+                "UPDATE cps_feuille_soins_acte SET write_date = %s WHERE feuille_id = %s",
+                [datetime(2026, 1, 3, 10, 0), feuille.id])
+            self._dater(feuille, datetime(2026, 1, 2, 10, 0), actes=False)
+            self.assertEqual(
+                feuille.get_fsa25_field_map()['acte_01_coefficient_texte'], '10')
+            self.assertEqual(build.call_count, 5)
+
+    # ── Cron des séances passées ──────────────────────────────────────────
+
+    def test_cron_seances_effectuees(self):
+        today = fields.Date.today()
+        ordonnance = self.env['cps.ordonnance'].create({
+            'praticien_id': self.praticien_kine.id,
+            'patient_id': self.patient.id,
+            'date_prescription': today - timedelta(days=30),
+            'ligne_ids': [(0, 0, {'acte_type_id': self.acte_type.id, 'nb_seances': 3})],
+        })
+        ligne = ordonnance.ligne_ids
+        feuille = self.env['cps.feuille.soins'].create({
+            'praticien_id': self.praticien_kine.id,
+            'patient_id': self.patient.id,
+            'ordonnance_id': ordonnance.id,
+            'date_prescription': today - timedelta(days=30),
+            'acte_ids': [(0, 0, {
+                'ordonnance_ligne_id': ligne.id,
+                'acte_type_id': self.acte_type.id,
+                'lettre_cle': 'AMK',
+                'date_acte': today + timedelta(days=jours),
+                'montant': 3675,
+            }) for jours in (1, 2)],
+        })
+        self.assertEqual(feuille.acte_ids.mapped('state_seance'), ['planifiee', 'planifiee'])
+        self.assertTrue(feuille.has_future_seances)
+        self.assertEqual(ligne.nb_seances_planifiees, 2)
+
+        # Le temps passe : les deux séances sont désormais dans le passé.
+        self.env.cr.execute(
+            "UPDATE cps_feuille_soins_acte SET date_acte = date_acte - 10 WHERE feuille_id = %s",
+            [feuille.id])
+        self.env.invalidate_all()
+
+        nb = self.env['cps.feuille.soins.acte']._cron_seances_effectuees()
+        self.assertGreaterEqual(nb, 2)
+        self.assertEqual(feuille.acte_ids.mapped('state_seance'), ['effectuee', 'effectuee'])
+        self.assertFalse(feuille.has_future_seances)
+        self.assertEqual(ligne.nb_seances_planifiees, 0)
+        self.assertEqual(ligne.nb_seances_theorique_restantes, 3)
+        self.assertTrue(ordonnance.has_seances_disponibles)
+        feuille.action_confirm()
+        self.assertEqual(feuille.state, 'confirmed')
+        self.assertEqual(self.env['cps.feuille.soins.acte']._cron_seances_effectuees(), 0)
+
+    def test_cron_seances_effectuees_fuseau_tahiti(self):
+        feuille = self.env['cps.feuille.soins'].create({
+            'praticien_id': self.praticien_kine.id,
+            'patient_id': self.patient.id,
+            'date_prescription': '2026-05-01',
+            'acte_ids': [(0, 0, {
+                'acte_type_id': self.acte_type.id,
+                'lettre_cle': 'AMK',
+                'date_acte': jour,
+                'state_seance': 'planifiee',
+                'montant': 3675,
+            }) for jour in (date(2026, 5, 9), date(2026, 5, 10))],
+        })
+        veille, lendemain = feuille.acte_ids.sorted('date_acte')
+        # 00:15 UTC le 10 = 14:15 le 9 à Tahiti : la séance du 10 n'a pas eu lieu.
+        with freeze_time('2026-05-10 00:15:00'):
+            self.env['cps.feuille.soins.acte']._cron_seances_effectuees()
+        self.assertEqual(veille.state_seance, 'effectuee')
+        self.assertEqual(lendemain.state_seance, 'planifiee')
+
+    # ── Conflits de créneaux (wizard de dates) ────────────────────────────
+
+    def _wizard_creneaux(self, jour):
+        """Séances du kiné le `jour` : 9h00 et 9h30 (30 min), 11h00 annulée."""
+        self.env['cps.feuille.soins'].create({
+            'praticien_id': self.praticien_kine.id,
+            'patient_id': self.patient.id,
+            'date_prescription': '2026-05-01',
+            'acte_ids': [(0, 0, {
+                'acte_type_id': self.acte_type.id,
+                'lettre_cle': 'AMK',
+                'date_acte': jour,
+                'heure_acte': heure,
+                'state_seance': state,
+                'montant': 3675,
+            }) for heure, state in ((9.0, 'planifiee'), (9.5, 'planifiee'), (11.0, 'annulee'))],
+        })
+        wizard = self.env['cps.wizard.date.selection'].create({
+            'feuille_id': self.feuille_kine.id,
+            'date_debut': jour,
+        })
+        return wizard, wizard._charger_creneaux(self.praticien_kine.id, jour, jour)
+
+    def test_conflit_chevauchement(self):
+        jour = date(2026, 5, 4)
+        wizard, creneaux = self._wizard_creneaux(jour)
+        conflit, info = wizard._check_conflict(creneaux, jour, 9.25, 30)
+        self.assertTrue(conflit)
+        self.assertIn('09h00', info)
+        # Débute avant 9h00 et déborde sur la séance.
+        self.assertTrue(wizard._check_conflict(creneaux, jour, 8.75, 30)[0])
+        # Autre jour : libre.
+        self.assertFalse(wizard._check_conflict(creneaux, jour + timedelta(days=1), 9.0, 30)[0])
+
+    def test_conflit_seances_accolees(self):
+        jour = date(2026, 5, 4)
+        wizard, creneaux = self._wizard_creneaux(jour)
+        self.assertEqual(wizard._check_conflict(creneaux, jour, 8.5, 30), (False, ''))
+        self.assertEqual(wizard._check_conflict(creneaux, jour, 10.0, 30), (False, ''))
+
+    def test_conflit_seance_annulee(self):
+        jour = date(2026, 5, 4)
+        wizard, creneaux = self._wizard_creneaux(jour)
+        self.assertEqual(len(creneaux[jour]), 2)
+        self.assertEqual(wizard._check_conflict(creneaux, jour, 11.0, 30), (False, ''))
+
+    def test_premier_creneau_libre(self):
+        jour = date(2026, 5, 4)
+        wizard, creneaux = self._wizard_creneaux(jour)
+        self.assertEqual(wizard._find_free_slot(creneaux, jour, 9.0, 30), (10.0, True))
+        self.assertEqual(wizard._find_free_slot(creneaux, jour, 8.0, 30), (8.0, False))
+
+        # Génération : séance décalée au premier créneau libre du même jour.
+        wizard.write({
+            'date_fin': jour, 'nb_seances': 0, 'heure_debut': 9.0, 'auto_decaler': True,
+            'acte_type_id': self.acte_type.id,
+        })
+        wizard.action_generer_dates()
+        self.assertEqual(wizard.ligne_ids.mapped('date'), [jour])
+        self.assertEqual(wizard.ligne_ids.heure_acte, 10.0)
+        self.assertFalse(wizard.ligne_ids.has_conflict)
+        self.assertIn('10h00', wizard.ligne_ids.conflict_info)
+
+    # ── Praticien / société stockés sur les actes ─────────────────────────
+
+    def test_praticien_societe_actes(self):
+        feuille = self.env['cps.feuille.soins'].create({
+            'praticien_id': self.praticien_kine.id,
+            'patient_id': self.patient.id,
+            'date_prescription': '2026-04-12',
+            'acte_ids': [(0, 0, {
+                'acte_type_id': self.acte_type.id,
+                'lettre_cle': 'AMK',
+                'date_acte': '2026-04-%02d' % jour,
+                'montant': 3675,
+            }) for jour in (13, 14)],
+        })
+        actes = feuille.acte_ids
+        self.assertEqual(actes.praticien_id, self.praticien_kine)
+        self.assertEqual(actes.company_id, feuille.company_id)
+
+        feuille.praticien_id = self.praticien_autre
+        self.env.flush_all()
+        Acte = self.env['cps.feuille.soins.acte']
+        self.assertEqual(
+            Acte.search([('praticien_id', '=', self.praticien_autre.id),
+                         ('date_acte', '=', '2026-04-13')]),
+            actes[0],
+        )
+        self.assertFalse(Acte.search_count([('praticien_id', '=', self.praticien_kine.id),
+                                            ('feuille_id', '=', feuille.id)]))
+        # Recherche des créneaux d'un praticien : plus de jointure sur la feuille.
+        requete = Acte._search([('praticien_id', '=', self.praticien_autre.id),
+                                ('date_acte', '=', '2026-04-13')])
+        self.assertNotIn('"cps_feuille_soins"', requete.select().code)
+
+    # ── Photo / scan ──────────────────────────────────────────────────────
+
+    def test_photo_piece_jointe(self):
+        try:
+            from PIL import Image
+        except ImportError:
+            self.skipTest('Pillow non installé')
+        tampon = io.BytesIO()
+        Image.new('RGB', (1200, 1600), 'white').save(tampon, 'JPEG')
+        photo = base64.b64encode(tampon.getvalue())
+        feuilles = self.feuille_kine | self.feuille_autre
+        feuilles.write({'photo_feuille': photo})
+
+        pieces = self.env['ir.attachment'].search([
+            ('res_model', '=', 'cps.feuille.soins'), ('res_field', '=', 'photo_feuille'),
+            ('res_id', 'in', feuilles.ids),
+        ])
+        self.assertEqual(len(pieces), 2)
+        # Même contenu : un seul fichier dans le filestore.
+        self.assertEqual(len(set(pieces.mapped('store_fname'))), 1)
+
+        if not self.feuille_kine.photo_miniature:
+            self.skipTest('Pillow sans support WebP')
+        miniature = base64.b64decode(self.feuille_kine.photo_miniature)
+        self.assertEqual(miniature[8:12], b'WEBP')
+        self.assertLess(len(miniature), len(tampon.getvalue()))
+
+        self.feuille_kine.photo_feuille = False
+        self.assertFalse(self.feuille_kine.photo_miniature)
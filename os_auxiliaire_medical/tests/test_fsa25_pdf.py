@@ -0,0 +1,135 @@
+"""
+Tests unitaires – remplissage natif du formulaire FSA25 (wizards/fsa25_pdf)
+Couvre :
+  - Disposition lue dans les gabarits : 16 lignes d'actes déduites de la
+    position, mêmes champs avec et sans fond
+  - Fichier de référence : texte d'une page identique à data/fsa25_page.golden
+  - Sortie déterministe ; fond partagé par les pages, sans champs de formulaire
+  - Texte trop long réduit à la largeur du champ, caractères accentués
+  - Impression d'une feuille et d'un bordereau sur le formulaire
+"""
+import datetime
+import io
+import os
+
+from odoo.tests.common import TransactionCase
+from odoo.tools.pdf import PdfFileReader
+
+from ..wizards.fsa25_pdf import MARGE, contenu_page, disposition, remplir
+
+GOLDEN = os.path.join(os.path.dirname(__file__), 'data', 'fsa25_page.golden')
+
+VALEURS = {
+    'name_texte': 'F2026-00042',
+    'patient_nom_texte': 'TERIITEHAU',
+    'patient_prenom_texte': 'HÉLÈNE',
+    'patient_dn_texte': '1234567',
+    'patient_date_naissance_texte': '05071984',
+    'praticien_name_texte': 'PRATICIEN KINÉSITHÉRAPEUTE (PAPEETE)',
+    'praticien_code_texte': 'K123',
+    'praticien_profession_texte': 'Masseur-kinésithérapeute',
+    'parcours_soins_oui': 'x',
+    'date_prescription_texte': '010326',
+    'maladie_oui': 'x',
+    'acte_01_date_texte': '020326',
+    'acte_01_lettre_cle_texte': 'AMK',
+    'acte_01_coefficient_texte': '7.5',
+    'acte_01_montant_texte': '3 675',
+    'acte_01_dimanche_ferie_oui': '',
+    'acte_05_date_texte': '090326',
+    'acte_05_nuit_oui': 'x',
+    'acte_16_date_texte': '300326',
+    'acte_16_montant_texte': '3 675',
+    'montant_total_texte': '11 025',
+    'montant_tiers_payant_texte': '7 718',
+    'montant_patient_texte': '3 307',
+}
+
+
+class TestFsa25Pdf(TransactionCase):
+
+    def _champs(self, fond=True):
+        return {champ[0]: champ for champ in disposition(fond)}
+
+    # ── Tests ─────────────────────────────────────────────────────────────
+
+    def test_disposition(self):
+        champs = self._champs()
+        lignes = [champs['acte_%02d_date_texte' % n][2] for n in range(1, 17)]
+        self.assertEqual(lignes, sorted(lignes, reverse=True))
+        self.assertNotIn('acte_17_date_texte', champs)
+        for suffixe in ('lettre_cle_texte', 'coefficient_texte', 'ifd_texte', 'ik_texte',
+                        'dimanche_ferie_oui', 'nuit_oui', 'montant_texte'):
+            self.assertEqual(champs['acte_05_' + suffixe][2], lignes[4])
+        # Bloc « assuré » : non rempli.
+        self.assertNotIn('patient_nom_2', champs)
+        self.assertEqual(disposition(True), disposition(False))
+
+    def test_fichier_de_reference(self):
+        with open(GOLDEN, 'rb') as f:
+            attendu = f.read()
+        self.assertEqual(contenu_page(disposition(False), VALEURS), attendu)
+
+    def test_sortie_deterministe(self):
+        for fond in (True, False):
+            premier, second = io.BytesIO(), io.BytesIO()
+            self.assertEqual(remplir([VALEURS, {}, VALEURS], premier, fond), 3)
+            remplir([VALEURS, {}, VALEURS], second, fond)
+            self.assertEqual(premier.getvalue(), second.getvalue())
+
+            reader = PdfFileReader(io.BytesIO(premier.getvalue()))
+            self.assertNotIn('/AcroForm', reader.trailer['/Root'])
+            fonds = set()
+            for i in range(3):
+                page = reader.getPage(i)
+                self.assertNotIn('/Annots', page)
+                *fond_page, texte = page.raw_get('/Contents')
+                fonds.add(tuple(ref.idnum for ref in fond_page))
+                self.assertEqual(texte.getObject().getData(),
+                                 contenu_page(disposition(fond), VALEURS if i != 1 else {}))
+            self.assertEqual(len(fonds), 1)
+
+    def test_texte_reduit(self):
+        champ = self._champs()['praticien_name_texte']
+        x0, taille = champ[1], champ[7]
+        ligne = contenu_page([champ], VALEURS).split(b'\n')[1]
+        self.assertIn(b'(PRATICIEN KIN\xc9SITH\xc9RAPEUTE \\(PAPEETE\\)) Tj', ligne)
+        taille_posee = float(ligne.split(b' Tf')[0].split()[-1])
+        self.assertLess(taille_posee, taille)
+        self.assertAlmostEqual(float(ligne.split(b' Tm')[0].split()[-2]), x0 + MARGE, delta=0.01)
+
+    def test_impression_feuille_et_bordereau(self):
+        praticien = self.env['res.partner'].create({'name': 'Praticien formulaire', 'vat': 'K77'})
+        patient = self.env['res.partner'].create({'name': 'Patient formulaire'})
+        bordereau = self.env['cps.bordereau'].create({
+            'praticien_id': praticien.id, 'date_bordereau': datetime.date(2026, 4, 1),
+        })
+        feuilles = self.env['cps.feuille.soins'].create([{
+            'praticien_id': praticien.id,
+            'patient_id': patient.id,
+            'date_prescription': '2026-03-01',
+            'bordereau_id': bordereau.id,
+            'acte_ids': [(0, 0, {
+                'date_acte': datetime.date(2026, 3, jour), 'lettre_cle': 'AMO',
+                'coefficient': 8, 'montant': 3920,
+            })],
+        } for jour in (12, 3)])
+
+        sortie = io.BytesIO()
+        self.assertEqual(feuilles[0]._fsa25_remplir(sortie, fond=False), 1)
+        page = PdfFileReader(io.BytesIO(sortie.getvalue())).getPage(0)
+        texte = page.raw_get('/Contents')[-1].getObject().getData()
+        self.assertIn(b'(K77) Tj', texte)
+        self.assertIn(b'(120326) Tj', texte)
+
+        # Bordereau : dans l'ordre des dates de début de soins.
+        sortie = io.BytesIO()
+        self.assertEqual(bordereau._fsa25_pdf(sortie, fond=True), 2)
+        reader = PdfFileReader(io.BytesIO(sortie.getvalue()))
+        premiere = reader.getPage(0).raw_get('/Contents')[-1].getObject().getData()
+        self.assertIn(b'(030326) Tj', premiere)
+
+        action = feuilles.action_print_fsa25_page_vierge()
+        self.assertEqual(action['url'], '/cps/feuille/fsa25.pdf?ids=%d,%d&fond=1' % tuple(feuilles.ids))
+        self.assertEqual(bordereau.action_print_fsa25()['url'],
+                         '/cps/bordereau/%d/fsa25.pdf' % bordereau.id)
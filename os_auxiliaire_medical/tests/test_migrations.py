@@ -0,0 +1,135 @@
+"""
+Tests unitaires – scripts de migration (migrations/<version>/)
+Couvre :
+  - Emplacement reconnu par Odoo : migrations/<version>/{pre,post}-*.py
+  - 17.0.2.4 : compteurs mensuels de tokens initialisés depuis le journal
+  - 17.0.2.5 : agrégats quotidiens initialisés depuis le journal
+  - 17.0.2.6 : praticien / société recopiés sur les actes en une requête
+  - 17.0.2.7 : scans des feuilles déplacés de la colonne vers les pièces
+    jointes, colonne supprimée
+"""
+import base64
+import io
+import os
+from datetime import date, datetime
+
+from odoo.modules.migration import load_script
+from odoo.tests.common import TransactionCase
+
+MIGRATIONS = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'migrations')
+
+
+def _script(version, etape):
+    """Module du script `etape` (pre / post) de `version`, tel que chargé par Odoo."""
+    dossier = os.path.join(MIGRATIONS, version)
+    (nom,) = [f for f in os.listdir(dossier) if f.startswith(etape + '-') and f.endswith('.py')]
+    return load_script(os.path.join(dossier, nom), 'os_auxiliaire_medical_%s_%s' % (
+        etape, version.replace('.', '_')))
+
+
+class TestMigrations(TransactionCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.praticien = cls.env['res.partner'].create({'name': 'Praticien migration'})
+        cls.patient = cls.env['res.partner'].create({'name': 'Patient migration'})
+        cls.feuille = cls.env['cps.feuille.soins'].create({
+            'praticien_id': cls.praticien.id,
+            'patient_id': cls.patient.id,
+            'date_prescription': '2026-04-10',
+        })
+
+    def _journal(self):
+        """Appels Claude d'un mois passé, hors log_usage (journal d'avant migration)."""
+        return self.env['cps.api.usage'].create([{
+            'date': datetime(2020, 1, jour, 9, 0),
+            'model': 'claude-haiku-4-5-20251001',
+            'operation': 'ocr_texte',
+            'input_tokens': 100 * jour,
+            'output_tokens': 10,
+            'success': jour != 20,
+        } for jour in (10, 10, 20)])
+
+    def _colonne(self, table, colonne):
+        self.env.cr.execute("""
+            SELECT 1 FROM information_schema.columns
+             WHERE table_name = %s AND column_name = %s
+        """, [table, colonne])
+        return bool(self.env.cr.fetchone())
+
+    # ── Tests ─────────────────────────────────────────────────────────────
+
+    def test_emplacement(self):
+        """Odoo ne charge que migrations/<version>/{pre,post,end}-*.py."""
+        for version in os.listdir(MIGRATIONS):
+            for nom in os.listdir(os.path.join(MIGRATIONS, version)):
+                if nom.endswith('.py'):
+                    self.assertTrue(nom.startswith(('pre-', 'post-', 'end-')), nom)
+
+    def test_compteurs_mensuels(self):
+        journal = self._journal()
+        self.env.flush_all()
+
+        _script('17.0.2.4', 'post').migrate(self.env.cr, '17.0.2.3.0')
+
+        Mensuel = self.env['cps.api.usage.mensuel']
+        company_id = self.env.company.id
+        total = sum(journal.mapped('total_tokens'))
+        self.assertEqual(Mensuel._tokens_du_mois(company_id, self.env.uid, date(2020, 1, 1)), total)
+        self.assertEqual(Mensuel._tokens_du_mois(company_id, None, date(2020, 1, 1)), total)
+
+    def test_agregats_quotidiens(self):
+        self._journal()
+        self.env.flush_all()
+
+        _script('17.0.2.5', 'post').migrate(self.env.cr, '17.0.2.4.0')
+
+        jours = self.env['cps.api.usage.jour'].search(
+            [('jour', '>=', date(2020, 1, 1)), ('jour', '<', date(2020, 2, 1))], order='jour')
+        self.assertEqual(jours.mapped('jour'), [date(2020, 1, 10), date(2020, 1, 20)])
+        self.assertEqual(jours.mapped('user_id'), self.env.user)
+        self.assertEqual(jours.mapped('nb_appels'), [2, 1])
+        self.assertEqual(jours.mapped('nb_erreurs'), [0, 1])
+        self.assertEqual(jours.mapped('total_tokens'), [2020, 2010])
+
+    def test_praticien_societe_actes(self):
+        self.feuille.acte_ids = [(0, 0, {
+            'date_acte': '2026-04-12', 'lettre_cle': 'AMK', 'coefficient': 7.5, 'montant': 3675,
+        })]
+        self.env.flush_all()
+        self.env.cr.execute("""
+            UPDATE cps_feuille_soins_acte SET praticien_id = NULL, company_id = NULL
+             WHERE feuille_id = %s
+        """, [self.feuille.id])
+
+        _script('17.0.2.6', 'pre').migrate(self.env.cr, '17.0.2.5.0')
+
+        self.env.invalidate_all()
+        acte = self.feuille.acte_ids
+        self.assertEqual(acte.praticien_id, self.praticien)
+        self.assertEqual(acte.company_id, self.feuille.company_id)
+
+    def test_photos_en_pieces_jointes(self):
+        try:
+            from PIL import Image
+        except ImportError:
+            self.skipTest('Pillow non installé')
+        tampon = io.BytesIO()
+        Image.new('RGB', (300, 400), 'white').save(tampon, 'JPEG')
+        photo = base64.b64encode(tampon.getvalue())
+        # Colonne de la version 17.0.2.6 (Binary sans attachment : base64).
+        self.env.flush_all()
+        self.env.cr.execute("ALTER TABLE cps_feuille_soins ADD COLUMN photo_feuille BYTEA")
+        self.env.cr.execute("UPDATE cps_feuille_soins SET photo_feuille = %s WHERE id = %s",
+                            [photo, self.feuille.id])
+
+        _script('17.0.2.7', 'post').migrate(self.env.cr, '17.0.2.6.0')
+
+        self.assertFalse(self._colonne('cps_feuille_soins', 'photo_feuille'))
+        self.env.invalidate_all()
+        self.assertEqual(self.feuille.photo_feuille, photo)
+        self.assertTrue(self.env['ir.attachment'].search_count([
+            ('res_model', '=', 'cps.feuille.soins'), ('res_field', '=', 'photo_feuille'),
+            ('res_id', '=', self.feuille.id),
+        ]))
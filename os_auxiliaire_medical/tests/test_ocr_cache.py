@@ -0,0 +1,115 @@
+"""
+Tests unitaires – cps.ocr.cache (cache des analyses Claude)
+Couvre :
+  - Clé : contenu + modèle + version du prompt
+  - Même texte re-soumis : aucun nouvel appel, trace cps.api.usage à 0 token
+  - Bouton OCR de l'ordonnance : même image, un seul appel
+  - Éviction par ancienneté puis par taille totale
+"""
+import base64
+from datetime import timedelta
+
+from odoo import fields
+from odoo.tests.common import TransactionCase
+
+from .anthropic_stub import AnthropicStub
+
+REPONSE_CLAUDE = {
+    'prescripteur_nom': 'MARTIN',
+    'date_prescription': '2026-03-02',
+    'patient_nom': 'DUPONT',
+    'actes': [{'lettre_cle': 'AMO', 'coefficient': 10, 'nb_seances': 12}],
+}
+TEXTE = "Docteur MARTIN\nPatient : DUPONT Alice\nAMO 10 x 12 séances\n02/03/2026"
+
+
+class TestOcrCache(TransactionCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.Cache = cls.env['cps.ocr.cache']
+        cls.Usage = cls.env['cps.api.usage']
+        praticien = cls.env['res.partner'].create({'name': 'Praticien cache'})
+        patient = cls.env['res.partner'].create({'name': 'Patient cache'})
+        cls.ordonnance = cls.env['cps.ordonnance'].create({
+            'praticien_id': praticien.id,
+            'patient_id': patient.id,
+            'date_prescription': '2026-03-02',
+        })
+        params = cls.env['ir.config_parameter'].sudo()
+        params.set_param('cps.anthropic.api.key', 'sk-test')
+
+    def _stub_param(self, stub):
+        self.env['ir.config_parameter'].sudo().set_param('cps.anthropic.api.url', stub.url)
+
+    def _usages(self):
+        return self.Usage.search([('ordonnance_id', '=', self.ordonnance.id)], order='id')
+
+    # ── Tests ─────────────────────────────────────────────────────────────
+
+    def test_cle(self):
+        self.Cache.ecrire(b'scan', 'haiku', 'v1', 'ocr_vision', {'patient_nom': 'X'})
+        self.assertEqual(self.Cache.lire(b'scan', 'haiku', 'v1'), {'patient_nom': 'X'})
+        self.assertIsNone(self.Cache.lire(b'scan', 'haiku', 'v2'))
+        self.assertIsNone(self.Cache.lire(b'scan', 'sonnet', 'v1'))
+        self.assertIsNone(self.Cache.lire(b'autre scan', 'haiku', 'v1'))
+        # Seconde écriture (job concurrent) : sans effet ni erreur.
+        self.Cache.ecrire(b'scan', 'haiku', 'v1', 'ocr_vision', {'patient_nom': 'Y'})
+        entree = self.Cache.search([('model', '=', 'haiku')])
+        self.assertEqual(len(entree), 1)
+        self.assertEqual(entree.nb_hits, 1)
+
+    def test_texte_resoumis(self):
+        wizard = self.env['cps.wizard.ocr.ordonnance'].create({
+            'ordonnance_id': self.ordonnance.id,
+            'fichier': base64.b64encode(b'scan'),
+            'fichier_nom': 'scan.png',
+        })
+        with AnthropicStub(REPONSE_CLAUDE) as stub:
+            self._stub_param(stub)
+            premier = wizard._analyser_texte(TEXTE, 'Alice')
+            second = wizard._analyser_texte(TEXTE, 'Alice')
+        self.assertEqual(len(stub.requetes), 1)
+        self.assertEqual(premier['actes_json'], second['actes_json'])
+        self.assertIn('cache', second['claude_status'])
+
+        appel, hit = self._usages()
+        self.assertFalse(appel.cache_hit)
+        self.assertEqual(appel.total_tokens, 160)
+        self.assertTrue(hit.cache_hit)
+        self.assertEqual(hit.total_tokens, 0)
+
+    def test_bouton_ocr_ordonnance(self):
+        self.ordonnance.ordonnance_image = base64.b64encode(b'\x89PNG\r\n\x1a\nordonnance')
+        with AnthropicStub({'date_prescription': '2026-03-05', 'actes': []}) as stub:
+            self._stub_param(stub)
+            self.ordonnance.action_ocr_ordonnance()
+            self.ordonnance.action_ocr_ordonnance()
+        self.assertEqual(len(stub.requetes), 1)
+        self.assertEqual(str(self.ordonnance.date_prescription), '2026-03-05')
+        self.assertEqual(self._usages().mapped('cache_hit'), [False, True])
+
+    def test_eviction(self):
+        for i in range(3):
+            self.Cache.ecrire(b'scan %d' % i, 'haiku', 'v1', 'ocr_texte', {'n': 'x' * 400_000})
+        entrees = self.Cache.search([('model', '=', 'haiku')], order='id')
+        maintenant = fields.Datetime.now()
+        entrees[0].date_dernier_acces = maintenant - timedelta(days=200)
+        entrees[1].date_dernier_acces = maintenant - timedelta(days=2)
+        entrees[2].date_dernier_acces = maintenant - timedelta(days=1)
+
+        params = self.env['ir.config_parameter'].sudo()
+        params.set_param('cps.ocr.cache.max_jours', '90')
+        params.set_param('cps.ocr.cache.max_mo', '0')
+        self.Cache._cron_purger_cache()
+        self.assertFalse(entrees.exists())
+
+        for i in range(3):
+            self.Cache.ecrire(b'scan %d' % i, 'haiku', 'v1', 'ocr_texte', {'n': 'x' * 400_000})
+        entrees = self.Cache.search([('model', '=', 'haiku')], order='id')
+        entrees[0].date_dernier_acces = maintenant - timedelta(days=3)
+        params.set_param('cps.ocr.cache.max_mo', '1')
+        self.Cache._cron_purger_cache()
+        # ~1,2 Mo au total : la moins récemment lue saute.
+        self.assertEqual(entrees.exists(), entrees[1:])
@@ -0,0 +1,91 @@
+"""
+Tests unitaires – pré-traitement des images pour Claude vision
+Couvre :
+  - Réduction au plus grand côté configuré et ré-encodage JPEG niveaux de gris
+  - Rotation EXIF appliquée aux pixels
+  - Redressement d'une photo inclinée, rognage des marges
+  - Image illisible : fichier d'origine renvoyé tel quel
+  - Options lues dans les Paramètres (désactivation comprise)
+  - Miniature WebP des listes (taille, orientation, PDF ignoré)
+"""
+import io
+import unittest
+
+from odoo.tests.common import TransactionCase
+
+from ..wizards.ocr_image import (
+    MINIATURE_COTE, _angle_redressement, miniature_webp, preparer_image, tokens_estimes,
+)
+from .ocr_fixtures import ORDONNANCES, photo_ordonnance
+
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
+
+
+@unittest.skipIf(Image is None, 'Pillow non installé')
+class TestOcrImage(TransactionCase):
+
+    def _ouvrir(self, data):
+        return Image.open(io.BytesIO(data))
+
+    # ── Tests ─────────────────────────────────────────────────────────────
+
+    def test_reduction_jpeg_gris(self):
+        data = photo_ordonnance(ORDONNANCES[0]['lignes'])
+        image, media_type, infos = preparer_image(data, {'cote_max': 1000, 'rogner': False})
+        self.assertEqual(media_type, 'image/jpeg')
+        resultat = self._ouvrir(image)
+        self.assertEqual(resultat.format, 'JPEG')
+        self.assertEqual(resultat.mode, 'L')
+        self.assertEqual(max(resultat.size), 1000)
+        self.assertLess(len(image), len(data))
+        self.assertLess(infos['tokens_apres'], infos['tokens_avant'])
+
+    def test_rotation_exif(self):
+        data = photo_ordonnance(ORDONNANCES[0]['lignes'], orientation_exif=6)
+        self.assertGreater(self._ouvrir(data).width, self._ouvrir(data).height)
+        image, _mt, _infos = preparer_image(data, {'rogner': False, 'redresser': False})
+        resultat = self._ouvrir(image)
+        self.assertLess(resultat.width, resultat.height)
+
+    def test_redressement_et_rognage(self):
+        data = photo_ordonnance(ORDONNANCES[1]['lignes'], angle=-3)
+        image, _mt, infos = preparer_image(data)
+        gris = self._ouvrir(image).convert('L')
+        self.assertLessEqual(abs(_angle_redressement(gris)), 0.5)
+        # Marges de la photo supprimées : bien moins de pixels que la page réduite.
+        self.assertLess(infos['apres'][0] * infos['apres'][1], 1568 * 1176 / 2)
+
+    def test_image_illisible(self):
+        self.assertEqual(preparer_image(b'pas une image'), (b'pas une image', None, {}))
+
+    def test_tokens_estimes(self):
+        self.assertEqual(tokens_estimes(750, 1000), 1000)
+        # Plafonné comme l'API : 1568 px de côté.
+        self.assertEqual(tokens_estimes(3024, 4032), tokens_estimes(1176, 1568))
+
+    def test_options_parametres(self):
+        Wizard = self.env['cps.wizard.ocr.ordonnance']
+        params = self.env['ir.config_parameter'].sudo()
+        params.set_param('cps.vision.pretraitement', 'True')
+        params.set_param('cps.vision.cote_max', '1200')
+        params.set_param('cps.vision.rogner', False)
+        options = Wizard._get_options_vision()
+        self.assertEqual(options['cote_max'], 1200)
+        self.assertFalse(options['rogner'])
+        params.set_param('cps.vision.pretraitement', False)
+        self.assertIsNone(Wizard._get_options_vision())
+
+    def test_miniature_webp(self):
+        data = photo_ordonnance(ORDONNANCES[0]['lignes'], orientation_exif=6)
+        miniature = miniature_webp(data)
+        if miniature is None:
+            self.skipTest('Pillow sans support WebP')
+        resultat = self._ouvrir(miniature)
+        self.assertEqual(resultat.format, 'WEBP')
+        self.assertEqual(max(resultat.size), MINIATURE_COTE)
+        self.assertLess(resultat.width, resultat.height)
+        self.assertLess(len(miniature), len(data) / 10)
+        self.assertIsNone(miniature_webp(b'%PDF-1.4 scan'))
@@ -0,0 +1,165 @@
+"""
+Tests unitaires – cps.ocr.job (analyses OCR en arrière-plan)
+Couvre :
+  - Le wizard met l'analyse en file et rend la main sans appel réseau
+  - Traitement par le cron : Claude texte sur un stub local de l'API Anthropic
+  - Clé API saisie dans le wizard effacée du job dès la fin de l'analyse
+  - Récupération du résultat par le wizard (Actualiser)
+  - Échec d'extraction : job en échec, wizard revenu à l'étape 1
+  - Erreur HTTP de l'API : job terminé avec statut d'erreur
+  - Job traité par le cron au nom du demandeur : budget personnel et
+    compteur mensuel de tokens et agrégat quotidien du demandeur
+"""
+import base64
+
+from odoo.tests.common import TransactionCase
+
+from .anthropic_stub import AnthropicStub
+
+REPONSE_CLAUDE = {
+    'prescripteur_nom': 'MARTIN',
+    'prescripteur_code': 'AB1234',
+    'date_prescription': '2026-03-02',
+    'patient_nom': 'DUPONT',
+    'actes': [{'lettre_cle': 'AMO', 'coefficient': 10, 'nb_seances': 12}],
+}
+TEXTE = "Docteur MARTIN\nPatient : DUPONT Alice\nAMO 10 x 12 séances\n02/03/2026"
+
+
+class TestOcrJob(TransactionCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.Job = cls.env['cps.ocr.job']
+        praticien = cls.env['res.partner'].create({'name': 'Praticien OCR'})
+        patient = cls.env['res.partner'].create({'name': 'Patient OCR'})
+        cls.ordonnance = cls.env['cps.ordonnance'].create({
+            'praticien_id': praticien.id,
+            'patient_id': patient.id,
+            'date_prescription': '2026-03-02',
+        })
+        cls.demandeur = cls.env['res.users'].create({
+            'name': 'Demandeur OCR',
+            'login': 'demandeur_ocr@cps.pf',
+            'groups_id': [(4, cls.env.ref('os_auxiliaire_medical.group_cps_user').id)],
+        })
+
+    def _wizard(self, user=None, **vals):
+        Wizard = self.env['cps.wizard.ocr.ordonnance']
+        if user:
+            Wizard = Wizard.with_user(user)
+        return Wizard.create(dict({
+            'ordonnance_id': self.ordonnance.id,
+            'fichier': base64.b64encode(b'pas une image'),
+            'fichier_nom': 'scan.png',
+        }, **vals))
+
+    def _stub_param(self, stub):
+        self.env['ir.config_parameter'].sudo().set_param('cps.anthropic.api.url', stub.url)
+
+    # ── Tests ─────────────────────────────────────────────────────────────
+
+    def test_extraire_met_en_file(self):
+        with AnthropicStub(REPONSE_CLAUDE) as stub:
+            self._stub_param(stub)
+            wizard = self._wizard(use_claude_vision=True, claude_api_key='sk-test')
+            wizard.action_extraire()
+            self.assertEqual(wizard.etat, 'en_cours')
+            self.assertEqual(wizard.job_id.state, 'queued')
+            self.assertFalse(stub.requetes)
+
+    def test_claude_texte_par_le_cron(self):
+        with AnthropicStub(REPONSE_CLAUDE) as stub:
+            self._stub_param(stub)
+            wizard = self._wizard(
+                etat='extrait', texte_extrait=TEXTE,
+                use_claude_ai=True, claude_api_key='sk-test',
+            )
+            wizard.action_reanalyser()
+            self.assertEqual(wizard.job_id.state, 'queued')
+
+            self.Job._cron_traiter_jobs()
+
+        self.assertEqual(wizard.job_id.state, 'done')
+        self.assertEqual(len(stub.requetes), 1)
+        requete = stub.requetes[0]
+        self.assertEqual(requete['path'], '/v1/messages')
+        self.assertEqual(requete['headers'].get('x-api-key'), 'sk-test')
+        self.assertFalse(wizard.job_id.sudo().claude_api_key)
+
+        wizard.action_actualiser()
+        self.assertEqual(wizard.etat, 'extrait')
+        self.assertEqual(wizard.prescripteur_code, 'AB1234')
+        self.assertEqual(str(wizard.date_prescription), '2026-03-02')
+        self.assertIn('AMO', wizard.actes_json)
+        self.assertIn('✅', wizard.claude_status)
+
+    def test_echec_extraction(self):
+        wizard = self._wizard()
+        wizard.action_extraire()
+        self.Job._cron_traiter_jobs()
+        self.assertEqual(wizard.job_id.state, 'failed')
+        self.assertTrue(wizard.job_id.error_message)
+        self.assertFalse(wizard.job_id.sudo().claude_api_key)
+
+        wizard.action_actualiser()
+        self.assertEqual(wizard.etat, 'attente')
+        self.assertIn('❌', wizard.claude_status)
+
+    def test_erreur_http(self):
+        self.env['ir.config_parameter'].sudo().set_param('cps.anthropic.tentatives', '0')
+        with AnthropicStub(status=500) as stub:
+            self._stub_param(stub)
+            wizard = self._wizard(
+                etat='extrait', texte_extrait=TEXTE,
+                use_claude_ai=True, claude_api_key='sk-test',
+            )
+            wizard.action_reanalyser()
+            self.Job._cron_traiter_jobs()
+
+        self.assertEqual(wizard.job_id.state, 'done')
+        wizard.action_actualiser()
+        self.assertIn('HTTP 500', wizard.claude_status)
+
+    def _job_du_demandeur(self, stub):
+        """Ré-analyse Claude mise en file par le demandeur, traitée par le cron."""
+        self._stub_param(stub)
+        wizard = self._wizard(
+            user=self.demandeur, etat='extrait', texte_extrait=TEXTE,
+            use_claude_ai=True, claude_api_key='sk-test',
+        )
+        wizard.action_reanalyser()
+        self.assertEqual(wizard.job_id.user_id, self.demandeur)
+        # Cron : environnement système, pas celui du demandeur.
+        self.Job._cron_traiter_jobs()
+        self.assertEqual(wizard.job_id.state, 'done')
+        return wizard.job_id
+
+    def test_cron_au_nom_du_demandeur(self):
+        Mensuel = self.env['cps.api.usage.mensuel']
+        company_id = self.env.company.id
+        with AnthropicStub(REPONSE_CLAUDE) as stub:
+            self._job_du_demandeur(stub)
+        self.assertEqual(len(stub.requetes), 1)
+        usage = self.env['cps.api.usage'].search(
+            [('ordonnance_id', '=', self.ordonnance.id)])
+        self.assertEqual(usage.user_id, self.demandeur)
+        self.assertTrue(Mensuel._tokens_du_mois(company_id, self.demandeur.id))
+        self.assertFalse(Mensuel._tokens_du_mois(company_id, self.env.uid))
+        jour = self.env['cps.api.usage.jour'].search([
+            ('operation', '=', usage.operation), ('jour', '=', usage.date.date()),
+        ])
+        self.assertEqual(jour.user_id, self.demandeur)
+        self.assertEqual(jour.nb_appels, 1)
+        self.assertEqual(jour.total_tokens, usage.input_tokens + usage.output_tokens)
+
+    def test_budget_du_demandeur(self):
+        self.env['cps.api.budget'].search([('company_id', '=', self.env.company.id)]).unlink()
+        self.env['cps.api.budget'].create({
+            'company_id': self.env.company.id, 'user_id': self.demandeur.id, 'limite_dure': 1,
+        })
+        with AnthropicStub(REPONSE_CLAUDE) as stub:
+            self._job_du_demandeur(stub)
+        # Budget personnel épuisé : pas d'appel, bien que le cron n'ait aucune limite.
+        self.assertFalse(stub.requetes)
@@ -0,0 +1,54 @@
+"""
+Tests unitaires – OCR local des PDF scannés, pages en parallèle
+Couvre :
+  - Texte identique en séquence et en parallèle, pages dans l'ordre
+  - Arrêt dès l'en-tête et les actes trouvés : pages suivantes non traitées
+  - Critère d'arrêt du wizard (_ordonnance_trouvee)
+"""
+import time
+
+from odoo.tests.common import TransactionCase
+
+from ..wizards.ocr_local import _assembler, ocr_pages
+from ..wizards.wizard_ocr_ordonnance import _ordonnance_trouvee
+
+PAGES = {
+    1: 'Docteur MARTIN\nPapeete, le 02/03/2026',
+    2: 'Patient : DUPONT Alice\nAMO 10 x 12 séances',
+}
+
+
+def _page_factice(tache):
+    """Remplace la rastérisation + tesseract d'une page."""
+    _chemin, page, delai = tache
+    time.sleep(delai)
+    return PAGES.get(page, 'Annexe page %d' % page)
+
+
+class TestOcrLocal(TransactionCase):
+
+    def _taches(self, nb_pages, delai=0.0):
+        return [(None, page, delai) for page in range(1, nb_pages + 1)]
+
+    # ── Tests ─────────────────────────────────────────────────────────────
+
+    def test_parallele_identique(self):
+        sequence = ocr_pages(self._taches(6), _page_factice, max_workers=1)
+        parallele = ocr_pages(self._taches(6, delai=0.01), _page_factice, max_workers=3)
+        self.assertEqual(sorted(parallele), list(range(1, 7)))
+        self.assertEqual(_assembler(parallele), _assembler(sequence))
+        self.assertTrue(_assembler(sequence).startswith(PAGES[1]))
+
+    def test_arret_anticipe(self):
+        sequence = ocr_pages(self._taches(12), _page_factice, max_workers=1,
+                             arret=_ordonnance_trouvee)
+        self.assertEqual(sorted(sequence), [1, 2])
+        parallele = ocr_pages(self._taches(12, delai=0.05), _page_factice, max_workers=2,
+                              arret=_ordonnance_trouvee)
+        self.assertIn(2, parallele)
+        self.assertLessEqual(len(parallele), 4)
+
+    def test_critere_arret(self):
+        self.assertFalse(_ordonnance_trouvee(PAGES[1]))
+        self.assertFalse(_ordonnance_trouvee(PAGES[2].replace('AMO 10 x 12 séances', '')))
+        self.assertTrue(_ordonnance_trouvee(PAGES[1] + '\n' + PAGES[2]))
@@ -0,0 +1,93 @@
+"""
+Tests unitaires – parser local du texte OCR des ordonnances
+Couvre :
+  - Corpus anonymisé (ocr_fixtures.TEXTES) : tous les champs exacts
+  - Positions : chaque span désigne la valeur extraite dans le texte
+  - Confiance selon la règle (Dr vs civilité, séances explicites, dates concordantes)
+  - Dates hors plage / invalides ignorées, code postal non pris pour un code
+  - Surlignage HTML du wizard (texte échappé)
+"""
+import datetime
+
+from odoo.tests.common import TransactionCase
+
+from ..wizards.ocr_parser import CONFIANCE, parse_ordonnance_text
+from ..wizards.wizard_ocr_ordonnance import _surligner
+from .ocr_fixtures import TEXTES
+
+
+def _resume(parsed):
+    """Champs du parser au format de `attendu` (dates ISO, actes en tuples)."""
+    date = parsed['date_prescription']
+    return {
+        'prescripteur_nom': parsed['prescripteur_nom'],
+        'prescripteur_code': parsed['prescripteur_code'],
+        'date_prescription': date.isoformat() if date else None,
+        'patient_nom': parsed['patient_nom'],
+        'patient_prenom': parsed['patient_prenom'],
+        'actes': [(a['lettre_cle'], a['coefficient'], a['nb_seances']) for a in parsed['actes']],
+    }
+
+
+class TestOcrParser(TransactionCase):
+
+    # ── Tests ─────────────────────────────────────────────────────────────
+
+    def test_corpus(self):
+        for no, cas in enumerate(TEXTES):
+            with self.subTest(texte=no):
+                self.assertEqual(_resume(parse_ordonnance_text(cas['texte'])), cas['attendu'])
+
+    def test_positions(self):
+        for cas in TEXTES:
+            texte = cas['texte']
+            parsed = parse_ordonnance_text(texte)
+            positions = parsed['positions']
+            if parsed['prescripteur_nom']:
+                debut, fin = positions['prescripteur_nom']
+                self.assertEqual(texte[debut:fin], parsed['prescripteur_nom'])
+            if parsed['prescripteur_code']:
+                debut, fin = positions['prescripteur_code']
+                self.assertEqual(texte[debut:fin], parsed['prescripteur_code'])
+            if parsed['patient_nom']:
+                debut, fin = positions['patient']
+                self.assertTrue(texte[debut:fin].upper().startswith(parsed['patient_nom']))
+            self.assertEqual(len(positions['actes']), len(parsed['actes']))
+            for (debut, fin), acte in zip(positions['actes'], parsed['actes']):
+                self.assertEqual(texte[debut:fin][:len(acte['lettre_cle'])].upper(),
+                                 acte['lettre_cle'])
+
+    def test_confiance(self):
+        parsed = parse_ordonnance_text('Dr TEHEI\nLe 15/01/2026\nMme TAPUTU Hina\nAMI 3\n')
+        confiance = parsed['confiance']
+        self.assertEqual(confiance['prescripteur_nom'], CONFIANCE['docteur'])
+        self.assertEqual(confiance['patient'], CONFIANCE['civilite_patient'])
+        self.assertEqual(confiance['actes'], [CONFIANCE['acte_seul']])
+        self.assertEqual(parsed['actes'][0]['nb_seances'], 1)
+
+        parsed = parse_ordonnance_text('M. ROCHE\nle 01/02/2026\nle 03/02/2026\n')
+        self.assertEqual(parsed['prescripteur_nom'], 'ROCHE')
+        self.assertEqual(parsed['confiance']['prescripteur_nom'],
+                         CONFIANCE['civilite_prescripteur'])
+        self.assertEqual(parsed['confiance']['date_prescription'], CONFIANCE['date_multiple'])
+        self.assertFalse(parsed['patient_nom'])
+
+    def test_dates_et_codes_ignores(self):
+        parsed = parse_ordonnance_text(
+            'Code postal 98714\nné le 04/07/1958\nle 31/04/2026\nle 12 juin 2026\n')
+        self.assertFalse(parsed['prescripteur_code'])
+        self.assertEqual(parsed['date_prescription'], datetime.date(2026, 6, 12))
+
+    def test_texte_vide(self):
+        parsed = parse_ordonnance_text('')
+        self.assertEqual(parsed['actes'], [])
+        self.assertEqual(parsed['positions'], {'actes': []})
+
+    def test_surlignage(self):
+        parsed = parse_ordonnance_text('Dr MARTIN <cabinet>\nPatient : DUPONT Alice\nAMO 10 x 5\n')
+        html = str(_surligner(parsed))
+        self.assertIn('&lt;cabinet&gt;', html)
+        self.assertIn('>MARTIN</mark>', html)
+        self.assertIn('>DUPONT Alice</mark>', html)
+        self.assertIn('>AMO 10 x 5</mark>', html)
+        self.assertIn('bg-success-subtle', html)
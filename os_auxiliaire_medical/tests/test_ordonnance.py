@@ -4,6 +4,7 @@ Couvre :
   - Création d'une ordonnance sans patient (OCR use-case)
   - Unicité de l'acte_type_id par ordonnance
   - Patient obligatoire dès qu'on ajoute une ligne d'acte
+  - Séances planifiées / restantes par ligne et séances disponibles de l'ordonnance
 """
 from odoo.tests.common import TransactionCase
 from odoo.exceptions import ValidationError
@@ -115,3 +116,47 @@ class TestOrdonnance(TransactionCase):
         })
         self.assertEqual(len(ordonnance.ligne_ids), 2)
         self.assertIn(ligne_b, ordonnance.ligne_ids)
+
+    # ── Compteurs de séances ──────────────────────────────────────────────
+
+    def test_compteurs_seances(self):
+        """Séances planifiées comptées par ligne ; ordonnance épuisée puis rouverte."""
+        ordonnance = self.env['cps.ordonnance'].create({
+            'patient_id':      self.patient.id,
+            'praticien_id':    self.praticien.id,
+            'date_prescription': '2026-04-01',
+            'ligne_ids': [
+                (0, 0, {'acte_type_id': self.acte_a.id, 'nb_seances': 3}),
+                (0, 0, {'acte_type_id': self.acte_b.id, 'nb_seances': 2}),
+            ],
+        })
+        ligne_a, ligne_b = ordonnance.ligne_ids
+        self.assertTrue(ordonnance.has_seances_disponibles)
+
+        feuille = self.env['cps.feuille.soins'].create({
+            'praticien_id': self.praticien.id,
+            'patient_id':   self.patient.id,
+            'ordonnance_id': ordonnance.id,
+            'date_prescription': '2026-04-01',
+            'acte_ids': [(0, 0, {
+                'ordonnance_ligne_id': ligne.id,
+                'acte_type_id': ligne.acte_type_id.id,
+                'date_acte': '2026-04-%02d' % (2 + i),
+                'lettre_cle': ligne.acte_type_id.lettre_cle,
+                'montant': 3675,
+                'state_seance': 'planifiee',
+            }) for i, ligne in enumerate((ligne_a, ligne_a, ligne_a, ligne_b, ligne_b))],
+        })
+        self.assertEqual(ligne_a.nb_seances_planifiees, 3)
+        self.assertEqual(ligne_a.nb_seances_theorique_restantes, 0)
+        self.assertEqual(ligne_b.nb_seances_theorique_restantes, 0)
+        self.assertFalse(ordonnance.has_seances_disponibles)
+
+        feuille.acte_ids.filtered(
+            lambda a: a.ordonnance_ligne_id == ligne_b)[0].state_seance = 'annulee'
+        self.assertEqual(ligne_b.nb_seances_planifiees, 1)
+        self.assertEqual(ligne_b.nb_seances_theorique_restantes, 1)
+        self.assertTrue(ordonnance.has_seances_disponibles)
+        self.assertIn(ordonnance, self.env['cps.ordonnance'].search([
+            ('patient_id', '=', self.patient.id), ('has_seances_disponibles', '=', True),
+        ]))
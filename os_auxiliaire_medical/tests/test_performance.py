@@ -0,0 +1,768 @@
+"""
+Bancs de mesure – performances CPS
+Non exécutés par défaut ; à lancer avec :
+    odoo-bin -d <db> -u os_auxiliaire_medical --test-tags cps_benchmark
+
+Couvre :
+  - Écriture d'actes / taille de ligne cps_feuille_soins (champs FSA25 non stockés)
+  - Construction groupée des field maps FSA25 (1 → 1000 feuilles)
+  - Liste des feuilles avec scans : lecture de la vue liste, taille de ligne, miniatures
+  - Revalorisation d'une année d'actes au tarif en vigueur à leur date
+  - Génération du planning (wizard de sélection de dates) : 1 → 12 mois
+  - Compteurs de séances d'un patient suivi sur plusieurs années (changement
+    de statut d'une séance, recherche des ordonnances avec séances disponibles)
+  - Cron nocturne des séances passées (planifiée → effectuée) : volume et requêtes
+  - Flux agenda d'un praticien : vue calendrier (related) vs lignes compactes vs ETag
+  - Recherches de séances par praticien (agenda, wizard de dates) : plans et durées
+    par la feuille (jointure) vs par le praticien stocké sur l'acte
+  - Optimiseur d'agenda sur cabinets synthétiques de 5 à 50 praticiens
+  - Clôture mensuelle des bordereaux : 20 praticiens, 5 → 50 feuilles chacun
+  - Impression des FSA25 d'un bordereau (200 feuilles) : pages/s sur le formulaire
+    PDF (sans / avec fond), puis en rapport HTML selon le nombre de wkhtmltopdf
+    simultanés et pages en cache
+  - Import OCR en lot (vision, API simulée) : débit selon les appels simultanés
+  - Pré-traitement des photos pour Claude vision : tokens, latence, exactitude
+    (API réelle si CPS_BENCH_ANTHROPIC_KEY est défini, sinon tesseract local)
+  - OCR d'un PDF scanné de 8 pages : pages en séquence vs en parallèle avec arrêt
+  - Parser local du texte OCR : exactitude par champ et durée sur le corpus anonymisé
+  - Tableau de bord de consommation Claude : pivot sur 3 ans de journal vs agrégats
+"""
+import base64
+import io
+import json
+import logging
+import os
+import random
+import time
+import zipfile
+from datetime import date, datetime, timedelta
+
+from odoo.tests.common import TransactionCase, tagged
+from odoo.tools import SQL
+
+from ..models.anthropic_client import ANTHROPIC_API_URL, envoyer
+from ..wizards.agenda_optimiseur import Demande, OptimiseurAgenda
+from ..wizards.ocr_image import preparer_image
+from ..wizards.ocr_local import ocr_pdf_scanne
+from ..wizards.wizard_ocr_ordonnance import (
+    _claude_payload_vision, _claude_texte_reponse,
+    _extract_text_image, _ordonnance_trouvee, parse_ordonnance_text,
+)
+from .anthropic_stub import AnthropicStub
+from .ocr_fixtures import ORDONNANCES, TEXTES, photo_ordonnance
+from .test_ocr_parser import _resume
+
+_logger = logging.getLogger(__name__)
+
+
+@tagged('post_install', '-at_install', '-standard', 'cps_benchmark')
+class TestPerformance(TransactionCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+
+        cls.cat_patient   = cls.env.ref('os_auxiliaire_medical.partner_category_patient')
+        cls.cat_praticien = cls.env.ref('os_auxiliaire_medical.partner_category_praticien')
+
+        cls.praticien = cls.env['res.partner'].create({
+            'name': 'Praticien Bench',
+            'category_id': [(4, cls.cat_praticien.id)],
+        })
+        cls.patient = cls.env['res.partner'].create({
+            'name': 'Patient Bench',
+            'category_id': [(4, cls.cat_patient.id)],
+        })
+        cls.acte_type = cls.env['cps.acte.type'].create({
+            'name': 'Acte bench',
+            'lettre_cle': 'AMK',
+            'coefficient_defaut': 7.5,
+            'tarif_unitaire': 490,
+            'profession': 'kinesitherapeute',
+        })
+
+    # ── Helpers ───────────────────────────────────────────────────────────
+
+    def _create_feuilles(self, nb_feuilles, nb_actes=16):
+        return self.env['cps.feuille.soins'].create([{
+            'praticien_id': self.praticien.id,
+            'patient_id':   self.patient.id,
+            'date_prescription': '2026-01-05',
+            'acte_ids': [(0, 0, {
+                'acte_type_id': self.acte_type.id,
+                'date_acte':    '2026-01-%02d' % (j % 28 + 1),
+                'lettre_cle':   'AMK',
+                'coefficient':  7.5,
+                'montant':      3675,
+            }) for j in range(nb_actes)],
+        } for _i in range(nb_feuilles)])
+
+    @staticmethod
+    def _chrono(fn, repeat=1):
+        start = time.perf_counter()
+        for _i in range(repeat):
+            fn()
+        return (time.perf_counter() - start) / repeat
+
+    # ── Feuilles de soins ─────────────────────────────────────────────────
+
+    def test_bench_ecriture_acte(self):
+        """Latence d'écriture d'un acte et taille moyenne d'une ligne de feuille."""
+        feuille = self._create_feuilles(1)
+        acte = feuille.acte_ids[0]
+
+        def ecrire():
+            acte.write({'coefficient': acte.coefficient + 0.5})
+            self.env.flush_all()
+
+        duree = self._chrono(ecrire, repeat=50)
+        self.env.cr.execute(
+            "SELECT avg(pg_column_size(f.*)) FROM cps_feuille_soins f WHERE id = %s",
+            [feuille.id],
+        )
+        taille = self.env.cr.fetchone()[0]
+        _logger.info(
+            'cps_benchmark écriture acte : %.2f ms / écriture, ligne feuille : %s octets',
+            duree * 1000, taille,
+        )
+        self.assertTrue(feuille.get_fsa25_field_map()['acte_01_coefficient_texte'])
+
+    def test_bench_fsa25_field_maps_lot(self):
+        """Construction groupée des field maps FSA25 : 1 → 1000 feuilles.
+
+        Le nombre de requêtes doit rester constant quelle que soit la taille
+        du lot (lectures groupées, pas d'accès acte par acte).
+        """
+        requetes = {}
+        for nb in (1, 10, 100, 1000):
+            feuilles = self._create_feuilles(nb)
+            self.env.flush_all()
+            self.env.invalidate_all()
+            self.env.registry.clear_cache()
+            avant = self.env.cr.sql_log_count
+            duree = self._chrono(feuilles.get_fsa25_field_maps)
+            requetes[nb] = self.env.cr.sql_log_count - avant
+            _logger.info(
+                'cps_benchmark field maps FSA25 : %4d feuilles, %8.2f ms (%.3f ms / feuille), '
+                '%d requêtes',
+                nb, duree * 1000, duree * 1000 / nb, requetes[nb],
+            )
+        self.assertEqual(requetes[1000], requetes[10])
+
+    def test_bench_liste_feuilles_scans(self):
+        """Vue liste de 200 feuilles scannées : scans en filestore, miniatures WebP."""
+        try:
+            from PIL import Image
+        except ImportError:
+            self.skipTest('Pillow non installé')
+        tampon = io.BytesIO()
+        Image.effect_noise((2000, 2800), 64).convert('RGB').save(tampon, 'JPEG', quality=90)
+        feuilles = self._create_feuilles(200, nb_actes=1)
+        for i, feuille in enumerate(feuilles):
+            # Contenus distincts : pas de partage de fichier dans le filestore.
+            feuille.photo_feuille = base64.b64encode(tampon.getvalue() + b'%d' % i)
+        self.env.flush_all()
+        self.env.invalidate_all()
+
+        champs = ['name', 'patient_id', 'praticien_id', 'date_prescription',
+                  'montant_total', 'state', 'photo_miniature']
+        Feuille = self.env['cps.feuille.soins'].with_context(bin_size=True)
+
+        def lire_liste():
+            self.env.invalidate_all()
+            Feuille.search_read([('id', 'in', feuilles.ids)], champs)
+
+        duree = self._chrono(lire_liste, repeat=5)
+        self.env.cr.execute(
+            "SELECT avg(pg_column_size(f.*)) FROM cps_feuille_soins f WHERE id IN %s",
+            [tuple(feuilles.ids)],
+        )
+        taille = self.env.cr.fetchone()[0]
+        miniatures = [len(base64.b64decode(m)) for m in
+                      feuilles.with_context(bin_size=False).mapped('photo_miniature') if m]
+        _logger.info(
+            'cps_benchmark liste feuilles scannées : 200 lignes en %.2f ms, ligne %s octets, '
+            'scan %d Ko, miniature %.1f Ko',
+            duree * 1000, taille, len(tampon.getvalue()) // 1024,
+            sum(miniatures) / max(len(miniatures), 1) / 1024,
+        )
+        self.assertLess(taille, 4096)
+
+    # ── Tarifs ────────────────────────────────────────────────────────────
+
+    def test_bench_revalorisation_annuelle(self):
+        """Revalorisation d'une année d'actes : requêtes indépendantes du volume."""
+        for mois, tarif in ((1, 495), (4, 500), (7, 505), (10, 510)):
+            self.env['cps.tarif.historique'].create({
+                'lettre_cle': 'AMK', 'tarif_unitaire': tarif,
+                'date_application': date(2026, mois, 1),
+            })
+        feuilles = self._create_feuilles(60)
+        debut = date(2026, 1, 1)
+        for i, acte in enumerate(feuilles.acte_ids):
+            acte.date_acte = debut + timedelta(days=i % 365)
+        self.env.flush_all()
+        self.env.invalidate_all()
+
+        actes = self.env['cps.feuille.soins.acte'].search([('feuille_id', 'in', feuilles.ids)])
+        avant = self.env.cr.sql_log_count
+        start = time.perf_counter()
+        nb = actes._revaloriser_montants()
+        self.env.flush_all()
+        duree = time.perf_counter() - start
+        requetes = self.env.cr.sql_log_count - avant
+        _logger.info(
+            'cps_benchmark revalorisation : %d actes (%d modifiés), %.2f ms, %d requêtes',
+            len(actes), nb, duree * 1000, requetes,
+        )
+        # 4 montants distincts → 4 écritures groupées, pas une par acte.
+        self.assertEqual(len(set(actes.mapped('montant'))), 4)
+        self.assertLess(requetes, len(actes) // 10)
+
+    # ── Planification ─────────────────────────────────────────────────────
+
+    def _patient_pluriannuel(self, nb_annees, seances_par_ligne, nb_lignes=3):
+        """Un patient, une ordonnance par an, toutes les séances planifiées en feuilles."""
+        patient = self.env['res.partner'].create({
+            'name': 'Patient pluriannuel %d' % seances_par_ligne,
+            'category_id': [(4, self.cat_patient.id)],
+        })
+        actes_types = self.env['cps.acte.type'].create([{
+            'name': 'Acte suivi %d-%d' % (seances_par_ligne, i),
+            'lettre_cle': 'AMK',
+            'coefficient_defaut': 7.5 + i,
+            'tarif_unitaire': 490,
+            'profession': 'kinesitherapeute',
+        } for i in range(nb_lignes)])
+        ordonnances = self.env['cps.ordonnance'].create([{
+            'praticien_id': self.praticien.id,
+            'patient_id': patient.id,
+            'date_prescription': date(2023 + annee, 1, 2),
+            'ligne_ids': [(0, 0, {
+                'acte_type_id': at.id, 'nb_seances': seances_par_ligne + 1,
+            }) for at in actes_types],
+        } for annee in range(nb_annees)])
+        vals_actes = [{
+            'ordonnance_ligne_id': ligne.id,
+            'acte_type_id': ligne.acte_type_id.id,
+            'date_acte': ligne.ordonnance_id.date_prescription + timedelta(days=i % 360),
+            'lettre_cle': 'AMK',
+            'montant': 3675,
+            'state_seance': 'planifiee',
+        } for ligne in ordonnances.ligne_ids for i in range(seances_par_ligne)]
+        self.env['cps.feuille.soins'].create([{
+            'praticien_id': self.praticien.id,
+            'patient_id': patient.id,
+            'date_prescription': '2023-01-02',
+            'acte_ids': [(0, 0, vals) for vals in vals_actes[i:i + 16]],
+        } for i in range(0, len(vals_actes), 16)])
+        self.env.flush_all()
+        self.env.invalidate_all()
+        return patient, ordonnances
+
+    def test_bench_seances_pluriannuelles(self):
+        """Statut d'une séance et séances disponibles : coût indépendant de l'historique.
+
+        Le comptage des séances planifiées d'une ligne est une agrégation SQL :
+        changer le statut d'une séance ne charge pas les centaines d'autres
+        séances de la ligne.
+        """
+        requetes = {}
+        for seances in (20, 200):
+            patient, ordonnances = self._patient_pluriannuel(4, seances)
+            ligne = ordonnances[0].ligne_ids[0]
+            acte = self.env['cps.feuille.soins.acte'].search(
+                [('ordonnance_ligne_id', '=', ligne.id)], limit=1)
+            etats = iter(['annulee', 'planifiee'] * 10)
+
+            def basculer():
+                acte.state_seance = next(etats)
+                self.env.flush_all()
+
+            self.env.invalidate_all()
+            avant = self.env.cr.sql_log_count
+            duree = self._chrono(basculer, repeat=10)
+            requetes[seances] = (self.env.cr.sql_log_count - avant) / 10
+
+            Ordonnance = self.env['cps.ordonnance']
+            duree_recherche = self._chrono(lambda: Ordonnance.search([
+                ('patient_id', '=', patient.id),
+                ('state', 'in', ['en_cours', 'brouillon']),
+                ('has_seances_disponibles', '=', True),
+            ]), repeat=20)
+            _logger.info(
+                'cps_benchmark séances pluriannuelles : 4 ans × 3 lignes × %d séances, '
+                'statut %.2f ms (%.1f requêtes), recherche disponibles %.2f ms',
+                seances, duree * 1000, requetes[seances], duree_recherche * 1000,
+            )
+            self.assertEqual(ligne.nb_seances_planifiees, seances)
+            self.assertTrue(ordonnances[0].has_seances_disponibles)
+        self.assertEqual(requetes[200], requetes[20])
+
+    def test_bench_cron_seances_effectuees(self):
+        """Cron des séances passées : requêtes indépendantes du nombre de séances."""
+        requetes = {}
+        Acte = self.env['cps.feuille.soins.acte']
+        for seances in (20, 200):
+            _patient, ordonnances = self._patient_pluriannuel(4, seances)
+            self.env.cr.execute("""
+                UPDATE cps_feuille_soins_acte SET date_acte = date_acte - 2000
+                 WHERE ordonnance_ligne_id IN %s
+            """, [tuple(ordonnances.ligne_ids.ids)])
+            self.env.invalidate_all()
+            avant = self.env.cr.sql_log_count
+            start = time.perf_counter()
+            nb = Acte._cron_seances_effectuees()
+            duree = time.perf_counter() - start
+            requetes[seances] = self.env.cr.sql_log_count - avant
+            _logger.info(
+                'cps_benchmark cron séances : %d séances passées en %.1f ms, %d requêtes',
+                nb, duree * 1000, requetes[seances],
+            )
+            self.assertGreaterEqual(nb, 4 * 3 * seances)
+            self.assertFalse(ordonnances.ligne_ids.filtered('nb_seances_planifiees'))
+        self.assertLess(requetes[200], 2 * requetes[20])
+
+    def test_bench_flux_agenda(self):
+        """Flux agenda sur un mois : lecture ORM de la vue calendrier vs SQL compact vs ETag."""
+        self._patient_pluriannuel(4, 200)
+        Acte = self.env['cps.feuille.soins.acte']
+        debut, fin = datetime(2024, 3, 1), datetime(2024, 4, 1)
+        domaine = [('praticien_id', '=', self.praticien.id),
+                   ('datetime_acte', '>=', debut), ('datetime_acte', '<', fin)]
+        champs = ['name', 'datetime_acte', 'date_delay', 'state_seance', 'patient_nom',
+                  'feuille_state', 'montant', 'montant_cps']
+
+        def mesurer(fn):
+            self.env.invalidate_all()
+            avant = self.env.cr.sql_log_count
+            duree = self._chrono(fn)
+            return duree, self.env.cr.sql_log_count - avant
+
+        duree_orm, req_orm = mesurer(lambda: Acte.search_read(domaine, champs))
+        duree_flux, req_flux = mesurer(
+            lambda: Acte._agenda_lignes(self.praticien.id, debut, fin))
+        duree_etag, req_etag = mesurer(
+            lambda: Acte._agenda_version(self.praticien.id, debut, fin))
+        nb = len(Acte._agenda_lignes(self.praticien.id, debut, fin))
+        _logger.info(
+            'cps_benchmark flux agenda : %d séances, vue calendrier %.2f ms (%d requêtes), '
+            'lignes compactes %.2f ms (%d), ETag %.2f ms (%d)',
+            nb, duree_orm * 1000, req_orm, duree_flux * 1000, req_flux,
+            duree_etag * 1000, req_etag,
+        )
+        self.assertEqual(nb, Acte.search_count(domaine))
+        self.assertLessEqual(req_flux, req_orm)
+
+    def test_bench_recherche_praticien(self):
+        """Séances d'un praticien : jointure sur la feuille vs colonne stockée sur l'acte.
+
+        Les plans (EXPLAIN ANALYZE) sont journalisés pour comparaison : la
+        colonne stockée est servie par l'index (praticien_id, date_acte,
+        state_seance) sans parcourir cps_feuille_soins.
+        """
+        self._patient_pluriannuel(4, 200)
+        self.env.cr.execute('ANALYZE cps_feuille_soins_acte')
+        self.env.cr.execute('ANALYZE cps_feuille_soins')
+        Acte = self.env['cps.feuille.soins.acte']
+        recherches = {
+            'wizard': [('date_acte', '>=', date(2024, 3, 1)), ('date_acte', '<=', date(2024, 5, 31)),
+                       ('state_seance', 'not in', ['annulee'])],
+            'agenda': [('datetime_acte', '>=', datetime(2024, 3, 1)),
+                       ('datetime_acte', '<', datetime(2024, 4, 1))],
+        }
+        for nom, periode in recherches.items():
+            resultats = {}
+            for acces in ('feuille_id.praticien_id', 'praticien_id'):
+                domaine = [(acces, '=', self.praticien.id)] + periode
+                requete = Acte._search(domaine)
+                self.env.cr.execute(SQL('EXPLAIN ANALYZE %s', requete.select()))
+                plan = '\n'.join(ligne for (ligne,) in self.env.cr.fetchall())
+                duree = self._chrono(lambda: Acte.search(domaine).ids, repeat=20)
+                resultats[acces] = Acte.search(domaine).ids
+                _logger.info('cps_benchmark recherche %s par %s : %.2f ms\n%s',
+                             nom, acces, duree * 1000, plan)
+            self.assertEqual(resultats['praticien_id'], resultats['feuille_id.praticien_id'])
+
+    def test_bench_wizard_dates_conflits(self):
+        """Génération de planning avec conflits : temps stable selon la durée du plan.
+
+        L'agenda du praticien est chargé en une requête ; chaque créneau
+        candidat est ensuite testé en mémoire.
+        """
+        agenda = self._create_feuilles(20)
+        for i, acte in enumerate(agenda.acte_ids):
+            acte.write({
+                'date_acte': date(2026, 1, 5) + timedelta(days=i % 300),
+                'heure_acte': 8.0 + (i % 3) * 0.5,
+                'state_seance': 'planifiee',
+            })
+        feuille = self._create_feuilles(1, nb_actes=0)
+        self.env.flush_all()
+
+        for semaines in (4, 13, 26, 52):
+            wizard = self.env['cps.wizard.date.selection'].create({
+                'feuille_id': feuille.id,
+                'date_debut': date(2026, 1, 5),
+                'date_fin': date(2026, 1, 5) + timedelta(weeks=semaines),
+                'nb_seances': 0,
+                'lundi': True, 'mardi': True, 'mercredi': True,
+                'jeudi': True, 'vendredi': True,
+                'heure_debut': 8.0,
+                'auto_decaler': True,
+            })
+            self.env.invalidate_all()
+            avant = self.env.cr.sql_log_count
+            duree = self._chrono(wizard.action_generer_dates)
+            requetes = self.env.cr.sql_log_count - avant
+            nb_dates = len(wizard.ligne_ids)
+            _logger.info(
+                'cps_benchmark wizard dates : %2d semaines, %3d séances, %8.2f ms, %d requêtes',
+                semaines, nb_dates, duree * 1000, requetes,
+            )
+            self.assertTrue(any(l.heure_acte > 8.0 for l in wizard.ligne_ids))
+        # Plus de requête par date candidate.
+        self.assertLess(requetes, nb_dates // 4)
+
+    @staticmethod
+    def _cabinet_synthetique(nb_praticiens, graine=1):
+        """Cabinet fictif : 40 séances existantes et 8 ordonnances par praticien."""
+        rng = random.Random(graine)
+        debut = date(2026, 1, 5)
+        horaires = {p: {j: (7 * 60, 19 * 60) for j in range(5)} for p in range(nb_praticiens)}
+        occupations = {}
+        demandes = []
+        for p in range(nb_praticiens):
+            for _i in range(40):
+                jour = debut + timedelta(days=rng.randrange(90))
+                heure = rng.randrange(8, 18) * 60
+                occupations.setdefault((p, jour), []).append((heure, heure + 30))
+            for o in range(8):
+                demandes.append(Demande(
+                    (p, o), p, rng.randint(8, 20), rng.choice([30, 30, 45, 60]),
+                    rng.choice([1, 2, 3]), debut + timedelta(days=rng.randrange(20)),
+                ))
+        return horaires, occupations, demandes, debut + timedelta(days=90)
+
+    def test_bench_optimiseur_agenda(self):
+        """Optimiseur : construction gloutonne puis amélioration bornée (5 → 50 praticiens)."""
+        limite = 3.0
+        for nb in (5, 10, 25, 50):
+            horaires, occupations, demandes, date_fin = self._cabinet_synthetique(nb)
+            nb_salles = max(2, nb // 4)
+            glouton = OptimiseurAgenda(horaires, occupations, nb_salles).optimiser(
+                demandes, date_fin, limite_s=0)
+            start = time.perf_counter()
+            res = OptimiseurAgenda(horaires, occupations, nb_salles).optimiser(
+                demandes, date_fin, limite_s=limite)
+            duree = time.perf_counter() - start
+            _logger.info(
+                'cps_benchmark optimiseur : %2d praticiens, %4d séances, %d non placées, '
+                'temps morts %d → %d min, %d itérations, %.2f s',
+                nb, len(res.placements), sum(res.non_places.values()),
+                glouton.temps_morts, res.temps_morts, res.iterations, duree,
+            )
+            self.assertLessEqual(res.cout, glouton.cout)
+            self.assertLess(duree, limite + 2)
+
+    # ── Bordereaux ────────────────────────────────────────────────────────
+
+    def test_bench_cloture_mensuelle(self):
+        """Clôture mensuelle : requêtes fonction du nombre de praticiens, pas de feuilles."""
+        praticiens = self.env['res.partner'].create([{
+            'name': 'Praticien clôture %02d' % i,
+            'category_id': [(4, self.cat_praticien.id)],
+        } for i in range(20)])
+        requetes = {}
+        for nb in (5, 50):
+            feuilles = self.env['cps.feuille.soins']
+            for praticien in praticiens:
+                lot = self._create_feuilles(nb, nb_actes=4)
+                lot.write({'praticien_id': praticien.id, 'state': 'confirmed'})
+                feuilles |= lot
+            self.env.flush_all()
+            self.env.invalidate_all()
+            avant = self.env.cr.sql_log_count
+            start = time.perf_counter()
+            bordereaux = self.env['cps.bordereau'].generer_bordereaux_mensuels(
+                date_cloture=date(2026, 1, 31))
+            self.env.flush_all()
+            duree = time.perf_counter() - start
+            requetes[nb] = self.env.cr.sql_log_count - avant
+            _logger.info(
+                'cps_benchmark clôture mensuelle : %d bordereaux, %4d feuilles, %8.2f ms, '
+                '%d requêtes',
+                len(bordereaux), len(feuilles), duree * 1000, requetes[nb],
+            )
+            self.assertEqual(len(bordereaux), len(praticiens))
+            self.assertEqual(sum(bordereaux.mapped('nb_feuilles')), len(feuilles))
+        self.assertLessEqual(requetes[50], requetes[5] + 2)
+
+    def test_bench_impression_fsa25(self):
+        """
+        FSA25 d'un mois (200 feuilles) : pages/s sur le formulaire PDF (sans puis
+        avec fond), puis rapport HTML avec 1 puis N wkhtmltopdf simultanés et cache.
+        """
+        bordereau = self.env['cps.bordereau'].create({
+            'praticien_id': self.praticien.id, 'date_bordereau': date(2026, 2, 1),
+        })
+        feuilles = self._create_feuilles(200, nb_actes=8)
+        feuilles.write({'bordereau_id': bordereau.id})
+        self.env.flush_all()
+        # Écritures antérieures à la transaction : pages éligibles au cache.
+        for table in ('cps_feuille_soins', 'cps_feuille_soins_acte', 'res_partner', 'cps_bordereau'):
+            self.env.cr.execute(f"UPDATE {table} SET write_date = write_date - interval '1 day'")
+        self.env.invalidate_all()
+
+        params = self.env['ir.config_parameter'].sudo()
+        params.set_param('cps.fsa25.moteur', 'formulaire')
+        debits = {}
+        for fond in (False, True):
+            self.env.invalidate_all()
+            sortie = io.BytesIO()
+            start = time.perf_counter()
+            pages = bordereau._fsa25_pdf(sortie, fond=fond)
+            duree = time.perf_counter() - start
+            debits['formulaire'] = pages / duree
+            _logger.info(
+                'cps_benchmark impression FSA25 : %d pages en %.2f s (formulaire %s fond), '
+                '%.1f pages/s, %d Ko',
+                pages, duree, 'avec' if fond else 'sans', pages / duree,
+                len(sortie.getvalue()) // 1024,
+            )
+            self.assertEqual(pages, len(feuilles))
+
+        if self.env['ir.actions.report'].get_wkhtmltopdf_state() != 'ok':
+            self.skipTest('wkhtmltopdf non installé')
+        params.set_param('cps.fsa25.moteur', 'html')
+        Attachment = self.env['ir.attachment'].sudo()
+        cache = [('res_model', '=', 'cps.feuille.soins'), ('res_field', '=', 'fsa25_page_cache'),
+                 ('res_id', 'in', feuilles.ids)]
+
+        for workers in (1, os.cpu_count() or 1, None):
+            if workers:
+                Attachment.search(cache).unlink()
+            self.env.invalidate_all()
+            start = time.perf_counter()
+            pages = bordereau._fsa25_pdf(io.BytesIO(), max_workers=workers)
+            duree = time.perf_counter() - start
+            debits.setdefault('html', pages / duree)
+            _logger.info(
+                'cps_benchmark impression FSA25 : %d pages en %.2f s (%s), %.1f pages/s',
+                pages, duree, '%d rendus simultanés' % workers if workers else 'cache',
+                pages / duree,
+            )
+            self.assertGreaterEqual(pages, len(feuilles))
+        self.assertEqual(Attachment.search_count(cache), len(feuilles))
+        _logger.info('cps_benchmark impression FSA25 : formulaire %.0f× plus rapide que '
+                     'wkhtmltopdf (un rendu)', debits['formulaire'] / debits['html'])
+        self.assertGreaterEqual(debits['formulaire'], 10 * debits['html'])
+
+    # ── OCR ───────────────────────────────────────────────────────────────
+
+    def test_bench_import_ocr_lot(self):
+        """Import OCR en lot : fichiers/min avec 1 puis 8 appels Claude simultanés."""
+        nb_fichiers = 16
+        reponse = {
+            'prescripteur_nom': 'Dr Bench',
+            'date_prescription': '2026-01-05',
+            'patient_nom': 'Patient Bench',
+            'actes': [{'lettre_cle': 'AMK', 'coefficient': 7.5, 'nb_seances': 10}],
+        }
+        params = self.env['ir.config_parameter'].sudo()
+        params.set_param('cps.anthropic.api.key', 'sk-bench')
+        params.set_param('cps.anthropic.requetes_minute', '0')
+        debits = {}
+        with AnthropicStub(reponse, delai=0.1) as stub:
+            params.set_param('cps.anthropic.api.url', stub.url)
+            for concurrence in (1, 8):
+                # Contenus distincts à chaque passe : pas de réponse servie par le cache OCR.
+                tampon = io.BytesIO()
+                with zipfile.ZipFile(tampon, 'w') as archive:
+                    for i in range(nb_fichiers):
+                        archive.writestr('scans/ordonnance_%02d.png' % i,
+                                         b'\x89PNG bench %d-%d' % (concurrence, i))
+                wizard = self.env['cps.wizard.ocr.import'].create({
+                    'fichier_zip': base64.b64encode(tampon.getvalue()),
+                    'fichier_zip_nom': 'lot.zip',
+                    'praticien_id': self.praticien.id,
+                    'use_claude_vision': True,
+                    'concurrence': concurrence,
+                })
+                duree = self._chrono(wizard.action_importer)
+                debits[concurrence] = nb_fichiers / duree * 60
+                _logger.info(
+                    'cps_benchmark import OCR : %d fichiers, %d simultanés, %8.2f ms, '
+                    '%6.0f fichiers/min',
+                    nb_fichiers, concurrence, duree * 1000, debits[concurrence],
+                )
+                self.assertEqual(wizard.nb_ok, nb_fichiers)
+        self.assertGreater(debits[8], debits[1] * 3)
+
+    def _extraction_exacte(self, attendu, date_prescription, actes):
+        return (str(date_prescription or '') == attendu['date_prescription']
+                and sorted(attendu['actes']) == sorted(
+                    (a['lettre_cle'], float(a['coefficient']), int(a['nb_seances']))
+                    for a in actes))
+
+    def test_bench_pretraitement_vision(self):
+        """Photo brute vs pré-traitée : tokens d'entrée, latence, exactitude d'extraction."""
+        cle_api = os.environ.get('CPS_BENCH_ANTHROPIC_KEY')
+        Wizard = self.env['cps.wizard.ocr.ordonnance']
+        model = Wizard._get_model()
+        config = dict(self.env['cps.anthropic.client']._config(cle_api),
+                      api_url=ANTHROPIC_API_URL, timeout=120)
+        totaux = {'brut': [0, 0.0, 0], 'pretraite': [0, 0.0, 0]}
+        for fixture in ORDONNANCES:
+            photo = photo_ordonnance(fixture['lignes'], fixture['angle'])
+            start = time.perf_counter()
+            image, media_type, infos = preparer_image(photo)
+            duree_pretraitement = time.perf_counter() - start
+            self.assertLess(infos['tokens_apres'], infos['tokens_avant'])
+            variantes = {
+                'brut': (photo, 'image/jpeg', infos['tokens_avant'], 0.0),
+                'pretraite': (image, media_type, infos['tokens_apres'], duree_pretraitement),
+            }
+            for mode, (octets, mt, tokens, duree) in variantes.items():
+                if cle_api:
+                    start = time.perf_counter()
+                    body = envoyer(config, _claude_payload_vision(model, octets, mt))
+                    duree += time.perf_counter() - start
+                    tokens = body['usage']['input_tokens']
+                    data, _err = Wizard._parse_claude_json(_claude_texte_reponse(body))
+                    vals = Wizard._vals_from_claude_data(data or {})
+                    exact = self._extraction_exacte(
+                        fixture['attendu'], vals.get('date_prescription'),
+                        json.loads(vals['actes_json']))
+                else:
+                    start = time.perf_counter()
+                    parse = parse_ordonnance_text(_extract_text_image(octets))
+                    duree += time.perf_counter() - start
+                    exact = self._extraction_exacte(
+                        fixture['attendu'], parse['date_prescription'], parse['actes'])
+                totaux[mode][0] += tokens
+                totaux[mode][1] += duree
+                totaux[mode][2] += int(exact)
+                _logger.info(
+                    'cps_benchmark vision %-9s : %7d octets, %5d tokens, %8.2f ms, exact=%s',
+                    mode, len(octets), tokens, duree * 1000, exact,
+                )
+        for mode, (tokens, duree, exacts) in totaux.items():
+            _logger.info(
+                'cps_benchmark vision %-9s (%s) : %d tokens, %8.2f ms, %d/%d exactes',
+                mode, 'API' if cle_api else 'estimation + tesseract',
+                tokens, duree * 1000, exacts, len(ORDONNANCES),
+            )
+        self.assertLess(totaux['pretraite'][0], totaux['brut'][0])
+        self.assertGreaterEqual(totaux['pretraite'][2], totaux['brut'][2])
+
+    def test_bench_ocr_pdf_pages(self):
+        """PDF scanné multi-pages : OCR page à page en séquence vs parallèle + arrêt anticipé."""
+        try:
+            import pdf2image  # noqa: F401
+            import pytesseract
+            from PIL import Image
+            pytesseract.get_tesseract_version()
+        except Exception:
+            self.skipTest('pdf2image / tesseract non disponibles')
+        pages = [Image.open(io.BytesIO(photo_ordonnance(ORDONNANCES[0]['lignes'], qualite=80)))]
+        pages += [
+            Image.open(io.BytesIO(photo_ordonnance(['Annexe %d' % i, 'Compte rendu'], qualite=80)))
+            for i in range(7)
+        ]
+        tampon = io.BytesIO()
+        pages[0].save(tampon, format='PDF', save_all=True, append_images=pages[1:])
+        pdf = tampon.getvalue()
+
+        resultats = {}
+        for mode, kwargs in (
+            ('séquence', {'max_workers': 1}),
+            ('parallèle', {'arret': _ordonnance_trouvee}),
+        ):
+            start = time.perf_counter()
+            texte = ocr_pdf_scanne(pdf, **kwargs)
+            duree = time.perf_counter() - start
+            resultats[mode] = duree
+            parse = parse_ordonnance_text(texte)
+            _logger.info(
+                'cps_benchmark OCR PDF 8 pages %-9s : %8.2f ms, %d actes',
+                mode, duree * 1000, len(parse['actes']),
+            )
+            self.assertTrue(parse['actes'])
+        self.assertLess(resultats['parallèle'], resultats['séquence'])
+
+    def test_bench_parser_ordonnance(self):
+        """Parser local : exactitude par champ sur le corpus TEXTES et durée d'analyse."""
+        repetitions = 500
+        exacts = dict.fromkeys(TEXTES[0]['attendu'], 0)
+        for cas in TEXTES:
+            resume = _resume(parse_ordonnance_text(cas['texte']))
+            for champ, valeur in cas['attendu'].items():
+                exacts[champ] += resume[champ] == valeur
+        for champ, nb in exacts.items():
+            _logger.info('cps_benchmark parser OCR %-17s : %d / %d exacts',
+                         champ, nb, len(TEXTES))
+
+        start = time.perf_counter()
+        for _i in range(repetitions):
+            for cas in TEXTES:
+                parse_ordonnance_text(cas['texte'])
+        duree = (time.perf_counter() - start) / (repetitions * len(TEXTES))
+        _logger.info('cps_benchmark parser OCR : %.1f µs / ordonnance', duree * 1e6)
+        self.assertEqual(sum(exacts.values()), len(TEXTES) * len(exacts))
+        self.assertLess(duree, 0.001)
+
+    # ── Consommation API ──────────────────────────────────────────────────
+
+    def test_bench_tableau_consommation(self):
+        """Pivot mensuel par utilisateur : journal brut (3 ans) vs agrégats quotidiens."""
+        nb_appels = 300000
+        cr = self.env.cr
+        cr.execute("""
+            INSERT INTO cps_api_usage
+                   (user_id, company_id, date, model, operation,
+                    input_tokens, output_tokens, total_tokens, success, cache_hit)
+            SELECT %s, %s, (now() at time zone 'UTC') - make_interval(mins => i * 5),
+                   'claude-bench', CASE WHEN i %% 3 = 0 THEN 'ocr_vision' ELSE 'ocr_texte' END,
+                   800, 150, 950, i %% 50 <> 0, i %% 7 = 0
+              FROM generate_series(1, %s) i
+        """, [self.env.uid, self.env.company.id, nb_appels])
+        cr.execute("""
+            INSERT INTO cps_api_usage_jour
+                   (company_id, user_id, jour, model, operation, nb_appels, nb_erreurs,
+                    nb_cache, input_tokens, output_tokens, total_tokens)
+            SELECT company_id, user_id, date::date, model, operation, COUNT(*),
+                   COUNT(*) FILTER (WHERE NOT success), COUNT(*) FILTER (WHERE cache_hit),
+                   SUM(input_tokens), SUM(output_tokens), SUM(total_tokens)
+              FROM cps_api_usage WHERE model = 'claude-bench'
+             GROUP BY company_id, user_id, date::date, model, operation
+        """)
+        nb_agregats = cr.rowcount
+        cr.execute('ANALYZE cps_api_usage')
+        cr.execute('ANALYZE cps_api_usage_jour')
+
+        domaine = [('model', '=', 'claude-bench')]
+        journal = self.env['cps.api.usage']
+        agregats = self.env['cps.api.usage.jour']
+        resultat = {}
+
+        def pivot_journal():
+            resultat['journal'] = journal.read_group(
+                domaine, ['total_tokens:sum'], ['date:month', 'user_id'], lazy=False)
+
+        def pivot_agregats():
+            resultat['agregats'] = agregats.read_group(
+                domaine, ['total_tokens:sum'], ['jour:month', 'user_id'], lazy=False)
+
+        duree_journal = self._chrono(pivot_journal, repeat=5)
+        duree_agregats = self._chrono(pivot_agregats, repeat=5)
+        _logger.info(
+            'cps_benchmark tableau consommation : %d appels → %d agrégats, '
+            'pivot journal %.1f ms, pivot agrégats %.1f ms',
+            nb_appels, nb_agregats, duree_journal * 1000, duree_agregats * 1000,
+        )
+        self.assertEqual(
+            sum(g['total_tokens'] for g in resultat['journal']),
+            sum(g['total_tokens'] for g in resultat['agregats']),
+        )
+        self.assertLess(duree_agregats, duree_journal)
@@ -0,0 +1,126 @@
+"""
+Tests unitaires – cps.tarif.resolver
+Couvre :
+  - Valorisation groupée (price_many) : acte standard, IFD, IFN
+  - Repli sur le tarif du catalogue pour une lettre clé non paramétrée
+  - Invalidation du cache sur set_param
+  - Tarif en vigueur à la date de l'acte (cps.tarif.historique) et revalorisation
+  - Séances du wizard de dates valorisées à leur date
+"""
+from datetime import date
+
+from odoo.tests.common import TransactionCase
+
+
+class TestTarifResolver(TransactionCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.Resolver = cls.env['cps.tarif.resolver']
+        IrParam = cls.env['ir.config_parameter'].sudo()
+        IrParam.set_param('cps.tarif.amo', '500')
+        IrParam.set_param('cps.supplement.ifd', '200')
+        IrParam.set_param('cps.supplement.ifn', '300')
+
+        cls.acte_amk = cls.env['cps.acte.type'].create({
+            'name': 'Séance kiné résolveur',
+            'lettre_cle': 'AMK',
+            'coefficient_defaut': 7.5,
+            'tarif_unitaire': 490,
+        })
+        cls.acte_ifn = cls.env['cps.acte.type'].create({
+            'name': 'IFN résolveur',
+            'lettre_cle': 'IFN',
+            'type_supplement': 'ifn',
+        })
+        cls.acte_inconnu = cls.env['cps.acte.type'].create({
+            'name': 'Acte hors nomenclature',
+            'lettre_cle': 'XYZ',
+            'coefficient_defaut': 2,
+            'tarif_unitaire': 100,
+        })
+
+    # ── Tests ─────────────────────────────────────────────────────────────
+
+    def test_price_many(self):
+        """Un montant par acte, dans l'ordre, répétitions comprises."""
+        montants = self.Resolver.price_many(
+            [self.acte_amk, self.acte_amk, self.acte_ifn, self.acte_inconnu],
+            [7.5, 10, 1, None],
+            [0, 2, 0, 0],
+        )
+        self.assertEqual(montants, [3750, 5000 + 400, 300, 0])
+
+    def test_coefficient_par_defaut(self):
+        """Sans coefficients : coefficient par défaut du type d'acte."""
+        self.assertEqual(self.Resolver.price_many(self.acte_inconnu), [200])
+
+    def test_cache_invalide_par_set_param(self):
+        """Un nouveau tarif en configuration est pris en compte immédiatement."""
+        self.assertEqual(self.Resolver.tarif_acte_type(self.acte_amk), 500)
+        self.env['ir.config_parameter'].sudo().set_param('cps.tarif.amo', '520')
+        self.assertEqual(self.Resolver.tarif_acte_type(self.acte_amk), 520)
+        self.assertEqual(self.Resolver.tarif_lettre_cle('amo'), 520)
+
+    def test_tarif_a_date(self):
+        """Chaque acte est valorisé selon la révision applicable à sa date."""
+        Historique = self.env['cps.tarif.historique']
+        Historique.create({'lettre_cle': 'AMO', 'tarif_unitaire': 450,
+                           'date_application': date(2024, 1, 1)})
+        Historique.create({'lettre_cle': 'AMK', 'tarif_unitaire': 480,
+                           'date_application': date(2025, 8, 1), 'supplement_ifd': 220})
+        montants = self.Resolver.price_many(
+            [self.acte_amk] * 4, [10] * 4, [0, 0, 1, 0],
+            [date(2023, 6, 1), date(2025, 7, 31), date(2025, 8, 1), None],
+        )
+        # Avant toute révision ou sans date : valeur de la configuration.
+        self.assertEqual(montants, [5000, 4500, 4800 + 220, 5000])
+
+    def test_revaloriser_montants(self):
+        """_revaloriser_montants n'écrit que les actes dont le montant change."""
+        praticien = self.env['res.partner'].create({'name': 'Praticien résolveur'})
+        patient = self.env['res.partner'].create({'name': 'Patient résolveur'})
+        feuille = self.env['cps.feuille.soins'].create({
+            'praticien_id': praticien.id,
+            'patient_id': patient.id,
+            'date_prescription': date(2025, 1, 1),
+            'acte_ids': [(0, 0, {
+                'acte_type_id': self.acte_amk.id, 'lettre_cle': 'AMK',
+                'date_acte': d, 'coefficient': 10, 'montant': 5000,
+            }) for d in (date(2025, 1, 10), date(2025, 9, 10))],
+        })
+        self.env['cps.tarif.historique'].create({
+            'lettre_cle': 'AMK', 'tarif_unitaire': 480, 'date_application': date(2025, 8, 1),
+        })
+        self.assertEqual(feuille.acte_ids._revaloriser_montants(), 1)
+        self.assertEqual(feuille.acte_ids.mapped('montant'), [5000, 4800])
+        self.assertEqual(feuille.montant_total, 9800)
+
+    def test_wizard_dates_tarif_a_date(self):
+        """Séances générées par le wizard de dates : tarif en vigueur à leur date."""
+        praticien = self.env['res.partner'].create({'name': 'Praticien wizard tarif'})
+        patient = self.env['res.partner'].create({'name': 'Patient wizard tarif'})
+        feuille = self.env['cps.feuille.soins'].create({
+            'praticien_id': praticien.id,
+            'patient_id': patient.id,
+            'date_prescription': date(2025, 7, 1),
+        })
+        self.env['cps.tarif.historique'].create({
+            'lettre_cle': 'AMK', 'tarif_unitaire': 480, 'date_application': date(2025, 8, 1),
+        })
+        wizard = self.env['cps.wizard.date.selection'].create({
+            'feuille_id': feuille.id,
+            'acte_type_id': self.acte_amk.id,
+            'date_debut': date(2025, 7, 30),
+            'date_fin': date(2025, 8, 1),
+            'nb_seances': 0,
+            'lundi': True, 'mardi': True, 'mercredi': True,
+            'jeudi': True, 'vendredi': True,
+            'heure_debut': 8.0,
+        })
+        wizard.action_generer_dates()
+        lignes = wizard.ligne_ids.sorted('date')
+        self.assertEqual(lignes.mapped('date'),
+                         [date(2025, 7, 30), date(2025, 7, 31), date(2025, 8, 1)])
+        self.assertEqual(lignes.mapped('montant'), [3750, 3750, 3600])
@@ -1,4 +1,5 @@
 from . import wizard_bordereau
 from . import wizard_date_selection
+from . import wizard_agenda_optimiseur
 from . import wizard_ocr_ordonnance
-# from . import ocr_wizard
+from . import wizard_ocr_import
@@ -0,0 +1,284 @@
+"""
+Optimiseur d'agenda multi-praticiens – solveur pur Python (sans dépendance Odoo).
+
+Place en une fois toutes les séances restantes d'un lot de demandes
+(une demande = une ligne d'ordonnance) en respectant :
+  • les jours et heures de travail de chaque praticien
+  • l'agenda existant (séances déjà planifiées)
+  • les salles déjà occupées par les autres praticiens du cabinet
+  • la durée de chaque séance (duree_seance du type d'acte)
+  • le délai minimum entre deux séances d'une même demande (≥ 1 jour)
+  • le nombre de salles du cabinet (séances simultanées, 0 = illimité)
+
+Objectif minimisé : séances non placées (jamais de surréservation : le
+surplus est rendu non placé), puis temps morts entre séances d'un même
+praticien sur une journée, puis éloignement de la date au plus tôt.
+
+Deux phases :
+  1. Construction gloutonne : demandes les plus contraintes d'abord, chaque
+     séance au premier jour possible, sur le créneau qui crée le moins de
+     temps mort.
+  2. Recherche locale bornée dans le temps (limite_s) : une séance est
+     déplacée dans sa fenêtre [précédente + délai, suivante − délai] si le
+     coût baisse ; les séances non placées sont retentées.
+
+Les heures sont exprimées en minutes depuis minuit.
+"""
+import datetime
+import random
+import time
+from bisect import insort
+from collections import namedtuple
+
+Demande = namedtuple('Demande', [
+    'ref',              # identifiant libre (ex. id de cps.ordonnance.ligne)
+    'praticien',        # identifiant du praticien
+    'nb_seances',       # nombre de séances à placer
+    'duree_min',        # durée d'une séance (minutes)
+    'delai_min_jours',  # écart minimum entre deux séances (jours)
+    'date_min',         # première date possible
+])
+Placement = namedtuple('Placement', 'ref praticien date debut fin')
+Resultat = namedtuple('Resultat', 'placements non_places temps_morts cout iterations')
+
+PENALITE_NON_PLACEE = 100000
+POIDS_RETARD_JOUR = 10
+JOURS_ESSAYES = 6
+EXISTANTE = -1
+MINUTES_JOUR = 24 * 60
+
+
+class OptimiseurAgenda:
+    """Solveur d'agenda ; une instance par optimisation."""
+
+    def __init__(self, horaires, occupations=None, nb_salles=0, pas_min=15,
+                 salles_occupees=None):
+        """
+        horaires        : {praticien: {weekday: (debut_min, fin_min)}}
+        occupations     : {(praticien, date): [(debut_min, fin_min), ...]}
+        nb_salles       : séances simultanées maximum dans le cabinet (0 = illimité)
+        pas_min         : pas de la grille de repli quand aucun créneau accolé n'est libre
+        salles_occupees : {date: [(debut_min, fin_min), ...]} séances des autres
+                          praticiens du cabinet (occupent une salle, sans agenda)
+        """
+        self.horaires = horaires
+        self.nb_salles = nb_salles
+        self.pas = pas_min
+        # (praticien, date) → [(debut, fin, cle)] trié ; cle = EXISTANTE ou n° de séance
+        self.jours = {}
+        # date → profil d'occupation du cabinet, un compteur par minute (salles)
+        self.salles = {}
+        for (praticien, date), intervalles in (occupations or {}).items():
+            for debut, fin in intervalles:
+                self._ajouter(praticien, date, debut, fin, EXISTANTE)
+        for date, intervalles in (salles_occupees or {}).items():
+            for debut, fin in intervalles:
+                self._occuper_salle(date, debut, fin, 1)
+
+    # ── Agenda en mémoire ─────────────────────────────────────────────────────
+
+    def _occuper_salle(self, date, debut, fin, delta):
+        profil = self.salles.setdefault(date, [0] * MINUTES_JOUR)
+        for minute in range(max(debut, 0), min(fin, MINUTES_JOUR)):
+            profil[minute] += delta
+
+    def _ajouter(self, praticien, date, debut, fin, cle):
+        insort(self.jours.setdefault((praticien, date), []), (debut, fin, cle))
+        self._occuper_salle(date, debut, fin, 1)
+
+    def _retirer(self, praticien, date, debut, fin, cle):
+        self.jours[(praticien, date)].remove((debut, fin, cle))
+        self._occuper_salle(date, debut, fin, -1)
+
+    def _praticien_libre(self, occupes, debut, fin):
+        for d, f, _cle in occupes:
+            if d >= fin:
+                break
+            if debut < f:
+                return False
+        return True
+
+    def _salles_libres(self, date, debut, fin):
+        if not self.nb_salles:
+            return True
+        profil = self.salles.get(date)
+        return not profil or max(profil[debut:fin]) < self.nb_salles
+
+    @staticmethod
+    def _cout_insertion(occupes, debut, fin):
+        """Temps mort (minutes) ajouté à la journée par la séance [debut, fin)."""
+        fin_prec = None
+        debut_suiv = None
+        for d, f, _cle in occupes:
+            if f <= debut:
+                fin_prec = f if fin_prec is None else max(fin_prec, f)
+            elif d >= fin:
+                debut_suiv = d
+                break
+        cout = 0
+        if fin_prec is not None:
+            cout += debut - fin_prec
+        if debut_suiv is not None:
+            cout += debut_suiv - fin
+        if fin_prec is not None and debut_suiv is not None:
+            cout -= debut_suiv - fin_prec
+        return cout
+
+    def _meilleur_creneau(self, praticien, date, duree):
+        """(cout temps mort, debut) du meilleur créneau libre du jour, ou None."""
+        heures = self.horaires.get(praticien, {}).get(date.weekday())
+        if not heures:
+            return None
+        ouverture, fermeture = heures
+        occupes = self.jours.get((praticien, date), ())
+
+        def valides(candidats):
+            for debut in sorted(candidats):
+                fin = debut + duree
+                if ouverture <= debut and fin <= fermeture \
+                        and self._praticien_libre(occupes, debut, fin) \
+                        and self._salles_libres(date, debut, fin):
+                    yield self._cout_insertion(occupes, debut, fin), debut
+
+        # Créneaux accolés aux séances existantes d'abord (zéro temps mort),
+        # grille régulière en repli (contrainte de salles).
+        accoles = {ouverture}
+        for d, f, _cle in occupes:
+            accoles.add(f)
+            accoles.add(d - duree)
+        meilleur = min(valides(accoles), default=None)
+        if meilleur is None:
+            meilleur = min(valides(range(ouverture, fermeture - duree + 1, self.pas)), default=None)
+        return meilleur
+
+    def _jours_ouvres(self, praticien):
+        return len(self.horaires.get(praticien, {}))
+
+    # ── Résolution ────────────────────────────────────────────────────────────
+
+    def optimiser(self, demandes, date_fin, limite_s=5.0, graine=0):
+        """Place les séances des demandes jusqu'à date_fin incluse. Retourne un Resultat."""
+        echeance = time.monotonic() + limite_s
+        rng = random.Random(graine)
+        self._demandes = demandes
+        self._date_fin = date_fin
+        # Par demande : liste ordonnée de séances (date, debut, fin, cle).
+        self._chaines = [[] for _d in demandes]
+        self._prochaine_cle = 0
+
+        ordre = sorted(
+            range(len(demandes)),
+            key=lambda i: (
+                self._jours_ouvres(demandes[i].praticien),
+                -demandes[i].nb_seances * demandes[i].duree_min,
+            ),
+        )
+        for i in ordre:
+            while len(self._chaines[i]) < demandes[i].nb_seances:
+                if not self._placer_suivante(i):
+                    break
+
+        iterations = 0
+        sans_gain = 0
+        indices = [i for i in range(len(demandes)) if demandes[i].nb_seances]
+        # Arrêt anticipé : plus d'amélioration sur un grand nombre d'essais.
+        patience = max(2000, 20 * len(indices))
+        while indices and sans_gain < patience and time.monotonic() < echeance:
+            iterations += 1
+            i = rng.choice(indices)
+            chaine = self._chaines[i]
+            if len(chaine) < demandes[i].nb_seances and rng.random() < 0.3:
+                gain = self._placer_suivante(i)
+            elif chaine:
+                gain = self._deplacer(i, rng.randrange(len(chaine)), rng)
+            else:
+                gain = False
+            sans_gain = 0 if gain else sans_gain + 1
+        return self._resultat(iterations)
+
+    def _delai(self, i):
+        return datetime.timedelta(days=max(self._demandes[i].delai_min_jours or 0, 1))
+
+    def _retard(self, i, date):
+        return POIDS_RETARD_JOUR * (date - self._demandes[i].date_min).days
+
+    def _placer_suivante(self, i):
+        """Place la séance suivante de la demande i au premier jour possible."""
+        dem = self._demandes[i]
+        chaine = self._chaines[i]
+        jour = chaine[-1][0] + self._delai(i) if chaine else dem.date_min
+        while jour <= self._date_fin:
+            creneau = self._meilleur_creneau(dem.praticien, jour, dem.duree_min)
+            if creneau:
+                debut = creneau[1]
+                cle = self._prochaine_cle
+                self._prochaine_cle += 1
+                self._ajouter(dem.praticien, jour, debut, debut + dem.duree_min, cle)
+                chaine.append((jour, debut, debut + dem.duree_min, cle))
+                return True
+            jour += datetime.timedelta(days=1)
+        return False
+
+    def _deplacer(self, i, k, rng):
+        """Déplace la séance k de la demande i si le coût baisse (retourne True)."""
+        dem = self._demandes[i]
+        chaine = self._chaines[i]
+        date, debut, fin, cle = chaine[k]
+        delai = self._delai(i)
+        borne_min = chaine[k - 1][0] + delai if k else dem.date_min
+        borne_max = chaine[k + 1][0] - delai if k + 1 < len(chaine) else self._date_fin
+
+        self._retirer(dem.praticien, date, debut, fin, cle)
+        occupes = self.jours.get((dem.praticien, date), ())
+        cout_actuel = self._cout_insertion(occupes, debut, fin) + self._retard(i, date)
+
+        nb_jours = (borne_max - borne_min).days + 1
+        essais = {date}
+        for _n in range(min(JOURS_ESSAYES, max(nb_jours, 0))):
+            essais.add(borne_min + datetime.timedelta(days=rng.randrange(nb_jours)))
+        meilleur = None
+        for jour in essais:
+            creneau = self._meilleur_creneau(dem.praticien, jour, dem.duree_min)
+            if creneau:
+                cout = creneau[0] + self._retard(i, jour)
+                if meilleur is None or cout < meilleur[0]:
+                    meilleur = (cout, jour, creneau[1])
+
+        if meilleur and meilleur[0] < cout_actuel:
+            _cout, jour, nouveau_debut = meilleur
+            nouvelle_fin = nouveau_debut + dem.duree_min
+            self._ajouter(dem.praticien, jour, nouveau_debut, nouvelle_fin, cle)
+            chaine[k] = (jour, nouveau_debut, nouvelle_fin, cle)
+            return True
+        self._ajouter(dem.praticien, date, debut, fin, cle)
+        return False
+
+    def _temps_morts(self):
+        total = 0
+        for occupes in self.jours.values():
+            fin_prec = None
+            for d, f, _cle in occupes:
+                if fin_prec is not None and d > fin_prec:
+                    total += d - fin_prec
+                fin_prec = f if fin_prec is None else max(fin_prec, f)
+        return total
+
+    def _resultat(self, iterations):
+        placements = []
+        non_places = {}
+        retard = 0
+        for i, (dem, chaine) in enumerate(zip(self._demandes, self._chaines)):
+            for date, debut, fin, _cle in chaine:
+                placements.append(Placement(dem.ref, dem.praticien, date, debut, fin))
+                retard += self._retard(i, date)
+            manquantes = dem.nb_seances - len(chaine)
+            if manquantes > 0:
+                non_places[dem.ref] = manquantes
+        temps_morts = self._temps_morts()
+        cout = (
+            PENALITE_NON_PLACEE * sum(non_places.values())
+            + temps_morts
+            + retard
+        )
+        placements.sort(key=lambda p: (p.praticien, p.date, p.debut))
+        return Resultat(placements, non_places, temps_morts, cout, iterations)
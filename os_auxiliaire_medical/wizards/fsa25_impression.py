@@ -0,0 +1,105 @@
+"""
+Impression FSA25 de toutes les feuilles d'un bordereau en un seul PDF.
+
+  1. HTML des feuilles rendu par le rapport QWeb (thread principal, ORM)
+  2. Feuilles réparties en lots : un wkhtmltopdf par lot, plusieurs lots en
+     parallèle dans un pool de threads (le travail se fait dans les
+     sous-processus)
+  3. PDF de chaque lot découpé par feuille sur ses signets de premier niveau
+     (le titre de chaque feuille), pages mises en cache par l'appelant
+  4. Fusion des pages dans un fichier : la réponse HTTP l'envoie par blocs
+
+Aucune dépendance ORM.
+"""
+import io
+import logging
+import os
+import subprocess
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+
+from odoo.tools.pdf import PdfFileReader, PdfFileWriter
+
+_logger = logging.getLogger(__name__)
+
+# Feuilles par appel à wkhtmltopdf : amortit le démarrage du processus sans
+# retarder les autres threads sur les derniers lots.
+FEUILLES_PAR_LOT = 20
+
+
+def _wkhtmltopdf(commande, corps):
+    """Un lot : [html] → PDF (octets). Fichiers temporaires supprimés."""
+    chemins = []
+    try:
+        for i, html in enumerate(corps):
+            fd, chemin = tempfile.mkstemp(prefix='cps.fsa25.%d.' % i, suffix='.html')
+            chemins.append(chemin)
+            with os.fdopen(fd, 'wb') as f:
+                f.write(html if isinstance(html, bytes) else html.encode())
+        fd, sortie = tempfile.mkstemp(prefix='cps.fsa25.', suffix='.pdf')
+        os.close(fd)
+        chemins.append(sortie)
+        process = subprocess.run(commande + chemins, capture_output=True, check=False)
+        # Code 1 : ressource distante injoignable, le PDF est tout de même produit.
+        if process.returncode not in (0, 1):
+            raise RuntimeError('wkhtmltopdf : code %d (%s)' % (
+                process.returncode, process.stderr[-1000:].decode(errors='replace')))
+        with open(sortie, 'rb') as f:
+            return f.read()
+    finally:
+        for chemin in chemins:
+            try:
+                os.unlink(chemin)
+            except OSError:
+                _logger.warning('Impression FSA25 : %s non supprimé', chemin)
+
+
+def wkhtmltopdf_lots(commande, lots, max_workers=None):
+    """[[html, ...], ...] → [PDF du lot, ...], dans l'ordre, lots en parallèle."""
+    if len(lots) < 2:
+        return [_wkhtmltopdf(commande, corps) for corps in lots]
+    workers = max(1, min(max_workers or os.cpu_count() or 1, len(lots)))
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(lambda corps: _wkhtmltopdf(commande, corps), lots))
+
+
+def decouper_par_signets(pdf, nb_documents):
+    """
+    PDF d'un lot → [PDF de chaque document], d'après les signets de premier
+    niveau posés par wkhtmltopdf sur le premier titre de chaque document.
+    None si les signets ne correspondent pas aux documents.
+    """
+    reader = PdfFileReader(io.BytesIO(pdf), strict=False)
+    racine = reader.trailer['/Root']
+    debuts = []
+    if '/Outlines' in racine and '/First' in racine['/Outlines']:
+        noeud = racine['/Outlines']['/First']
+        while True:
+            debuts.append(racine['/Dests'][noeud['/Dest']][0])
+            if '/Next' not in noeud:
+                break
+            noeud = noeud['/Next']
+    debuts = sorted(set(debuts))
+    if len(debuts) != nb_documents or not debuts or debuts[0] != 0:
+        return None
+    bornes = debuts + [reader.getNumPages()]
+    documents = []
+    for debut, fin in zip(bornes, bornes[1:]):
+        writer = PdfFileWriter()
+        for page in range(debut, fin):
+            writer.addPage(reader.getPage(page))
+        flux = io.BytesIO()
+        writer.write(flux)
+        documents.append(flux.getvalue())
+    return documents
+
+
+def fusionner(pdfs, sortie):
+    """Écrit dans le fichier sortie les pages de [PDF] à la suite ; retourne le nombre de pages."""
+    writer = PdfFileWriter()
+    for pdf in pdfs:
+        reader = PdfFileReader(io.BytesIO(pdf), strict=False)
+        for page in range(reader.getNumPages()):
+            writer.addPage(reader.getPage(page))
+    writer.write(sortie)
+    return writer.getNumPages()
@@ -0,0 +1,175 @@
+"""
+Remplissage natif des formulaires FSA25 (templates/*16.pdf), sans navigateur.
+
+  1. Disposition lue une fois par gabarit dans ses champs de formulaire
+     (widgets AcroForm) : rectangle, police et taille (/DA), alignement (/Q)
+  2. Texte de chaque feuille écrit en opérateurs PDF aux coordonnées des
+     champs (polices Helvetica du gabarit, largeurs reportlab), réduit si
+     le texte déborde du champ
+  3. Pages assemblées sur la page du gabarit : contenu et ressources du fond
+     partagés par toutes les pages, widgets et AcroForm non recopiés
+
+Deux gabarits de même disposition : avec fond (formulaire officiel scanné,
+impression sur page vierge) et sans fond (impression sur formulaire
+pré-imprimé). Sortie déterministe : mêmes field maps, mêmes octets.
+
+Aucune dépendance ORM.
+"""
+import functools
+import io
+import os
+import re
+
+from reportlab.pdfbase.pdfmetrics import stringWidth
+
+from odoo.tools.pdf import (
+    ArrayObject, DecodedStreamObject, NameObject, PdfFileReader, PdfFileWriter,
+)
+
+DOSSIER_GABARITS = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'templates')
+GABARITS = {
+    True: 'feuilleDeSoinsAuxiliaires16.pdf',
+    False: 'feuilleDeSoinsAuxiliairesSF16.pdf',
+}
+
+# Champs du gabarit → clé du field map (get_fsa25_field_maps). None : champ
+# laissé vide. Les autres champs portent déjà le nom de leur clé.
+CHAMPS_GABARIT = {
+    'name': 'name_texte',
+    'patient_nom': 'patient_nom_texte',
+    'patient_dn': 'patient_dn_texte',
+    'patient_adresse': 'patient_adresse_texte',
+    'code_auxiliaire': 'praticien_code_texte',
+    'code_auxiliaire_2': 'accord_prealable_texte',
+    'code_prescripteur': 'code_prescripteur_texte',
+    'autre_derogation': 'motif_derogation_texte',
+    'at_mp_texte': None,
+    # Bloc « Assuré (si la personne recevant les soins n'est pas l'assuré) ».
+    'patient_nom_2': None,
+    'patient_prenom': None,
+    'patient_dn_2': None,
+    'date_naissance': None,
+}
+# Colonnes des lignes d'actes → suffixe de la clé acte_NN_<suffixe>.
+COLONNES_ACTE = {
+    'dimanche_ferie_texte': 'dimanche_ferie_oui',
+    'nuit_texte': 'nuit_oui',
+}
+# Les champs d'actes du gabarit sont mal nommés au-delà de la 4e ligne
+# (copies « acte_01_date_texte_8 »...) : la ligne est déduite de la position.
+_CHAMP_ACTE = re.compile(r'acte_\d+_(.+?)(?:_\d+)?$')
+_DA_COULEUR = re.compile(r'([\d.]+) ([\d.]+) ([\d.]+) rg')
+_DA_POLICE = re.compile(r'/([\w-]+) ([\d.]+) Tf')
+
+MARGE = 2.0
+# Hauteur des capitales Helvetica (em) : texte centré verticalement dans le champ.
+HAUTEUR_CAPITALES = 0.718
+
+
+def _gabarit(fond):
+    return os.path.join(DOSSIER_GABARITS, GABARITS[bool(fond)])
+
+
+@functools.lru_cache(maxsize=None)
+def _octets_gabarit(fond):
+    with open(_gabarit(fond), 'rb') as f:
+        return f.read()
+
+
+@functools.lru_cache(maxsize=None)
+def disposition(fond=True):
+    """
+    Champs du gabarit : tuple de (clé, x0, y0, x1, y1, police, police reportlab,
+    taille, couleur, alignement), un par clé, dans l'ordre de la page.
+    """
+    page = PdfFileReader(io.BytesIO(_octets_gabarit(fond)), strict=False).getPage(0)
+    polices = page['/Resources']['/Font']
+    widgets = []
+    for annotation in page.get('/Annots') or []:
+        widget = annotation.getObject()
+        if widget.get('/Subtype') != '/Widget' or '/T' not in widget:
+            continue
+        x0, y0, x1, y1 = (float(v) for v in widget['/Rect'])
+        da = str(widget.get('/DA', ''))
+        police, taille = _DA_POLICE.search(da).groups()
+        if '/' + police not in polices:
+            raise ValueError('Gabarit FSA25 : police /%s absente de la page' % police)
+        couleur = _DA_COULEUR.search(da)
+        widgets.append((
+            str(widget['/T']), min(x0, x1), min(y0, y1), max(x0, x1), max(y0, y1),
+            police, str(polices['/' + police]['/BaseFont'])[1:], float(taille),
+            tuple(float(c) for c in couleur.groups()) if couleur else (0.0, 0.0, 0.0),
+            int(widget.get('/Q', 0)),
+        ))
+
+    # Lignes d'actes, de haut en bas : ordonnées des champs « date ».
+    lignes = sorted({round(w[2], 1) for w in widgets
+                     if w[0].startswith('acte_') and _CHAMP_ACTE.match(w[0]).group(1) == 'date_texte'},
+                    reverse=True)
+    champs = {}
+    for nom, *reste in widgets:
+        if nom.startswith('acte_'):
+            ligne = [i for i, y in enumerate(lignes) if abs(y - reste[1]) < 1]
+            if not ligne:
+                continue
+            colonne = _CHAMP_ACTE.match(nom).group(1)
+            cle = 'acte_%02d_%s' % (ligne[0] + 1, COLONNES_ACTE.get(colonne, colonne))
+        else:
+            cle = CHAMPS_GABARIT.get(nom, nom)
+        if cle and cle not in champs:
+            champs[cle] = (cle, *reste)
+    return tuple(champs.values())
+
+
+def _chaine(texte):
+    """Texte → chaîne littérale PDF (WinAnsiEncoding, comme les polices du gabarit)."""
+    octets = texte.encode('cp1252', 'replace')
+    return b'(' + octets.replace(b'\\', b'\\\\').replace(b'(', b'\\(').replace(b')', b'\\)') + b')'
+
+
+def contenu_page(champs, valeurs):
+    """Opérateurs PDF du texte d'une feuille (field map) posé sur les champs."""
+    operations = []
+    for cle, x0, y0, x1, y1, police, police_rl, taille, couleur, alignement in champs:
+        texte = ' '.join(str(valeurs.get(cle) or '').split())
+        if not texte:
+            continue
+        largeur = stringWidth(texte, police_rl, taille)
+        disponible = x1 - x0 - 2 * MARGE
+        if largeur > disponible:
+            taille *= disponible / largeur
+            largeur = disponible
+        if alignement == 1:
+            x = x0 + (x1 - x0 - largeur) / 2
+        elif alignement == 2:
+            x = x1 - MARGE - largeur
+        else:
+            x = x0 + MARGE
+        y = y0 + (y1 - y0 - taille * HAUTEUR_CAPITALES) / 2
+        operations.append(b'%.3f %.3f %.3f rg /%s %.2f Tf 1 0 0 1 %.2f %.2f Tm %s Tj' % (
+            *couleur, police.encode(), taille, x, y, _chaine(texte)))
+    return b'q BT\n' + b'\n'.join(operations) + b'\nET Q'
+
+
+def remplir(field_maps, sortie, fond=True):
+    """
+    Écrit dans le fichier sortie une page FSA25 par field map, sur le
+    gabarit avec ou sans fond ; retourne le nombre de pages.
+    """
+    champs = disposition(fond)
+    gabarit = PdfFileReader(io.BytesIO(_octets_gabarit(fond)), strict=False).getPage(0)
+    _x0, _y0, largeur, hauteur = (float(v) for v in gabarit['/MediaBox'])
+    ressources = gabarit.raw_get('/Resources')
+    fond_page = gabarit.raw_get('/Contents')
+    fond_page = list(fond_page) if isinstance(fond_page, ArrayObject) else [fond_page]
+
+    writer = PdfFileWriter()
+    for valeurs in field_maps:
+        flux = DecodedStreamObject()
+        (getattr(flux, 'set_data', None) or flux.setData)(contenu_page(champs, valeurs))
+        flux = (getattr(flux, 'flate_encode', None) or flux.flateEncode)()
+        page = writer.addBlankPage(largeur, hauteur)
+        page[NameObject('/Resources')] = ressources
+        page[NameObject('/Contents')] = ArrayObject(fond_page + [writer._addObject(flux)])
+    writer.write(sortie)
+    return writer.getNumPages()
@@ -0,0 +1,183 @@
+"""
+Pré-traitement des photos d'ordonnances avant envoi à Claude vision.
+
+Le coût en tokens d'une image est proportionnel à sa surface
+(≈ largeur × hauteur / 750) et l'API redimensionne de toute façon au-delà
+de 1568 px de côté : une photo de téléphone brute (12 Mpx) est facturée au
+plafond et transférée pour rien. Étapes, toutes optionnelles :
+
+  1. rotation EXIF (photo prise en portrait / paysage)
+  2. niveaux de gris
+  3. réduction du plus grand côté (avant les étapes coûteuses)
+  4. redressement des petites inclinaisons (± 5°, profil de projection)
+  5. rognage des marges uniformes autour du document
+  6. ré-encodage JPEG
+
+Aucune dépendance ORM : utilisable depuis un pool de threads. Sans Pillow,
+ou sur une image illisible, le fichier d'origine est renvoyé tel quel.
+
+Également : miniatures WebP des scans (feuilles, ordonnances) affichées
+dans les listes à la place de l'image d'origine (miniature_webp).
+"""
+import io
+import logging
+
+_logger = logging.getLogger(__name__)
+
+OPTIONS_DEFAUT = {
+    'cote_max': 1568,
+    'qualite': 80,
+    'niveaux_gris': True,
+    'redresser': True,
+    'rogner': True,
+}
+
+# Redressement : angles testés (degrés) sur une miniature, du grossier au fin.
+ANGLE_MAX = 5
+ANGLE_PAS_FIN = 0.5
+MINIATURE_REDRESSEMENT = 400
+# Rognage : écart au fond (0-255) considéré comme de l'encre, marge conservée.
+SEUIL_ENCRE = 60
+MARGE_ROGNAGE = 0.02
+# Miniatures des listes : plus grand côté (px) et qualité WebP.
+MINIATURE_COTE = 256
+MINIATURE_QUALITE = 70
+
+
+def tokens_estimes(largeur, hauteur):
+    """Estimation Anthropic du coût d'entrée d'une image (après plafond 1568 px)."""
+    cote = max(largeur, hauteur)
+    if cote > 1568:
+        ratio = 1568 / cote
+        largeur, hauteur = largeur * ratio, hauteur * ratio
+    return int(largeur * hauteur / 750)
+
+
+def _angle_redressement(gris):
+    """Angle (degrés) qui maximise la variance du profil horizontal d'encre."""
+    from PIL import Image
+
+    ratio = MINIATURE_REDRESSEMENT / max(gris.size)
+    miniature = gris.resize(
+        (max(1, int(gris.width * ratio)), max(1, int(gris.height * ratio))),
+        Image.BILINEAR, reducing_gap=2.0,
+    )
+    hauteur = miniature.height
+
+    def score(angle):
+        tournee = miniature.rotate(angle, resample=Image.BILINEAR, fillcolor=255)
+        # Redimensionner à 1 px de large = moyenne de chaque ligne.
+        profil = list(tournee.resize((1, hauteur), Image.BOX).getdata())
+        moyenne = sum(profil) / hauteur
+        return sum((p - moyenne) ** 2 for p in profil)
+
+    def meilleur(angles):
+        return max(angles, key=lambda a: (score(a), -abs(a)))
+
+    grossier = meilleur(range(-ANGLE_MAX, ANGLE_MAX + 1))
+    return meilleur((grossier - ANGLE_PAS_FIN, grossier, grossier + ANGLE_PAS_FIN))
+
+
+def _boite_document(gris):
+    """Boîte englobant l'encre (marges uniformes exclues), ou None."""
+    from PIL import ImageOps
+
+    # Fond supposé clair : l'encre est ce qui s'écarte nettement du blanc.
+    encre = ImageOps.invert(gris).point(lambda p: 255 if p > SEUIL_ENCRE else 0)
+    boite = encre.getbbox()
+    if not boite:
+        return None
+    marge_x = int(gris.width * MARGE_ROGNAGE)
+    marge_y = int(gris.height * MARGE_ROGNAGE)
+    return (
+        max(0, boite[0] - marge_x), max(0, boite[1] - marge_y),
+        min(gris.width, boite[2] + marge_x), min(gris.height, boite[3] + marge_y),
+    )
+
+
+def preparer_image(data, options=None):
+    """
+    Image prête pour Claude vision : (octets, media_type, infos).
+    infos : tailles avant / après (px) et tokens estimés, pour les traces et
+    le banc de mesure.
+    """
+    opts = dict(OPTIONS_DEFAUT, **(options or {}))
+    try:
+        from PIL import Image, ImageOps
+    except ImportError:
+        return data, None, {}
+    cote_max = int(opts['cote_max'] or 0)
+    try:
+        img = Image.open(io.BytesIO(data))
+        avant = img.size
+        if cote_max:
+            # JPEG : décodage directement à une échelle réduite (1/2, 1/4…)
+            # tant que les deux côtés restent au-dessus du plafond.
+            img.draft('RGB', (cote_max, cote_max))
+        img.load()
+    except Exception as e:
+        _logger.warning('Pré-traitement image : illisible (%s)', e)
+        return data, None, {}
+
+    if img.getexif().get(0x0112, 1) != 1:
+        img = ImageOps.exif_transpose(img)
+    if img.mode not in ('L', 'RGB'):
+        img = img.convert('RGB')
+
+    if opts['niveaux_gris']:
+        img = img.convert('L')
+    if cote_max and max(img.size) > cote_max:
+        img.thumbnail((cote_max, cote_max), Image.LANCZOS)
+    gris = img if img.mode == 'L' else img.convert('L')
+
+    if opts['redresser']:
+        angle = _angle_redressement(gris)
+        if angle:
+            fond = 255 if img.mode == 'L' else (255, 255, 255)
+            img = img.rotate(angle, resample=Image.BICUBIC, expand=True, fillcolor=fond)
+            if cote_max and max(img.size) > cote_max:
+                img.thumbnail((cote_max, cote_max), Image.LANCZOS)
+            gris = img if img.mode == 'L' else img.convert('L')
+
+    if opts['rogner']:
+        boite = _boite_document(gris)
+        if boite and (boite[2] - boite[0]) * (boite[3] - boite[1]) < 0.95 * img.width * img.height:
+            img = img.crop(boite)
+
+    sortie = io.BytesIO()
+    img.save(sortie, format='JPEG', quality=int(opts['qualite']), optimize=True)
+    resultat = sortie.getvalue()
+    return resultat, 'image/jpeg', {
+        'avant': avant,
+        'apres': img.size,
+        'octets_avant': len(data),
+        'octets_apres': len(resultat),
+        'tokens_avant': tokens_estimes(*avant),
+        'tokens_apres': tokens_estimes(*img.size),
+    }
+
+
+def miniature_webp(data, cote=MINIATURE_COTE, qualite=MINIATURE_QUALITE):
+    """
+    Miniature WebP d'un scan (rotation EXIF appliquée). None sans Pillow,
+    sans support WebP, ou si le fichier n'est pas une image (PDF…).
+    """
+    try:
+        from PIL import Image, ImageOps
+    except ImportError:
+        return None
+    try:
+        img = Image.open(io.BytesIO(data))
+        img.draft('RGB', (cote, cote))
+        img.load()
+        if img.getexif().get(0x0112, 1) != 1:
+            img = ImageOps.exif_transpose(img)
+        if img.mode not in ('L', 'RGB'):
+            img = img.convert('RGB')
+        img.thumbnail((cote, cote), Image.LANCZOS)
+        sortie = io.BytesIO()
+        img.save(sortie, format='WEBP', quality=qualite, method=4)
+    except Exception as e:
+        _logger.info('Miniature : image illisible (%s)', e)
+        return None
+    return sortie.getvalue()
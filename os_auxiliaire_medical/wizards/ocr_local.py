@@ -0,0 +1,136 @@
+"""
+OCR local (tesseract) des images et des PDF scannés.
+
+PDF scanné : les pages sont rastérisées une par une par pdf2image
+(first_page / last_page sur un fichier temporaire) dans un pool de threads
+borné, au plus une page en cours par thread : le document complet n'est
+jamais en mémoire sous forme d'images. pdftoppm et tesseract sont des
+processus externes : les threads ne font qu'attendre leur fin, sans fork
+du processus Odoo (threads HTTP et cron, curseurs, verrous de logging). Dès que les premières pages
+contiennent l'essentiel de l'ordonnance (critère `arret`), les pages
+restantes ne sont pas traitées.
+
+Aucune dépendance ORM. Sans pytesseract / pdf2image, les fonctions
+renvoient un texte vide (comportement historique du wizard).
+"""
+import functools
+import itertools
+import logging
+import os
+import tempfile
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+_logger = logging.getLogger(__name__)
+
+DPI_OCR = 200
+LANGUES_PREFEREES = ('fra', 'eng')
+
+
+@functools.lru_cache(maxsize=1)
+def _langue_tesseract():
+    """Première langue installée parmi LANGUES_PREFEREES (un seul passage par page)."""
+    import pytesseract
+    try:
+        installees = set(pytesseract.get_languages(config=''))
+    except Exception:
+        return 'fra+eng'
+    for langue in LANGUES_PREFEREES:
+        if langue in installees:
+            return langue
+    return None
+
+
+def ocr_tesseract(image):
+    """Texte d'une image PIL ('' si tesseract indisponible ou en erreur)."""
+    try:
+        import pytesseract
+    except ImportError:
+        return ''
+    try:
+        langue = _langue_tesseract()
+        return pytesseract.image_to_string(image, **({'lang': langue} if langue else {}))
+    except Exception as e:
+        _logger.warning('pytesseract: %s', e)
+        return ''
+
+
+def _ocr_page(tache):
+    """Rastérise et OCRise une seule page : (chemin du PDF, n° de page, dpi)."""
+    chemin, page, dpi = tache
+    try:
+        from pdf2image import convert_from_path
+        images = convert_from_path(chemin, dpi=dpi, first_page=page, last_page=page,
+                                   grayscale=True)
+    except Exception as e:
+        _logger.warning('pdf2image page %d: %s', page, e)
+        return ''
+    return ocr_tesseract(images[0]) if images else ''
+
+
+def _prefixe(textes):
+    """Pages consécutives terminées depuis la première."""
+    prefixe = []
+    for page in itertools.count(1):
+        if page not in textes:
+            return prefixe
+        prefixe.append(textes[page])
+
+
+def _assembler(textes):
+    return '\n'.join(textes[page] for page in sorted(textes))
+
+
+def ocr_pages(taches, fonction, max_workers=None, arret=None):
+    """
+    Applique `fonction` aux tâches de page (n° de page en 2e position) dans
+    un pool de threads ; retourne {n° de page: texte} pour les pages
+    traitées. Au plus `max_workers` pages en cours ; `arret(texte)` est
+    évalué sur les pages consécutives terminées et interrompt le lot.
+    """
+    textes = {}
+    workers = min(max_workers or os.cpu_count() or 1, len(taches))
+
+    def sequentiel(restantes):
+        for tache in restantes:
+            textes[tache[1]] = fonction(tache)
+            if arret and arret('\n'.join(_prefixe(textes))):
+                break
+        return textes
+
+    if workers <= 1:
+        return sequentiel(taches)
+    suivantes = iter(taches)
+    try:
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='cps_ocr_page') as pool:
+            en_cours = {pool.submit(fonction, t): t[1] for t in itertools.islice(suivantes, workers)}
+            while en_cours:
+                faites, _reste = wait(en_cours, return_when=FIRST_COMPLETED)
+                for future in faites:
+                    textes[en_cours.pop(future)] = future.result()
+                if arret and arret('\n'.join(_prefixe(textes))):
+                    pool.shutdown(wait=True, cancel_futures=True)
+                    break
+                for tache in itertools.islice(suivantes, len(faites)):
+                    en_cours[pool.submit(fonction, tache)] = tache[1]
+    except RuntimeError as e:
+        _logger.warning('OCR PDF : pool de threads indisponible (%s), pages en séquence', e)
+        return sequentiel([t for t in taches if t[1] not in textes])
+    return textes
+
+
+def ocr_pdf_scanne(data, dpi=DPI_OCR, max_workers=None, arret=None):
+    """Texte OCR d'un PDF scanné, pages en parallèle (voir ocr_pages)."""
+    try:
+        from pdf2image import pdfinfo_from_path
+    except ImportError:
+        return ''
+    with tempfile.NamedTemporaryFile(suffix='.pdf') as fichier:
+        fichier.write(data)
+        fichier.flush()
+        try:
+            nb_pages = int(pdfinfo_from_path(fichier.name)['Pages'])
+        except Exception as e:
+            _logger.warning('pdf2image: %s', e)
+            return ''
+        taches = [(fichier.name, page, dpi) for page in range(1, nb_pages + 1)]
+        return _assembler(ocr_pages(taches, _ocr_page, max_workers, arret))
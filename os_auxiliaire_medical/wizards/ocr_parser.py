@@ -0,0 +1,196 @@
+"""
+Analyse du texte OCR d'une ordonnance (parser local, sans Claude).
+
+Un seul balayage du texte : une expression régulière compilée une fois,
+dont chaque alternative nommée est un type de jeton (fin de ligne, date,
+code prescripteur, docteur, patient, civilité, acte, ligne en majuscules).
+Les jetons sont ensuite arbitrés :
+
+  - date de prescription : la plus récente des dates 2000 – 2099
+  - prescripteur : premier « Dr / Docteur », à défaut première civilité
+  - patient : « Patient : » ou « pour M. / Mme », à défaut une civilité non
+    retenue comme prescripteur, à défaut une ligne en majuscules de la
+    moitié centrale du document (règle historique)
+  - actes : lettre-clé, coefficient et nombre de séances
+
+Chaque champ reçoit un indice de confiance (0 – 1, selon la règle qui l'a
+trouvé) et sa position (début, fin) dans le texte, pour le surlignage.
+
+Aucune dépendance ORM.
+"""
+import datetime
+import re
+
+MOIS_FR = {
+    'janvier': 1, 'fevrier': 2, 'février': 2, 'mars': 3, 'avril': 4,
+    'mai': 5, 'juin': 6, 'juillet': 7, 'aout': 8, 'août': 8,
+    'septembre': 9, 'octobre': 10, 'novembre': 11, 'decembre': 12, 'décembre': 12,
+}
+DATE_MIN = datetime.date(2000, 1, 1)
+DATE_MAX = datetime.date(2099, 12, 31)
+
+_MAJ = 'A-ZÉÈÀÙÂÊÎÔÛÄÇ'
+_MIN = 'a-záéèàùâêîôûäçëïü'
+# Nom propre : un mot à initiale majuscule, puis jusqu'à 3 mots à initiale
+# majuscule sur la même ligne (« DUPONT Alice », « LE BRIS Anne-Marie »).
+_NOM = r'[{M}][{M}{m}\-]+(?:[ \t]+[{M}][{M}{m}\-]*){{0,3}}'.format(M=_MAJ, m=_MIN)
+_CIVILITES = r'(?:mme|mlle|mr|m)'
+_CIVILITE = _CIVILITES + r'\b\.?'
+
+RE_JETONS = re.compile('|'.join((
+    r'(?P<fin_ligne>[ \t\r]*\n(?:[ \t\r]*\n)*)',
+    r'(?P<date>\b(?P<jour>\d{1,2})[/.\-](?P<mois>\d{1,2})[/.\-](?P<annee>\d{2,4})\b)',
+    r'(?P<date_l>(?i:\b(?P<jour_l>\d{1,2})(?:er)?[ \t]+(?P<mois_l>%s)[ \t]+(?P<annee_l>\d{4})\b))'
+    % '|'.join(MOIS_FR),
+    r'(?P<code>(?i:\b(?:code(?:[ \t]+prescripteur)?(?![ \t]+postal)|n°?[ \t]*(?:rpps|am)\b)'
+    r'[ \t]*:?[ \t]*(?P<code_val>(?=[A-Z]*\d)[A-Z0-9]{4,15})\b))',
+    r'(?P<docteur>(?i:\b(?:dr\b\.?|docteur\b))[ \t]*(?P<docteur_nom>%s))' % _NOM,
+    r'(?P<patient>(?i:\bpatiente?\b[ \t]*:?|\bpour[ \t]+%s)[ \t]*(?:(?i:%s)[ \t]+)?'
+    r'(?P<patient_nom>%s))' % (_CIVILITE, _CIVILITE, _NOM),
+    r'(?P<civilite>(?i:\b%s)[ \t]+(?P<civilite_nom>%s))' % (_CIVILITE, _NOM),
+    r'(?P<acte>(?i:\b(?P<lettre>AM[OKYIS]|AMP|AIS|DI)[ \t]*(?P<coef>\d+(?:[.,]\d+)?)'
+    r'(?:[ \t]*(?:(?P<fois>[x×*])|-)?[ \t]*(?P<nb>\d+)(?![/.\-]?\d)(?P<seances>[ \t]*séances?)?)?))',
+    # Ligne entière en majuscules (hors civilité / docteur, traités ci-dessus).
+    r'(?P<majuscules>^[ \t]*(?!(?i:dr|docteur|%s)\b)(?P<majuscules_nom>[%s][%s \t\-]{2,39}?)[ \t\r]*$)'
+    % (_CIVILITES, _MAJ, _MAJ),
+)), re.MULTILINE)
+
+# Indices de confiance par règle de détection.
+CONFIANCE = {
+    'date_unique': 0.9,
+    'date_multiple': 0.7,
+    'code': 0.9,
+    'docteur': 0.9,
+    'civilite_prescripteur': 0.5,
+    'patient': 0.9,
+    'civilite_patient': 0.6,
+    'majuscules': 0.3,
+    'acte_seances': 0.9,
+    'acte_seul': 0.6,
+}
+
+
+def _date(jour, mois, annee):
+    try:
+        annee = int(annee)
+        d = datetime.date(annee + 2000 if annee < 100 else annee, int(mois), int(jour))
+    except ValueError:
+        return None
+    return d if DATE_MIN <= d <= DATE_MAX else None
+
+
+def _nom_prenom(nom_complet):
+    """« LE BRIS Anne » → ('LE BRIS', 'Anne') ; tout en majuscules : 1er mot = nom."""
+    mots = nom_complet.split()
+    nb_nom = 0
+    while nb_nom < len(mots) and mots[nb_nom].isupper():
+        nb_nom += 1
+    if nb_nom in (0, len(mots)):
+        nb_nom = 1
+    return ' '.join(mots[:nb_nom]).upper(), ' '.join(mots[nb_nom:]).title()
+
+
+def parse_ordonnance_text(text):
+    """
+    Champs d'une ordonnance extraits du texte OCR.
+
+    Clés historiques : prescripteur_nom, prescripteur_code, date_prescription,
+    patient_nom, patient_prenom, actes [{lettre_cle, coefficient, nb_seances}],
+    texte_brut. En plus :
+      confiance : {champ: 0 – 1} ; 'actes' : liste alignée sur actes
+      positions : {champ: (début, fin)} ; 'actes' : liste alignée sur actes
+    Les champs 'patient' de confiance / positions couvrent nom et prénom.
+    """
+    result = {
+        'prescripteur_nom': '', 'prescripteur_code': '',
+        'date_prescription': None, 'patient_nom': '', 'patient_prenom': '',
+        'actes': [], 'texte_brut': text,
+        'confiance': {'actes': []}, 'positions': {'actes': []},
+    }
+    if not text:
+        return result
+    confiance, positions = result['confiance'], result['positions']
+
+    dates = []
+    docteur = code = patient = None
+    civilites = []
+    majuscules = []
+    ligne = fin_derniere_ligne = 0
+    for m in RE_JETONS.finditer(text):
+        genre = m.lastgroup
+        if genre == 'fin_ligne':
+            if m.start():
+                ligne += 1
+            fin_derniere_ligne = m.end()
+        elif genre == 'acte':
+            nb = m.group('nb')
+            explicite = nb and (m.group('fois') or m.group('seances'))
+            result['actes'].append({
+                'lettre_cle': m.group('lettre').upper(),
+                'coefficient': float(m.group('coef').replace(',', '.')),
+                'nb_seances': int(nb) if explicite else 1,
+            })
+            positions['actes'].append(m.span())
+            confiance['actes'].append(CONFIANCE['acte_seances' if explicite else 'acte_seul'])
+        elif genre == 'date':
+            d = _date(m.group('jour'), m.group('mois'), m.group('annee'))
+            if d:
+                dates.append((d, m.span()))
+        elif genre == 'date_l':
+            d = _date(m.group('jour_l'), MOIS_FR[m.group('mois_l').lower()], m.group('annee_l'))
+            if d:
+                dates.append((d, m.span()))
+        elif genre == 'docteur':
+            docteur = docteur or m
+        elif genre == 'code':
+            code = code or m
+        elif genre == 'patient':
+            patient = patient or m
+        elif genre == 'civilite':
+            civilites.append(m)
+        elif genre == 'majuscules':
+            majuscules.append((ligne, m))
+    nb_lignes = ligne + (1 if text[fin_derniere_ligne:].strip() else 0)
+
+    if dates:
+        date, span = max(dates, key=lambda d: d[0])
+        result['date_prescription'] = date
+        positions['date_prescription'] = span
+        confiance['date_prescription'] = CONFIANCE[
+            'date_unique' if len({d for d, _s in dates}) == 1 else 'date_multiple']
+
+    if code:
+        result['prescripteur_code'] = code.group('code_val')
+        positions['prescripteur_code'] = code.span('code_val')
+        confiance['prescripteur_code'] = CONFIANCE['code']
+
+    # Prescripteur : « Dr » d'abord ; une civilité seule est ambiguë avec le patient.
+    if docteur:
+        prescripteur, groupe, regle = docteur, 'docteur_nom', 'docteur'
+    elif civilites:
+        prescripteur, groupe, regle = civilites.pop(0), 'civilite_nom', 'civilite_prescripteur'
+    else:
+        prescripteur = None
+    if prescripteur:
+        result['prescripteur_nom'] = prescripteur.group(groupe).strip()
+        positions['prescripteur_nom'] = prescripteur.span(groupe)
+        confiance['prescripteur_nom'] = CONFIANCE[regle]
+
+    if patient:
+        trouve, groupe, regle = patient, 'patient_nom', 'patient'
+    elif civilites:
+        trouve, groupe, regle = civilites[0], 'civilite_nom', 'civilite_patient'
+    else:
+        debut, fin = nb_lignes // 4, nb_lignes * 3 // 4
+        trouve = next((
+            m for no, m in majuscules
+            if debut <= no < fin and 2 <= len(m.group('majuscules_nom').split()) <= 4
+        ), None)
+        groupe, regle = 'majuscules_nom', 'majuscules'
+    if trouve:
+        nom, prenom = _nom_prenom(trouve.group(groupe))
+        result['patient_nom'], result['patient_prenom'] = nom, prenom
+        positions['patient'] = trouve.span(groupe)
+        confiance['patient'] = CONFIANCE[regle]
+    return result
+
@@ -0,0 +1,253 @@
+"""
+Wizard d'optimisation d'agenda multi-praticiens.
+
+Place en une fois les séances restantes (théoriques) d'un lot d'ordonnances,
+tous praticiens confondus, avec le solveur pur Python agenda_optimiseur :
+jours/heures de travail, durée de séance, délai minimum, agenda existant et
+nombre de salles du cabinet (séances de tous ses praticiens). Les séances proposées sont modifiables avant
+création des feuilles FSA25 (16 actes maximum par feuille, par ordonnance).
+"""
+import datetime
+from odoo import models, fields, api, _
+from odoo.exceptions import UserError
+
+from .agenda_optimiseur import Demande, OptimiseurAgenda
+from .wizard_date_selection import SEANCES_PAR_FEUILLE
+
+
+class WizardAgendaOptimiseur(models.TransientModel):
+    _name = 'cps.wizard.agenda.optimiseur'
+    _description = "Optimisation de l'agenda (multi-praticiens)"
+
+    ordonnance_ids = fields.Many2many(
+        'cps.ordonnance', string='Ordonnances',
+        domain="[('has_seances_disponibles', '=', True)]",
+        default=lambda self: self._default_ordonnances(),
+    )
+    date_debut = fields.Date(string='Du', required=True, default=fields.Date.today)
+    date_fin = fields.Date(
+        string='Au', required=True,
+        default=lambda self: fields.Date.today() + datetime.timedelta(days=90),
+    )
+
+    # ── Disponibilités du cabinet ─────────────────────────────────────────────
+    heure_ouverture = fields.Float(string="Début de journée", default=7.0, digits=(2, 2))
+    heure_fermeture = fields.Float(string='Fin de journée', default=19.0, digits=(2, 2))
+    nb_salles = fields.Integer(
+        string='Salles', default=0,
+        help='Nombre de séances simultanées possibles dans le cabinet '
+             '(salles partagées entre praticiens). 0 = pas de limite.',
+    )
+    limite_secondes = fields.Float(
+        string='Temps de calcul max (s)', default=5.0,
+        help="Durée maximale de la phase d'amélioration du solveur.",
+    )
+
+    lundi         = fields.Boolean(string='Lundi',    default=True)
+    mardi         = fields.Boolean(string='Mardi',    default=True)
+    mercredi      = fields.Boolean(string='Mercredi', default=True)
+    jeudi         = fields.Boolean(string='Jeudi',    default=True)
+    vendredi      = fields.Boolean(string='Vendredi', default=True)
+    samedi        = fields.Boolean(string='Samedi',   default=False)
+    dimanche_jour = fields.Boolean(string='Dimanche', default=False)
+
+    ligne_ids = fields.One2many('cps.wizard.agenda.optimiseur.ligne', 'wizard_id')
+    nb_selectionnees = fields.Integer(compute='_compute_stats')
+    nb_non_placees = fields.Integer(string='Séances non placées', readonly=True)
+    temps_morts = fields.Integer(string='Temps morts (min)', readonly=True)
+
+    @api.model
+    def _default_ordonnances(self):
+        if self.env.context.get('active_model') == 'cps.ordonnance':
+            return [(6, 0, self.env.context.get('active_ids', []))]
+        return []
+
+    @api.depends('ligne_ids.selected')
+    def _compute_stats(self):
+        for rec in self:
+            rec.nb_selectionnees = len(rec.ligne_ids.filtered('selected'))
+
+    # ── Préparation des données du solveur ────────────────────────────────────
+
+    def _horaires(self, praticien_ids):
+        jours = [idx for coché, idx in [
+            (self.lundi, 0), (self.mardi, 1), (self.mercredi, 2), (self.jeudi, 3),
+            (self.vendredi, 4), (self.samedi, 5), (self.dimanche_jour, 6),
+        ] if coché]
+        if not jours:
+            raise UserError(_('Cochez au moins un jour de la semaine.'))
+        plage = (int(round(self.heure_ouverture * 60)), int(round(self.heure_fermeture * 60)))
+        return {pid: {j: plage for j in jours} for pid in praticien_ids}
+
+    def _charger_occupations(self, praticien_ids):
+        """
+        Charge en une requête les séances non annulées du cabinet (sociétés
+        des ordonnances) sur la période. Retourne (occupations, salles) :
+          - occupations : {(praticien_id, date): [(debut_min, fin_min), ...]}
+            pour les praticiens du lot (conflits d'agenda)
+          - salles : {date: [(debut_min, fin_min), ...]} pour les autres
+            praticiens du cabinet (salles partagées)
+        """
+        existing = self.env['cps.feuille.soins.acte'].search([
+            ('company_id', 'in', self.ordonnance_ids.company_id.ids),
+            ('date_acte', '>=', self.date_debut),
+            ('date_acte', '<=', self.date_fin),
+            ('state_seance', 'not in', ['annulee']),
+        ])
+        lot = set(praticien_ids)
+        occupations, salles = {}, {}
+        for ex in existing:
+            debut = int(round((ex.heure_acte or 8.0) * 60))
+            duree = ex.acte_type_id.duree_seance if ex.acte_type_id else 30
+            intervalle = (debut, debut + (duree or 30))
+            if ex.praticien_id.id in lot:
+                occupations.setdefault((ex.praticien_id.id, ex.date_acte), []).append(intervalle)
+            else:
+                salles.setdefault(ex.date_acte, []).append(intervalle)
+        return occupations, salles
+
+    def _demandes(self):
+        """Une demande par ligne d'ordonnance ayant des séances restantes."""
+        demandes = []
+        for ordonnance in self.ordonnance_ids:
+            if not ordonnance.praticien_id:
+                continue
+            for ligne in ordonnance.ligne_ids.filtered(
+                lambda l: l.nb_seances_theorique_restantes > 0 and l.acte_type_id
+            ):
+                delai = ligne.acte_type_id.delai_min_jours or 0
+                derniere = ligne.get_last_seance_date()
+                date_min = max(self.date_debut, ordonnance.date_prescription or self.date_debut)
+                if derniere:
+                    date_min = max(date_min, derniere + datetime.timedelta(days=max(delai, 1)))
+                demandes.append(Demande(
+                    ref=ligne.id,
+                    praticien=ordonnance.praticien_id.id,
+                    nb_seances=ligne.nb_seances_theorique_restantes,
+                    duree_min=ligne.acte_type_id.duree_seance or 30,
+                    delai_min_jours=delai,
+                    date_min=date_min,
+                ))
+        return demandes
+
+    # ── Optimisation ──────────────────────────────────────────────────────────
+
+    def action_optimiser(self):
+        self.ensure_one()
+        if not self.ordonnance_ids:
+            raise UserError(_('Sélectionnez au moins une ordonnance.'))
+        if self.date_debut > self.date_fin:
+            raise UserError(_('La date de début doit être ≤ à la date de fin.'))
+        if self.heure_ouverture >= self.heure_fermeture:
+            raise UserError(_("L'heure de fin de journée doit suivre l'heure de début."))
+
+        demandes = self._demandes()
+        if not demandes:
+            raise UserError(_("Les ordonnances sélectionnées n'ont plus de séances à planifier."))
+        praticien_ids = list({d.praticien for d in demandes})
+
+        occupations, salles = self._charger_occupations(praticien_ids)
+        optimiseur = OptimiseurAgenda(
+            self._horaires(praticien_ids), occupations,
+            nb_salles=max(self.nb_salles, 0), salles_occupees=salles,
+        )
+        resultat = optimiseur.optimiser(
+            demandes, self.date_fin, limite_s=max(self.limite_secondes, 0.0),
+        )
+
+        lignes_ord = {
+            l.id: l for l in self.env['cps.ordonnance.ligne'].browse([d.ref for d in demandes])
+        }
+        placees = [lignes_ord[p.ref] for p in resultat.placements]
+        montants = self.env['cps.tarif.resolver'].price_many(
+            [l.acte_type_id for l in placees],
+            [l.coefficient or l.acte_type_id.coefficient_defaut for l in placees],
+            date=[p.date for p in resultat.placements],
+            company=[l.ordonnance_id.company_id.id for l in placees],
+        )
+        self.write({
+            'ligne_ids': [(5, 0, 0)] + [(0, 0, {
+                'selected': True,
+                'date': p.date,
+                'heure_acte': p.debut / 60.0,
+                'duree_seance': p.fin - p.debut,
+                'praticien_id': p.praticien,
+                'ordonnance_ligne_id': p.ref,
+                'acte_type_id': lignes_ord[p.ref].acte_type_id.id,
+                'montant': montant,
+            }) for p, montant in zip(resultat.placements, montants)],
+            'nb_non_placees': sum(resultat.non_places.values()),
+            'temps_morts': resultat.temps_morts,
+        })
+        return self._reopen()
+
+    # ── Application : création des feuilles ───────────────────────────────────
+
+    def action_appliquer(self):
+        self.ensure_one()
+        sel = self.ligne_ids.filtered('selected')
+        if not sel:
+            raise UserError(_('Aucune séance sélectionnée.'))
+
+        feuilles = self.env['cps.feuille.soins']
+        for ordonnance in sel.mapped('ordonnance_id'):
+            seances = sel.filtered(lambda l: l.ordonnance_id == ordonnance).sorted(
+                lambda l: (l.date, l.heure_acte)
+            )
+            feuilles |= feuilles.create([{
+                'patient_id':        ordonnance.patient_id.id,
+                'praticien_id':      ordonnance.praticien_id.id,
+                'ordonnance_id':     ordonnance.id,
+                'date_prescription': ordonnance.date_prescription,
+                'company_id':        ordonnance.company_id.id,
+                'parcours_soins':    True,
+                'code_prescripteur': ordonnance.prescripteur_id.vat or '',
+                'acte_ids': [(0, 0, {
+                    'acte_type_id':        l.acte_type_id.id,
+                    'date_acte':           l.date,
+                    'heure_acte':          l.heure_acte,
+                    'lettre_cle':          l.acte_type_id.lettre_cle,
+                    'coefficient':         (l.ordonnance_ligne_id.coefficient
+                                            or l.acte_type_id.coefficient_defaut),
+                    'montant':             l.montant,
+                    'ordonnance_ligne_id': l.ordonnance_ligne_id.id,
+                }) for l in seances[i:i + SEANCES_PAR_FEUILLE]],
+            } for i in range(0, len(seances), SEANCES_PAR_FEUILLE)])
+
+        return {
+            'type': 'ir.actions.act_window',
+            'name': _('%d feuilles FSA25 créées') % len(feuilles),
+            'res_model': 'cps.feuille.soins',
+            'view_mode': 'list,form',
+            'domain': [('id', 'in', feuilles.ids)],
+            'target': 'current',
+        }
+
+    def _reopen(self):
+        return {
+            'type': 'ir.actions.act_window',
+            'res_model': self._name,
+            'res_id': self.id,
+            'view_mode': 'form',
+            'target': 'new',
+            'context': self.env.context,
+        }
+
+
+class WizardAgendaOptimiseurLigne(models.TransientModel):
+    _name = 'cps.wizard.agenda.optimiseur.ligne'
+    _description = "Séance proposée (optimisation de l'agenda)"
+    _order = 'praticien_id, date, heure_acte'
+
+    wizard_id           = fields.Many2one('cps.wizard.agenda.optimiseur', required=True,
+                                          ondelete='cascade')
+    selected            = fields.Boolean(string='✓', default=True)
+    date                = fields.Date(required=True)
+    heure_acte          = fields.Float(string='Heure', digits=(2, 2))
+    duree_seance        = fields.Integer(string='Durée (min)')
+    praticien_id        = fields.Many2one('res.partner', string='Praticien', readonly=True)
+    ordonnance_ligne_id = fields.Many2one('cps.ordonnance.ligne', readonly=True)
+    ordonnance_id       = fields.Many2one(related='ordonnance_ligne_id.ordonnance_id')
+    patient_id          = fields.Many2one(related='ordonnance_ligne_id.ordonnance_id.patient_id')
+    acte_type_id        = fields.Many2one('cps.acte.type', string='Acte', readonly=True)
+    montant             = fields.Float(digits=(10, 0))
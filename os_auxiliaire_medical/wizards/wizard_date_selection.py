@@ -176,27 +176,47 @@ class WizardDateSelection(models.TransientModel):
 
     # ── Détection de conflits ─────────────────────────────────────────────────
 
-    def _check_conflict(self, praticien_id, date, heure_debut, duree_min):
+    def _charger_creneaux(self, praticien_id, date_min, date_max):
         """
-        Vérifie si le praticien a déjà une séance qui chevauche le créneau
-        [heure_debut, heure_debut + duree_min/60].
+        Charge en une requête les séances non annulées du praticien sur
+        [date_min, date_max] et les indexe par jour.
 
-        Retourne (has_conflict: bool, description: str).
+        Retourne {date: [(heure_debut, heure_fin, patient), ...]} trié par
+        heure de début ; la détection de conflit travaille ensuite en mémoire.
         """
         if not praticien_id:
-            return False, ''
-        heure_fin = heure_debut + duree_min / 60.0
+            return {}
         existing = self.env['cps.feuille.soins.acte'].search([
             ('praticien_id', '=', praticien_id),
-            ('date_acte', '=', date),
+            ('date_acte', '>=', date_min),
+            ('date_acte', '<=', date_max),
             ('state_seance', 'not in', ['annulee']),
         ])
+        creneaux = {}
         for ex in existing:
             ex_debut = ex.heure_acte or 8.0
             ex_duree_min = ex.acte_type_id.duree_seance if ex.acte_type_id else 30
-            ex_fin = ex_debut + ex_duree_min / 60.0
-            if heure_debut < ex_fin and heure_fin > ex_debut:
-                patient_name = ex.patient_id.name if ex.patient_id else '?'
+            creneaux.setdefault(ex.date_acte, []).append((
+                ex_debut,
+                ex_debut + ex_duree_min / 60.0,
+                ex.patient_id.name if ex.patient_id else '?',
+            ))
+        for jour in creneaux.values():
+            jour.sort()
+        return creneaux
+
+    def _check_conflict(self, creneaux, date, heure_debut, duree_min):
+        """
+        Vérifie si le praticien a déjà une séance qui chevauche le créneau
+        [heure_debut, heure_debut + duree_min/60] (creneaux : _charger_creneaux).
+
+        Retourne (has_conflict: bool, description: str).
+        """
+        heure_fin = heure_debut + duree_min / 60.0
+        for ex_debut, ex_fin, patient_name in creneaux.get(date, ()):
+            if ex_debut >= heure_fin:
+                break
+            if heure_debut < ex_fin:
                 return True, _('Conflit : %s à %s') % (
                     patient_name, self._fmt_heure(ex_debut)
                 )
@@ -208,18 +228,34 @@ class WizardDateSelection(models.TransientModel):
         mins = int(round((h - hours) * 60))
         return '%02dh%02d' % (hours, mins)
 
-    def _find_free_slot(self, praticien_id, date, heure_debut, duree_min):
+    def _find_free_slot(self, creneaux, date, heure_debut, duree_min):
         """
-        Cherche le premier créneau libre à partir de heure_debut sur la journée.
+        Cherche le premier créneau libre à partir de heure_debut sur la journée,
+        par pas de duree_min, en un seul balayage des séances du jour.
         Retourne (heure_libre, decale: bool).
         """
-        heure = heure_debut
+        pas = duree_min / 60.0
         max_heure = 19.0
-        while heure + duree_min / 60.0 <= max_heure + 1:
-            conflict, _ = self._check_conflict(praticien_id, date, heure, duree_min)
-            if not conflict:
+        occupes = creneaux.get(date, ())
+        i = 0
+        heure = heure_debut
+        while heure + pas <= max_heure + 1:
+            # Les séances triées par début qui finissent avant le candidat sont
+            # écartées (le candidat ne fait qu'avancer) ; seules les suivantes
+            # peuvent encore chevaucher.
+            while i < len(occupes) and occupes[i][1] <= heure:
+                i += 1
+            fin = heure + pas
+            libre = True
+            for ex_debut, ex_fin, _patient in occupes[i:]:
+                if ex_debut >= fin:
+                    break
+                if heure < ex_fin:
+                    libre = False
+                    break
+            if libre:
                 return heure, heure != heure_debut
-            heure += duree_min / 60.0
+            heure += pas
         # Aucun créneau libre : on retourne l'original avec signalement
         return heure_debut, False
 
@@ -275,13 +311,13 @@ class WizardDateSelection(models.TransientModel):
         if not dates:
             raise UserError(_('Aucune date ne correspond à la sélection.'))
 
-        IrParam = self.env['ir.config_parameter'].sudo()
+        Resolver = self.env['cps.tarif.resolver']
         heure   = self.heure_debut
         duree   = self.duree_seance or 30
         praticien_id = self.feuille_id.praticien_id.id if self.feuille_id.praticien_id else False
+        creneaux = self._charger_creneaux(praticien_id, dates[0], dates[-1])
 
         if self.acte_type_id:
-            montant_u = self._montant_unitaire(self.acte_type_id, IrParam)
             ord_ligne = False
             if self.ordonnance_id:
                 ol = self.ordonnance_id.ligne_ids.filtered(
@@ -291,7 +327,7 @@ class WizardDateSelection(models.TransientModel):
             nouvelles = []
             for d in dates:
                 actual_heure, decale, conflict, conflict_info = \
-                    self._resolve_slot(praticien_id, d, heure, duree)
+                    self._resolve_slot(creneaux, d, heure, duree)
                 if decale:
                     conflict_info = _('Décalé à %s') % self._fmt_heure(actual_heure)
                 nouvelles.append((0, 0, {
@@ -299,19 +335,18 @@ class WizardDateSelection(models.TransientModel):
                     'selected': True,
                     'acte_type_id': self.acte_type_id.id,
                     'ordonnance_ligne_id': ord_ligne.id if ord_ligne else False,
-                    'montant': montant_u,
                     'heure_acte': actual_heure,
                     'warning': '',
                     'has_conflict': conflict,
                     'conflict_info': conflict_info,
                 }))
         elif self.ordonnance_id:
-            nouvelles = self._distribuer_dates_auto(dates, IrParam, heure, duree, praticien_id)
+            nouvelles = self._distribuer_dates_auto(dates, heure, duree, creneaux)
         else:
             nouvelles = []
             for d in dates:
                 actual_heure, decale, conflict, conflict_info = \
-                    self._resolve_slot(praticien_id, d, heure, duree)
+                    self._resolve_slot(creneaux, d, heure, duree)
                 if decale:
                     conflict_info = _('Décalé à %s') % self._fmt_heure(actual_heure)
                 nouvelles.append((0, 0, {
@@ -326,20 +361,21 @@ class WizardDateSelection(models.TransientModel):
                     'conflict_info': conflict_info,
                 }))
 
+        self._tarifer(nouvelles, Resolver)
         self.ligne_ids = [(5, 0, 0)] + nouvelles
         return self._reopen()
 
-    def _resolve_slot(self, praticien_id, date, heure, duree_min):
+    def _resolve_slot(self, creneaux, date, heure, duree_min):
         """
         Détermine le créneau final selon la politique de conflit.
 
         Retourne (actual_heure, decale, has_conflict, conflict_info).
         """
-        conflict, info = self._check_conflict(praticien_id, date, heure, duree_min)
+        conflict, info = self._check_conflict(creneaux, date, heure, duree_min)
         if not conflict:
             return heure, False, False, ''
         if self.auto_decaler:
-            free, decale = self._find_free_slot(praticien_id, date, heure, duree_min)
+            free, decale = self._find_free_slot(creneaux, date, heure, duree_min)
             if decale:
                 return free, True, False, ''
             # Aucun créneau libre après décalage
@@ -347,7 +383,7 @@ class WizardDateSelection(models.TransientModel):
         else:
             return heure, False, True, info
 
-    def _distribuer_dates_auto(self, dates, IrParam, heure, duree_min, praticien_id):
+    def _distribuer_dates_auto(self, dates, heure, duree_min, creneaux):
         lignes_ord = self.ordonnance_id.ligne_ids.sorted(
             lambda l: (l.acte_type_id.sequence or 0, l.id)
         ).filtered(lambda l: l.nb_seances_theorique_restantes > 0)
@@ -355,7 +391,7 @@ class WizardDateSelection(models.TransientModel):
             result = []
             for d in dates:
                 actual_heure, decale, conflict, conflict_info = \
-                    self._resolve_slot(praticien_id, d, heure, duree_min)
+                    self._resolve_slot(creneaux, d, heure, duree_min)
                 if decale:
                     conflict_info = _('Décalé à %s') % self._fmt_heure(actual_heure)
                 result.append((0, 0, {
@@ -369,7 +405,6 @@ class WizardDateSelection(models.TransientModel):
 
         remaining    = {l.id: l.nb_seances_theorique_restantes for l in lignes_ord}
         last_date    = {l.id: l.get_last_seance_date() for l in lignes_ord}
-        montants     = {l.id: self._montant_unitaire(l.acte_type_id, IrParam) for l in lignes_ord}
         delai_global = self.delai_min_jours
         result = []
         for date in sorted(dates):
@@ -382,14 +417,13 @@ class WizardDateSelection(models.TransientModel):
                 if last and delai > 0 and (date - last).days < delai:
                     continue
                 actual_heure, decale, conflict, conflict_info = \
-                    self._resolve_slot(praticien_id, date, heure, duree_min)
+                    self._resolve_slot(creneaux, date, heure, duree_min)
                 if decale:
                     conflict_info = _('Décalé à %s') % self._fmt_heure(actual_heure)
                 result.append((0, 0, {
                     'date': date, 'selected': True,
                     'acte_type_id': ligne.acte_type_id.id,
                     'ordonnance_ligne_id': ligne.id,
-                    'montant': montants[ligne.id],
                     'heure_acte': actual_heure,
                     'warning': '',
                     'has_conflict': conflict,
@@ -401,7 +435,7 @@ class WizardDateSelection(models.TransientModel):
                 break
             if not assigned:
                 actual_heure, decale, conflict, conflict_info = \
-                    self._resolve_slot(praticien_id, date, heure, duree_min)
+                    self._resolve_slot(creneaux, date, heure, duree_min)
                 result.append((0, 0, {
                     'date': date, 'selected': False,
                     'acte_type_id': False, 'ordonnance_ligne_id': False,
@@ -411,22 +445,27 @@ class WizardDateSelection(models.TransientModel):
                 }))
         return result
 
+    def _tarifer(self, nouvelles, Resolver):
+        """
+        Montant des séances générées ((0, 0, vals) avec un type d'acte) au
+        tarif en vigueur à leur date, pour la société de la feuille : un seul
+        appel groupé au resolver.
+        """
+        a_tarifer = [vals for _cmd, _id, vals in nouvelles if vals.get('acte_type_id')]
+        ActeType = self.env['cps.acte.type']
+        montants = Resolver.price_many(
+            [ActeType.browse(vals['acte_type_id']) for vals in a_tarifer],
+            date=[vals['date'] for vals in a_tarifer],
+            company=self.feuille_id.company_id,
+        )
+        for vals, montant in zip(a_tarifer, montants):
+            vals['montant'] = montant
+
     @staticmethod
-    def _montant_unitaire(acte_type, IrParam):
+    def _montant_unitaire(acte_type, Resolver, date=None, company=None):
         if not acte_type:
             return 0.0
-        if acte_type.type_supplement == 'ifn':
-            return float(IrParam.get_param('cps.supplement.ifn', 250))
-        cfg = {
-            'AMO': 'cps.tarif.amo', 'AMK': 'cps.tarif.amo', 'AMY': 'cps.tarif.amy',
-            'AMI': 'cps.tarif.ami', 'AIS': 'cps.tarif.ami', 'DI':  'cps.tarif.ami',
-            'AMS': 'cps.tarif.ams', 'AMP': 'cps.tarif.ams',
-        }
-        lk    = (acte_type.lettre_cle or '').upper()
-        key   = cfg.get(lk)
-        tarif = (float(IrParam.get_param(key, acte_type.tarif_unitaire or 490))
-                 if key else (acte_type.tarif_unitaire or 490))
-        return round(tarif * (acte_type.coefficient_defaut or 0), 0)
+        return Resolver.price_many(acte_type, date=date, company=company)[0]
 
     # ── Application : création multi-feuilles ─────────────────────────────────
 
@@ -592,7 +631,7 @@ class WizardDateSelectionLigne(models.TransientModel):
         wizard = self.wizard_id
         if not wizard or not wizard.ordonnance_id:
             return
-        IrParam = self.env['ir.config_parameter'].sudo()
+        Resolver = self.env['cps.tarif.resolver']
         planned_counts = {}
         for l in wizard.ligne_ids:
             if l != self and l.selected and l.acte_type_id:
@@ -607,6 +646,7 @@ class WizardDateSelectionLigne(models.TransientModel):
                 self.acte_type_id        = ligne_ord.acte_type_id
                 self.ordonnance_ligne_id = ligne_ord
                 self.montant = WizardDateSelection._montant_unitaire(
-                    ligne_ord.acte_type_id, IrParam
+                    ligne_ord.acte_type_id, Resolver,
+                    date=self.date, company=wizard.feuille_id.company_id,
                 )
                 return
@@ -0,0 +1,428 @@
+"""
+Import OCR en lot : un ZIP ou plusieurs scans d'ordonnances en une fois.
+
+  1. OCR local (pdfminer / tesseract) ou préparation des images pour Claude
+     vision (ocr_image), en parallèle dans un pool de threads borné
+  2. Appels Claude (texte anonymisé ou vision) dans un pool de threads borné
+     (nombre d'appels simultanés configurable)
+  3. Création groupée des ordonnances brouillon et de leurs lignes
+     (_create_lignes_from_ocr), dans le thread principal uniquement
+
+Les contenus déjà analysés (cps.ocr.cache) ne sont pas renvoyés à Claude.
+
+Chaque fichier reçoit un statut dans le rapport du wizard.
+"""
+import base64
+import io
+import json
+import logging
+import os
+import posixpath
+import time
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+
+from odoo import models, fields, api, _
+from odoo.exceptions import UserError
+
+from ..models.anthropic_client import ErreurClaude, envoyer, estimer_tokens
+from .wizard_ocr_ordonnance import (
+    PROMPT_VERSION_TEXTE, PROMPT_VERSION_VISION,
+    _claude_payload_texte, _claude_payload_vision,
+    _claude_texte_reponse, _extract_text_local, _image_for_vision,
+    parse_ordonnance_text,
+)
+
+_logger = logging.getLogger(__name__)
+
+EXTENSIONS_OCR = ('.pdf', '.png', '.jpg', '.jpeg', '.webp', '.tif', '.tiff')
+EXTENSIONS_IMAGE = ('.png', '.jpg', '.jpeg', '.webp')
+
+
+# ── Pools (sans accès ORM) ────────────────────────────────────────────────────
+
+def _ocr_local_worker(fichier):
+    nom, data, pages_paralleles = fichier
+    try:
+        return _extract_text_local(nom.lower(), data, pages_paralleles), None
+    except Exception as e:
+        return '', str(e)
+
+
+def _vision_worker(fichier):
+    nom, data, options = fichier
+    try:
+        return _image_for_vision(nom.lower(), data, options)
+    except Exception as e:
+        _logger.warning('Import OCR : image %s non préparée (%s)', nom, e)
+        return None, None
+
+
+def _pool_lot(fonction, elements, max_workers=None):
+    """
+    map() dans un pool de threads borné, repli séquentiel s'il ne peut pas
+    démarrer. Pas de fork : le processus Odoo a d'autres threads (HTTP, cron)
+    dont un verrou pris (logging, curseur) resterait bloqué dans l'enfant.
+    tesseract et pdftoppm tournent dans des processus externes, Pillow
+    libère le GIL pendant le traitement des images.
+    """
+    if len(elements) < 2:
+        return [fonction(e) for e in elements]
+    workers = max_workers or min(os.cpu_count() or 1, len(elements))
+    try:
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='cps_ocr_lot') as pool:
+            return list(pool.map(fonction, elements))
+    except RuntimeError as e:
+        _logger.warning('Import OCR : pool de threads indisponible (%s), traitement séquentiel', e)
+        return [fonction(e) for e in elements]
+
+
+def ocr_local_lot(fichiers, max_workers=None):
+    """
+    OCR local de [(nom, octets)] → [(texte, erreur)], dans l'ordre.
+    Plusieurs fichiers : un thread par fichier, pages des PDF en séquence ;
+    un seul fichier : ses pages sont réparties sur les threads.
+    """
+    pages_paralleles = len(fichiers) < 2
+    return _pool_lot(_ocr_local_worker, [(nom, data, pages_paralleles) for nom, data in fichiers],
+                     max_workers)
+
+
+def vision_lot(fichiers, options=None, max_workers=None):
+    """Images prêtes pour Claude vision : [(nom, octets)] → [(octets, media_type)]."""
+    return _pool_lot(_vision_worker, [(nom, data, options) for nom, data in fichiers],
+                     max_workers)
+
+
+def claude_lot(payloads, config, concurrence=4):
+    """
+    Appels Claude [payload | None] → [(corps JSON, erreur)], dans l'ordre,
+    au plus `concurrence` requêtes simultanées. `config` : voir
+    cps.anthropic.client._config (session HTTP, nouvelles tentatives et
+    limite de débit partagées avec les autres appels du processus).
+    """
+    def appel(payload):
+        if payload is None:
+            return None, None
+        try:
+            return envoyer(config, payload), None
+        except ErreurClaude as e:
+            return None, str(e)
+
+    with ThreadPoolExecutor(max_workers=max(1, concurrence)) as pool:
+        return list(pool.map(appel, payloads))
+
+
+class WizardOcrImport(models.TransientModel):
+    _name = 'cps.wizard.ocr.import'
+    _description = "Import OCR d'ordonnances en lot"
+
+    fichier_zip = fields.Binary(string='Archive ZIP')
+    fichier_zip_nom = fields.Char(string='Nom du ZIP')
+    attachment_ids = fields.Many2many(
+        'ir.attachment', 'cps_wizard_ocr_import_attachment_rel', 'wizard_id', 'attachment_id',
+        string='Fichiers',
+    )
+    praticien_id = fields.Many2one(
+        'res.partner', string='Praticien',
+        domain="[('category_id.name', '=', 'Praticien CPS')]",
+        required=True, default=lambda self: self.env['cps.ordonnance']._default_praticien(),
+    )
+    use_claude_ai = fields.Boolean(
+        string='Analyser avec Claude (texte)', default=True,
+        help='Texte OCR local envoyé à Claude, prénom du patient anonymisé.',
+    )
+    use_claude_vision = fields.Boolean(
+        string='Analyser avec Claude (vision)',
+        help="Image envoyée directement à Claude (pas d'OCR local).",
+    )
+    concurrence = fields.Integer(
+        string='Appels Claude simultanés', default=4,
+        help="Nombre maximum de requêtes simultanées vers l'API Anthropic.",
+    )
+
+    etat = fields.Selection([
+        ('attente', 'En attente'), ('termine', 'Terminé'),
+    ], default='attente', readonly=True)
+    ligne_ids = fields.One2many('cps.wizard.ocr.import.ligne', 'wizard_id', readonly=True)
+    nb_ok = fields.Integer(compute='_compute_stats')
+    nb_erreur = fields.Integer(compute='_compute_stats')
+    duree = fields.Float(string='Durée (s)', readonly=True, digits=(10, 1))
+
+    @api.depends('ligne_ids.statut')
+    def _compute_stats(self):
+        for rec in self:
+            rec.nb_ok = len(rec.ligne_ids.filtered(lambda l: l.statut == 'ok'))
+            rec.nb_erreur = len(rec.ligne_ids) - rec.nb_ok
+
+    # ── Collecte des fichiers ─────────────────────────────────────────────────
+
+    def _collecter_fichiers(self):
+        """[(nom, octets)] depuis le ZIP (fichiers OCR uniquement) et les pièces jointes."""
+        fichiers = []
+        if self.fichier_zip:
+            try:
+                archive = zipfile.ZipFile(io.BytesIO(base64.b64decode(self.fichier_zip)))
+            except zipfile.BadZipFile:
+                raise UserError(_("L'archive %s n'est pas un ZIP valide.") % (self.fichier_zip_nom or ''))
+            for info in archive.infolist():
+                nom = posixpath.basename(info.filename)
+                if info.is_dir() or not nom or nom.startswith('.') \
+                        or '__MACOSX' in info.filename \
+                        or not nom.lower().endswith(EXTENSIONS_OCR):
+                    continue
+                fichiers.append((nom, archive.read(info)))
+        for att in self.attachment_ids:
+            fichiers.append((att.name or _('fichier %d') % att.id, att.raw or b''))
+        return fichiers
+
+    # ── Analyse ───────────────────────────────────────────────────────────────
+
+    def _analyser_lot(self, fichiers):
+        """
+        Analyse tous les fichiers ; retourne une liste alignée de
+        (données normalisées | None, erreur | None, usage | None, operation).
+        """
+        ocr = self.env['cps.wizard.ocr.ordonnance']
+        api_key = ocr._get_api_key()
+        model = ocr._get_model()
+        vision = self.use_claude_vision and bool(api_key)
+        claude_texte = self.use_claude_ai and bool(api_key) and not vision
+
+        # Cache puis budget : un contenu déjà analysé ne coûte rien ; au-delà
+        # de la limite dure du budget mensuel, le fichier passe en OCR local.
+        Client = self.env['cps.anthropic.client']
+        Cache = self.env['cps.ocr.cache']
+        souple, dure = Client._budget_restant()
+        engage = 0
+        hors_budget = 0
+        payloads = [None] * len(fichiers)
+        # Clé de cache par fichier envoyé à Claude : (contenu, version du prompt, opération)
+        cles = [None] * len(fichiers)
+        caches = [None] * len(fichiers)
+
+        def preparer(i, payload, cle):
+            nonlocal engage, hors_budget
+            caches[i] = Cache.lire(cle[0], model, cle[1])
+            if caches[i] is None:
+                estimation = estimer_tokens(payload)
+                if dure is not None and engage + estimation > dure:
+                    hors_budget += 1
+                    return
+                engage += estimation
+            payloads[i], cles[i] = payload, cle
+
+        # 1. Vision pour les images (et PDF convertibles), OCR local pour le reste
+        if vision:
+            a_voir = [i for i, (nom, _d) in enumerate(fichiers)
+                      if nom.lower().endswith(EXTENSIONS_IMAGE + ('.pdf',))]
+            images = vision_lot([fichiers[i] for i in a_voir], ocr._get_options_vision())
+            for i, (image, media_type) in zip(a_voir, images):
+                if image is not None:
+                    preparer(i, _claude_payload_vision(model, image, media_type),
+                             (image, PROMPT_VERSION_VISION, 'ocr_vision'))
+        a_ocr = [i for i, p in enumerate(payloads) if p is None]
+        textes = [('', None)] * len(fichiers)
+        for i, resultat in zip(a_ocr, ocr_local_lot([fichiers[i] for i in a_ocr])):
+            textes[i] = resultat
+        parses = [parse_ordonnance_text(texte) for texte, _err in textes]
+
+        # 2. Claude texte
+        if claude_texte:
+            for i, ((texte, _err), parse) in enumerate(zip(textes, parses)):
+                if texte.strip():
+                    texte_anon = ocr._anonymize_prenom(texte, parse['patient_prenom'])
+                    preparer(i, _claude_payload_texte(model, texte_anon),
+                             (texte_anon, PROMPT_VERSION_TEXTE, 'ocr_texte'))
+
+        if hors_budget:
+            _logger.info('Import OCR : budget Claude épuisé, %d fichier(s) en OCR local',
+                         hors_budget)
+        if souple is not None and engage > souple:
+            Client._avertir_budget()
+
+        # Seuls les contenus jamais analysés partent vers l'API.
+        a_envoyer = [p if c is None else None for p, c in zip(payloads, caches)]
+        reponses = [(None, None)] * len(fichiers)
+        if any(a_envoyer):
+            config = Client._config(api_key)
+            reponses = claude_lot(a_envoyer, config, self.concurrence)
+
+        # 3. Normalisation (thread principal)
+        resultats = []
+        for (texte, err_ocr), parse, payload, cle, claude, (body, err_claude) in zip(
+                textes, parses, payloads, cles, caches, reponses):
+            operation = cle[2] if cle else 'ocr_texte'
+            if payload is None and not texte.strip():
+                resultats.append((None, err_ocr or _('Aucun texte extrait.'), None, operation))
+                continue
+            data = {k: parse[k] for k in (
+                'prescripteur_nom', 'prescripteur_code', 'date_prescription',
+                'patient_nom', 'patient_prenom', 'actes')}
+            usage = None
+            if claude is not None:
+                usage = {'cache_hit': True}
+            elif payload is not None:
+                if err_claude:
+                    resultats.append((None, _('Erreur API Claude : %s') % err_claude,
+                                      {'success': False, 'error_message': err_claude}, operation))
+                    continue
+                usage = body.get('usage', {})
+                claude, err_json = ocr._parse_claude_json(_claude_texte_reponse(body))
+                if err_json:
+                    resultats.append((None, err_json, usage, operation))
+                    continue
+                Cache.ecrire(cle[0], model, cle[1], operation, claude)
+            if claude is not None:
+                vals = ocr._vals_from_claude_data(claude)
+                data.update({k: vals[k] for k in (
+                    'prescripteur_nom', 'prescripteur_code', 'date_prescription',
+                    'patient_nom') if k in vals})
+                data['actes'] = json.loads(vals['actes_json'])
+            resultats.append((data, None, usage, operation))
+        return resultats
+
+    # ── Création des ordonnances ──────────────────────────────────────────────
+
+    def _trouver_partenaires(self, noms, xmlid_categorie):
+        """{nom: res.partner} ; recherche par nom dans la catégorie, création sinon."""
+        categorie = self.env.ref(xmlid_categorie, raise_if_not_found=False)
+        Partner = self.env['res.partner']
+        partenaires = {}
+        for nom in noms:
+            domain = [('name', 'ilike', nom)]
+            if categorie:
+                domain.append(('category_id', 'in', categorie.ids))
+            partenaires[nom] = Partner.search(domain, limit=1)
+        a_creer = [nom for nom, p in partenaires.items() if not p]
+        if a_creer:
+            crees = Partner.create([
+                dict({'name': nom}, **({'category_id': [(4, categorie.id)]} if categorie else {}))
+                for nom in a_creer
+            ])
+            partenaires.update(zip(a_creer, crees))
+        return partenaires
+
+    def _vals_ordonnance(self, nom, data_fichier, data, patients, prescripteurs):
+        vals = {
+            'praticien_id': self.praticien_id.id,
+            'patient_id': patients[data['_patient']].id,
+            'date_prescription': data['date_prescription'] or fields.Date.context_today(self),
+            'notes': _('Import OCR en lot : %s') % nom,
+        }
+        if data['prescripteur_nom']:
+            vals['prescripteur_id'] = prescripteurs[data['prescripteur_nom']].id
+        if nom.lower().endswith(EXTENSIONS_IMAGE):
+            vals['ordonnance_image'] = base64.b64encode(data_fichier)
+            vals['ordonnance_filename'] = nom
+        return vals
+
+    def action_importer(self):
+        self.ensure_one()
+        fichiers = self._collecter_fichiers()
+        if not fichiers:
+            raise UserError(_('Ajoutez une archive ZIP ou des fichiers à importer.'))
+
+        debut = time.monotonic()
+        resultats = self._analyser_lot(fichiers)
+
+        lignes = []
+        a_creer = []
+        for (nom, data_fichier), (data, erreur, usage, operation) in zip(fichiers, resultats):
+            ligne = {'fichier_nom': nom, 'statut': 'erreur', 'message': erreur}
+            if data is not None:
+                data['_patient'] = ' '.join(filter(None, [
+                    data['patient_nom'], data.get('patient_prenom')])).strip()
+                if not data['_patient']:
+                    ligne['message'] = _('Patient non identifié.')
+                    data = None
+            lignes.append(ligne)
+            a_creer.append((ligne, nom, data_fichier, data, usage, operation))
+
+        valides = [t for t in a_creer if t[3] is not None]
+        patients = self._trouver_partenaires(
+            {t[3]['_patient'] for t in valides}, 'os_auxiliaire_medical.partner_category_patient')
+        prescripteurs = self._trouver_partenaires(
+            {t[3]['prescripteur_nom'] for t in valides if t[3]['prescripteur_nom']},
+            'os_auxiliaire_medical.partner_category_prescripteur')
+
+        Ordonnance = self.env['cps.ordonnance']
+        vals_list = [self._vals_ordonnance(nom, data_fichier, data, patients, prescripteurs)
+                     for _l, nom, data_fichier, data, _u, _o in valides]
+        try:
+            with self.env.cr.savepoint():
+                creees = Ordonnance.create(vals_list)
+                creees._create_lignes_from_ocr([t[3]['actes'] for t in valides])
+                ordonnances = list(creees)
+        except Exception as e:
+            # Un fichier invalide ne doit pas bloquer le lot : reprise fichier par fichier.
+            _logger.info('Import OCR : création groupée impossible (%s), reprise unitaire', e)
+            ordonnances = []
+            for vals, (ligne, _n, _d, data, _u, _o) in zip(vals_list, valides):
+                try:
+                    with self.env.cr.savepoint():
+                        ordonnance = Ordonnance.create(vals)
+                        ordonnance._create_lignes_from_ocr([data['actes']])
+                except Exception as err:
+                    ligne['message'] = str(err.args[0] if err.args else err)
+                    ordonnance = None
+                ordonnances.append(ordonnance)
+
+        for (ligne, nom, _d, data, _u, _o), ordonnance in zip(valides, ordonnances):
+            if ordonnance is None:
+                continue
+            ligne.update({
+                'statut': 'ok',
+                'ordonnance_id': ordonnance.id,
+                'nb_actes': len(data['actes']),
+                'message': False if data['date_prescription']
+                else _('Date de prescription non trouvée : à vérifier.'),
+            })
+
+        Usage = self.env['cps.api.usage']
+        for ligne, _n, _d, _data, usage, operation in a_creer:
+            if usage is not None:
+                Usage.log_usage(
+                    model=self.env['cps.wizard.ocr.ordonnance']._get_model(),
+                    operation=operation,
+                    input_tokens=usage.get('input_tokens', 0),
+                    output_tokens=usage.get('output_tokens', 0),
+                    ordonnance_id=ligne.get('ordonnance_id'),
+                    success=usage.get('success', True),
+                    error_message=usage.get('error_message'),
+                    cache_hit=usage.get('cache_hit', False),
+                )
+
+        self.write({
+            'etat': 'termine',
+            'duree': time.monotonic() - debut,
+            'ligne_ids': [(5, 0, 0)] + [(0, 0, l) for l in lignes],
+        })
+        return self._reopen()
+
+    def action_voir_ordonnances(self):
+        self.ensure_one()
+        return {
+            'type': 'ir.actions.act_window',
+            'name': _('Ordonnances importées'),
+            'res_model': 'cps.ordonnance',
+            'view_mode': 'list,form',
+            'domain': [('id', 'in', self.ligne_ids.ordonnance_id.ids)],
+            'target': 'current',
+        }
+
+    def _reopen(self):
+        return {'type': 'ir.actions.act_window', 'res_model': self._name,
+                'res_id': self.id, 'view_mode': 'form', 'target': 'new'}
+
+
+class WizardOcrImportLigne(models.TransientModel):
+    _name = 'cps.wizard.ocr.import.ligne'
+    _description = "Fichier d'un import OCR en lot"
+
+    wizard_id = fields.Many2one('cps.wizard.ocr.import', required=True, ondelete='cascade')
+    fichier_nom = fields.Char(string='Fichier')
+    statut = fields.Selection([('ok', 'Ordonnance créée'), ('erreur', 'Erreur')], required=True)
+    ordonnance_id = fields.Many2one('cps.ordonnance', string='Ordonnance')
+    nb_actes = fields.Integer(string='Actes')
+    message = fields.Char()
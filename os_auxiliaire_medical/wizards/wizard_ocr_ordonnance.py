@@ -1,50 +1,36 @@
 """
-Wizard OCR pour l'import d'ordonnances – v7.
+Wizard OCR pour l'import d'ordonnances – v8.
 Options :
   - OCR local (pdfminer + pytesseract)
   - Claude Haiku 4.5 texte   : envoie le texte extrait (prénom anonymisé)
   - Claude Haiku 4.5 vision  : envoie l'image directement (plus fiable sur
                                ordonnances manuscrites ou peu lisibles)
+
+L'extraction et les appels Claude sont exécutés en arrière-plan par la file
+cps.ocr.job : le wizard rend la main immédiatement, l'utilisateur est notifié
+à la fin de l'analyse et récupère le résultat avec « Actualiser ».
+
+Les appels passent par cps.anthropic.client (connexions réutilisées,
+nouvelles tentatives, limite de débit, trace dans cps.api.usage).
+
+Les réponses Claude sont mises en cache (cps.ocr.cache) par empreinte du
+contenu envoyé : re-soumettre le même scan ou le même texte ne refacture rien.
 """
 import base64, io, re, datetime, json, logging
-import urllib.request, urllib.error
+
+from markupsafe import Markup, escape
 
 from odoo import models, fields, api, _
 from odoo.exceptions import UserError
+from odoo.tools import str2bool
 
-_logger = logging.getLogger(__name__)
-
-MOIS_FR = {
-    'janvier': 1, 'fevrier': 2, 'février': 2, 'mars': 3, 'avril': 4,
-    'mai': 5, 'juin': 6, 'juillet': 7, 'aout': 8, 'août': 8,
-    'septembre': 9, 'octobre': 10, 'novembre': 11, 'decembre': 12, 'décembre': 12,
-}
-RE_DATE = re.compile(r'\b(\d{1,2})[/.\-](\d{1,2})[/.\-](\d{2,4})\b')
-RE_DATE_L = re.compile(
-    r'\b(\d{1,2})\s+(' + '|'.join(MOIS_FR.keys()) + r')\s+(\d{4})\b', re.IGNORECASE)
-RE_ACTE = re.compile(
-    r'\b(AM[OKYIS]|AMP|AIS|DI)\s*(\d+(?:[.,]\d+)?)'
-    r'(?:\s*[xX×]\s*(\d+))?(?:\s*séances?)?', re.IGNORECASE)
-RE_DR = re.compile(
-    r'(?:Dr\.?|Docteur|M\.?\s+|Mme\.?\s+)\s*'
-    r'([A-ZÉÈÀÙÂÊÎÔÛÄ][A-ZÉÈÀÙÂÊÎÔÛÄa-záéèàùâêîôûä\-]+(?:\s+[A-ZÉÈÀÙa-záéèàù\-]+)*)',
-    re.UNICODE)
-RE_PATIENT = re.compile(
-    r'(?:Patient\s*:?\s*|pour\s+(?:M\.?|Mme\.?)\s+|(?:M\.?|Mme\.?)\s+)'
-    r'([A-ZÉÈÀÙÂÊÎÔÛÄ][A-ZÉÈÀÙÂÊÎÔÛÄa-záéèàùâêîôûä\-]+(?:\s+[A-ZÉÈÀÙa-záéèàùâêîôûä\-]+)*)',
-    re.UNICODE)
-RE_CODE_PRESC = re.compile(
-    r'(?:code\s*(?:prescripteur)?\s*:?\s*|n°?\s*rpps\s*:?\s*|n°?\s*am\s*:?\s*)'
-    r'([A-Z0-9]{4,15})', re.IGNORECASE)
-
-
-def _parse_date(jj, mm, aaaa):
-    try:
-        y = int(aaaa); y = y + 2000 if y < 100 else y
-        return datetime.date(y, int(mm), int(jj))
-    except Exception:
-        return None
+from ..models.anthropic_client import BudgetEpuise, ErreurClaude
+from ..models.ocr_cache import version_prompt
+from .ocr_image import preparer_image
+from .ocr_local import ocr_pdf_scanne, ocr_tesseract
+from .ocr_parser import parse_ordonnance_text
 
+_logger = logging.getLogger(__name__)
 
 def _extract_text_pdf(data):
     try:
@@ -58,84 +44,86 @@ def _extract_text_pdf(data):
 
 def _extract_text_image(data):
     try:
-        import pytesseract
         from PIL import Image
         img = Image.open(io.BytesIO(data))
-        for lang in ('fra', 'fra+eng', 'eng'):
-            try:
-                t = pytesseract.image_to_string(img, lang=lang)
-                if t.strip():
-                    return t
-            except Exception:
-                continue
-        return ''
     except ImportError:
         return ''
     except Exception as e:
         _logger.warning('pytesseract: %s', e); return ''
+    return ocr_tesseract(img)
 
 
-def _pdf_to_images(data):
+def _pdf_premiere_page(data):
+    """Première page d'un PDF en image (vision) ; les suivantes ne sont pas rastérisées."""
     try:
         from pdf2image import convert_from_bytes
-        return convert_from_bytes(data, dpi=200)
+        images = convert_from_bytes(data, dpi=200, first_page=1, last_page=1)
+        return images[0] if images else None
     except Exception:
-        return []
+        return None
 
 
-def parse_ordonnance_text(text):
-    result = {
-        'prescripteur_nom': '', 'prescripteur_code': '',
-        'date_prescription': None, 'patient_nom': '', 'patient_prenom': '',
-        'actes': [], 'texte_brut': text,
-    }
-    if not text:
-        return result
-    lines = [l.strip() for l in text.splitlines() if l.strip()]
-    # Dates
-    dates = []
-    for m in RE_DATE.finditer(text):
-        d = _parse_date(m.group(1), m.group(2), m.group(3))
-        if d and datetime.date(2000, 1, 1) <= d <= datetime.date(2099, 12, 31):
-            dates.append(d)
-    for m in RE_DATE_L.finditer(text.lower()):
-        mo = MOIS_FR.get(m.group(2).lower())
-        if mo:
-            d = _parse_date(m.group(1), mo, m.group(3))
-            if d: dates.append(d)
-    if dates:
-        result['date_prescription'] = max(dates)
-    # Prescripteur
-    dr = RE_DR.search(text)
-    if dr:
-        result['prescripteur_nom'] = dr.group(1).strip()
-    code = RE_CODE_PRESC.search(text)
-    if code:
-        result['prescripteur_code'] = code.group(1).strip()
-    # Patient
-    mid_s = max(0, len(lines) // 4); mid_e = min(len(lines), len(lines) * 3 // 4)
-    pm = RE_PATIENT.search('\n'.join(lines[mid_s:mid_e]))
-    if pm:
-        parts = pm.group(1).strip().split()
-        if parts:
-            result['patient_nom'] = parts[0].upper()
-            result['patient_prenom'] = ' '.join(parts[1:]).capitalize()
-    else:
-        for line in lines[mid_s:mid_e]:
-            if re.match(r'^[A-ZÉÈÀÙÂÊÎÔÛÄ\s\-]{3,40}$', line) and len(line.split()) <= 4:
-                parts = line.strip().split()
-                if len(parts) >= 2:
-                    result['patient_nom'] = parts[0]
-                    result['patient_prenom'] = ' '.join(parts[1:]).capitalize()
-                    break
-    # Actes
-    for m in RE_ACTE.finditer(text):
-        result['actes'].append({
-            'lettre_cle': m.group(1).upper(),
-            'coefficient': float(m.group(2).replace(',', '.')),
-            'nb_seances': int(m.group(3)) if m.group(3) else 1,
-        })
-    return result
+def _ordonnance_trouvee(texte):
+    """En-tête (prescripteur ou date) et actes reconnus : les pages suivantes sont inutiles."""
+    parsed = parse_ordonnance_text(texte)
+    return bool(parsed['actes']) and bool(parsed['prescripteur_nom'] or parsed['date_prescription'])
+
+
+def _extract_text_local(nom, data, pages_paralleles=True):
+    """
+    OCR local d'un fichier : PDF texte, sinon PDF scanné (pages en parallèle,
+    arrêt dès l'ordonnance trouvée) ou image (tesseract).
+    """
+    if nom.endswith('.pdf'):
+        texte = _extract_text_pdf(data)
+        if texte.strip():
+            return texte
+        return ocr_pdf_scanne(
+            data, max_workers=None if pages_paralleles else 1, arret=_ordonnance_trouvee)
+    return _extract_text_image(data)
+
+
+def _surligner(parsed):
+    """Texte du parser en HTML, champs reconnus dans des <mark> (infobulle : champ et confiance)."""
+    texte = parsed['texte_brut'] or ''
+    confiance, positions = parsed['confiance'], parsed['positions']
+    zones = [(debut, fin, champ, confiance[champ])
+             for champ, (debut, fin) in positions.items() if champ != 'actes']
+    zones += [(debut, fin, 'actes', c)
+              for (debut, fin), c in zip(positions['actes'], confiance['actes'])]
+    morceaux, curseur = [], 0
+    for debut, fin, champ, c in sorted(zones):
+        morceaux.append(escape(texte[curseur:debut]))
+        morceaux.append(Markup('<mark class="%s" title="%s (%d %%)">%s</mark>') % (
+            'bg-success-subtle' if c >= 0.8 else 'bg-warning-subtle',
+            champ, round(c * 100), texte[debut:fin]))
+        curseur = fin
+    morceaux.append(escape(texte[curseur:]))
+    return Markup('<pre class="mb-0">%s</pre>') % Markup('').join(morceaux)
+
+
+def _image_for_vision(nom, data, options=None):
+    """
+    (octets, media_type) à envoyer à Claude vision ; (None, None) si PDF non
+    convertible. Avec `options` (voir ocr_image.OPTIONS_DEFAUT), l'image est
+    pré-traitée (réduite, redressée, JPEG).
+    """
+    if nom.endswith('.pdf'):
+        page = _pdf_premiere_page(data)
+        if page is None:
+            return None, None
+        buf = io.BytesIO()
+        page.save(buf, format='PNG')
+        data, nom = buf.getvalue(), 'page.png'
+    if options is not None:
+        image, media_type, _infos = preparer_image(data, options)
+        if media_type:
+            return image, media_type
+    if nom.endswith('.png'):
+        return data, 'image/png'
+    if nom.endswith('.webp'):
+        return data, 'image/webp'
+    return data, 'image/jpeg'
 
 
 CLAUDE_SYSTEM_PROMPT = """Tu es un assistant médical analysant des ordonnances de Polynésie française.
@@ -169,6 +157,49 @@ CLAUDE_VISION_PROMPT = (
     "Ne retourne rien d'autre que le JSON."
 )
 
+PROMPT_VERSION_TEXTE = version_prompt(CLAUDE_SYSTEM_PROMPT)
+PROMPT_VERSION_VISION = version_prompt(CLAUDE_VISION_PROMPT)
+
+
+# ── Appels HTTP Claude (sans accès ORM : utilisables depuis un thread) ────────
+
+def _claude_payload_texte(model, texte):
+    return {
+        'model': model,
+        'max_tokens': 1000,
+        'system': CLAUDE_SYSTEM_PROMPT,
+        'messages': [{'role': 'user', 'content': texte}],
+    }
+
+
+def _claude_payload_vision(model, image_bytes, media_type):
+    return {
+        'model': model,
+        'max_tokens': 1024,
+        'messages': [{
+            'role': 'user',
+            'content': [
+                {
+                    'type': 'image',
+                    'source': {
+                        'type': 'base64',
+                        'media_type': media_type,
+                        'data': base64.b64encode(image_bytes).decode('utf-8'),
+                    },
+                },
+                {'type': 'text', 'text': CLAUDE_VISION_PROMPT},
+            ],
+        }],
+    }
+
+
+def _claude_texte_reponse(body):
+    return ''.join(
+        block.get('text', '')
+        for block in body.get('content', [])
+        if block.get('type') == 'text'
+    )
+
 
 class WizardOcrOrdonnance(models.TransientModel):
     _name = 'cps.wizard.ocr.ordonnance'
@@ -178,6 +209,10 @@ class WizardOcrOrdonnance(models.TransientModel):
     fichier = fields.Binary(string='Fichier (image ou PDF)', required=True)
     fichier_nom = fields.Char(string='Nom du fichier')
     texte_extrait = fields.Text(string='Texte extrait (éditable)')
+    texte_surligne = fields.Html(
+        string='Champs repérés', compute='_compute_texte_surligne', sanitize=False,
+        help='Texte extrait, champs reconnus par le parser local surlignés '
+             '(vert : confiance élevée, orange : à vérifier).')
 
     # Champs parsés / éditables
     prescripteur_nom = fields.Char(string='Nom du prescripteur')
@@ -205,7 +240,7 @@ class WizardOcrOrdonnance(models.TransientModel):
         default=False,
         help='Envoie directement l\'image à Claude Haiku 4.5 pour analyse visuelle. '
              'Plus efficace sur les ordonnances manuscrites ou peu lisibles. '
-             'Nécessite le paquet Python "anthropic" et une clé API Anthropic.',
+             'Nécessite une clé API Anthropic.',
     )
     claude_api_key = fields.Char(
         string='Clé API Anthropic',
@@ -215,20 +250,64 @@ class WizardOcrOrdonnance(models.TransientModel):
 
     etat = fields.Selection([
         ('attente', 'En attente'),
+        ('en_cours', 'Analyse en cours'),
         ('extrait', 'Texte extrait'),
         ('applique', 'Appliqué'),
     ], default='attente', readonly=True)
 
+    # ── Analyse en arrière-plan ────────────────────────────────────────────────
+    job_id = fields.Many2one('cps.ocr.job', string='Analyse', readonly=True)
+    job_state = fields.Selection(related='job_id.state', string="État de l'analyse")
+
+    @api.depends('texte_extrait')
+    def _compute_texte_surligne(self):
+        for wiz in self:
+            wiz.texte_surligne = _surligner(parse_ordonnance_text(wiz.texte_extrait or ''))
+
     # ── Étape 1 : Extraction ──────────────────────────────────────────────────
 
     def action_extraire(self):
         self.ensure_one()
         if not self.fichier:
             raise UserError(_('Veuillez charger un fichier.'))
+        self._lancer_job({'fichier': self.fichier, 'fichier_nom': self.fichier_nom})
+        return self._reopen()
 
-        data = base64.b64decode(self.fichier)
-        nom = (self.fichier_nom or '').lower()
-        texte = ''
+    def action_actualiser(self):
+        """Récupère le résultat de l'analyse en arrière-plan."""
+        self.ensure_one()
+        job = self.job_id.sudo()
+        if job.state == 'done':
+            vals = job.get_resultat()
+            vals.setdefault('etat', 'extrait')
+            self.write(vals)
+        elif job.state == 'failed':
+            self.write({
+                'etat': 'extrait' if self.texte_extrait else 'attente',
+                'claude_status': '❌ %s' % (job.error_message or _('Analyse en échec.')),
+            })
+        return self._reopen()
+
+    def _lancer_job(self, vals):
+        """Met l'analyse en file d'attente et passe le wizard en attente de résultat."""
+        job = self.env['cps.ocr.job'].sudo().create(dict(
+            vals,
+            user_id=self.env.uid,
+            company_id=self.env.company.id,
+            ordonnance_id=self.ordonnance_id.id,
+            use_claude_ai=self.use_claude_ai,
+            use_claude_vision=self.use_claude_vision,
+            claude_api_key=self.claude_api_key or False,
+        ))
+        self.write({'job_id': job.id, 'etat': 'en_cours', 'claude_status': False})
+        return job
+
+    def _analyser_fichier(self, data, nom):
+        """
+        OCR local et/ou Claude sur le fichier ; retourne les vals du wizard.
+        Exécuté par cps.ocr.job, hors requête HTTP.
+        """
+        vals = {}
 
         # ── Vision Claude en priorité si demandé ──────────────────────────────
         if self.use_claude_vision:
@@ -237,22 +316,11 @@ class WizardOcrOrdonnance(models.TransientModel):
                 vision_vals['etat'] = 'extrait'
                 vision_vals.setdefault(
                     'texte_extrait', _('(Image analysée directement par Claude vision)'))
-                self.write(vision_vals)
-                return self._reopen()
-            self.write({'claude_status': vision_vals.get('claude_status', '')})
+                return vision_vals
+            vals['claude_status'] = vision_vals.get('claude_status', '')
 
         # ── OCR local ─────────────────────────────────────────────────────────
-        if nom.endswith('.pdf'):
-            texte = _extract_text_pdf(data)
-            if not texte.strip():
-                images = _pdf_to_images(data)
-                parts = []
-                for img in images:
-                    buf = io.BytesIO(); img.save(buf, format='PNG')
-                    parts.append(_extract_text_image(buf.getvalue()))
-                texte = '\n'.join(parts)
-        else:
-            texte = _extract_text_image(data)
+        texte = _extract_text_local(nom, data)
 
         if not texte.strip():
             raise UserError(_(
@@ -265,7 +333,7 @@ class WizardOcrOrdonnance(models.TransientModel):
         parsed = parse_ordonnance_text(texte)
         actes_txt = self._format_actes(parsed['actes'])
 
-        vals = {
+        vals.update({
             'texte_extrait': texte,
             'prescripteur_nom': parsed['prescripteur_nom'],
             'prescripteur_code': parsed['prescripteur_code'],
@@ -275,14 +343,16 @@ class WizardOcrOrdonnance(models.TransientModel):
             'actes_detectes': actes_txt or _('Aucun acte détecté.'),
             'actes_json': json.dumps(parsed['actes']),
             'etat': 'extrait',
-        }
+        })
 
         # Appel Claude texte si demandé — ses résultats écrasent le parsing regex
         if self.use_claude_ai:
-            vals.update(self._run_claude_texte(texte, parsed.get('patient_prenom', '')))
+            vals.update(self._analyser_texte(texte, parsed.get('patient_prenom', '')))
+        return vals
 
-        self.write(vals)
-        return self._reopen()
+    def _analyser_texte(self, texte, prenom):
+        """Analyse Claude (mode texte) d'un texte déjà extrait."""
+        return self._run_claude_texte(texte, prenom)
 
     def action_reanalyser(self):
         self.ensure_one()
@@ -297,28 +367,62 @@ class WizardOcrOrdonnance(models.TransientModel):
             'actes_detectes': actes_txt or _('Aucun acte détecté.'),
             'actes_json': json.dumps(parsed['actes']),
         }
-        if self.use_claude_ai:
-            vals.update(self._run_claude_texte(
-                self.texte_extrait or '',
-                parsed.get('patient_prenom', '') or self.patient_prenom or ''
-            ))
         self.write(vals)
+        # Le résultat regex est immédiat ; Claude complète en arrière-plan.
+        if self.use_claude_ai:
+            self._lancer_job({
+                'texte_source': self.texte_extrait or '',
+                'patient_prenom': parsed.get('patient_prenom', '') or self.patient_prenom or '',
+            })
         return self._reopen()
 
     # ── Helpers API ───────────────────────────────────────────────────────────
 
     def _get_api_key(self):
-        if self.claude_api_key:
-            return self.claude_api_key
-        return self.env['ir.config_parameter'].sudo().get_param(
-            'cps.anthropic.api.key', ''
-        )
+        return self.claude_api_key or self.env['cps.anthropic.client']._config()['api_key']
 
     def _get_model(self):
-        return self.env['ir.config_parameter'].sudo().get_param(
-            'claude_model', 'claude-haiku-4-5-20251001'
+        return self.env['cps.anthropic.client']._config()['model']
+
+    def _log_cache(self, operation):
+        """Trace une lecture du cache OCR (0 token) ; les appels sont tracés par le client."""
+        self.env['cps.api.usage'].log_usage(
+            model=self._get_model(), operation=operation,
+            ordonnance_id=self.ordonnance_id.id, cache_hit=True,
         )
 
+    def _appeler_claude(self, payload, operation):
+        """
+        (corps JSON, None) ou (None, statut d'erreur pour claude_status).
+        Budget épuisé : le résultat de l'OCR local (tesseract) est conservé.
+        """
+        try:
+            return self.env['cps.anthropic.client'].messages(
+                payload, operation,
+                ordonnance_id=self.ordonnance_id.id, api_key=self._get_api_key(),
+            ), None
+        except BudgetEpuise:
+            return None, _('⚠ Budget mensuel Claude épuisé : analyse locale (tesseract).')
+        except ErreurClaude as e:
+            return None, _('❌ Erreur API Claude : %s') % e
+
+    def _get_options_vision(self):
+        """
+        Options de pré-traitement des images (Paramètres), None si désactivé.
+        Booléens : paramètre absent = décoché (valeurs initiales posées par
+        data/ir_config_parameter_data.xml).
+        """
+        IrParam = self.env['ir.config_parameter'].sudo()
+        if not str2bool(IrParam.get_param('cps.vision.pretraitement', 'False')):
+            return None
+        return {
+            'cote_max': int(IrParam.get_param('cps.vision.cote_max', 1568) or 0),
+            'qualite': int(IrParam.get_param('cps.vision.qualite', 80) or 80),
+            'niveaux_gris': str2bool(IrParam.get_param('cps.vision.niveaux_gris', 'False')),
+            'redresser': str2bool(IrParam.get_param('cps.vision.redresser', 'False')),
+            'rogner': str2bool(IrParam.get_param('cps.vision.rogner', 'False')),
+        }
+
     def _anonymize_prenom(self, texte, prenom):
         """Remplace le prénom du patient par [PRÉNOM] dans le texte."""
         if not prenom or len(prenom) < 2:
@@ -337,13 +441,14 @@ class WizardOcrOrdonnance(models.TransientModel):
             _logger.warning('Claude JSON parse error: %s – raw: %s', e, raw[:500])
             return None, _('⚠ Réponse Claude non parseable.')
 
-    def _vals_from_claude_data(self, data):
+    def _vals_from_claude_data(self, data, cache=False):
         """
         Construit le dict de vals Odoo depuis le JSON retourné par Claude.
         Stocke les actes à la fois dans actes_detectes (lisible) et actes_json
         (réutilisable par action_appliquer).
         """
-        vals = {'claude_status': _('✅ Analyse Claude réussie.')}
+        vals = {'claude_status': _('✅ Analyse Claude réussie (cache).') if cache
+                else _('✅ Analyse Claude réussie.')}
         if data.get('prescripteur_nom'):
             vals['prescripteur_nom'] = data['prescripteur_nom']
         if data.get('prescripteur_code'):
@@ -374,12 +479,11 @@ class WizardOcrOrdonnance(models.TransientModel):
         vals['actes_detectes'] = self._format_actes(actes_norm) or _('Aucun acte détecté.')
         return vals
 
-    # ── Claude Haiku 4.5 – mode texte (urllib, sans dépendance SDK) ───────────
+    # ── Claude Haiku 4.5 – mode texte ─────────────────────────────────────────
 
     def _run_claude_texte(self, texte, prenom):
         """
         Anonymise le prénom du patient puis envoie le texte à Claude Haiku 4.5.
-        Utilise urllib (aucune dépendance Python externe).
         Retourne un dict de vals à merger dans write().
         """
         api_key = self._get_api_key()
@@ -387,116 +491,56 @@ class WizardOcrOrdonnance(models.TransientModel):
             return {'claude_status': _('⚠ Clé API Anthropic non configurée.')}
 
         texte_anon = self._anonymize_prenom(texte, prenom)
-
-        payload = json.dumps({
-            'model': self._get_model(),
-            'max_tokens': 1000,
-            'system': CLAUDE_SYSTEM_PROMPT,
-            'messages': [{'role': 'user', 'content': texte_anon}],
-        }).encode('utf-8')
-
-        req = urllib.request.Request(
-            'https://api.anthropic.com/v1/messages',
-            data=payload,
-            headers={
-                'Content-Type': 'application/json',
-                'anthropic-version': '2023-06-01',
-                'x-api-key': api_key,
-            },
-            method='POST',
-        )
-        try:
-            with urllib.request.urlopen(req, timeout=30) as resp:
-                body = json.loads(resp.read().decode('utf-8'))
-        except urllib.error.HTTPError as e:
-            err = e.read().decode('utf-8', errors='replace')
-            _logger.error('Claude API HTTP %s: %s', e.code, err)
-            return {'claude_status': _('❌ Erreur API Claude : HTTP %s') % e.code}
-        except Exception as e:
-            _logger.error('Claude API error: %s', e)
-            return {'claude_status': _('❌ Erreur réseau : %s') % str(e)}
-
-        raw = ''.join(
-            block.get('text', '')
-            for block in body.get('content', [])
-            if block.get('type') == 'text'
-        )
-        data, err = self._parse_claude_json(raw)
+        model = self._get_model()
+        Cache = self.env['cps.ocr.cache']
+        data = Cache.lire(texte_anon, model, PROMPT_VERSION_TEXTE)
+        if data is not None:
+            self._log_cache('ocr_texte')
+            return self._vals_from_claude_data(data, cache=True)
+
+        body, err = self._appeler_claude(_claude_payload_texte(model, texte_anon), 'ocr_texte')
         if err:
             return {'claude_status': err}
+        data, err = self._parse_claude_json(_claude_texte_reponse(body))
+        if err:
+            return {'claude_status': err}
+        Cache.ecrire(texte_anon, model, PROMPT_VERSION_TEXTE, 'ocr_texte', data)
         return self._vals_from_claude_data(data)
 
-    # ── Claude Haiku 4.5 – mode vision (SDK anthropic) ───────────────────────
+    # ── Claude Haiku 4.5 – mode vision ────────────────────────────────────────
 
     def _run_claude_vision(self, file_data, fichier_nom):
         """
         Envoie l'image (ou la première page du PDF converti) directement à
-        Claude Haiku 4.5 en mode vision via le SDK 'anthropic'.
+        Claude Haiku 4.5 en mode vision.
         Retourne un dict de vals à merger dans write().
         """
-        api_key = self._get_api_key()
-        if not api_key:
+        if not self._get_api_key():
             return {'claude_status': _('⚠ Clé API Anthropic non configurée.')}
 
-        try:
-            import anthropic as anthropic_sdk
-        except ImportError:
+        image_bytes, media_type = _image_for_vision(
+            fichier_nom.lower(), file_data, self._get_options_vision())
+        if image_bytes is None:
             return {'claude_status': _(
-                "❌ Le paquet Python 'anthropic' n'est pas installé. "
-                "Lancez : pip install anthropic"
+                '❌ Impossible de convertir le PDF en image pour la vision. '
+                'Installez pdf2image et poppler, ou utilisez le mode texte.'
             )}
 
-        nom = fichier_nom.lower()
-        if nom.endswith('.pdf'):
-            images = _pdf_to_images(file_data)
-            if not images:
-                return {'claude_status': _(
-                    '❌ Impossible de convertir le PDF en image pour la vision. '
-                    'Installez pdf2image et poppler, ou utilisez le mode texte.'
-                )}
-            buf = io.BytesIO()
-            images[0].save(buf, format='PNG')
-            image_bytes = buf.getvalue()
-            media_type = 'image/png'
-        else:
-            image_bytes = file_data
-            if nom.endswith('.png'):
-                media_type = 'image/png'
-            elif nom.endswith('.webp'):
-                media_type = 'image/webp'
-            else:
-                media_type = 'image/jpeg'
-
-        image_b64 = base64.b64encode(image_bytes).decode('utf-8')
-
-        client = anthropic_sdk.Anthropic(api_key=api_key)
-        try:
-            response = client.messages.create(
-                model=self._get_model(),
-                max_tokens=1024,
-                messages=[{
-                    'role': 'user',
-                    'content': [
-                        {
-                            'type': 'image',
-                            'source': {
-                                'type': 'base64',
-                                'media_type': media_type,
-                                'data': image_b64,
-                            },
-                        },
-                        {'type': 'text', 'text': CLAUDE_VISION_PROMPT},
-                    ],
-                }],
-            )
-            raw = response.content[0].text if response.content else ''
-        except Exception as exc:
-            _logger.error('Claude vision error: %s', exc)
-            return {'claude_status': _('❌ Erreur Claude vision : %s') % str(exc)}
+        model = self._get_model()
+        Cache = self.env['cps.ocr.cache']
+        data = Cache.lire(image_bytes, model, PROMPT_VERSION_VISION)
+        if data is not None:
+            self._log_cache('ocr_vision')
+            return self._vals_from_claude_data(data, cache=True)
 
-        data, err = self._parse_claude_json(raw)
+        body, err = self._appeler_claude(
+            _claude_payload_vision(model, image_bytes, media_type), 'ocr_vision')
+        if err:
+            return {'claude_status': err}
+        data, err = self._parse_claude_json(_claude_texte_reponse(body))
         if err:
             return {'claude_status': err}
+        Cache.ecrire(image_bytes, model, PROMPT_VERSION_VISION, 'ocr_vision', data)
         return self._vals_from_claude_data(data)
 
     # ── Application ───────────────────────────────────────────────────────────